@@ -0,0 +1,245 @@
+"""Replay recorded AdmissionReview requests and report webhook latency.
+
+Record requests with ``knetvis admission FLOWS --record requests.jsonl``, or
+generate a synthetic cluster, protected flows and recording:
+
+    python benchmarks/admission_replay.py --generate bench/
+    python benchmarks/admission_replay.py bench/requests.jsonl \\
+        --snapshot bench/snapshot.json --flows bench/flows.yaml
+
+With ``--snapshot`` and ``--flows`` a local server is started in a separate
+process; use ``--url`` to load an already running webhook instead. Exits
+with status 1 when the p99 latency exceeds ``--budget-ms``.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+from typing import Any, List, Optional, Tuple
+
+from knetvis.admission import AdmissionChecker, AdmissionServer, load_protected_flows
+from knetvis.policy import PolicyParser
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+
+
+def _policy(namespace: str, name: str, app: str, sources: List[str]) -> dict:
+    peers = [{"podSelector": {"matchLabels": {"app": source}}} for source in sources]
+    return {
+        "apiVersion": "networking.k8s.io/v1",
+        "kind": "NetworkPolicy",
+        "metadata": {"name": name, "namespace": namespace},
+        "spec": {
+            "podSelector": {"matchLabels": {"app": app}},
+            "policyTypes": ["Ingress"],
+            "ingress": [{"from": peers}],
+        },
+    }
+
+
+def _review(uid: int, operation: str, policy: dict) -> dict:
+    request = {
+        "uid": f"replay-{uid}",
+        "kind": {
+            "group": "networking.k8s.io",
+            "version": "v1",
+            "kind": "NetworkPolicy",
+        },
+        "namespace": policy["metadata"]["namespace"],
+        "name": policy["metadata"]["name"],
+        "operation": operation,
+        "dryRun": True,
+    }
+    request["oldObject" if operation == "DELETE" else "object"] = policy
+    return {
+        "apiVersion": "admission.k8s.io/v1",
+        "kind": "AdmissionReview",
+        "request": request,
+    }
+
+
+def generate(
+    directory: str, namespaces: int, pods: int, flows: int, requests: int
+) -> None:
+    """Write snapshot.json, flows.yaml and requests.jsonl to directory"""
+    rng = random.Random(0)
+    apps = [f"app-{i}" for i in range(20)]
+    names = [f"ns-{i}" for i in range(namespaces)]
+    pod_labels: dict = {ns: {} for ns in names}
+    for i in range(pods):
+        pod_labels[rng.choice(names)][f"pod-{i}"] = {"app": rng.choice(apps)}
+    policies: dict = {
+        ns: [_policy(ns, f"allow-{app}", app, rng.sample(apps, 5)) for app in apps]
+        for ns in names
+    }
+    snapshot = ClusterSnapshot(
+        context="replay",
+        namespaces={ns: {"name": ns} for ns in names},
+        pods=pod_labels,
+        policies=policies,
+    )
+    os.makedirs(directory, exist_ok=True)
+    snapshot.save(os.path.join(directory, "snapshot.json"))
+
+    endpoints = [(ns, pod) for ns in names for pod in pod_labels[ns]]
+    with open(os.path.join(directory, "flows.yaml"), "w") as f:
+        for _ in range(flows):
+            (src_ns, src), (dst_ns, dst) = rng.sample(endpoints, 2)
+            f.write(f"- from: {src_ns}/pod/{src}\n  to: {dst_ns}/pod/{dst}\n")
+
+    with open(os.path.join(directory, "requests.jsonl"), "w") as f:
+        for uid in range(requests):
+            ns = rng.choice(names)
+            operation = rng.choice(["CREATE", "UPDATE", "DELETE"])
+            app = rng.choice(apps)
+            name = f"extra-{uid}" if operation == "CREATE" else f"allow-{app}"
+            policy = _policy(ns, name, app, rng.sample(apps, rng.randint(0, 5)))
+            f.write(json.dumps(_review(uid, operation, policy)) + "\n")
+
+
+def _serve(snapshot: str, flows: str, port: Any) -> None:
+    parser = PolicyParser(snapshot=ClusterSnapshot.load(snapshot))
+    checker = AdmissionChecker(TrafficSimulator(parser), load_protected_flows(flows))
+    server = AdmissionServer(checker, ("127.0.0.1", 0))
+    port.value = server.server_port
+    server.serve_forever()
+
+
+def start_local(snapshot: str, flows: str) -> Tuple[str, multiprocessing.Process]:
+    """Run a webhook on a free local port in a child process"""
+    port = multiprocessing.Value("i", 0)
+    process = multiprocessing.Process(
+        target=_serve, args=(snapshot, flows, port), daemon=True
+    )
+    process.start()
+    while port.value == 0:
+        if not process.is_alive():
+            raise RuntimeError("webhook failed to start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port.value}/validate", process
+
+
+def replay(
+    url: str, bodies: List[bytes], concurrency: int, insecure: bool = False
+) -> Tuple[List[float], int, int]:
+    """Send every body once; return latencies in seconds, denials and errors"""
+    parsed = urllib.parse.urlsplit(url)
+    latencies: List[float] = []
+    counts = {"denied": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def connect() -> http.client.HTTPConnection:
+        if parsed.scheme == "https":
+            context = ssl._create_unverified_context() if insecure else None
+            return http.client.HTTPSConnection(parsed.netloc, context=context)
+        return http.client.HTTPConnection(parsed.netloc)
+
+    def worker(share: List[bytes]) -> None:
+        connection = connect()
+        own: List[float] = []
+        denied = errors = 0
+        for body in share:
+            start = time.perf_counter()
+            try:
+                connection.request(
+                    "POST",
+                    parsed.path or "/",
+                    body,
+                    {"Content-Type": "application/json"},
+                )
+                answer = json.loads(connection.getresponse().read())
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+                connection = connect()
+                continue
+            own.append(time.perf_counter() - start)
+            denied += not answer["response"]["allowed"]
+        connection.close()
+        with lock:
+            latencies.extend(own)
+            counts["denied"] += denied
+            counts["errors"] += errors
+
+    threads = [
+        threading.Thread(target=worker, args=(bodies[i::concurrency],))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, counts["denied"], counts["errors"]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", nargs="?")
+    parser.add_argument("--generate", metavar="DIR")
+    parser.add_argument("--namespaces", type=int, default=50)
+    parser.add_argument("--pods", type=int, default=5000)
+    parser.add_argument("--flows", type=str, default=None)
+    parser.add_argument("--flow-count", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--snapshot")
+    parser.add_argument("--url")
+    parser.add_argument("--insecure", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        generate(
+            args.generate, args.namespaces, args.pods, args.flow_count, args.requests
+        )
+        print(f"Wrote snapshot.json, flows.yaml and requests.jsonl to {args.generate}")
+        return 0
+    if not args.recording or not (args.url or (args.snapshot and args.flows)):
+        parser.error("give a recording and --url, or --snapshot and --flows")
+
+    with open(args.recording, "rb") as f:
+        bodies = [line.strip() for line in f if line.strip()] * args.repeat
+
+    process = None
+    url = args.url
+    if url is None:
+        url, process = start_local(args.snapshot, args.flows)
+    try:
+        start = time.perf_counter()
+        latencies, denied, errors = replay(url, bodies, args.concurrency, args.insecure)
+        elapsed = time.perf_counter() - start
+    finally:
+        if process is not None:
+            process.terminate()
+
+    p99 = percentile(latencies, 0.99) * 1000
+    print(
+        f"{len(latencies)} requests ({denied} denied, {errors} failed), "
+        f"{args.concurrency} client(s): {len(latencies) / elapsed:,.0f} requests/s"
+    )
+    print(
+        f"p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+        f"p95 {percentile(latencies, 0.95) * 1000:.2f} ms, "
+        f"p99 {p99:.2f} ms, max {max(latencies) * 1000:.2f} ms"
+    )
+    if p99 > args.budget_ms:
+        print(f"p99 exceeds the {args.budget_ms:.0f} ms budget")
+    return 1 if errors or p99 > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
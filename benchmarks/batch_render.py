@@ -0,0 +1,63 @@
+"""Time batch rendering of every namespace, then re-runs after small changes.
+
+Renders a generated cluster with ``render_all`` three times into a scratch
+directory: from scratch, unchanged (every namespace skipped by hash), and
+after relabelling one pod (only its namespace re-rendered). The per-run
+time is what a dashboard refreshing on a schedule would pay.
+
+Usage: python benchmarks/batch_render.py [NAMESPACES] [JOBS] [FORMAT]
+"""
+
+import sys
+import tempfile
+import time
+
+from knetvis.batch import render_all
+from knetvis.snapshot import ClusterSnapshot
+
+
+def generate(namespaces: int) -> ClusterSnapshot:
+    names = [f"ns-{i}" for i in range(namespaces)]
+    return ClusterSnapshot(
+        context="bench",
+        namespaces={ns: {} for ns in names},
+        pods={
+            ns: {f"{app}-{j}": {"app": app} for app in ("web", "api") for j in range(5)}
+            for ns in names
+        },
+        policies={
+            ns: [
+                {
+                    "metadata": {"name": "api-from-web"},
+                    "spec": {
+                        "podSelector": {"matchLabels": {"app": "api"}},
+                        "ingress": [
+                            {"from": [{"podSelector": {"matchLabels": {"app": "web"}}}]}
+                        ],
+                    },
+                }
+            ]
+            for ns in names
+        },
+    )
+
+
+def main() -> None:
+    namespaces = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    fmt = sys.argv[3] if len(sys.argv) > 3 else "png"
+    snapshot = generate(namespaces)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name in ("cold", "unchanged", "one pod relabelled"):
+            if name == "one pod relabelled":
+                snapshot.pods["ns-0"]["web-0"] = {"app": "web", "canary": "true"}
+            start = time.perf_counter()
+            results = render_all(snapshot, out_dir, formats=(fmt,), jobs=jobs)
+            elapsed = time.perf_counter() - start
+            rendered = sum(r.status == "rendered" for r in results)
+            print(f"{name}: {elapsed:.2f}s, {rendered}/{namespaces} rendered")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Per-pair evaluation cost as unrelated policies are added to a namespace.
+
+Policies are bucketed once per namespace and direction ("build", in ms).
+Each pair is then evaluated once, with the selector lookup for its label
+set, and again from the memoized buckets; both are compared with a linear
+scan over every policy of the namespace, which is what evaluation cost
+before policies were bucketed.
+
+Usage: python benchmarks/engine_buckets.py [PAIRS] [MAX_POLICIES]
+"""
+
+import sys
+import time
+from typing import List
+
+from knetvis.engine import CompiledPolicy, PolicyEngine
+from knetvis.models import Endpoint
+from knetvis.selector import NamespaceIndex
+from knetvis.snapshot import ClusterSnapshot, SnapshotApi
+
+BASE = [
+    {
+        "metadata": {"name": "api-from-web"},
+        "spec": {
+            "podSelector": {"matchLabels": {"app": "api"}},
+            "ingress": [{"from": [{"podSelector": {"matchLabels": {"role": "web"}}}]}],
+        },
+    },
+    {
+        "metadata": {"name": "deny-batch-egress"},
+        "spec": {
+            "podSelector": {"matchLabels": {"app": "batch"}},
+            "policyTypes": ["Egress"],
+        },
+    },
+]
+
+
+def unrelated(count: int) -> List[dict]:
+    return [
+        {
+            "metadata": {"name": f"other-{i}"},
+            "spec": {
+                "podSelector": {"matchLabels": {"app": f"other-{i}"}},
+                "policyTypes": ["Ingress", "Egress"],
+                "ingress": [{"from": [{"podSelector": {"matchLabels": {"x": "y"}}}]}],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def linear(
+    policies: List[CompiledPolicy],
+    direction: str,
+    subject: Endpoint,
+    peer: Endpoint,
+    namespaces: NamespaceIndex,
+) -> bool:
+    isolated = False
+    for policy in policies:
+        if policy.isolates(direction) and policy.selector.matches(subject.labels):
+            if policy.allows(direction, peer, namespaces):
+                return True
+            isolated = True
+    return not isolated
+
+
+def main() -> None:
+    pairs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    largest = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    namespaces = NamespaceIndex(SnapshotApi(ClusterSnapshot("bench", {"shop": {}})))
+    flows = [
+        (
+            Endpoint("shop", f"web-{i}", {"role": "web", "pod": str(i)}),
+            Endpoint("shop", f"api-{i}", {"app": "api", "pod": str(i)}),
+        )
+        for i in range(pairs)
+    ]
+
+    print(
+        f"{'policies':>8} {'build ms':>10} {'first':>10} {'repeat':>10} "
+        f"{'linear':>10}  (us/pair)"
+    )
+    count = 10
+    while count <= largest:
+        engine = PolicyEngine({"shop": BASE + unrelated(count)}, namespaces)
+
+        start = time.perf_counter()
+        engine.buckets("shop", "ingress")
+        engine.buckets("shop", "egress")
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for source, dest in flows:
+            engine.allowed(source, dest)
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for source, dest in flows:
+            engine.allowed(source, dest)
+        repeat = time.perf_counter() - start
+
+        compiled = list(engine.by_namespace["shop"])
+        start = time.perf_counter()
+        for source, dest in flows:
+            linear(compiled, "egress", source, dest, namespaces) and linear(
+                compiled, "ingress", dest, source, namespaces
+            )
+        scan = time.perf_counter() - start
+
+        print(
+            f"{count + len(BASE):>8} {build * 1e3:>10.1f} {first / pairs * 1e6:>10.1f} "
+            f"{repeat / pairs * 1e6:>10.1f} {scan / pairs * 1e6:>10.1f}"
+        )
+        count *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Time reconstructing past cluster states from a week-long history.
+
+Records a synthetic week of polls (pods rolling over, labels and policies
+changing) into a temporary history file, then reconstructs the state at
+random points in time.
+
+Usage: python benchmarks/history_reconstruct.py [PODS] [INTERVAL_MINUTES]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from knetvis.history import HistoryStore
+from knetvis.snapshot import ClusterSnapshot
+
+NAMESPACES = [f"ns-{i}" for i in range(20)]
+WEEK = 7 * 24 * 3600
+
+
+def _policy(namespace: str, name: str, app: str) -> dict:
+    return {
+        "metadata": {"name": name, "namespace": namespace},
+        "spec": {
+            "podSelector": {"matchLabels": {"app": app}},
+            "policyTypes": ["Ingress"],
+            "ingress": [{"from": [{"podSelector": {}}]}],
+        },
+    }
+
+
+def main() -> None:
+    pods = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    interval = 60 * (float(sys.argv[2]) if len(sys.argv) > 2 else 1.0)
+    rng = random.Random(0)
+    snapshot = ClusterSnapshot(
+        context="bench",
+        namespaces={ns: {"team": ns} for ns in NAMESPACES},
+        pods={ns: {} for ns in NAMESPACES},
+        policies={
+            ns: [_policy(ns, f"allow-{i}", f"app-{i}") for i in range(10)]
+            for ns in NAMESPACES
+        },
+    )
+    for i in range(pods):
+        snapshot.pods[rng.choice(NAMESPACES)][f"pod-{i}"] = {"app": f"app-{i % 30}"}
+    serial = pods
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.jsonl")
+        store = HistoryStore(path)
+        start = time.perf_counter()
+        records = int(WEEK / interval)
+        for step in range(records):
+            for _ in range(rng.randint(1, 10)):
+                ns = rng.choice(NAMESPACES)
+                if snapshot.pods[ns]:
+                    del snapshot.pods[ns][rng.choice(list(snapshot.pods[ns]))]
+                snapshot.pods[ns][f"pod-{serial}"] = {"app": f"app-{serial % 30}"}
+                serial += 1
+            if step % 50 == 0:
+                ns = rng.choice(NAMESPACES)
+                snapshot.policies[ns] = snapshot.policies[ns][1:] + [
+                    _policy(ns, f"allow-{step}", f"app-{step % 30}")
+                ]
+            store.record(snapshot, timestamp=step * interval)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(path) / 1024 / 1024
+        print(
+            f"Recorded {records} polls of {pods} pods in {elapsed:.1f}s "
+            f"({size:.1f} MiB)"
+        )
+
+        start = time.perf_counter()
+        reopened = HistoryStore(path)
+        print(f"Opened history in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        timings = []
+        for _ in range(20):
+            at = rng.uniform(0, records * interval)
+            start = time.perf_counter()
+            reopened.at(at)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(
+            f"Reconstruction: median {timings[len(timings) // 2] * 1000:.1f} ms, "
+            f"max {timings[-1] * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Scaling of policy evaluation with worker processes (1, 2, 4 and 8 jobs).
+
+Times the all-pairs matrix over every namespace and the policy graph of
+one namespace on a generated snapshot.
+
+Usage: python benchmarks/parallel_scaling.py [PODS] [POLICIES]
+"""
+
+import os
+import random
+import sys
+import time
+from typing import Any, Callable
+
+from knetvis import visualizer as visualizer_module
+from knetvis.cache import ResultCache
+from knetvis.engine import PolicyEngine
+from knetvis.matrix import evaluate_pairs
+from knetvis.models import Endpoint
+from knetvis.policy import PolicyParser
+from knetvis.snapshot import ClusterSnapshot
+from knetvis.visualizer import NetworkVisualizer
+
+JOBS = (1, 2, 4, 8)
+NAMESPACES = [f"ns-{i}" for i in range(8)]
+
+
+def _selector(rng: random.Random) -> dict:
+    return {"matchLabels": {"app": f"app-{rng.randint(0, 40)}"}}
+
+
+def generate(pods: int, policies: int, seed: int = 0) -> ClusterSnapshot:
+    rng = random.Random(seed)
+    labels = {ns: {"team": rng.choice(["a", "b", "c"])} for ns in NAMESPACES}
+    pod_labels: dict = {ns: {} for ns in NAMESPACES}
+    for i in range(pods):
+        pod_labels[rng.choice(NAMESPACES)][f"pod-{i}"] = {
+            "app": f"app-{rng.randint(0, 40)}",
+            "tier": rng.choice(["web", "api", "db"]),
+        }
+    docs: dict = {ns: [] for ns in NAMESPACES}
+    for i in range(policies):
+        peers = [
+            {"podSelector": _selector(rng)},
+            {"namespaceSelector": {"matchLabels": {"team": "a"}}},
+            {
+                "namespaceSelector": {"matchLabels": {"team": "b"}},
+                "podSelector": _selector(rng),
+            },
+        ]
+        docs[rng.choice(NAMESPACES)].append(
+            {
+                "metadata": {"name": f"policy-{i}"},
+                "spec": {
+                    "podSelector": {"matchLabels": {"tier": rng.choice(["api", "db"])}},
+                    "policyTypes": ["Ingress", "Egress"],
+                    "ingress": [{"from": rng.sample(peers, 2)}],
+                    "egress": [{"to": rng.sample(peers, 1)}],
+                },
+            }
+        )
+    return ClusterSnapshot(
+        context="bench", namespaces=labels, pods=pod_labels, policies=docs
+    )
+
+
+def _timed(func: Callable[..., Any], *args: Any) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    pods = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    policies = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    snapshot = generate(pods, policies)
+    parser = PolicyParser(snapshot=snapshot)
+    engine = PolicyEngine(snapshot.policies, parser.namespace_index)
+    endpoints = [
+        Endpoint(ns, name, labels)
+        for ns, ns_pods in snapshot.pods.items()
+        for name, labels in ns_pods.items()
+    ]
+    namespace = NAMESPACES[0]
+    graph_policies = parser.get_namespace_policies(namespace)
+    visualizer_module.console.quiet = True
+
+    def build_graph(jobs: int) -> None:
+        NetworkVisualizer(
+            core_api=parser.core_api,
+            namespace_index=parser.namespace_index,
+            cache=ResultCache(),
+            jobs=jobs,
+        ).create_graph(namespace, graph_policies)
+
+    print(f"{pods} pods, {policies} policies, {os.cpu_count()} CPU(s)")
+    print(
+        f"{'jobs':>4}  {'matrix s':>9}  {'speedup':>7}  {'graph s':>8}  {'speedup':>7}"
+    )
+    base = None
+    for jobs in JOBS:
+        times = (
+            _timed(evaluate_pairs, engine, endpoints, jobs),
+            _timed(build_graph, jobs),
+        )
+        base = base or times
+        print(
+            f"{jobs:>4}  {times[0]:>9.2f}  {base[0] / times[0]:>6.2f}x  "
+            f"{times[1]:>8.2f}  {base[1] / times[1]:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
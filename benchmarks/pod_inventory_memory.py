@@ -0,0 +1,213 @@
+"""Peak RSS of listing a large namespace: client models vs. paged records.
+
+Serves PODS generated pods from a local fake API server and lists them in a
+fresh process per mode, so each peak is measured on its own.
+
+Usage: python benchmarks/pod_inventory_memory.py [PODS] [PAGE_SIZE]
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from kubernetes import client
+
+from knetvis.inventory import PAGE_SIZE, iter_pods
+
+
+def generate_pod(i: int) -> dict:
+    """A pod shaped like a typical Deployment replica"""
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {
+            "name": f"web-{i}",
+            "namespace": "bench",
+            "uid": f"00000000-0000-0000-0000-{i:012d}",
+            "resourceVersion": str(1000 + i),
+            "creationTimestamp": "2024-01-01T00:00:00Z",
+            "labels": {"app": f"app-{i % 50}", "tier": "web", "shard": str(i % 7)},
+            "annotations": {"checksum/config": "f" * 64},
+            "ownerReferences": [
+                {
+                    "apiVersion": "apps/v1",
+                    "kind": "ReplicaSet",
+                    "name": f"web-{i % 50}-abc",
+                    "uid": "11111111-1111-1111-1111-111111111111",
+                    "controller": True,
+                }
+            ],
+            "managedFields": [
+                {
+                    "manager": "kube-controller-manager",
+                    "operation": "Update",
+                    "apiVersion": "v1",
+                    "fieldsType": "FieldsV1",
+                    "fieldsV1": {"f:metadata": {"f:labels": {".": {}}}},
+                }
+            ],
+        },
+        "spec": {
+            "containers": [
+                {
+                    "name": "web",
+                    "image": "registry.example.com/web:1.2.3",
+                    "ports": [{"name": "http", "containerPort": 8080}],
+                    "env": [{"name": f"VAR_{k}", "value": "x" * 20} for k in range(8)],
+                    "resources": {
+                        "limits": {"cpu": "500m", "memory": "256Mi"},
+                        "requests": {"cpu": "100m", "memory": "128Mi"},
+                    },
+                    "readinessProbe": {
+                        "httpGet": {"path": "/healthz", "port": 8080},
+                        "periodSeconds": 10,
+                    },
+                    "volumeMounts": [{"name": "config", "mountPath": "/etc/web"}],
+                }
+            ],
+            "volumes": [{"name": "config", "configMap": {"name": "web-config"}}],
+            "nodeName": f"node-{i % 100}",
+        },
+        "status": {
+            "phase": "Running",
+            "podIP": f"10.0.{i // 256 % 256}.{i % 256}",
+            "conditions": [
+                {
+                    "type": t,
+                    "status": "True",
+                    "lastTransitionTime": "2024-01-01T00:00:00Z",
+                }
+                for t in ("Initialized", "Ready", "ContainersReady", "PodScheduled")
+            ],
+            "containerStatuses": [
+                {
+                    "name": "web",
+                    "ready": True,
+                    "restartCount": 0,
+                    "image": "registry.example.com/web:1.2.3",
+                    "imageID": "sha256:" + "a" * 64,
+                    "state": {"running": {"startedAt": "2024-01-01T00:00:00Z"}},
+                }
+            ],
+        },
+    }
+
+
+def serve(count: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            query = parse_qs(self.path.partition("?")[2])
+            limit = int(query.get("limit", [count])[0])
+            start = int(query.get("continue", ["0"])[0])
+            end = min(start + limit, count)
+            body = {
+                "apiVersion": "v1",
+                "kind": "PodList",
+                "metadata": {"continue": str(end) if end < count else ""},
+                "items": [generate_pod(i) for i in range(start, end)],
+            }
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _status_mib(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise OSError(field)
+
+
+def peak_mib() -> float:
+    """Peak resident set size of this process.
+
+    On Linux ru_maxrss is inherited from the parent across fork and exec,
+    so VmHWM is read instead where available.
+    """
+    try:
+        return _status_mib("VmHWM")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_mib() -> float:
+    try:
+        return _status_mib("VmRSS")
+    except OSError:
+        return peak_mib()
+
+
+def child(mode: str, url: str, page_size: int) -> None:
+    configuration = client.Configuration()
+    configuration.host = url
+    core_api = client.CoreV1Api(client.ApiClient(configuration))
+    baseline = current_mib()
+
+    start = time.perf_counter()
+    if mode == "models":
+        pods = core_api.list_namespaced_pod("bench")
+        labels = {pod.metadata.name: pod.metadata.labels for pod in pods.items}
+        del pods
+    else:
+        labels = {
+            pod.name: pod.labels for pod in iter_pods(core_api, "bench", "", page_size)
+        }
+    elapsed = time.perf_counter() - start
+
+    print(
+        json.dumps(
+            {
+                "pods": len(labels),
+                "baseline": baseline,
+                "peak": peak_mib(),
+                "seconds": elapsed,
+            }
+        )
+    )
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else PAGE_SIZE
+    server = serve(count)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{count} pods, page size {page_size}")
+    for mode in ("models", "records"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode, url, str(page_size)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output)
+        print(
+            f"{mode:>8}: peak RSS {result['peak']:7.1f} MiB "
+            f"({result['baseline']:.1f} MiB before listing), "
+            f"{result['seconds']:6.2f}s for {result['pods']} pods"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
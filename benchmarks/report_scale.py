@@ -0,0 +1,86 @@
+"""Time the coverage and exposure report on a generated snapshot.
+
+Usage: python benchmarks/report_scale.py [PODS] [POLICIES]
+"""
+
+import io
+import random
+import sys
+import time
+
+from knetvis.report import CoverageReport
+from knetvis.snapshot import ClusterSnapshot
+
+NAMESPACES = [f"ns-{i}" for i in range(50)]
+
+
+def generate(pods: int, policies: int, seed: int = 0) -> ClusterSnapshot:
+    rng = random.Random(seed)
+    labels = {ns: {"team": rng.choice(["a", "b", "c"])} for ns in NAMESPACES}
+    pod_labels: dict = {ns: {} for ns in NAMESPACES}
+    ports: dict = {ns: {} for ns in NAMESPACES}
+    for i in range(pods):
+        ns = rng.choice(NAMESPACES)
+        app = f"app-{rng.randint(0, 60)}"
+        pod_labels[ns][f"{app}-{i}"] = {
+            "app": app,
+            "tier": rng.choice(["web", "api", "db"]),
+            "pod-template-hash": f"{rng.randint(0, 3):05x}",
+        }
+        ports[ns][f"{app}-{i}"] = [["http", 8000 + rng.randint(0, 9), "TCP"]]
+    docs: dict = {ns: [] for ns in NAMESPACES}
+    for i in range(policies):
+        ns = rng.choice(NAMESPACES)
+        peers = [
+            {"podSelector": {"matchLabels": {"app": f"app-{rng.randint(0, 60)}"}}},
+            {"namespaceSelector": {"matchLabels": {"team": rng.choice("abc")}}},
+            {"namespaceSelector": {}},
+        ]
+        docs[ns].append(
+            {
+                "metadata": {"name": f"policy-{i}", "namespace": ns},
+                "spec": {
+                    "podSelector": {
+                        "matchLabels": {"app": f"app-{rng.randint(0, 60)}"}
+                    },
+                    "policyTypes": ["Ingress"],
+                    "ingress": [
+                        {
+                            "from": rng.sample(peers, rng.randint(1, 2)),
+                            "ports": [{"port": "http"}],
+                        }
+                    ],
+                },
+            }
+        )
+    return ClusterSnapshot(
+        context="bench",
+        namespaces=labels,
+        pods=pod_labels,
+        policies=docs,
+        ports=ports,
+    )
+
+
+def main() -> None:
+    pods = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    policies = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    snapshot = generate(pods, policies)
+
+    start = time.perf_counter()
+    report = CoverageReport(snapshot)
+    summary = report.to_dict()["summary"]
+    elapsed = time.perf_counter() - start
+    print(f"{pods} pods, {policies} policies: report in {elapsed:.2f}s")
+    print(
+        f"{summary['unselected']} unselected, "
+        f"{summary['reachable_from_all_namespaces']} reachable from all namespaces"
+    )
+
+    start = time.perf_counter()
+    report.write_csv(io.StringIO())
+    print(f"CSV in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
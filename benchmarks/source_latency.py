@@ -0,0 +1,83 @@
+"""Time evaluation against the in-process fake API server at a given latency.
+
+Serves a generated cluster from ``knetvis.fakeapi.FakeApiServer`` and runs
+the same connectivity checks through a live source and a cached one, so the
+cost of API round trips can be measured without a cluster.
+
+Usage: python benchmarks/source_latency.py [LATENCY_MS] [NAMESPACES] [RUNS]
+"""
+
+import sys
+import time
+
+from knetvis.cache import ResultCache
+from knetvis.fakeapi import FakeApiServer
+from knetvis.models import Target
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+from knetvis.sources import CachedSource, ClusterSource
+
+
+def generate(namespaces: int) -> ClusterSnapshot:
+    names = [f"ns-{i}" for i in range(namespaces)]
+    return ClusterSnapshot(
+        context="bench",
+        namespaces={ns: {"team": f"team-{i % 3}"} for i, ns in enumerate(names)},
+        pods={ns: {f"web-{j}": {"app": "web"} for j in range(20)} for ns in names},
+        policies={
+            ns: [
+                {
+                    "metadata": {"name": "team-0", "namespace": ns},
+                    "spec": {
+                        "podSelector": {},
+                        "ingress": [
+                            {
+                                "from": [
+                                    {
+                                        "namespaceSelector": {
+                                            "matchLabels": {"team": "team-0"}
+                                        }
+                                    }
+                                ]
+                            }
+                        ],
+                    },
+                }
+            ]
+            for ns in names
+        },
+    )
+
+
+def run(source: ClusterSource, namespaces: int, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        # A fresh simulator per run, as separate CLI invocations would have
+        simulator = TrafficSimulator(source=source, cache=ResultCache())
+        for i in range(namespaces):
+            simulator.test_connectivity(
+                Target("ns-0", "pod", "web-0"), Target(f"ns-{i}", "pod", "web-1")
+            )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.005
+    namespaces = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    with FakeApiServer(generate(namespaces), latency=latency) as server:
+        for name, source in (
+            ("live", server.source()),
+            ("cached", CachedSource(server.source())),
+        ):
+            before = len(server.requests)
+            elapsed = run(source, namespaces, runs)
+            print(
+                f"{name}: {elapsed:.2f}s, {len(server.requests) - before} requests "
+                f"at {latency * 1000:.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
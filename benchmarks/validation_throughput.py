@@ -0,0 +1,66 @@
+"""Validation throughput on generated NetworkPolicy documents.
+
+Usage: python benchmarks/validation_throughput.py [DOCS] [JOBS]
+"""
+
+import random
+import sys
+import time
+
+from knetvis.validation import DEFAULT_RULES
+
+
+def generate(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    docs = []
+    for i in range(count):
+        peers = [
+            {"podSelector": {"matchLabels": {"app": f"app-{rng.randint(0, 50)}"}}},
+            {
+                "namespaceSelector": {
+                    "matchExpressions": [
+                        {"key": "team", "operator": "In", "values": ["a", "b"]}
+                    ]
+                }
+            },
+            {"ipBlock": {"cidr": "10.0.0.0/8", "except": ["10.1.0.0/16"]}},
+        ]
+        docs.append(
+            {
+                "apiVersion": "networking.k8s.io/v1",
+                "kind": "NetworkPolicy",
+                "metadata": {"name": f"policy-{i}", "namespace": "bench"},
+                "spec": {
+                    "podSelector": {"matchLabels": {"app": f"app-{i % 50}"}},
+                    "policyTypes": ["Ingress", "Egress"],
+                    "ingress": [
+                        {
+                            "from": rng.sample(peers, 2),
+                            "ports": [{"port": 8000, "endPort": 8080}],
+                        }
+                    ],
+                    "egress": [
+                        {"to": rng.sample(peers, 1), "ports": [{"port": "dns"}]}
+                    ],
+                },
+            }
+        )
+    return docs
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    docs = generate(count)
+    validator = DEFAULT_RULES.compile(jobs=jobs)
+
+    start = time.perf_counter()
+    issues = validator.validate_all(docs)
+    elapsed = time.perf_counter() - start
+
+    print(f"{count} documents, {jobs} job(s): {elapsed:.2f}s")
+    print(f"{count / elapsed * 60:,.0f} documents/minute, {len(issues)} issues")
+
+
+if __name__ == "__main__":
+    main()
@@ -33,7 +33,11 @@ setup(
         "click>=8.1.3",
         "rich>=13.3.5",
         "pyyaml>=6.0.1",
+        "numpy>=1.22",
     ],
+    extras_require={
+        "parquet": ["pyarrow>=10.0"],
+    },
     entry_points={
         "console_scripts": [
             "knetvis=knetvis.cli:cli",  
@@ -0,0 +1,383 @@
+import json
+import queue
+import socket
+import ssl
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import IO, Any, Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+from kubernetes import client
+
+from .engine import CompiledPolicy, PolicyEngine
+from .models import Endpoint, Target
+from .sampling import PodClass, classify
+from .simulator import TrafficSimulator
+from .sources import list_and_watch
+from .workloads import canonical_kind
+
+# Values of the webhook failurePolicy, applied when a check itself fails
+FAILURE_POLICIES = ("Ignore", "Fail")
+
+
+class ProtectedFlow(NamedTuple):
+    """A flow that policy changes must not block"""
+
+    source: Target
+    dest: Target
+
+    def __str__(self) -> str:
+        return f"{self.source} -> {self.dest}"
+
+
+def load_protected_flows(filename: str) -> List[ProtectedFlow]:
+    """Read a YAML list of ``{from: ns/kind/name, to: ns/kind/name}`` entries.
+
+    Targets may be pods, workloads or services.
+    """
+    try:
+        with open(filename) as f:
+            entries = yaml.safe_load(f) or []
+        flows = [
+            ProtectedFlow(Target.from_str(e["from"]), Target.from_str(e["to"]))
+            for e in entries
+        ]
+        for flow in flows:
+            for target in flow:
+                canonical_kind(target.kind)
+        return flows
+    except Exception as e:
+        raise Exception(f"Failed to load protected flows: {str(e)}")
+
+
+@dataclass
+class Decision:
+    """Outcome of checking one proposed policy change"""
+
+    allowed: bool
+    broken: List[ProtectedFlow] = field(default_factory=list)
+    checked: int = 0
+
+    @property
+    def message(self) -> str:
+        if self.allowed:
+            return f"{self.checked} protected flow(s) unaffected"
+        flows = "; ".join(str(f) for f in self.broken)
+        return f"Change blocks {len(self.broken)} protected flow(s): {flows}"
+
+
+def _metadata(obj: Optional[dict]) -> dict:
+    return (obj or {}).get("metadata") or {}
+
+
+class AdmissionChecker:
+    """Checks proposed NetworkPolicy changes against protected flows.
+
+    Policies and the pods of every protected target are loaded once and
+    kept warm. A change only recompiles the changed policy and re-evaluates
+    the protected flows with an endpoint in its namespace, since a policy
+    affects no other pods. Checking never changes the state: changes the
+    API server has persisted are passed to :meth:`apply`, and
+    :meth:`refresh` reloads everything from the cluster.
+
+    ``failure_policy`` decides a review that cannot be checked, like the
+    webhook's ``failurePolicy``: ``Ignore`` admits it with a warning,
+    ``Fail`` rejects it.
+    """
+
+    def __init__(
+        self,
+        simulator: TrafficSimulator,
+        flows: List[ProtectedFlow],
+        failure_policy: str = "Ignore",
+    ) -> None:
+        if failure_policy not in FAILURE_POLICIES:
+            raise ValueError(f"Unknown failure policy: {failure_policy}")
+        self.simulator = simulator
+        self.flows = list(flows)
+        self.failure_policy = failure_policy
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Reload policies and the pods of every protected target.
+
+        Pods, workloads and services are resolved through one
+        :class:`WorkloadIndex`; a flow with a side that has no pods is
+        unresolved and not checked.
+        """
+        targets = [t for flow in self.flows for t in flow]
+        namespaces = sorted({t.namespace for t in targets})
+        index = self.simulator.workload_index(namespaces)
+        engine = self.simulator.build_engine(namespaces)
+
+        endpoints: Dict[int, Tuple[List[PodClass], List[PodClass]]] = {}
+        unresolved = []
+        by_namespace: Dict[str, List[int]] = {}
+        for i, (source, dest) in enumerate(self.flows):
+            sources, dests = [
+                classify([Endpoint(p.namespace, p.name, p.labels) for p in pods])
+                for pods in (index.resolve(source), index.resolve(dest))
+            ]
+            if not sources or not dests:
+                unresolved.append(self.flows[i])
+                continue
+            endpoints[i] = (sources, dests)
+            for namespace in {source.namespace, dest.namespace}:
+                by_namespace.setdefault(namespace, []).append(i)
+        verdicts = {i: _allowed_pairs(engine, *pair) for i, pair in endpoints.items()}
+
+        with self._lock:
+            self.engine = engine
+            self.endpoints = endpoints
+            self.unresolved = unresolved
+            self.by_namespace = by_namespace
+            self.verdicts = verdicts
+
+    def _proposed(
+        self, namespace: str, name: str, policy: Optional[dict]
+    ) -> PolicyEngine:
+        compiled = {p.name: p for p in self.engine.by_namespace.get(namespace, ())}
+        if policy is None:
+            compiled.pop(name, None)
+        else:
+            compiled[name] = CompiledPolicy(namespace, policy)
+        return self.engine.with_policies(namespace, compiled.values())
+
+    def _evaluate(
+        self, namespace: str, name: str, policy: Optional[dict]
+    ) -> Tuple[Decision, PolicyEngine, Dict[int, int]]:
+        engine = self._proposed(namespace, name, policy)
+        indices = self.by_namespace.get(namespace, [])
+        verdicts = {i: _allowed_pairs(engine, *self.endpoints[i]) for i in indices}
+        broken = [
+            self.flows[i]
+            for i, allowed in verdicts.items()
+            if allowed < self.verdicts[i]
+        ]
+        return Decision(not broken, broken, len(indices)), engine, verdicts
+
+    def check(self, namespace: str, name: str, policy: Optional[dict]) -> Decision:
+        """Check creating or replacing a policy, or deleting it (``policy=None``).
+
+        The change is allowed when no protected flow loses a pod pair that
+        is allowed now.
+        """
+        with self._lock:
+            return self._evaluate(namespace, name, policy)[0]
+
+    def apply(self, namespace: str, name: str, policy: Optional[dict]) -> None:
+        """Update the state with a persisted change (``policy=None``: deleted)"""
+        with self._lock:
+            if namespace not in self.by_namespace:
+                return
+            _, self.engine, verdicts = self._evaluate(namespace, name, policy)
+            self.verdicts.update(verdicts)
+
+    def review(self, review: dict) -> dict:
+        """Answer an ``admission.k8s.io`` AdmissionReview request"""
+        request = review.get("request") or {}
+        uid = request.get("uid", "")
+        allowed = True
+        status: Dict[str, Any] = {}
+        warnings: List[str] = []
+        if (request.get("kind") or {}).get("kind") == "NetworkPolicy":
+            try:
+                deleting = request.get("operation") == "DELETE"
+                policy = None if deleting else request.get("object")
+                metadata = _metadata(policy or request.get("oldObject"))
+                decision = self.check(
+                    request.get("namespace") or metadata.get("namespace", ""),
+                    request.get("name") or metadata.get("name", ""),
+                    policy,
+                )
+                allowed = decision.allowed
+                status = {"message": decision.message}
+                if not allowed:
+                    status["code"] = 403
+            except Exception as e:
+                message = f"Failed to check policy: {str(e)}"
+                allowed = self.failure_policy == "Ignore"
+                if allowed:
+                    status = {}
+                    warnings = [message]
+                else:
+                    status = {"code": 500, "message": message}
+        response: Dict[str, Any] = {"uid": uid, "allowed": allowed}
+        if status:
+            response["status"] = status
+        if warnings:
+            response["warnings"] = warnings
+        return {
+            "apiVersion": review.get("apiVersion", "admission.k8s.io/v1"),
+            "kind": "AdmissionReview",
+            "response": response,
+        }
+
+
+def _allowed_pairs(
+    engine: PolicyEngine, sources: List[PodClass], dests: List[PodClass]
+) -> int:
+    """Allowed (source pod, destination pod) pairs, one evaluation per class"""
+    return sum(
+        src.size * dst.size
+        for src in sources
+        for dst in dests
+        if engine.allowed(src.representative, dst.representative)
+    )
+
+
+class _AdmissionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; don't wait on delayed ACKs
+    disable_nagle_algorithm = True
+    server: "AdmissionServer"
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            review = json.loads(body)
+        except ValueError:
+            self.send_error(400, "Expected an AdmissionReview")
+            return
+        self.server.record(body)
+        payload = json.dumps(self.server.checker.review(review)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class AdmissionServer(ThreadingHTTPServer):
+    """Validating webhook endpoint; every POST path is an AdmissionReview.
+
+    With a certificate, the listening socket stays plain and each accepted
+    connection does its TLS handshake in its own thread, bounded by
+    ``handshake_timeout``, so a slow client cannot hold up the others.
+    With ``recording`` set, request bodies are appended to it one per line,
+    for replay by ``benchmarks/admission_replay.py``.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+    handshake_timeout = 5.0
+
+    def __init__(
+        self,
+        checker: AdmissionChecker,
+        address: Tuple[str, int],
+        certfile: Optional[str] = None,
+        keyfile: Optional[str] = None,
+        recording: Optional[IO[str]] = None,
+    ) -> None:
+        super().__init__(address, _AdmissionHandler)
+        self.checker = checker
+        self.recording = recording
+        self._record_lock = threading.Lock()
+        self.ssl_context: Optional[ssl.SSLContext] = None
+        if certfile:
+            self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.ssl_context.load_cert_chain(certfile, keyfile)
+
+    def get_request(self) -> Tuple[socket.socket, Any]:
+        """Accept a raw connection; TLS is set up in the handler thread"""
+        return self.socket.accept()
+
+    def process_request_thread(self, request: Any, client_address: Any) -> None:
+        if self.ssl_context is not None:
+            try:
+                request = self.ssl_context.wrap_socket(
+                    request, server_side=True, do_handshake_on_connect=False
+                )
+                request.settimeout(self.handshake_timeout)
+                request.do_handshake()
+                request.settimeout(None)
+            except (OSError, ValueError):
+                request.close()
+                return
+        super().process_request_thread(request, client_address)
+
+    def record(self, body: bytes) -> None:
+        if self.recording is None:
+            return
+        with self._record_lock:
+            self.recording.write(body.decode("utf-8").replace("\n", " ") + "\n")
+            self.recording.flush()
+
+    def watch_policies(
+        self, stop: Optional[threading.Event] = None, timeout_seconds: int = 60
+    ) -> threading.Thread:
+        """Apply persisted NetworkPolicy changes to the checker as they happen.
+
+        Policies are listed and then watched. Each list reloads the state,
+        and each event updates it through :meth:`AdmissionChecker.apply`.
+        After a failed watch, the state is kept and the policies are listed
+        again.
+        """
+        stop = stop if stop is not None else threading.Event()
+        api = self.checker.simulator.source.networking_api
+        events: "queue.Queue[Tuple[str, str, Any]]" = queue.Queue()
+
+        def stream() -> None:
+            while not stop.is_set():
+                list_and_watch(
+                    api.list_network_policy_for_all_namespaces,
+                    "networkpolicies",
+                    events,
+                    stop,
+                    timeout_seconds,
+                )
+                stop.wait(1.0)
+
+        def apply() -> None:
+            serializer = client.ApiClient()
+            while not stop.is_set():
+                try:
+                    _, event_type, obj = events.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                try:
+                    if event_type == "SYNC":
+                        self.checker.refresh()
+                    elif event_type != "ERROR":
+                        deleted = event_type == "DELETED"
+                        self.checker.apply(
+                            obj.metadata.namespace,
+                            obj.metadata.name,
+                            (
+                                None
+                                if deleted
+                                else serializer.sanitize_for_serialization(obj)
+                            ),
+                        )
+                except Exception:
+                    continue
+
+        threading.Thread(target=stream, daemon=True).start()
+        thread = threading.Thread(target=apply, daemon=True)
+        thread.start()
+        return thread
+
+    def resync_every(self, seconds: float) -> threading.Thread:
+        """Refresh the checker's warm state periodically in the background.
+
+        A failed refresh keeps the previous state until the next attempt.
+        """
+
+        def resync() -> None:
+            while True:
+                time.sleep(seconds)
+                try:
+                    self.checker.refresh()
+                except Exception:
+                    continue
+
+        thread = threading.Thread(target=resync, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,251 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from kubernetes import client
+
+from .inventory import PAGE_SIZE, ContinueExpired, PodRecord, fetch_page
+from .workloads import ServiceRecord, fetch_services
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 10.0
+
+
+class AsyncClusterClient:
+    """Asyncio access to the Kubernetes API with bounded concurrency.
+
+    Each request runs the blocking ``kubernetes.client`` call on a worker
+    thread, so hundreds of list/get requests can be in flight at once while
+    at most ``max_concurrency`` hit the API server simultaneously. Every
+    request is bounded by ``timeout`` seconds. The worker threads start with
+    the first request and stop on :meth:`close`, until the next one.
+    """
+
+    def __init__(
+        self,
+        core_api: Optional[Any] = None,
+        networking_api: Optional[Any] = None,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.core_api = core_api if core_api is not None else client.CoreV1Api()
+        self.networking_api = (
+            networking_api if networking_api is not None else client.NetworkingV1Api()
+        )
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def close(self) -> None:
+        """Stop the worker threads and wait for them to exit"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="knetvis-api"
+            )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the loop they are first used on
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking API method under the concurrency and time limits"""
+        if self.timeout is not None:
+            kwargs.setdefault("_request_timeout", self.timeout)
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._get_executor(), functools.partial(func, *args, **kwargs)
+            )
+            try:
+                return await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                name = getattr(func, "__name__", "request")
+                raise TimeoutError(f"{name} timed out after {self.timeout}s")
+
+    async def gather(self, *requests: Awaitable[Any]) -> List[Any]:
+        """Await many requests concurrently, preserving their order"""
+        return list(await asyncio.gather(*requests))
+
+    async def list_namespace(self, label_selector: str = "") -> Any:
+        return await self.call(
+            self.core_api.list_namespace, label_selector=label_selector
+        )
+
+    async def read_namespace(self, name: str) -> Any:
+        return await self.call(self.core_api.read_namespace, name)
+
+    async def list_namespaced_pod(
+        self, namespace: str, label_selector: str = ""
+    ) -> Any:
+        return await self.call(
+            self.core_api.list_namespaced_pod,
+            namespace,
+            label_selector=label_selector,
+        )
+
+    async def list_pod_records(
+        self, namespace: str, label_selector: str = "", page_size: int = PAGE_SIZE
+    ) -> List[PodRecord]:
+        """A namespace's pods as minimal records, fetched page by page.
+
+        Each page is parsed on the worker thread, so only one page of raw
+        JSON per namespace is alive at a time. If a continue token expires
+        with no replacement, the list starts over and the pods already
+        read are skipped.
+        """
+        records: List[PodRecord] = []
+        token: Optional[str] = None
+        skip = 0
+        while True:
+            try:
+                page, token = await self.call(
+                    fetch_page,
+                    self.core_api,
+                    namespace,
+                    label_selector,
+                    page_size,
+                    token,
+                )
+            except ContinueExpired:
+                token, skip = None, len(records)
+                continue
+            records.extend(page[skip:])
+            skip = max(skip - len(page), 0)
+            if not token:
+                return records
+
+    async def list_service_records(self, namespace: str) -> List[ServiceRecord]:
+        """A namespace's services and their selectors"""
+        services: List[ServiceRecord] = await self.call(
+            fetch_services, self.core_api, namespace
+        )
+        return services
+
+    async def read_namespaced_pod(self, name: str, namespace: str) -> Any:
+        return await self.call(self.core_api.read_namespaced_pod, name, namespace)
+
+    async def list_namespaced_network_policy(self, namespace: str) -> Any:
+        return await self.call(
+            self.networking_api.list_namespaced_network_policy, namespace
+        )
+
+
+class ClusterClient:
+    """Blocking facade over :class:`AsyncClusterClient` for the sync classes.
+
+    Each batch method runs its requests on a private event loop, so it must
+    not be called from inside a running loop.
+    """
+
+    def __init__(
+        self,
+        core_api: Optional[Any] = None,
+        networking_api: Optional[Any] = None,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.aio = AsyncClusterClient(
+            core_api=core_api,
+            networking_api=networking_api,
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+        )
+
+    def close(self) -> None:
+        self.aio.close()
+
+    def run(self, request: Awaitable[Any]) -> Any:
+        """Run a single coroutine to completion"""
+
+        async def runner() -> Any:
+            return await request
+
+        return asyncio.run(runner())
+
+    def _fetch_all(
+        self, keys: List[Any], factory: Callable[[Any], Awaitable[Any]]
+    ) -> Dict[Any, Any]:
+        async def fetch() -> List[Any]:
+            return await self.aio.gather(*(factory(key) for key in keys))
+
+        return dict(zip(keys, asyncio.run(fetch())))
+
+    def list_pods(
+        self, namespaces: Iterable[str], label_selector: str = ""
+    ) -> Dict[str, Any]:
+        """List pods in each namespace concurrently"""
+        return self._fetch_all(
+            list(dict.fromkeys(namespaces)),
+            lambda ns: self.aio.list_namespaced_pod(ns, label_selector=label_selector),
+        )
+
+    def list_pod_records(
+        self,
+        namespaces: Iterable[str],
+        label_selector: str = "",
+        page_size: int = PAGE_SIZE,
+    ) -> Dict[str, List[PodRecord]]:
+        """List pods in each namespace concurrently, as minimal records"""
+        return self._fetch_all(
+            list(dict.fromkeys(namespaces)),
+            lambda ns: self.aio.list_pod_records(ns, label_selector, page_size),
+        )
+
+    def list_workloads(
+        self, namespaces: Iterable[str]
+    ) -> Tuple[Dict[str, List[PodRecord]], Dict[str, List[ServiceRecord]]]:
+        """List pods and services of each namespace in one concurrent batch"""
+        names = list(dict.fromkeys(namespaces))
+
+        async def fetch() -> List[Any]:
+            return await self.aio.gather(
+                *(self.aio.list_pod_records(ns) for ns in names),
+                *(self.aio.list_service_records(ns) for ns in names),
+            )
+
+        results = asyncio.run(fetch())
+        return (
+            dict(zip(names, results[: len(names)])),
+            dict(zip(names, results[len(names) :])),
+        )
+
+    def read_pods(self, pods: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Any]:
+        """Read (namespace, name) pods concurrently"""
+        return self._fetch_all(
+            list(dict.fromkeys(pods)),
+            lambda key: self.aio.read_namespaced_pod(key[1], key[0]),
+        )
+
+    def read_namespaces(self, names: Iterable[str]) -> Dict[str, Any]:
+        """Read namespaces concurrently"""
+        return self._fetch_all(list(dict.fromkeys(names)), self.aio.read_namespace)
+
+    def list_namespaces(self, label_selector: str = "") -> Any:
+        """List namespaces matching a label selector"""
+        return self.run(self.aio.list_namespace(label_selector=label_selector))
+
+    def list_policy_objects(self, namespaces: Iterable[str]) -> Dict[str, Any]:
+        """List NetworkPolicies in each namespace concurrently"""
+        return self._fetch_all(
+            list(dict.fromkeys(namespaces)), self.aio.list_namespaced_network_policy
+        )
+
+    def list_policies(self, namespaces: Iterable[str]) -> Dict[str, List[dict]]:
+        """List NetworkPolicies in each namespace concurrently, as dicts"""
+        results = self.list_policy_objects(namespaces)
+        return {ns: [p.to_dict() for p in res.items] for ns, res in results.items()}
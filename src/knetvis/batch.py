@@ -0,0 +1,196 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .cache import cache_key
+from .export import export_graph
+from .parallel import fork_map
+from .policy import PolicyParser
+from .snapshot import ClusterSnapshot
+from .visualizer import NetworkVisualizer
+
+MANIFEST = "index.json"
+
+
+@dataclass
+class RenderResult:
+    """Outcome of rendering one namespace in a batch"""
+
+    namespace: str
+    status: str
+    hash: Optional[str] = None
+    files: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+    nodes: int = 0
+    edges: int = 0
+    error: Optional[str] = None
+
+
+def load_manifest(out_dir: str) -> Dict[str, Any]:
+    """The manifest of the previous batch in out_dir, or an empty one"""
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            data: Dict[str, Any] = json.load(f)
+        return data
+    except (FileNotFoundError, ValueError):
+        return {"namespaces": {}}
+
+
+def write_atomic(path: str, text: str) -> None:
+    """Write a file so readers see either the old or the new content"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except Exception:
+        os.remove(tmp)
+        raise
+
+
+def render_key(
+    visualizer: NetworkVisualizer,
+    namespace: str,
+    policies: List[dict],
+    formats: Sequence[str],
+    sample: Optional[int] = None,
+) -> str:
+    """Hash of a namespace's graph and of how it is rendered"""
+    return cache_key(
+        "render",
+        visualizer.graph_key(namespace, policies, sample),
+        visualizer.level,
+        tuple(sorted(set(formats))),
+    )
+
+
+def _render(
+    state: Tuple[ClusterSnapshot, str, Sequence[str], str, Optional[int]],
+    task: Tuple[str, str],
+) -> RenderResult:
+    """Render one namespace into a scratch directory, then move it into place"""
+    snapshot, out_dir, formats, level, sample = state
+    namespace, key = task
+    start = time.perf_counter()
+    scratch = tempfile.mkdtemp(dir=out_dir, prefix=".render-")
+    try:
+        parser = PolicyParser(snapshot=snapshot)
+        policies = parser.get_namespace_policies(namespace)
+        visualizer = NetworkVisualizer(source=parser.source, level=level)
+        paths = export_graph(
+            visualizer, namespace, policies, scratch, formats, sample=sample
+        )
+        files = []
+        for path in paths:
+            name = os.path.basename(path)
+            os.replace(path, os.path.join(out_dir, name))
+            files.append(name)
+        view = visualizer.view
+        return RenderResult(
+            namespace,
+            "rendered",
+            key,
+            files,
+            time.perf_counter() - start,
+            view.number_of_nodes(),
+            view.number_of_edges(),
+        )
+    except Exception as e:
+        return RenderResult(
+            namespace,
+            "failed",
+            seconds=time.perf_counter() - start,
+            error=str(e),
+        )
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def render_all(
+    snapshot: ClusterSnapshot,
+    out_dir: str,
+    namespaces: Optional[Sequence[str]] = None,
+    formats: Sequence[str] = ("png",),
+    level: str = "pod",
+    sample: Optional[int] = None,
+    jobs: int = 1,
+    force: bool = False,
+) -> List[RenderResult]:
+    """Render every namespace of a snapshot into out_dir.
+
+    A namespace whose render hash matches the previous manifest, and whose
+    files are all still there, is skipped. The others are rendered by
+    ``jobs`` forked workers. Each file is moved into place once complete,
+    and ``index.json`` is rewritten last with the hash, files and timing
+    of every namespace. Files of namespaces that no longer exist are
+    removed; other entries of the previous manifest are kept.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    previous = load_manifest(out_dir).get("namespaces", {})
+    names = sorted(snapshot.namespaces) if namespaces is None else list(namespaces)
+
+    parser = PolicyParser(snapshot=snapshot)
+    visualizer = NetworkVisualizer(source=parser.source, level=level)
+    results: Dict[str, RenderResult] = {}
+    pending = []
+    for namespace in names:
+        start = time.perf_counter()
+        try:
+            policies = parser.get_namespace_policies(namespace)
+            key = render_key(visualizer, namespace, policies, formats, sample)
+        except Exception as e:
+            results[namespace] = RenderResult(namespace, "failed", error=str(e))
+            continue
+        entry = previous.get(namespace) or {}
+        files = entry.get("files") or []
+        if (
+            not force
+            and entry.get("hash") == key
+            and files
+            and all(os.path.exists(os.path.join(out_dir, f)) for f in files)
+        ):
+            results[namespace] = RenderResult(
+                namespace,
+                "unchanged",
+                key,
+                files,
+                time.perf_counter() - start,
+                entry.get("nodes", 0),
+                entry.get("edges", 0),
+            )
+        else:
+            pending.append((namespace, key))
+
+    # Workers build their own sources; stop this one's threads so they fork
+    parser.source.close()
+    state = (snapshot, out_dir, tuple(formats), level, sample)
+    for result in fork_map(_render, state, pending, jobs):
+        results[result.namespace] = result
+    for result in results.values():
+        if result.status == "failed":
+            # The last good render stays in place and listed
+            result.files = (previous.get(result.namespace) or {}).get("files") or []
+
+    entries = {}
+    for namespace, entry in previous.items():
+        if namespace in snapshot.namespaces:
+            entries[namespace] = entry
+            continue
+        for name in entry.get("files") or []:
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except FileNotFoundError:
+                pass
+    ordered = [results[ns] for ns in names]
+    entries.update((r.namespace, asdict(r)) for r in ordered)
+    manifest = {
+        "context": snapshot.context,
+        "generated": time.time(),
+        "namespaces": dict(sorted(entries.items())),
+    }
+    write_atomic(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=2) + "\n")
+    return ordered
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# Bump when the layout of cached results changes
+CACHE_VERSION = 3
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Eviction trims the disk tier to this fraction of max_bytes, so the next
+# few writes don't each need another directory scan
+EVICT_TO = 0.9
+
+
+def content_hash(value: Any) -> str:
+    """Stable SHA-256 of a JSON-like value; dict key order does not matter"""
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def policies_hash(policies: Dict[str, List[dict]]) -> str:
+    """Hash of the name and spec of each policy, by namespace.
+
+    Metadata such as resourceVersion and managedFields changes on every
+    write without changing what a policy allows, so it is left out.
+    """
+    return content_hash(
+        {
+            ns: sorted(
+                ([(p.get("metadata") or {}).get("name"), p.get("spec")] for p in docs),
+                key=lambda item: json.dumps(item, sort_keys=True, default=str),
+            )
+            for ns, docs in policies.items()
+        }
+    )
+
+
+def labels_hash(items: Iterable[Tuple[str, str, Dict[str, str]]]) -> str:
+    """Hash of (namespace, name, labels) triples in any order"""
+    return content_hash(sorted([ns, name, labels] for ns, name, labels in items))
+
+
+def cache_key(kind: str, *parts: Hashable) -> str:
+    """Key for one kind of result computed from the given input hashes"""
+    return content_hash([CACHE_VERSION, kind, *parts])
+
+
+class ResultCache:
+    """Content-addressed cache of evaluation results.
+
+    Keys are hashes of every input a result depends on, so an entry never
+    needs invalidating: when a policy, pod label or namespace label changes
+    the key changes with it. Entries live in an in-memory LRU and, when
+    ``directory`` is set, in JSON files there, so values written to disk
+    must be JSON values. Reading a file never runs code, even if someone
+    else can write to the directory. The disk tier keeps a running total of
+    the bytes written and only scans the directory, evicting
+    least-recently-used files, once that total exceeds ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        directory: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bytes in the disk tier; counted on the first write
+        self._disk_bytes: Optional[int] = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _path(self, key: str) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._remember(key, value)
+        if self.directory is not None:
+            self._write_disk(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        for path, _, _ in self._disk_entries():
+            os.remove(path)
+        self._disk_bytes = None
+
+    def _remember(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Any]:
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            self._touch(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A truncated or incompatible entry is just a miss
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _write_disk(self, key: str, value: Any) -> None:
+        assert self.directory is not None
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, separators=(",", ":"))
+            os.replace(tmp, path)
+            self._touch(path)
+            size = os.path.getsize(path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+            else:
+                # Overwrites are counted twice; the next scan corrects it
+                self._disk_bytes += size
+            over = self._disk_bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _touch(self, path: str) -> None:
+        """Mark a file as recently used for eviction.
+
+        Set explicitly because file system timestamps can be coarser than
+        the interval between two cache writes.
+        """
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _disk_entries(self) -> List[Tuple[str, int, int]]:
+        if self.directory is None:
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_mtime_ns, stat.st_size))
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._disk_entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        if total > self.max_bytes:
+            for path, _, size in entries:
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+
+_default_cache = ResultCache()
+
+
+def default_cache() -> ResultCache:
+    """The process-wide cache used when none is passed explicitly"""
+    return _default_cache
+
+
+def configure(
+    directory: Optional[str] = None,
+    max_entries: int = DEFAULT_MAX_ENTRIES,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> ResultCache:
+    """Replace the process-wide cache"""
+    global _default_cache
+    _default_cache = ResultCache(max_entries, directory, max_bytes)
+    return _default_cache
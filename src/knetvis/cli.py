@@ -1,46 +1,385 @@
+import json
 import os
-from typing import Any, Dict, List
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import click
 from rich.console import Console
+from rich.table import Table
 
 from knetvis.visualizer import NetworkVisualizer
 
-from .models import Target
+from . import cache, fleet
+from .admission import (
+    FAILURE_POLICIES,
+    AdmissionChecker,
+    AdmissionServer,
+    load_protected_flows,
+)
+from .aggregate import LEVELS
+from .batch import RenderResult, render_all
+from .export import FORMATS, export_graph
+from .guard import FlowGuard, GuardChange, load_flow_spec, watch_guard
+from .history import CHECKPOINT_EVERY, HistoryStore, parse_timestamp
+from .models import Endpoint, Target
 from .policy import PolicyParser
+from .profiling import Profiler, find_captures, summarize
+from .report import CoverageReport
 from .simulator import TrafficSimulator
+from .snapshot import ClusterSnapshot
+from .validation import DEFAULT_RULES, load_rules
 
 console = Console()
 
 
+def fleet_options(func: Callable) -> Callable:
+    """Add the multi-cluster options shared by visualize, test and validate"""
+    func = click.option(
+        "--snapshot",
+        "snapshots",
+        multiple=True,
+        type=click.Path(exists=True, dir_okay=False),
+        help="Evaluate a snapshot file instead of a live cluster (repeatable).",
+    )(func)
+    func = click.option(
+        "--all-contexts", is_flag=True, help="Evaluate every kubeconfig context."
+    )(func)
+    func = click.option(
+        "--contexts", default=None, help="Comma-separated kubeconfig contexts."
+    )(func)
+    return func
+
+
+def _load_clusters(
+    contexts: Optional[str], all_contexts: bool, snapshots: Tuple[str, ...]
+) -> Optional[List[ClusterSnapshot]]:
+    """Return the clusters selected by the fleet options, or None if unused"""
+    names: List[str] = []
+    if all_contexts:
+        names = fleet.list_contexts()
+    elif contexts:
+        names = [c.strip() for c in contexts.split(",") if c.strip()]
+    if not names and not snapshots:
+        return None
+
+    clusters = []
+    for path in snapshots:
+        snapshot = ClusterSnapshot.load(path)
+        if not snapshot.context:
+            snapshot.context = os.path.splitext(os.path.basename(path))[0]
+        clusters.append(snapshot)
+    if names:
+        console.print(f"Fetching {len(names)} cluster(s): {', '.join(names)}")
+        clusters.extend(fleet.fetch_snapshots(names).values())
+    return clusters
+
+
+def history_options(func: Callable) -> Callable:
+    """Add the options that evaluate a past state from a history file"""
+    func = click.option(
+        "--at",
+        default=None,
+        help="Evaluate the state at this time (ISO 8601 or epoch seconds).",
+    )(func)
+    func = click.option(
+        "--history",
+        type=click.Path(exists=True, dir_okay=False),
+        default=None,
+        help="History file recorded by 'knetvis record'.",
+    )(func)
+    return func
+
+
+def _history_clusters(
+    history: Optional[str], at: Optional[str]
+) -> Optional[List[ClusterSnapshot]]:
+    """Return the state selected by --history/--at, or None if unused"""
+    if history is None and at is None:
+        return None
+    if history is None:
+        raise click.UsageError("--at needs --history")
+    store = HistoryStore(history)
+    timestamp = parse_timestamp(at) if at else store.span[1]
+    snapshot = store.at(timestamp)
+    when = datetime.fromtimestamp(timestamp).isoformat(timespec="seconds")
+    snapshot.context = f"{snapshot.context or 'history'}@{when}"
+    return [snapshot]
+
+
+def sampling_options(func: Callable) -> Callable:
+    """Add the approximate-mode options shared by visualize and matrix"""
+    func = click.option(
+        "--budget-seconds",
+        type=click.FloatRange(min=0),
+        default=None,
+        help="Stop refining the sample once this much time has passed.",
+    )(func)
+    func = click.option(
+        "--sample",
+        type=click.IntRange(min=1),
+        default=None,
+        help="Evaluate at most N representative label classes.",
+    )(func)
+    return func
+
+
+def _print_report(title: str, results: List[fleet.ClusterResult]) -> None:
+    table = Table(title=title)
+    table.add_column("Cluster")
+    table.add_column("Status")
+    table.add_column("Details")
+    for result in results:
+        status = "[green]ok[/green]" if result.ok else "[red]failed[/red]"
+        table.add_row(result.cluster, status, result.summary)
+    console.print(table)
+
+
+def _print_renders(context: str, out_dir: str, results: List[RenderResult]) -> None:
+    table = Table(title=f"Namespaces of '{context}' -> {out_dir}")
+    table.add_column("Namespace")
+    table.add_column("Status")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Details")
+    styles = {"rendered": "green", "unchanged": "cyan", "failed": "red"}
+    for result in results:
+        style = styles[result.status]
+        details = result.error or f"{result.nodes} nodes, {result.edges} edges"
+        table.add_row(
+            result.namespace,
+            f"[{style}]{result.status}[/{style}]",
+            f"{result.seconds:.2f}",
+            details,
+        )
+    console.print(table)
+    counts = {status: 0 for status in styles}
+    for result in results:
+        counts[result.status] += 1
+    console.print(
+        f"{counts['rendered']} rendered, {counts['unchanged']} unchanged, "
+        f"{counts['failed']} failed"
+    )
+
+
+def _print_coverage(data: Dict[str, Any]) -> None:
+    table = Table(title=f"Policy coverage of '{data['context']}'")
+    table.add_column("Namespace")
+    table.add_column("Pods", justify="right")
+    table.add_column("Unselected", justify="right")
+    table.add_column("Open to all namespaces", justify="right")
+    table.add_column("Ingress-open ports")
+    for name, ns in sorted(data["namespaces"].items()):
+        table.add_row(
+            name,
+            str(ns["pods"]),
+            str(ns["unselected"]),
+            str(ns["reachable_from_all_namespaces"]),
+            " ".join(ns["open_ports"]),
+        )
+    console.print(table)
+    summary = data["summary"]
+    console.print(
+        f"{summary['pods']} pods, {summary['policies']} policies: "
+        f"{summary['unselected']} not selected by any policy, "
+        f"{summary['reachable_from_all_namespaces']} reachable from all namespaces"
+    )
+
+
+def _print_timings(timings: Dict[str, List[float]]) -> None:
+    table = Table(title="Rule timings")
+    table.add_column("Rule")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total ms", justify="right")
+    table.add_column("µs/call", justify="right")
+    for name, (seconds, calls) in sorted(timings.items(), key=lambda t: -t[1][0]):
+        per_call = seconds / calls * 1e6 if calls else 0.0
+        table.add_row(name, str(int(calls)), f"{seconds * 1000:.2f}", f"{per_call:.2f}")
+    console.print(table)
+
+
 @click.group()
-def cli() -> None:
+@click.option(
+    "--cache-dir",
+    envvar="KNETVIS_CACHE_DIR",
+    default=None,
+    help="Also keep evaluation results on disk here, across runs.",
+)
+@click.option(
+    "--cache-size",
+    envvar="KNETVIS_CACHE_SIZE",
+    type=click.IntRange(min=0),
+    default=256,
+    help="Maximum size of the on-disk cache in MiB.",
+)
+@click.option(
+    "--profile-out",
+    envvar="KNETVIS_PROFILE_OUT",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Profile the command (CPU, allocations, stacks) into a new dir here.",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    cache_dir: Optional[str],
+    cache_size: int,
+    profile_out: Optional[str],
+) -> None:
     """knetvis - Kubernetes Network Policy Visualization Tool"""
-    pass
+    if cache_dir:
+        cache.configure(directory=cache_dir, max_bytes=cache_size * 1024 * 1024)
+    if profile_out:
+        profiler = Profiler(profile_out, ctx.invoked_subcommand or "knetvis")
+        profiler.start()
+
+        def write_profile() -> None:
+            console.print(f"[cyan]Profile written to {profiler.stop()}[/cyan]")
+
+        ctx.call_on_close(write_profile)
 
 
 @cli.command()
-@click.argument("namespace")
-def visualize(namespace: str) -> None:
+@click.argument("namespace", required=False)
+@click.option(
+    "--all",
+    "all_namespaces",
+    is_flag=True,
+    help="Render every namespace, skipping those whose graph is unchanged.",
+)
+@click.option(
+    "--out-dir",
+    default="output",
+    show_default=True,
+    type=click.Path(file_okay=False),
+    help="Directory to write the files (and, with --all, index.json) to.",
+)
+@click.option(
+    "--format",
+    "formats",
+    multiple=True,
+    type=click.Choice(FORMATS),
+    default=("png",),
+    show_default=True,
+    help=(
+        "Output format (repeatable); png and html are rendered from the "
+        "finished graph, the others stream while edges are built."
+    ),
+)
+@sampling_options
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Worker processes to split the policies across, or with --all "
+    "the namespaces.",
+)
+@click.option(
+    "--level",
+    type=click.Choice(LEVELS),
+    default="pod",
+    show_default=True,
+    help="Draw pods, or merge them into workloads or namespaces.",
+)
+@click.option(
+    "--verbose", is_flag=True, help="Log every pod, rule and edge as it is added."
+)
+@fleet_options
+@history_options
+def visualize(
+    namespace: Optional[str],
+    all_namespaces: bool,
+    out_dir: str,
+    formats: Tuple[str, ...],
+    sample: Optional[int],
+    budget_seconds: Optional[float],
+    jobs: int,
+    level: str,
+    verbose: bool,
+    contexts: Optional[str],
+    all_contexts: bool,
+    snapshots: Tuple[str, ...],
+    history: Optional[str],
+    at: Optional[str],
+) -> None:
     """Visualize network policies in a namespace."""
+    if all_namespaces == (namespace is not None):
+        raise click.UsageError("Pass either NAMESPACE or --all")
+    if all_namespaces and budget_seconds is not None:
+        raise click.UsageError("--budget-seconds cannot be used with --all")
     try:
-        parser = PolicyParser()
-        policies: List[Dict[str, Any]] = parser.get_namespace_policies(namespace)
+        clusters = _history_clusters(history, at) or _load_clusters(
+            contexts, all_contexts, snapshots
+        )
+        if all_namespaces:
+            if clusters is None:
+                parser = PolicyParser()
+                clusters = [
+                    ClusterSnapshot.fetch(
+                        parser.cluster, context=fleet.current_context()
+                    )
+                ]
+                parser.source.close()
+            for snapshot in clusters:
+                directory = out_dir
+                if len(clusters) > 1:
+                    directory = os.path.join(out_dir, snapshot.context)
+                renders = render_all(
+                    snapshot,
+                    directory,
+                    formats=formats,
+                    level=level,
+                    sample=sample,
+                    jobs=jobs,
+                )
+                _print_renders(snapshot.context, directory, renders)
+            return
+        assert namespace is not None
 
-        visualizer = NetworkVisualizer()
-        # Passing required namespace and policies arguments
-        visualizer.create_graph(namespace=namespace, policies=policies)
+        if clusters is not None:
+            results = fleet.evaluate(
+                fleet.visualize_cluster,
+                clusters,
+                namespace=namespace,
+                output_dir=out_dir,
+                sample=sample,
+                budget_seconds=budget_seconds,
+                formats=formats,
+                jobs=jobs,
+                level=level,
+            )
+            _print_report(f"Visualization of namespace '{namespace}'", results)
+            return
 
-        # Create output directory if it doesn't exist
-        os.makedirs("output", exist_ok=True)
+        parser = PolicyParser()
+        policies: List[Dict[str, Any]] = parser.get_namespace_policies(namespace)
 
-        # Save graph with output filename
-        output_file = os.path.join("output", f"{namespace}-network-policies.png")
-        visualizer.save_graph(output_file=output_file)
+        visualizer = NetworkVisualizer(
+            source=parser.source,
+            jobs=jobs,
+            level=level,
+            verbose=verbose,
+        )
+        paths = export_graph(
+            visualizer,
+            namespace,
+            policies,
+            out_dir,
+            formats,
+            sample=sample,
+            budget_seconds=budget_seconds,
+        )
+        for path in paths:
+            console.print(f"[green]Wrote {path}[/green]")
 
         console.print(
             f"[green]✓ Visualization created for namespace '{namespace}'[/green]"
         )
+        if visualizer.coverage < 1.0:
+            console.print(
+                f"[yellow]Approximate: sample covers {visualizer.coverage:.1%} "
+                "of pods[/yellow]"
+            )
     except Exception as e:
         console.print(f"[red]Error: {str(e)}[/red]")
 
@@ -48,9 +387,37 @@ def visualize(namespace: str) -> None:
 @cli.command()
 @click.argument("source")
 @click.argument("destination")
-def test(source: str, destination: str) -> None:
+@click.option(
+    "--explain", is_flag=True, help="Show the policy, rule and peer that decided."
+)
+@fleet_options
+@history_options
+def test(
+    source: str,
+    destination: str,
+    explain: bool,
+    contexts: Optional[str],
+    all_contexts: bool,
+    snapshots: Tuple[str, ...],
+    history: Optional[str],
+    at: Optional[str],
+) -> None:
     """Test connectivity between resources."""
     try:
+        clusters = _history_clusters(history, at) or _load_clusters(
+            contexts, all_contexts, snapshots
+        )
+        if clusters is not None:
+            results = fleet.evaluate(
+                fleet.check_connectivity,
+                clusters,
+                source=source,
+                destination=destination,
+                explain=explain,
+            )
+            _print_report(f"Connectivity {source} -> {destination}", results)
+            return
+
         source_target = Target.from_str(source)
         dest_target = Target.from_str(destination)
         parser = PolicyParser()
@@ -65,35 +432,520 @@ def test(source: str, destination: str) -> None:
             )
             return
 
-        allowed = simulator.test_connectivity(source_target, dest_target)
+        if explain:
+            explanation = simulator.explain_connectivity(source_target, dest_target)
+            allowed = explanation.allowed
+        elif source_target.kind == dest_target.kind == "pod":
+            allowed = simulator.test_connectivity(source_target, dest_target)
+        else:
+            count, total = simulator.count_connectivity(source_target, dest_target)
+            allowed = total > 0 and count == total
+            if 0 < count < total:
+                console.print(
+                    f"[yellow]~ Traffic is allowed for {count} of {total} "
+                    "pod pairs[/yellow]"
+                )
+                return
+            if total == 0:
+                console.print("[yellow]No pods selected by the targets[/yellow]")
+                return
 
         if allowed:
             console.print("[green]✓ Traffic is allowed[/green]")
         else:
             console.print("[red]✗ Traffic is blocked[/red]")
+        if explain:
+            for line in explanation.lines()[1:]:
+                console.print(line.strip(), markup=False)
+
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+
+
+@cli.command()
+@click.argument("namespaces", nargs=-1, required=True)
+@sampling_options
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Worker processes to split the policies across.",
+)
+def matrix(
+    namespaces: Tuple[str, ...],
+    sample: Optional[int],
+    budget_seconds: Optional[float],
+    jobs: int,
+) -> None:
+    """Estimate pod-to-pod connectivity between namespaces."""
+    try:
+        simulator = TrafficSimulator(PolicyParser())
+        estimate = None
+        for estimate in simulator.sampled_matrix(
+            list(namespaces), sample=sample, budget_seconds=budget_seconds, jobs=jobs
+        ):
+            console.print(
+                f"Round {estimate.round}: {len(estimate.classes)}/"
+                f"{estimate.total_classes} label classes, "
+                f"{estimate.coverage:.1%} of pods, "
+                f"{estimate.allowed_fraction:.1%} of pairs allowed"
+            )
+        if estimate is None:
+            console.print("[yellow]No pods found[/yellow]")
+            return
 
+        table = Table(title=f"Allowed pod pairs ({estimate.coverage:.1%} coverage)")
+        table.add_column("Source")
+        table.add_column("Destination")
+        table.add_column("Allowed", justify="right")
+        for (src, dst), fraction in estimate.namespace_summary().items():
+            table.add_row(src, dst, f"{fraction:.1%}")
+        console.print(table)
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+
+
+def _print_endpoints(title: str, endpoints: List[Endpoint]) -> None:
+    console.print(title)
+    if not endpoints:
+        return
+    table = Table()
+    table.add_column("Namespace")
+    table.add_column("Pod")
+    for endpoint in endpoints:
+        table.add_row(endpoint.namespace, endpoint.name)
+    console.print(table)
+
+
+def _reach_query(target: str, namespaces: Tuple[str, ...], inbound: bool) -> None:
+    resource = Target.from_str(target)
+    simulator = TrafficSimulator(PolicyParser())
+    if not simulator.check_resource_exists(resource):
+        console.print(f"[red]Error: Resource {target} not found[/red]")
+        return
+
+    scope = list(namespaces) or None
+    if inbound:
+        endpoints = simulator.who_can_reach(resource, scope)
+        title = f"{len(endpoints)} pod(s) can reach {target}"
+    else:
+        endpoints = simulator.reachable_from(resource, scope)
+        title = f"{target} can reach {len(endpoints)} pod(s)"
+    _print_endpoints(title, endpoints)
+
+
+@cli.command("who-can-reach")
+@click.argument("target")
+@click.option(
+    "-n",
+    "--namespace",
+    "namespaces",
+    multiple=True,
+    help="Only consider sources in this namespace (repeatable).",
+)
+def who_can_reach(target: str, namespaces: Tuple[str, ...]) -> None:
+    """List the pods allowed to send traffic to TARGET."""
+    try:
+        _reach_query(target, namespaces, inbound=True)
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+
+
+@cli.command("reachable-from")
+@click.argument("source")
+@click.option(
+    "-n",
+    "--namespace",
+    "namespaces",
+    multiple=True,
+    help="Only consider destinations in this namespace (repeatable).",
+)
+def reachable_from(source: str, namespaces: Tuple[str, ...]) -> None:
+    """List the pods SOURCE is allowed to send traffic to."""
+    try:
+        _reach_query(source, namespaces, inbound=False)
     except Exception as e:
         console.print(f"[red]Error: {str(e)}[/red]")
 
 
 @cli.command()
-@click.argument("policy-file")
-def validate(policy_file: str) -> None:
-    """Validate a network policy file"""
+@click.argument("policy-file", required=False)
+@click.option(
+    "--rules",
+    "rule_files",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Python file defining register(registry) with custom rules (repeatable).",
+)
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Worker processes for large multi-document files.",
+)
+@click.option("--timings", is_flag=True, help="Report time spent in each rule.")
+@fleet_options
+def validate(
+    policy_file: Optional[str],
+    rule_files: Tuple[str, ...],
+    jobs: int,
+    timings: bool,
+    contexts: Optional[str],
+    all_contexts: bool,
+    snapshots: Tuple[str, ...],
+) -> None:
+    """Validate a network policy file, or the policies deployed in clusters"""
     try:
+        clusters = _load_clusters(contexts, all_contexts, snapshots)
+        if clusters is not None:
+            if policy_file:
+                raise click.UsageError(
+                    "Pass either POLICY_FILE or --contexts/--all-contexts/--snapshot"
+                )
+            results = fleet.evaluate(fleet.validate_cluster, clusters)
+            _print_report("Deployed policy validation", results)
+            return
+        if not policy_file:
+            raise click.UsageError("Missing argument 'POLICY_FILE'")
+
         if not os.path.exists(policy_file):
             console.print(f"[red]Error: File '{policy_file}' does not exist[/red]")
             return
 
         parser = PolicyParser()
+        registry = DEFAULT_RULES.copy()
+        for path in rule_files:
+            load_rules(path, registry)
+        parser.validator = registry.compile(jobs=jobs, timed=timings)
         is_valid, message = parser.validate_policy(policy_file)
 
         if is_valid:
             console.print("[green]✓ Policy is valid[/green]")
         else:
             console.print("[yellow]Policy has potential issues:[/yellow]")
-            console.print(f"[yellow]{message}[/yellow]")
+            console.print(message, style="yellow", markup=False)
+        if timings:
+            _print_timings(parser.validator.timings)
+
+    except click.UsageError:
+        raise
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+
+
+@cli.command()
+@click.argument("output-dir")
+@click.option("--contexts", default=None, help="Comma-separated kubeconfig contexts.")
+@click.option("--all-contexts", is_flag=True, help="Snapshot every context.")
+def snapshot(output_dir: str, contexts: Optional[str], all_contexts: bool) -> None:
+    """Save cluster state to OUTPUT_DIR/<context>.json for offline use"""
+    try:
+        if all_contexts:
+            names = fleet.list_contexts()
+        elif contexts:
+            names = [c.strip() for c in contexts.split(",") if c.strip()]
+        else:
+            names = []
+
+        if names:
+            snapshots = list(fleet.fetch_snapshots(names).values())
+        else:
+            parser = PolicyParser()
+            name = fleet.current_context()
+            snapshots = [ClusterSnapshot.fetch(parser.cluster, context=name)]
+
+        os.makedirs(output_dir, exist_ok=True)
+        for snap in snapshots:
+            output_file = os.path.join(output_dir, f"{snap.context}.json")
+            snap.save(output_file)
+            console.print(
+                f"[green]✓ Snapshot of '{snap.context}' saved to {output_file}[/green]"
+            )
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+
+
+@cli.command()
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "json", "csv"]),
+    default="table",
+    show_default=True,
+    help="Per-namespace table, full JSON report, or one CSV row per pod.",
+)
+@click.option("--output", "-o", default=None, help="Write to a file, not stdout.")
+@click.option(
+    "--snapshot",
+    "snapshot_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Report on a snapshot file instead of the live cluster.",
+)
+@history_options
+def report(
+    output_format: str,
+    output: Optional[str],
+    snapshot_file: Optional[str],
+    history: Optional[str],
+    at: Optional[str],
+) -> None:
+    """Report unselected pods, pods open to all namespaces and open ports"""
+    try:
+        clusters = _history_clusters(history, at)
+        if clusters is not None:
+            snap = clusters[0]
+        elif snapshot_file:
+            snap = ClusterSnapshot.load(snapshot_file)
+        else:
+            parser = PolicyParser()
+            snap = ClusterSnapshot.fetch(
+                parser.cluster, context=fleet.current_context()
+            )
+        coverage = CoverageReport(snap)
+
+        if output_format == "table":
+            _print_coverage(coverage.to_dict())
+            return
+        with click.open_file(output or "-", "w") as out:
+            if output_format == "csv":
+                coverage.write_csv(out)
+            else:
+                json.dump(coverage.to_dict(), out, indent=2)
+                out.write("\n")
+        if output:
+            console.print(f"[green]Wrote {output}[/green]")
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+
+
+def _print_guard_change(change: GuardChange) -> None:
+    stamp = datetime.now().strftime("%H:%M:%S")
+    for violation in change.violations:
+        console.print(f"[red]{stamp} ✗ {violation}[/red]")
+    for violation in change.resolved:
+        console.print(f"[green]{stamp} ✓ resolved: {violation}[/green]")
+
+
+@cli.command()
+@click.argument("flows-file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--watch",
+    "watch_mode",
+    is_flag=True,
+    help="Keep running and re-check affected flows on every change.",
+)
+@click.option(
+    "--snapshot",
+    "snapshot_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Check a snapshot file instead of the live cluster.",
+)
+def guard(flows_file: str, watch_mode: bool, snapshot_file: Optional[str]) -> None:
+    """Check the flows FLOWS_FILE expects to be allowed or denied.
+
+    Exits with status 1 if any flow is violated. With --watch, violations
+    and fixes are printed as changes arrive.
+    """
+    if watch_mode and snapshot_file:
+        raise click.UsageError("--watch needs a live cluster, not --snapshot")
+    try:
+        entries = load_flow_spec(flows_file)
+        if snapshot_file:
+            snap = ClusterSnapshot.load(snapshot_file)
+        else:
+            parser = PolicyParser()
+            snap = ClusterSnapshot.fetch(
+                parser.cluster, context=fleet.current_context()
+            )
+        flow_guard = FlowGuard(entries, snap)
+        violations = flow_guard.check_all()
+        for violation in violations:
+            console.print(f"[red]✗ {violation}[/red]")
+        console.print(f"{len(entries)} flow(s) checked, {len(violations)} violation(s)")
+        if watch_mode:
+            console.print("Watching for changes...")
+            watch_guard(flow_guard, parser.core_api, parser.api, _print_guard_change)
+    except KeyboardInterrupt:
+        return
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        return
+    if violations:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.argument("history-file")
+@click.option(
+    "--interval",
+    type=float,
+    default=None,
+    help="Keep recording, polling the cluster every this many seconds.",
+)
+@click.option(
+    "--checkpoint-every",
+    type=click.IntRange(min=1),
+    default=CHECKPOINT_EVERY,
+    show_default=True,
+    help="Store the full state every this many records.",
+)
+def record(history_file: str, interval: Optional[float], checkpoint_every: int) -> None:
+    """Append the cluster state to HISTORY_FILE when it changed"""
+    try:
+        store = HistoryStore(history_file, checkpoint_every=checkpoint_every)
+        parser = PolicyParser()
+        name = fleet.current_context()
+        while True:
+            snap = ClusterSnapshot.fetch(parser.cluster, context=name)
+            if store.record(snap):
+                console.print(f"[green]✓ Recorded '{name}' to {history_file}[/green]")
+            else:
+                console.print(f"No changes in '{name}'")
+            if interval is None:
+                return
+            time.sleep(interval)
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+
+
+@cli.command()
+@click.argument("flows-file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--host", default="0.0.0.0", show_default=True, help="Address to bind.")
+@click.option("--port", type=int, default=8443, show_default=True, help="Port.")
+@click.option("--tls-cert", default=None, help="Serving certificate (PEM).")
+@click.option("--tls-key", default=None, help="Private key of the certificate.")
+@click.option(
+    "--resync",
+    type=click.FloatRange(min=1),
+    default=300.0,
+    show_default=True,
+    help="Seconds between reloads of policies and pod labels.",
+)
+@click.option(
+    "--failure-policy",
+    type=click.Choice(FAILURE_POLICIES),
+    default="Ignore",
+    show_default=True,
+    help="Admit (Ignore) or reject (Fail) changes that cannot be checked.",
+)
+@click.option(
+    "--record",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Append every AdmissionReview received to this file, for replay.",
+)
+@click.option(
+    "--snapshot",
+    "snapshot_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Check against a snapshot file instead of the live cluster.",
+)
+def admission(
+    flows_file: str,
+    host: str,
+    port: int,
+    tls_cert: Optional[str],
+    tls_key: Optional[str],
+    resync: float,
+    failure_policy: str,
+    record: Optional[str],
+    snapshot_file: Optional[str],
+) -> None:
+    """Serve a validating webhook that rejects policies blocking FLOWS_FILE."""
+    try:
+        flows = load_protected_flows(flows_file)
+        if snapshot_file:
+            parser = PolicyParser(snapshot=ClusterSnapshot.load(snapshot_file))
+        else:
+            parser = PolicyParser()
+        checker = AdmissionChecker(TrafficSimulator(parser), flows, failure_policy)
+        for flow in checker.unresolved:
+            console.print(f"[yellow]Warning: pods of {flow} not found[/yellow]")
 
+        with ExitStack() as stack:
+            recording = stack.enter_context(open(record, "a")) if record else None
+            server = AdmissionServer(
+                checker, (host, port), tls_cert, tls_key, recording=recording
+            )
+            stack.callback(server.server_close)
+            if not snapshot_file:
+                server.watch_policies()
+                server.resync_every(resync)
+            console.print(
+                f"[green]Checking {len(flows)} protected flow(s) on "
+                f"{host}:{server.server_port}[/green]"
+            )
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+
+
+def _print_capture(summary: Dict[str, Any]) -> None:
+    meta = summary["meta"]
+    console.print(
+        f"[bold]{meta['command']}[/bold] ({summary['path']}): "
+        f"{meta['seconds']:.2f}s, peak traced memory "
+        f"{summary['peak'] / 1024 / 1024:.1f} MiB, {meta['samples']} stack samples"
+    )
+
+    table = Table(title="Functions by own time")
+    table.add_column("Function")
+    table.add_column("Calls", justify="right")
+    table.add_column("Own s", justify="right")
+    table.add_column("Cumulative s", justify="right")
+    for row in summary["functions"]:
+        table.add_row(
+            row["function"],
+            str(row["calls"]),
+            f"{row['own']:.3f}",
+            f"{row['cumulative']:.3f}",
+        )
+    console.print(table)
+
+    table = Table(title="Allocation sites still held at exit")
+    table.add_column("Line")
+    table.add_column("KiB", justify="right")
+    table.add_column("Blocks", justify="right")
+    for site in summary["allocations"]:
+        table.add_row(
+            f"{site['file']}:{site['line']}",
+            f"{site['size'] / 1024:.1f}",
+            str(site["count"]),
+        )
+    console.print(table)
+
+    table = Table(title="Sampled frames (innermost)")
+    table.add_column("Frame")
+    table.add_column("Samples", justify="right")
+    table.add_column("Share", justify="right")
+    for frame in summary["frames"]:
+        table.add_row(frame["frame"], str(frame["samples"]), f"{frame['share']:.1%}")
+    console.print(table)
+
+
+@cli.command("profile-report")
+@click.argument("path", type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--top",
+    type=click.IntRange(min=1),
+    default=15,
+    show_default=True,
+    help="Rows per table.",
+)
+def profile_report(path: str, top: int) -> None:
+    """Summarize captures written by --profile-out"""
+    try:
+        captures = find_captures(path)
+        if not captures:
+            console.print(f"[yellow]No profile captures in {path}[/yellow]")
+            return
+        for capture in captures:
+            _print_capture(summarize(capture, top))
     except Exception as e:
         console.print(f"[red]Error: {str(e)}[/red]")
 
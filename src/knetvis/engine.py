@@ -0,0 +1,444 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .models import Endpoint
+from .selector import LabelSelector, NamespaceIndex
+
+INGRESS = "ingress"
+EGRESS = "egress"
+
+# How a policy treats a direction
+UNAFFECTED = 0  # the direction is not in the policy's policyTypes
+DENY_ALL = 1  # the policy isolates this direction and lists no rules
+RULES = 2  # traffic must match one of the policy's rules
+
+
+def _get(obj: dict, camel: str, snake: str) -> Any:
+    """Read a field from either the YAML (camelCase) or to_dict() form"""
+    value = obj.get(camel)
+    return obj.get(snake) if value is None else value
+
+
+def policy_types(spec: dict) -> List[str]:
+    """policyTypes with the API server's defaulting applied.
+
+    Without an explicit list a policy always affects Ingress, and affects
+    Egress only when it has at least one egress rule.
+    """
+    types = _get(spec, "policyTypes", "policy_types")
+    if types:
+        return list(types)
+    return ["Ingress", "Egress"] if spec.get(EGRESS) else ["Ingress"]
+
+
+def peer_selectors(peer: dict) -> Tuple[Optional[dict], Optional[dict]]:
+    """A peer's (podSelector, namespaceSelector): None if absent, {} if empty"""
+    return (
+        _get(peer, "podSelector", "pod_selector"),
+        _get(peer, "namespaceSelector", "namespace_selector"),
+    )
+
+
+def uses_namespace_selectors(policies_by_namespace: Dict[str, List[dict]]) -> bool:
+    """Whether any rule peer has a namespaceSelector, so namespace labels matter"""
+    for policies in policies_by_namespace.values():
+        for policy in policies:
+            spec = policy.get("spec") or {}
+            for direction, peer_key in ((INGRESS, "from"), (EGRESS, "to")):
+                for rule in spec.get(direction) or []:
+                    peers = rule.get(peer_key) or rule.get("_" + peer_key) or []
+                    for peer in peers:
+                        if peer_selectors(peer)[1] is not None:
+                            return True
+    return False
+
+
+class CompiledPeer:
+    """One entry of a rule's ``from``/``to`` list.
+
+    A podSelector alone selects pods in the policy's own namespace; with a
+    namespaceSelector it selects those pods in the matching namespaces. An
+    empty selector (``{}``) selects everything in its scope. ipBlock peers
+    describe addresses outside the cluster and never match a pod.
+    """
+
+    __slots__ = (
+        "index",
+        "namespace",
+        "pod_selector",
+        "namespace_selector",
+        "ip_block",
+        "description",
+    )
+
+    def __init__(self, index: int, peer: dict, namespace: str) -> None:
+        self.index = index
+        self.namespace = namespace
+        pod_selector, namespace_selector = peer_selectors(peer)
+        self.pod_selector = (
+            LabelSelector(pod_selector) if pod_selector is not None else None
+        )
+        self.namespace_selector = (
+            LabelSelector(namespace_selector)
+            if namespace_selector is not None
+            else None
+        )
+        self.ip_block = _get(peer, "ipBlock", "ip_block") is not None
+        parts = []
+        if self.pod_selector is not None:
+            parts.append(f"podSelector {self.pod_selector.to_string()!r}")
+        if self.namespace_selector is not None:
+            parts.append(f"namespaceSelector {self.namespace_selector.to_string()!r}")
+        if self.ip_block:
+            parts.append("ipBlock")
+        self.description = ", ".join(parts) or "empty peer"
+
+    def selects_pods(self) -> bool:
+        """Whether the peer can match pods at all"""
+        return not self.ip_block and (
+            self.pod_selector is not None or self.namespace_selector is not None
+        )
+
+    def matches_namespace(self, namespace: str, namespaces: NamespaceIndex) -> bool:
+        if self.namespace_selector is None:
+            return namespace == self.namespace
+        if self.namespace_selector.is_empty():
+            return True
+        return namespaces.matches(namespace, self.namespace_selector)
+
+    def matches(self, endpoint: Endpoint, namespaces: NamespaceIndex) -> bool:
+        if not self.selects_pods():
+            return False
+        if self.pod_selector is not None and not self.pod_selector.matches(
+            endpoint.labels
+        ):
+            return False
+        return self.matches_namespace(endpoint.namespace, namespaces)
+
+
+class CompiledRule:
+    """One ingress or egress rule; a rule without peers matches everything"""
+
+    __slots__ = ("index", "peers")
+
+    def __init__(self, index: int, peers: Iterable[dict], namespace: str) -> None:
+        self.index = index
+        self.peers = tuple(
+            CompiledPeer(i, peer, namespace) for i, peer in enumerate(peers)
+        )
+
+    def matches(self, endpoint: Endpoint, namespaces: NamespaceIndex) -> bool:
+        if not self.peers:
+            return True
+        for peer in self.peers:
+            if peer.matches(endpoint, namespaces):
+                return True
+        return False
+
+
+class CompiledPolicy:
+    """A NetworkPolicy compiled once into selectors and per-direction rules"""
+
+    __slots__ = ("namespace", "name", "selector", "modes", "rules")
+
+    def __init__(self, namespace: str, policy: dict) -> None:
+        spec = policy.get("spec") or {}
+        metadata = policy.get("metadata") or {}
+        self.namespace = namespace
+        self.name = str(metadata.get("name") or "<unnamed>")
+        self.selector = LabelSelector(_get(spec, "podSelector", "pod_selector"))
+
+        types = policy_types(spec)
+        self.modes: Dict[str, int] = {}
+        self.rules: Dict[str, Tuple[CompiledRule, ...]] = {}
+        for direction, type_name, peer_key in (
+            (INGRESS, "Ingress", "from"),
+            (EGRESS, "Egress", "to"),
+        ):
+            rules = spec.get(direction) or []
+            if type_name not in types:
+                mode = UNAFFECTED
+                rules = []
+            elif not rules:
+                mode = DENY_ALL
+            else:
+                mode = RULES
+            self.modes[direction] = mode
+            self.rules[direction] = tuple(
+                CompiledRule(
+                    i,
+                    rule.get(peer_key) or rule.get("_" + peer_key) or [],
+                    namespace,
+                )
+                for i, rule in enumerate(rules)
+            )
+
+    def __str__(self) -> str:
+        return f"{self.namespace}/{self.name}"
+
+    def isolates(self, direction: str) -> bool:
+        return self.modes[direction] != UNAFFECTED
+
+    def allows(
+        self, direction: str, peer: Endpoint, namespaces: NamespaceIndex
+    ) -> bool:
+        """Whether the policy's rules admit a peer; only for isolated directions"""
+        if self.modes[direction] != RULES:
+            return False
+        for rule in self.rules[direction]:
+            if rule.matches(peer, namespaces):
+                return True
+        return False
+
+
+class SelectorIndex:
+    """Policies filed by podSelector, to find those selecting a pod quickly.
+
+    Policies sharing a selector are grouped, and each distinct selector is
+    filed under one of its matchLabels pairs; selectors without matchLabels
+    are kept apart. A lookup only tests the selectors filed under one of the
+    pod's own labels, plus those, so policies selecting unrelated apps are
+    never looked at. Results keep the policies' order and are memoized per
+    label set.
+    """
+
+    def __init__(self, policies: Iterable[CompiledPolicy]) -> None:
+        self._groups: Dict[LabelSelector, List[Tuple[int, CompiledPolicy]]] = {}
+        for position, policy in enumerate(policies):
+            self._groups.setdefault(policy.selector, []).append((position, policy))
+        self._by_label: Dict[Tuple[str, str], List[LabelSelector]] = {}
+        self._unkeyed: List[LabelSelector] = []
+        for selector in self._groups:
+            if selector.match_labels:
+                self._by_label.setdefault(selector.match_labels[0], []).append(selector)
+            else:
+                self._unkeyed.append(selector)
+        self._memo: Dict[FrozenSet[Tuple[str, str]], Tuple[CompiledPolicy, ...]] = {}
+
+    def lookup(self, labels: Dict[str, str]) -> Tuple[CompiledPolicy, ...]:
+        """Policies whose podSelector selects the labels, in policy order"""
+        key = frozenset(labels.items())
+        found = self._memo.get(key)
+        if found is None:
+            matched: List[Tuple[int, CompiledPolicy]] = []
+            candidates = list(self._unkeyed)
+            for pair in key:
+                candidates.extend(self._by_label.get(pair, ()))
+            for selector in candidates:
+                if selector.matches(labels):
+                    matched.extend(self._groups[selector])
+            found = tuple(policy for _, policy in sorted(matched, key=_position))
+            self._memo[key] = found
+        return found
+
+
+def _position(item: Tuple[int, CompiledPolicy]) -> int:
+    return item[0]
+
+
+class DirectionBuckets:
+    """One namespace's policies that restrict one direction, pre-sorted.
+
+    For the policies selecting a pod, a flow is decided without looking at
+    the peer when none of them restricts the direction (allowed), when one
+    has a rule without peers (allowed), or when all of them are default-deny
+    (denied). Otherwise only the allow-list policies are left to check, and
+    the first rule admitting the peer decides. The split is memoized per
+    label set.
+    """
+
+    def __init__(self, policies: Iterable[CompiledPolicy], direction: str) -> None:
+        self.direction = direction
+        self.index = SelectorIndex(p for p in policies if p.isolates(direction))
+        self._memo: Dict[
+            FrozenSet[Tuple[str, str]],
+            Tuple[Optional[bool], Tuple[CompiledPolicy, ...]],
+        ] = {}
+
+    def candidates(
+        self, labels: Dict[str, str]
+    ) -> Tuple[Optional[bool], Tuple[CompiledPolicy, ...]]:
+        """(verdict if decided without the peer, allow-list policies to check)"""
+        key = frozenset(labels.items())
+        found = self._memo.get(key)
+        if found is None:
+            selecting = self.index.lookup(labels)
+            allow_lists = tuple(
+                p for p in selecting if p.modes[self.direction] == RULES
+            )
+            verdict: Optional[bool] = None
+            if not selecting:
+                verdict = True
+            elif any(
+                not rule.peers
+                for policy in allow_lists
+                for rule in policy.rules[self.direction]
+            ):
+                verdict = True
+            elif not allow_lists:
+                # Only default-deny policies select the pod
+                verdict = False
+            found = (verdict, allow_lists)
+            self._memo[key] = found
+        return found
+
+
+@dataclass
+class Verdict:
+    """Why one direction of a flow was allowed or denied"""
+
+    direction: str
+    allowed: bool
+    reason: str
+    policy: Optional[str] = None
+    rule: Optional[int] = None
+    peer: Optional[int] = None
+    selecting: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Explanation:
+    """Trace of the policy, rule and peer that decided a flow"""
+
+    source: str
+    destination: str
+    egress: Verdict
+    ingress: Verdict
+
+    @property
+    def allowed(self) -> bool:
+        return self.egress.allowed and self.ingress.allowed
+
+    def lines(self) -> List[str]:
+        verdict = "allowed" if self.allowed else "blocked"
+        lines = [f"{self.source} -> {self.destination}: {verdict}"]
+        for v in (self.egress, self.ingress):
+            status = "allowed" if v.allowed else "denied"
+            lines.append(f"  {v.direction} {status}: {v.reason}")
+        return lines
+
+
+class PolicyEngine:
+    """Evaluates flows against compiled NetworkPolicies.
+
+    :meth:`allowed` is the fast path and records nothing. :meth:`explain`
+    re-walks the same compiled rules for a single flow and reports which
+    policy, rule and peer decided it, so a flow can be explained after the
+    fact without re-running a whole batch.
+    """
+
+    def __init__(
+        self,
+        policies_by_namespace: Dict[str, List[dict]],
+        namespace_index: NamespaceIndex,
+    ) -> None:
+        self.namespace_index = namespace_index
+        self.by_namespace: Dict[str, Tuple[CompiledPolicy, ...]] = {
+            ns: tuple(CompiledPolicy(ns, p) for p in policies)
+            for ns, policies in policies_by_namespace.items()
+        }
+        # Built per namespace on first use
+        self._selectors: Dict[str, SelectorIndex] = {}
+        self._buckets: Dict[Tuple[str, str], DirectionBuckets] = {}
+
+    def with_policies(
+        self, namespace: str, policies: Iterable[CompiledPolicy]
+    ) -> "PolicyEngine":
+        """A copy with one namespace's policies replaced; others are shared"""
+        engine = PolicyEngine({}, self.namespace_index)
+        engine.by_namespace = dict(self.by_namespace)
+        engine.by_namespace[namespace] = tuple(policies)
+        return engine
+
+    def selecting(self, endpoint: Endpoint) -> List[CompiledPolicy]:
+        """Policies in the endpoint's namespace whose podSelector selects it"""
+        index = self._selectors.get(endpoint.namespace)
+        if index is None:
+            index = SelectorIndex(self.by_namespace.get(endpoint.namespace, ()))
+            self._selectors[endpoint.namespace] = index
+        return list(index.lookup(endpoint.labels))
+
+    def buckets(self, namespace: str, direction: str) -> DirectionBuckets:
+        """The namespace's policies restricting a direction, bucketed"""
+        buckets = self._buckets.get((namespace, direction))
+        if buckets is None:
+            buckets = DirectionBuckets(self.by_namespace.get(namespace, ()), direction)
+            self._buckets[namespace, direction] = buckets
+        return buckets
+
+    def _direction_allowed(
+        self, direction: str, subject: Endpoint, peer: Endpoint
+    ) -> bool:
+        verdict, allow_lists = self.buckets(subject.namespace, direction).candidates(
+            subject.labels
+        )
+        if verdict is not None:
+            return verdict
+        for policy in allow_lists:
+            if policy.allows(direction, peer, self.namespace_index):
+                return True
+        return False
+
+    def allowed(self, source: Endpoint, dest: Endpoint) -> bool:
+        return self._direction_allowed(
+            EGRESS, source, dest
+        ) and self._direction_allowed(INGRESS, dest, source)
+
+    def _explain_direction(
+        self, direction: str, subject: Endpoint, peer: Endpoint
+    ) -> Verdict:
+        selecting = self.selecting(subject)
+        names = [str(p) for p in selecting]
+        if not selecting:
+            return Verdict(
+                direction, True, f"no policy selects {subject}", selecting=names
+            )
+        isolating = [p for p in selecting if p.isolates(direction)]
+        if not isolating:
+            return Verdict(
+                direction,
+                True,
+                f"no policy selecting {subject} restricts {direction}",
+                selecting=names,
+            )
+
+        for policy in isolating:
+            for rule in policy.rules[direction]:
+                if not rule.peers:
+                    return Verdict(
+                        direction,
+                        True,
+                        f"policy {policy} {direction} rule {rule.index} "
+                        "allows all peers",
+                        policy=str(policy),
+                        rule=rule.index,
+                        selecting=names,
+                    )
+                for p in rule.peers:
+                    if p.matches(peer, self.namespace_index):
+                        return Verdict(
+                            direction,
+                            True,
+                            f"policy {policy} {direction} rule {rule.index} "
+                            f"peer {p.index} ({p.description}) matches {peer}",
+                            policy=str(policy),
+                            rule=rule.index,
+                            peer=p.index,
+                            selecting=names,
+                        )
+
+        return Verdict(
+            direction,
+            False,
+            f"{subject} is selected by {', '.join(str(p) for p in isolating)} "
+            f"and no {direction} rule matches {peer}",
+            selecting=names,
+        )
+
+    def explain(self, source: Endpoint, dest: Endpoint) -> Explanation:
+        return Explanation(
+            source=str(source),
+            destination=str(dest),
+            egress=self._explain_direction(EGRESS, source, dest),
+            ingress=self._explain_direction(INGRESS, dest, source),
+        )
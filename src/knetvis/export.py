@@ -0,0 +1,271 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from contextlib import ExitStack
+from typing import IO, Any, Dict, List, Optional, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+import networkx as nx
+
+# Edges buffered per Parquet row group
+PARQUET_BATCH = 65536
+
+FORMATS = ("png", "html", "graphml", "dot", "ndjson", "parquet")
+
+# Formats rendered from the finished graph rather than streamed
+RENDERED = ("png", "html")
+
+
+class GraphWriter(ABC):
+    """Writes nodes and edges to a file as the graph is built.
+
+    Nothing is buffered beyond the current record (or Parquet row group),
+    so exporting does not keep a second copy of the edge list.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.nodes = 0
+        self.edges = 0
+
+    def write_node(self, node_id: str, attrs: Dict[str, Any]) -> None:
+        self.nodes += 1
+        self._node(node_id, attrs)
+
+    def write_edge(self, source: str, target: str, attrs: Dict[str, Any]) -> None:
+        self.edges += 1
+        self._edge(source, target, attrs)
+
+    def write_graph(self, graph: nx.DiGraph) -> None:
+        """Write an already-built graph"""
+        for node_id, attrs in graph.nodes(data=True):
+            self.write_node(node_id, attrs)
+        for source, target, attrs in graph.edges(data=True):
+            self.write_edge(source, target, attrs)
+
+    @abstractmethod
+    def _node(self, node_id: str, attrs: Dict[str, Any]) -> None:
+        """Write one node record"""
+
+    @abstractmethod
+    def _edge(self, source: str, target: str, attrs: Dict[str, Any]) -> None:
+        """Write one edge record"""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Flush and close the file"""
+
+    def __enter__(self) -> "GraphWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class _TextWriter(GraphWriter):
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.file: IO[str] = open(path, "w", encoding="utf-8")
+        self._header()
+
+    def _header(self) -> None:
+        pass
+
+    def _footer(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self._footer()
+            self.file.close()
+
+
+class GraphMLWriter(_TextWriter):
+    """GraphML; nodes and edges may be interleaved inside <graph>"""
+
+    KEYS = [
+        ("kind", "node", "string"),
+        ("namespace", "node", "string"),
+        ("labels", "node", "string"),
+        ("class_size", "node", "int"),
+        ("workload", "node", "string"),
+        # Aggregated views (--level workload or namespace)
+        ("count", "node", "int"),
+        ("type", "edge", "string"),
+        ("weight", "edge", "int"),
+    ]
+
+    def _header(self) -> None:
+        self.file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+        )
+        for name, domain, kind in self.KEYS:
+            self.file.write(
+                f'  <key id="{name}" for="{domain}" '
+                f'attr.name="{name}" attr.type="{kind}"/>\n'
+            )
+        self.file.write('  <graph id="G" edgedefault="directed">\n')
+
+    def _data(self, attrs: Dict[str, Any]) -> str:
+        parts = []
+        for key, value in attrs.items():
+            if key == "labels":
+                value = json.dumps(value, sort_keys=True)
+            parts.append(f'<data key="{key}">{escape(str(value))}</data>')
+        return "".join(parts)
+
+    def _node(self, node_id: str, attrs: Dict[str, Any]) -> None:
+        self.file.write(
+            f"    <node id={quoteattr(node_id)}>{self._data(attrs)}</node>\n"
+        )
+
+    def _edge(self, source: str, target: str, attrs: Dict[str, Any]) -> None:
+        self.file.write(
+            f"    <edge source={quoteattr(source)} target={quoteattr(target)}>"
+            f"{self._data(attrs)}</edge>\n"
+        )
+
+    def _footer(self) -> None:
+        self.file.write("  </graph>\n</graphml>\n")
+
+
+def _dot_id(value: Any) -> str:
+    return json.dumps(str(value))
+
+
+class DotWriter(_TextWriter):
+    """Graphviz DOT"""
+
+    def _header(self) -> None:
+        self.file.write("digraph knetvis {\n")
+
+    def _attrs(self, attrs: Dict[str, Any]) -> str:
+        if not attrs:
+            return ""
+        items = []
+        for key, value in attrs.items():
+            if key == "labels":
+                value = json.dumps(value, sort_keys=True)
+            items.append(f"{key}={_dot_id(value)}")
+        return f" [{', '.join(items)}]"
+
+    def _node(self, node_id: str, attrs: Dict[str, Any]) -> None:
+        self.file.write(f"  {_dot_id(node_id)}{self._attrs(attrs)};\n")
+
+    def _edge(self, source: str, target: str, attrs: Dict[str, Any]) -> None:
+        self.file.write(
+            f"  {_dot_id(source)} -> {_dot_id(target)}{self._attrs(attrs)};\n"
+        )
+
+    def _footer(self) -> None:
+        self.file.write("}\n")
+
+
+class NDJSONWriter(_TextWriter):
+    """One JSON object per line, tagged ``"record": "node"`` or ``"edge"``"""
+
+    def _node(self, node_id: str, attrs: Dict[str, Any]) -> None:
+        record = {"record": "node", "id": node_id, **attrs}
+        self.file.write(json.dumps(record, sort_keys=True) + "\n")
+
+    def _edge(self, source: str, target: str, attrs: Dict[str, Any]) -> None:
+        record = {"record": "edge", "source": source, "target": target, **attrs}
+        self.file.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+class ParquetWriter(GraphWriter):
+    """Parquet edge list (source, target, type), one row group per batch.
+
+    Requires pyarrow (``pip install knetvis[parquet]``). Nodes are not
+    written; node attributes are available from the other formats.
+    """
+
+    def __init__(self, path: str, batch_size: int = PARQUET_BATCH) -> None:
+        super().__init__(path)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception(
+                "Parquet export requires pyarrow: pip install knetvis[parquet]"
+            )
+        self._pa = pa
+        self.batch_size = batch_size
+        self.schema = pa.schema(
+            [("source", pa.string()), ("target", pa.string()), ("type", pa.string())]
+        )
+        self._writer: Optional[Any] = pq.ParquetWriter(path, self.schema)
+        self._batch: Dict[str, List[str]] = {"source": [], "target": [], "type": []}
+
+    def _node(self, node_id: str, attrs: Dict[str, Any]) -> None:
+        pass
+
+    def _edge(self, source: str, target: str, attrs: Dict[str, Any]) -> None:
+        self._batch["source"].append(source)
+        self._batch["target"].append(target)
+        self._batch["type"].append(str(attrs.get("type", "")))
+        if len(self._batch["source"]) >= self.batch_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._batch["source"] and self._writer is not None:
+            table = self._pa.Table.from_pydict(self._batch, schema=self.schema)
+            self._writer.write_table(table)
+            self._batch = {"source": [], "target": [], "type": []}
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._flush()
+            self._writer.close()
+            self._writer = None
+
+
+WRITERS = {
+    "graphml": GraphMLWriter,
+    "dot": DotWriter,
+    "ndjson": NDJSONWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def open_writer(fmt: str, path: str) -> GraphWriter:
+    """Open a streaming writer for one of the non-image formats"""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown graph format: {fmt}")
+    writer: GraphWriter = WRITERS[fmt](path)
+    return writer
+
+
+def export_graph(
+    visualizer: Any,
+    namespace: str,
+    policies: List[dict],
+    output_dir: str,
+    formats: Sequence[str] = ("png",),
+    **options: Any,
+) -> List[str]:
+    """Build a namespace graph, streaming it to each format; return the paths.
+
+    The PNG and HTML viewer are drawn from the finished graph; every other
+    format is written while edges are generated.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {
+        fmt: os.path.join(output_dir, f"{namespace}-network-policies.{fmt}")
+        for fmt in dict.fromkeys(formats)
+    }
+    with ExitStack() as stack:
+        writers = [
+            stack.enter_context(open_writer(fmt, path))
+            for fmt, path in paths.items()
+            if fmt not in RENDERED
+        ]
+        visualizer.create_graph(
+            namespace=namespace, policies=policies, writers=writers, **options
+        )
+    if "png" in paths:
+        visualizer.save_graph(output_file=paths["png"])
+    if "html" in paths:
+        visualizer.save_html(output_file=paths["html"])
+    return list(paths.values())
@@ -0,0 +1,367 @@
+import base64
+import copy
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from kubernetes import client
+
+from .snapshot import ClusterSnapshot, _labels_match
+from .sources import LiveSource, to_manifests
+
+# kind -> (resource, list kind, apiVersion)
+KINDS = {
+    "Namespace": ("namespaces", "NamespaceList", "v1"),
+    "Pod": ("pods", "PodList", "v1"),
+    "Service": ("services", "ServiceList", "v1"),
+    "NetworkPolicy": (
+        "networkpolicies",
+        "NetworkPolicyList",
+        "networking.k8s.io/v1",
+    ),
+}
+RESOURCES = {resource: kind for kind, (resource, _, _) in KINDS.items()}
+
+_CORE = re.compile(
+    r"^/api/v1(?:/namespaces/(?P<ns>[^/]+))?/(?P<resource>namespaces|pods|services)"
+    r"(?:/(?P<name>[^/]+))?$"
+)
+_NETWORKING = re.compile(
+    r"^/apis/networking\.k8s\.io/v1(?:/namespaces/(?P<ns>[^/]+))?"
+    r"/(?P<resource>networkpolicies)(?:/(?P<name>[^/]+))?$"
+)
+
+# (namespace, name); namespaces themselves use an empty namespace
+Key = Tuple[str, str]
+
+
+def _status(code: int, reason: str, message: str) -> dict:
+    return {
+        "kind": "Status",
+        "apiVersion": "v1",
+        "status": "Failure",
+        "code": code,
+        "reason": reason,
+        "message": message,
+    }
+
+
+def _encode_token(offset: int, epoch: int) -> str:
+    token = {"start": offset, "epoch": epoch}
+    return base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+
+def _decode_token(token: str) -> Tuple[int, int]:
+    decoded = json.loads(base64.urlsafe_b64decode(token.encode()))
+    return int(decoded["start"]), int(decoded["epoch"])
+
+
+class Gone(Exception):
+    """A request the server answers with 410 Gone and a Status body"""
+
+    def __init__(self, body: dict) -> None:
+        super().__init__(body["message"])
+        self.body = body
+
+
+class FakeApiServer:
+    """In-process Kubernetes API server over a set of objects.
+
+    Serves the real REST paths of namespaces, pods, services and
+    NetworkPolicies on a local port, so the official client, and with it
+    knetvis' pagination and watch code, runs unchanged against it. Lists
+    honour ``labelSelector``, ``limit`` and ``continue``; ``watch=true``
+    streams events after ``resourceVersion`` until ``timeoutSeconds``.
+    :meth:`apply` and :meth:`delete` change objects and emit watch events;
+    :meth:`expire_continue_tokens` makes outstanding continue tokens fail
+    with 410 Gone, as after a compaction. Every request waits ``latency``
+    seconds first, to model a remote API server; :attr:`max_in_flight`
+    records how many were served at once.
+    """
+
+    def __init__(
+        self,
+        snapshot: Optional[ClusterSnapshot] = None,
+        latency: float = 0.0,
+        watch_timeout: float = 60.0,
+    ) -> None:
+        self.latency = latency
+        self.watch_timeout = watch_timeout
+        self.requests: List[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.version = 0
+        self.objects: Dict[str, Dict[Key, dict]] = {r: {} for r in RESOURCES}
+        self._events: List[Tuple[int, str, str, dict]] = []
+        self._changed = threading.Condition()
+        self._closed = False
+        # Continue tokens from an earlier epoch have expired
+        self._token_epoch = 0
+        self._replace_tokens = True
+        if snapshot is not None:
+            for doc in to_manifests(snapshot):
+                self.apply(doc)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def apply(self, obj: dict) -> dict:
+        """Create or replace an object; returns the stored copy"""
+        resource = KINDS[obj["kind"]][0]
+        stored = copy.deepcopy(obj)
+        metadata = stored.setdefault("metadata", {})
+        namespace = "" if resource == "namespaces" else metadata["namespace"]
+        key = (namespace, metadata["name"])
+        with self._changed:
+            self.version += 1
+            metadata["resourceVersion"] = str(self.version)
+            objects = self.objects[resource]
+            event = "MODIFIED" if key in objects else "ADDED"
+            objects[key] = stored
+            self._events.append((self.version, resource, event, stored))
+            self._changed.notify_all()
+        return stored
+
+    def delete(self, kind: str, name: str, namespace: str = "") -> None:
+        """Delete an object; unknown objects are ignored"""
+        resource = KINDS[kind][0]
+        with self._changed:
+            stored = self.objects[resource].pop((namespace, name), None)
+            if stored is None:
+                return
+            self.version += 1
+            stored = dict(stored, metadata=dict(stored["metadata"]))
+            stored["metadata"]["resourceVersion"] = str(self.version)
+            self._events.append((self.version, resource, "DELETED", stored))
+            self._changed.notify_all()
+
+    def expire_continue_tokens(self, replace: bool = True) -> None:
+        """Expire every continue token handed out so far.
+
+        With ``replace`` the 410 error carries a fresh token for the same
+        position, as the API server's does; without, the list must restart.
+        """
+        with self._changed:
+            self._token_epoch += 1
+            self._replace_tokens = replace
+
+    def _select(
+        self, resource: str, namespace: Optional[str], label_selector: str
+    ) -> List[dict]:
+        return [
+            obj
+            for (ns, _), obj in sorted(self.objects[resource].items())
+            if (namespace is None or ns == namespace)
+            and _labels_match(obj["metadata"].get("labels") or {}, label_selector)
+        ]
+
+    def list(
+        self,
+        resource: str,
+        namespace: Optional[str] = None,
+        label_selector: str = "",
+        limit: int = 0,
+        token: str = "",
+    ) -> dict:
+        """A list response, paged when ``limit`` is set"""
+        with self._changed:
+            items = self._select(resource, namespace, label_selector)
+            version = self.version
+            epoch, replace = self._token_epoch, self._replace_tokens
+        start, issued = _decode_token(token) if token else (0, epoch)
+        if issued != epoch:
+            body = _status(410, "Expired", "The provided continue parameter is too old")
+            if replace:
+                body["metadata"] = {"continue": _encode_token(start, epoch)}
+            raise Gone(body)
+        end = start + limit if limit else len(items)
+        metadata: Dict[str, Any] = {"resourceVersion": str(version)}
+        if end < len(items):
+            metadata["continue"] = _encode_token(end, epoch)
+            metadata["remainingItemCount"] = len(items) - end
+        _, list_kind, api_version = KINDS[RESOURCES[resource]]
+        return {
+            "kind": list_kind,
+            "apiVersion": api_version,
+            "metadata": metadata,
+            "items": items[start:end],
+        }
+
+    def _watch(
+        self,
+        resource: str,
+        namespace: Optional[str],
+        label_selector: str,
+        resource_version: int,
+        timeout: float,
+    ) -> Any:
+        """Yield encoded watch events until the timeout or shutdown"""
+
+        def wanted(obj: dict) -> bool:
+            metadata = obj["metadata"]
+            return (
+                namespace is None or metadata.get("namespace", "") == namespace
+            ) and _labels_match(metadata.get("labels") or {}, label_selector)
+
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            if resource_version:
+                seen = resource_version
+                pending = []
+            else:
+                # Like the API server: synthetic ADDED events for what exists
+                seen = self.version
+                # ...oldest first, so the last one carries the newest version
+                pending = [
+                    ("ADDED", obj)
+                    for obj in sorted(
+                        self._select(resource, namespace, ""),
+                        key=lambda obj: int(obj["metadata"]["resourceVersion"]),
+                    )
+                ]
+        while True:
+            for event, obj in pending:
+                if wanted(obj):
+                    line = json.dumps({"type": event, "object": obj}) + "\n"
+                    yield line.encode()
+            with self._changed:
+                remaining = deadline - time.monotonic()
+                while self.version == seen and not self._closed and remaining > 0:
+                    self._changed.wait(remaining)
+                    remaining = deadline - time.monotonic()
+                if self._closed or self.version == seen:
+                    return
+                # Event versions are 1, 2, 3...; the ones after seen follow it
+                pending = [
+                    (event, obj)
+                    for _, kind, event, obj in self._events[seen:]
+                    if kind == resource
+                ]
+                seen = self.version
+
+    def _handler(self) -> Any:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; don't let Nagle delay them
+            disable_nagle_algorithm = True
+
+            def _send(self, code: int, body: dict) -> None:
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, chunks: Any) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self) -> None:
+                path, _, query = self.path.partition("?")
+                with server._changed:
+                    server.requests.append(path)
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    self._get(path, query)
+                finally:
+                    with server._changed:
+                        server.in_flight -= 1
+
+            def _get(self, path: str, query: str) -> None:
+                time.sleep(server.latency)
+                params = {k: v[-1] for k, v in parse_qs(query).items()}
+                match = _CORE.match(path) or _NETWORKING.match(path)
+                try:
+                    if match is None:
+                        self._send(404, _status(404, "NotFound", path))
+                        return
+                    resource = match.group("resource")
+                    namespace, name = match.group("ns"), match.group("name")
+                    if resource == "namespaces" and namespace is not None:
+                        # /api/v1/namespaces/{name}
+                        namespace, name = "", namespace
+                    if name is not None:
+                        obj = server.objects[resource].get((namespace or "", name))
+                        if obj is None:
+                            message = f'{resource} "{name}" not found'
+                            self._send(404, _status(404, "NotFound", message))
+                        else:
+                            self._send(200, obj)
+                        return
+                    selector = params.get("labelSelector", "")
+                    if params.get("watch") in ("true", "1"):
+                        self._stream(
+                            server._watch(
+                                resource,
+                                namespace,
+                                selector,
+                                int(params.get("resourceVersion") or 0),
+                                float(
+                                    params.get("timeoutSeconds") or server.watch_timeout
+                                ),
+                            )
+                        )
+                        return
+                    self._send(
+                        200,
+                        server.list(
+                            resource,
+                            namespace,
+                            selector,
+                            int(params.get("limit") or 0),
+                            params.get("continue", ""),
+                        ),
+                    )
+                except Gone as e:
+                    self._send(410, e.body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
+
+    def api_client(self) -> client.ApiClient:
+        """An API client configured for this server"""
+        configuration = client.Configuration()
+        configuration.host = self.url
+        configuration.connection_pool_maxsize = 32
+        return client.ApiClient(configuration)
+
+    def source(self, context: str = "fake") -> LiveSource:
+        """A live cluster source talking to this server"""
+        return LiveSource(context=context, api_client=self.api_client())
+
+    def start(self) -> "FakeApiServer":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeApiServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,188 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from kubernetes import config
+
+from .export import export_graph
+from .models import Target
+from .parallel import pool_context
+from .policy import PolicyParser
+from .simulator import TrafficSimulator
+from .snapshot import ClusterSnapshot
+from .sources import LiveSource
+from .visualizer import NetworkVisualizer
+
+
+@dataclass
+class ClusterResult:
+    """Outcome of one fleet task on one cluster"""
+
+    cluster: str
+    ok: bool
+    summary: str
+    details: Dict[str, Any] = field(default_factory=dict)
+
+
+def list_contexts(config_file: Optional[str] = None) -> List[str]:
+    """Return the names of all contexts in the kubeconfig"""
+    contexts, _ = config.list_kube_config_contexts(config_file=config_file)
+    return [ctx["name"] for ctx in contexts]
+
+
+def current_context(config_file: Optional[str] = None) -> str:
+    """Return the active kubeconfig context, or 'in-cluster' without one"""
+    try:
+        _, active = config.list_kube_config_contexts(config_file=config_file)
+        return str(active["name"])
+    except Exception:
+        return "in-cluster"
+
+
+def fetch_snapshot(
+    context: str, namespaces: Optional[Iterable[str]] = None
+) -> ClusterSnapshot:
+    """Fetch a snapshot of one context using its own API client"""
+    source = LiveSource(context)
+    try:
+        return ClusterSnapshot.fetch(
+            source.cluster, context=context, namespaces=namespaces
+        )
+    finally:
+        source.close()
+
+
+def fetch_snapshots(
+    contexts: List[str], namespaces: Optional[Iterable[str]] = None
+) -> Dict[str, ClusterSnapshot]:
+    """Fetch snapshots of several contexts concurrently"""
+    ns = list(namespaces) if namespaces is not None else None
+    if not contexts:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(contexts)) as pool:
+        futures = {ctx: pool.submit(fetch_snapshot, ctx, ns) for ctx in contexts}
+        return {ctx: future.result() for ctx, future in futures.items()}
+
+
+def evaluate(
+    task: Callable[..., ClusterResult],
+    snapshots: List[ClusterSnapshot],
+    jobs: Optional[int] = None,
+    **kwargs: Any,
+) -> List[ClusterResult]:
+    """Run a task on every snapshot in parallel processes.
+
+    Workers are forked only when no other thread is running, as in
+    :func:`~knetvis.parallel.pool_context`. Failures are reported per
+    cluster instead of aborting the whole run. Results are returned in the
+    order of ``snapshots``.
+    """
+    if jobs is None:
+        jobs = min(len(snapshots), os.cpu_count() or 1)
+
+    def failed(snapshot: ClusterSnapshot, e: Exception) -> ClusterResult:
+        return ClusterResult(snapshot.context, False, f"Error: {str(e)}")
+
+    results = []
+    if jobs <= 1 or len(snapshots) <= 1:
+        for snapshot in snapshots:
+            try:
+                results.append(task(snapshot, **kwargs))
+            except Exception as e:
+                results.append(failed(snapshot, e))
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=pool_context()) as pool:
+        futures = [pool.submit(task, snapshot, **kwargs) for snapshot in snapshots]
+        for snapshot, future in zip(snapshots, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(failed(snapshot, e))
+    return results
+
+
+def visualize_cluster(
+    snapshot: ClusterSnapshot,
+    namespace: str,
+    output_dir: str,
+    sample: Optional[int] = None,
+    budget_seconds: Optional[float] = None,
+    formats: Sequence[str] = ("png",),
+    jobs: int = 1,
+    level: str = "pod",
+) -> ClusterResult:
+    """Render a namespace of one cluster to output_dir/<context>/"""
+    parser = PolicyParser(snapshot=snapshot)
+    policies = parser.get_namespace_policies(namespace)
+
+    visualizer = NetworkVisualizer(
+        source=parser.source,
+        jobs=jobs,
+        level=level,
+    )
+    paths = export_graph(
+        visualizer,
+        namespace,
+        policies,
+        os.path.join(output_dir, snapshot.context),
+        formats,
+        sample=sample,
+        budget_seconds=budget_seconds,
+    )
+
+    view = visualizer.view
+    nodes = view.number_of_nodes()
+    edges = view.number_of_edges()
+    return ClusterResult(
+        snapshot.context,
+        True,
+        f"{nodes} nodes, {edges} edges -> {', '.join(paths)}",
+        {
+            "output_file": paths[0],
+            "output_files": paths,
+            "nodes": nodes,
+            "edges": edges,
+            "coverage": visualizer.coverage,
+        },
+    )
+
+
+def check_connectivity(
+    snapshot: ClusterSnapshot, source: str, destination: str, explain: bool = False
+) -> ClusterResult:
+    """Test connectivity between two resources in one cluster"""
+    source_target = Target.from_str(source)
+    dest_target = Target.from_str(destination)
+    simulator = TrafficSimulator(PolicyParser(snapshot=snapshot))
+
+    for label, target in (("Source", source_target), ("Destination", dest_target)):
+        if not simulator.check_resource_exists(target):
+            return ClusterResult(
+                snapshot.context, False, f"{label} resource {target} not found"
+            )
+
+    count, total = simulator.count_connectivity(source_target, dest_target)
+    allowed = total > 0 and count == total
+    details = {"allowed": allowed, "allowed_pairs": count, "total_pairs": total}
+    if 0 < count < total:
+        summary = f"Traffic is allowed for {count} of {total} pod pairs"
+    elif total == 0:
+        summary = "No pods selected by the targets"
+    else:
+        summary = "Traffic is allowed" if allowed else "Traffic is blocked"
+    if explain:
+        explanation = simulator.explain_connectivity(source_target, dest_target)
+        lines = [line.strip() for line in explanation.lines()[1:]]
+        summary = "\n".join([summary] + lines)
+    return ClusterResult(snapshot.context, True, summary, details)
+
+
+def validate_cluster(snapshot: ClusterSnapshot) -> ClusterResult:
+    """Validate every NetworkPolicy deployed in one cluster"""
+    parser = PolicyParser(snapshot=snapshot)
+    documents = [doc for docs in snapshot.policies.values() for doc in docs]
+    is_valid, message = parser.validate_documents(documents)
+    summary = f"{len(documents)} policies valid" if is_valid else message
+    return ClusterResult(snapshot.context, is_valid, summary)
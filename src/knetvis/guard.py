@@ -0,0 +1,398 @@
+import queue
+import threading
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple, Union
+
+import yaml
+from kubernetes import client
+
+from .engine import CompiledPolicy, PolicyEngine
+from .models import Endpoint
+from .selector import NamespaceIndex
+from .snapshot import ClusterSnapshot, SnapshotApi
+from .sources import list_and_watch
+
+EXPECTATIONS = ("allow", "deny")
+
+# (namespace, frozenset of labels): pods the engine cannot tell apart
+ClassKey = Tuple[str, FrozenSet[Tuple[str, str]]]
+
+
+class FlowSelector:
+    """Pods picked by a spec entry: a namespace and labels, with wildcards.
+
+    ``namespace`` and every label value are shell-style patterns (``*``,
+    ``?``, ``[...]``); a label whose value is ``*`` only has to exist. The
+    string form ``NAMESPACE[/key=value,...]`` is accepted as well.
+    """
+
+    __slots__ = ("namespace", "labels")
+
+    def __init__(self, spec: Union[str, dict]) -> None:
+        if isinstance(spec, str):
+            namespace, _, selector = spec.partition("/")
+            labels = {}
+            for part in filter(None, (p.strip() for p in selector.split(","))):
+                key, sep, value = part.partition("=")
+                labels[key.strip()] = value.strip() if sep else "*"
+            spec = {"namespace": namespace, "labels": labels}
+        self.namespace = str(spec.get("namespace") or "*")
+        self.labels: Tuple[Tuple[str, str], ...] = tuple(
+            sorted((str(k), str(v)) for k, v in (spec.get("labels") or {}).items())
+        )
+
+    def matches_namespace(self, namespace: str) -> bool:
+        return fnmatchcase(namespace, self.namespace)
+
+    def matches(self, namespace: str, labels: Dict[str, str]) -> bool:
+        if not self.matches_namespace(namespace):
+            return False
+        for key, pattern in self.labels:
+            value = labels.get(key)
+            if value is None or not fnmatchcase(value, pattern):
+                return False
+        return True
+
+    def __str__(self) -> str:
+        labels = ",".join(f"{k}={v}" for k, v in self.labels)
+        return f"{self.namespace}/{labels}" if labels else self.namespace
+
+
+@dataclass
+class FlowEntry:
+    """A flow the spec expects to be allowed or denied for every pod pair"""
+
+    name: str
+    source: FlowSelector
+    dest: FlowSelector
+    expect: str = "allow"
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.source} -> {self.dest}, expect {self.expect})"
+
+
+def load_flow_spec(filename: str) -> List[FlowEntry]:
+    """Read ``flows.yaml``: a ``flows`` list of ``{name, from, to, expect}``"""
+    try:
+        with open(filename) as f:
+            data = yaml.safe_load(f) or {}
+        entries = data.get("flows") if isinstance(data, dict) else data
+        flows = []
+        for i, entry in enumerate(entries or []):
+            expect = str(entry.get("expect", "allow")).lower()
+            if expect not in EXPECTATIONS:
+                raise ValueError(f"flow {i}: expect must be allow or deny")
+            flows.append(
+                FlowEntry(
+                    name=str(entry.get("name") or f"flow-{i}"),
+                    source=FlowSelector(entry["from"]),
+                    dest=FlowSelector(entry["to"]),
+                    expect=expect,
+                )
+            )
+        return flows
+    except Exception as e:
+        raise Exception(f"Failed to load flow spec: {str(e)}")
+
+
+@dataclass
+class Violation:
+    """Pods of one label class pair whose verdict differs from the spec"""
+
+    entry: FlowEntry
+    source: Endpoint
+    dest: Endpoint
+    pairs: int
+
+    def __str__(self) -> str:
+        actual = "denied" if self.entry.expect == "allow" else "allowed"
+        others = f" (and {self.pairs - 1} more pod pairs)" if self.pairs > 1 else ""
+        return (
+            f"{self.entry.name}: {self.source} -> {self.dest} is {actual}, "
+            f"expected {self.entry.expect}{others}"
+        )
+
+
+@dataclass
+class GuardChange:
+    """What one cluster change did to the spec"""
+
+    checked: int = 0
+    violations: List[Violation] = field(default_factory=list)
+    resolved: List[Violation] = field(default_factory=list)
+
+
+class FlowGuard:
+    """Keeps a flow spec checked against changing cluster state.
+
+    Pods are grouped into label classes and each entry's selectors are
+    resolved to classes, so a verdict is computed once per class pair and
+    memoized until a policy in either namespace changes. Each change only
+    re-checks the entries it can affect: a pod change those whose selectors
+    match the pod before or after, a policy change those with an endpoint
+    namespace matching the policy's. A namespace label change re-checks
+    everything, since namespaceSelectors may now match differently.
+    """
+
+    def __init__(self, entries: List[FlowEntry], snapshot: ClusterSnapshot) -> None:
+        self.entries = list(entries)
+        self.snapshot = snapshot
+        self.classes: Dict[ClassKey, List[str]] = {}
+        for namespace, pods in snapshot.pods.items():
+            for name, labels in pods.items():
+                self.classes.setdefault(_class_key(namespace, labels), []).append(name)
+        self._verdicts: Dict[Tuple[ClassKey, ClassKey], bool] = {}
+        self.violations: Dict[int, Dict[Tuple[ClassKey, ClassKey], Violation]] = {}
+        self._build_engine()
+
+    def _build_engine(self) -> None:
+        self.namespace_index = NamespaceIndex(SnapshotApi(self.snapshot))
+        self.engine = PolicyEngine(self.snapshot.policies, self.namespace_index)
+        self._verdicts.clear()
+
+    def _allowed(self, source: ClassKey, dest: ClassKey) -> bool:
+        key = (source, dest)
+        verdict = self._verdicts.get(key)
+        if verdict is None:
+            verdict = self.engine.allowed(
+                Endpoint(source[0], self.classes[source][0], dict(source[1])),
+                Endpoint(dest[0], self.classes[dest][0], dict(dest[1])),
+            )
+            self._verdicts[key] = verdict
+        return verdict
+
+    def _select(self, selector: FlowSelector) -> List[ClassKey]:
+        return [key for key in self.classes if selector.matches(key[0], dict(key[1]))]
+
+    def _check(self, index: int) -> Dict[Tuple[ClassKey, ClassKey], Violation]:
+        entry = self.entries[index]
+        expected = entry.expect == "allow"
+        found = {}
+        for source in self._select(entry.source):
+            for dest in self._select(entry.dest):
+                size = len(self.classes[source])
+                pairs = size * len(self.classes[dest])
+                if source == dest:
+                    # A pod's traffic to itself is not a flow
+                    pairs -= size
+                if pairs and self._allowed(source, dest) != expected:
+                    src = self.classes[source][0]
+                    dst = next(
+                        n for n in self.classes[dest] if (dest, n) != (source, src)
+                    )
+                    found[source, dest] = Violation(
+                        entry,
+                        Endpoint(source[0], src, dict(source[1])),
+                        Endpoint(dest[0], dst, dict(dest[1])),
+                        pairs,
+                    )
+        return found
+
+    def recheck(self, indices: Optional[Set[int]] = None) -> GuardChange:
+        """Re-check entries (default: all); report what appeared or cleared"""
+        if indices is None:
+            indices = set(range(len(self.entries)))
+        change = GuardChange(checked=len(indices))
+        for index in sorted(indices):
+            before = self.violations.get(index, {})
+            after = self._check(index)
+            change.violations.extend(v for k, v in after.items() if k not in before)
+            change.resolved.extend(v for k, v in before.items() if k not in after)
+            self.violations[index] = after
+        return change
+
+    def check_all(self) -> List[Violation]:
+        """Check every entry; returns all current violations"""
+        self.recheck()
+        return self.current()
+
+    def current(self) -> List[Violation]:
+        return [v for found in self.violations.values() for v in found.values()]
+
+    def set_pod(
+        self, namespace: str, name: str, labels: Optional[Dict[str, str]]
+    ) -> GuardChange:
+        """Add, relabel or (with ``labels=None``) delete a pod"""
+        pods = self.snapshot.pods.setdefault(namespace, {})
+        old = pods.get(name)
+        if old == labels:
+            return GuardChange()
+        affected = set()
+        for state in (old, labels):
+            if state is not None:
+                affected |= {
+                    i
+                    for i, e in enumerate(self.entries)
+                    if e.source.matches(namespace, state)
+                    or e.dest.matches(namespace, state)
+                }
+        if old is not None:
+            key = _class_key(namespace, old)
+            self.classes[key].remove(name)
+            if not self.classes[key]:
+                del self.classes[key]
+            del pods[name]
+        if labels is not None:
+            pods[name] = dict(labels)
+            self.classes.setdefault(_class_key(namespace, labels), []).append(name)
+        return self.recheck(affected)
+
+    def set_policy(
+        self, namespace: str, name: str, policy: Optional[dict]
+    ) -> GuardChange:
+        """Create, replace or (with ``policy=None``) delete a NetworkPolicy"""
+        docs = self.snapshot.policies.setdefault(namespace, [])
+        position = next(
+            (i for i, doc in enumerate(docs) if _policy_name(doc) == name), None
+        )
+        if position is not None:
+            if policy is not None and _spec(docs[position]) == _spec(policy):
+                return GuardChange()
+            del docs[position]
+        elif policy is None:
+            return GuardChange()
+        if policy is not None:
+            docs.append(policy)
+        self.engine = self.engine.with_policies(
+            namespace, (CompiledPolicy(namespace, doc) for doc in docs)
+        )
+        for key in [k for k in self._verdicts if namespace in (k[0][0], k[1][0])]:
+            del self._verdicts[key]
+        return self.recheck(
+            {
+                i
+                for i, e in enumerate(self.entries)
+                if e.source.matches_namespace(namespace)
+                or e.dest.matches_namespace(namespace)
+            }
+        )
+
+    def set_namespace(self, name: str, labels: Optional[Dict[str, str]]) -> GuardChange:
+        """Add, relabel or (with ``labels=None``) delete a namespace"""
+        if self.snapshot.namespaces.get(name) == labels:
+            return GuardChange()
+        if labels is None:
+            self.snapshot.namespaces.pop(name, None)
+        else:
+            self.snapshot.namespaces[name] = dict(labels)
+        self._build_engine()
+        return self.recheck()
+
+
+def _class_key(namespace: str, labels: Dict[str, str]) -> ClassKey:
+    return namespace, frozenset(labels.items())
+
+
+def _policy_name(doc: dict) -> str:
+    return str((doc.get("metadata") or {}).get("name") or "")
+
+
+def _spec(doc: dict) -> Any:
+    return doc.get("spec")
+
+
+# Watched resource -> (API attribute, list call)
+WATCHED = {
+    "namespaces": ("core_api", "list_namespace"),
+    "pods": ("core_api", "list_pod_for_all_namespaces"),
+    "networkpolicies": ("networking_api", "list_network_policy_for_all_namespaces"),
+}
+
+
+class _GuardUpdater:
+    """Applies listed and watched objects of each resource to a guard"""
+
+    def __init__(self, guard: FlowGuard) -> None:
+        self.guard = guard
+        self.serializer = client.ApiClient()
+
+    def apply(self, kind: str, obj: Any, deleted: bool = False) -> GuardChange:
+        metadata = obj.metadata
+        if kind == "namespaces":
+            labels = None if deleted else dict(metadata.labels or {})
+            return self.guard.set_namespace(metadata.name, labels)
+        if kind == "pods":
+            labels = None if deleted else dict(metadata.labels or {})
+            return self.guard.set_pod(metadata.namespace, metadata.name, labels)
+        doc = None if deleted else self.serializer.sanitize_for_serialization(obj)
+        return self.guard.set_policy(metadata.namespace, metadata.name, doc)
+
+    def sync(self, kind: str, items: List[Any]) -> GuardChange:
+        """Apply a full list, deleting what the guard has and it lacks"""
+        snapshot = self.guard.snapshot
+        known: Set[Tuple[str, str]]
+        if kind == "namespaces":
+            known = {("", name) for name in snapshot.namespaces}
+        elif kind == "pods":
+            known = {(ns, name) for ns, pods in snapshot.pods.items() for name in pods}
+        else:
+            known = {
+                (ns, _policy_name(doc))
+                for ns, docs in snapshot.policies.items()
+                for doc in docs
+            }
+        total = GuardChange()
+        for obj in items:
+            namespace = "" if kind == "namespaces" else obj.metadata.namespace
+            known.discard((namespace, obj.metadata.name))
+            _merge(total, self.apply(kind, obj))
+        for namespace, name in known:
+            if kind == "namespaces":
+                change = self.guard.set_namespace(name, None)
+            elif kind == "pods":
+                change = self.guard.set_pod(namespace, name, None)
+            else:
+                change = self.guard.set_policy(namespace, name, None)
+            _merge(total, change)
+        return total
+
+
+def _merge(total: GuardChange, change: GuardChange) -> None:
+    total.checked += change.checked
+    total.violations.extend(change.violations)
+    total.resolved.extend(change.resolved)
+
+
+def watch_guard(
+    guard: FlowGuard,
+    core_api: Any,
+    networking_api: Any,
+    on_change: Callable[[GuardChange], None],
+    stop: Optional[threading.Event] = None,
+    timeout_seconds: int = 60,
+) -> None:
+    """Apply namespace, pod and policy changes to the guard as they come.
+
+    Each resource is listed and then watched from the list's version in its
+    own thread, and events are applied in this one in arrival order. The
+    list reconciles whatever changed since the guard's state was taken,
+    deletions included. Every update that changes a checked entry is passed
+    to ``on_change`` straight away. Returns when ``stop`` is set; raises if
+    a watch fails.
+    """
+    stop = stop if stop is not None else threading.Event()
+    apis = {"core_api": core_api, "networking_api": networking_api}
+    updater = _GuardUpdater(guard)
+    events: "queue.Queue[Tuple[str, str, Any]]" = queue.Queue()
+    for kind, (api, method) in WATCHED.items():
+        threading.Thread(
+            target=list_and_watch,
+            args=(getattr(apis[api], method), kind, events, stop, timeout_seconds),
+            daemon=True,
+        ).start()
+
+    while not stop.is_set():
+        try:
+            kind, event_type, obj = events.get(timeout=0.2)
+        except queue.Empty:
+            continue
+        if event_type == "ERROR":
+            stop.set()
+            raise Exception(f"Failed to watch {kind}: {str(obj)}")
+        if event_type == "SYNC":
+            change = updater.sync(kind, obj)
+        else:
+            change = updater.apply(kind, obj, deleted=event_type == "DELETED")
+        if change.violations or change.resolved:
+            on_change(change)
@@ -0,0 +1,213 @@
+import bisect
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .snapshot import ClusterSnapshot
+
+# Snapshot fields and their nesting: 1 is {namespace: value},
+# 2 is {namespace: {name: value}}
+SECTIONS = {
+    "namespaces": 1,
+    "policies": 1,
+    "pods": 2,
+    "owners": 2,
+    "ports": 2,
+    "services": 2,
+}
+CHECKPOINT_EVERY = 100
+
+# Every record starts with its timestamp and kind, so the index can be
+# rebuilt without parsing whole checkpoints
+_PREFIX = re.compile(rb'\{"ts": ([-+0-9.eE]+), "kind": "(\w+)"')
+
+
+def parse_timestamp(text: str) -> float:
+    """Seconds since the epoch from ISO 8601 (local time if no offset) or epoch"""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {text}")
+
+
+def _diff(old: dict, new: dict, depth: int) -> Tuple[dict, Any]:
+    """Entries of new that differ from old, and the keys removed from old"""
+    if depth == 1:
+        changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+        return changed, [k for k in old if k not in new]
+    changed, removed = {}, {}
+    for ns, items in new.items():
+        if ns not in old:
+            changed[ns] = items
+            continue
+        inner_changed, inner_removed = _diff(old[ns], items, 1)
+        if inner_changed:
+            changed[ns] = inner_changed
+        if inner_removed:
+            removed[ns] = inner_removed
+    # None drops the whole namespace
+    removed.update({ns: None for ns in old if ns not in new})
+    return changed, removed
+
+
+def _apply(state: dict, changed: dict, removed: Any, depth: int) -> None:
+    if depth == 1:
+        for key in removed:
+            state.pop(key, None)
+        state.update(changed)
+        return
+    for ns, names in removed.items():
+        if names is None:
+            state.pop(ns, None)
+            continue
+        for name in names:
+            state.get(ns, {}).pop(name, None)
+    for ns, items in changed.items():
+        state.setdefault(ns, {}).update(items)
+
+
+def delta(old: ClusterSnapshot, new: ClusterSnapshot) -> Dict[str, dict]:
+    """Changes from old to new, per section; empty when nothing changed"""
+    before, after = old.to_dict(), new.to_dict()
+    changes = {}
+    for section, depth in SECTIONS.items():
+        changed, removed = _diff(before[section], after[section], depth)
+        if changed or removed:
+            changes[section] = {"set": changed, "del": removed}
+    return changes
+
+
+def apply_delta(snapshot: ClusterSnapshot, changes: Dict[str, dict]) -> None:
+    """Apply changes from :func:`delta` to snapshot in place"""
+    for section, change in changes.items():
+        _apply(
+            getattr(snapshot, section), change["set"], change["del"], SECTIONS[section]
+        )
+
+
+class HistoryStore:
+    """Append-only history of cluster snapshots in a JSON-lines file.
+
+    The first record and every ``checkpoint_every``-th after it hold the
+    full state; the others hold only what changed since the previous
+    record. A sidecar ``.idx`` file maps timestamps to file offsets, so
+    reconstructing a point in time reads one checkpoint and the deltas
+    after it rather than the whole history.
+    """
+
+    def __init__(self, path: str, checkpoint_every: int = CHECKPOINT_EVERY) -> None:
+        self.path = path
+        self.index_path = path + ".idx"
+        self.checkpoint_every = checkpoint_every
+        # (timestamp, is checkpoint, offset) of every record, in file order
+        self.entries: List[Tuple[float, bool, int]] = []
+        self._times: List[float] = []
+        self._latest: Optional[ClusterSnapshot] = None
+        self._load_index()
+
+    def _load_index(self) -> None:
+        end = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for line in f:
+                    ts, kind, offset = line.split()
+                    self._add(float(ts), kind, int(offset))
+        if self.entries:
+            # Skip past the last indexed record; anything after it was
+            # appended without reaching the index
+            with open(self.path, "rb") as f:
+                f.seek(self.entries[-1][2])
+                f.readline()
+                end = f.tell()
+        if os.path.exists(self.path) and end < os.path.getsize(self.path):
+            self._reindex(end)
+
+    def _reindex(self, offset: int) -> None:
+        with open(self.path, "r+b") as f, open(self.index_path, "a") as index:
+            f.seek(offset)
+            for line in iter(f.readline, b""):
+                match = _PREFIX.match(line)
+                if match is None or not line.endswith(b"\n"):
+                    # Drop a torn final write so later appends stay readable
+                    f.truncate(offset)
+                    break
+                ts, kind = float(match.group(1)), match.group(2).decode()
+                self._add(ts, kind, offset)
+                index.write(f"{ts!r} {kind} {offset}\n")
+                offset += len(line)
+
+    def _add(self, ts: float, kind: str, offset: int) -> None:
+        self.entries.append((ts, kind == "checkpoint", offset))
+        self._times.append(ts)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def span(self) -> Tuple[float, float]:
+        """Timestamps of the first and last record"""
+        if not self.entries:
+            raise ValueError(f"History {self.path} is empty")
+        return self.entries[0][0], self.entries[-1][0]
+
+    def _append(self, ts: float, kind: str, body: Dict[str, Any]) -> None:
+        record = {"ts": ts, "kind": kind}
+        record.update(body)
+        line = json.dumps(record, separators=(", ", ": ")) + "\n"
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(line.encode("utf-8"))
+        with open(self.index_path, "a") as index:
+            index.write(f"{ts!r} {kind} {offset}\n")
+        self._add(ts, kind, offset)
+
+    def record(
+        self, snapshot: ClusterSnapshot, timestamp: Optional[float] = None
+    ) -> bool:
+        """Append the snapshot if it differs from the last record.
+
+        Returns whether anything was written.
+        """
+        ts = time.time() if timestamp is None else timestamp
+        if self.entries and ts < self.entries[-1][0]:
+            raise ValueError("History records must be appended in time order")
+        since = next(
+            (i for i, entry in enumerate(reversed(self.entries)) if entry[1]), None
+        )
+        if since is not None:
+            previous = self._latest or self.at(self.entries[-1][0])
+            changes = delta(previous, snapshot)
+            if not changes:
+                return False
+            if since + 1 < self.checkpoint_every:
+                self._append(ts, "delta", {"changes": changes})
+                # Copy the changes; the caller may go on mutating the snapshot
+                apply_delta(previous, json.loads(json.dumps(changes)))
+                self._latest = previous
+                return True
+        state = snapshot.to_dict()
+        self._append(ts, "checkpoint", {"state": state})
+        self._latest = ClusterSnapshot.from_dict(json.loads(json.dumps(state)))
+        return True
+
+    def at(self, timestamp: float) -> ClusterSnapshot:
+        """The cluster state as of timestamp: the last record at or before it"""
+        end = bisect.bisect_right(self._times, timestamp)
+        if end == 0:
+            raise ValueError(f"History {self.path} has no state at {timestamp}")
+        start = end - 1
+        while not self.entries[start][1]:
+            start -= 1
+        with open(self.path, "rb") as f:
+            f.seek(self.entries[start][2])
+            snapshot = ClusterSnapshot.from_dict(json.loads(f.readline())["state"])
+            for _ in range(end - start - 1):
+                apply_delta(snapshot, json.loads(f.readline())["changes"])
+        return snapshot
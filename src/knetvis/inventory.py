@@ -0,0 +1,198 @@
+import json
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from kubernetes import client
+
+# Pods requested per page; bounds the raw JSON held at any one time
+PAGE_SIZE = 500
+
+
+class ContinueExpired(Exception):
+    """A list's continue token expired and the server offered no other"""
+
+
+class PodRecord(NamedTuple):
+    """The parts of a pod that evaluation uses"""
+
+    namespace: str
+    name: str
+    labels: Dict[str, str]
+    # (name, containerPort, protocol) of every container port
+    ports: Tuple[Tuple[str, int, str], ...] = ()
+    # (kind, name) of every ownerReference
+    owners: Tuple[Tuple[str, str], ...] = ()
+
+
+def json_ports(spec: dict) -> Tuple[Tuple[str, int, str], ...]:
+    """(name, containerPort, protocol) of every container port in a raw pod spec"""
+    ports = []
+    for container in spec.get("containers") or []:
+        for port in container.get("ports") or []:
+            ports.append(
+                (
+                    port.get("name") or "",
+                    int(port.get("containerPort") or 0),
+                    port.get("protocol") or "TCP",
+                )
+            )
+    return tuple(ports)
+
+
+def _model_ports(pod: Any) -> Tuple[Tuple[str, int, str], ...]:
+    containers = getattr(getattr(pod, "spec", None), "containers", None)
+    if not isinstance(containers, list):
+        return ()
+    ports = []
+    for container in containers:
+        for port in getattr(container, "ports", None) or []:
+            ports.append(
+                (port.name or "", int(port.container_port or 0), port.protocol or "TCP")
+            )
+    return tuple(ports)
+
+
+def _json_owners(metadata: dict) -> Tuple[Tuple[str, str], ...]:
+    return tuple(
+        (ref.get("kind") or "", ref.get("name") or "")
+        for ref in metadata.get("ownerReferences") or []
+    )
+
+
+def _model_owners(pod: Any) -> Tuple[Tuple[str, str], ...]:
+    refs = getattr(pod.metadata, "owner_references", None)
+    if not isinstance(refs, list):
+        return ()
+    return tuple((ref.kind or "", ref.name or "") for ref in refs)
+
+
+def records_from_json(
+    namespace: str, page: dict
+) -> Tuple[List[PodRecord], Optional[str]]:
+    """Records and continue token of one raw PodList page"""
+    records = [
+        PodRecord(
+            namespace=namespace,
+            name=item["metadata"]["name"],
+            labels=item["metadata"].get("labels") or {},
+            ports=json_ports(item.get("spec") or {}),
+            owners=_json_owners(item["metadata"]),
+        )
+        for item in page.get("items") or []
+    ]
+    token = (page.get("metadata") or {}).get("continue") or None
+    return records, token
+
+
+def records_from_models(namespace: str, items: Any) -> List[PodRecord]:
+    """Records from already-deserialized pod objects"""
+    return [
+        PodRecord(
+            namespace=namespace,
+            name=pod.metadata.name,
+            labels=dict(pod.metadata.labels or {}),
+            ports=_model_ports(pod),
+            owners=_model_owners(pod),
+        )
+        for pod in items
+    ]
+
+
+def fetch_page(
+    core_api: Any,
+    namespace: str,
+    label_selector: str = "",
+    limit: int = PAGE_SIZE,
+    continue_token: Optional[str] = None,
+    **kwargs: Any,
+) -> Tuple[List[PodRecord], Optional[str]]:
+    """Fetch one page of pods as records, without building client models.
+
+    The response body is parsed straight from JSON, so the OpenAPI model
+    objects for every container, volume and status field are never built.
+    APIs that do not return a raw response (snapshots, test doubles) are
+    read from their objects instead, as a single page.
+
+    A continue token expires (410 Gone) once the API server compacts the
+    version the list started at. The error then usually carries a fresh
+    token for the same position, and the page is fetched with it, so the
+    rest of the list is read at a newer version. Without one,
+    :class:`ContinueExpired` is raised and the list must start over.
+    """
+    while True:
+        if continue_token:
+            kwargs["_continue"] = continue_token
+        try:
+            response = core_api.list_namespaced_pod(
+                namespace,
+                label_selector=label_selector,
+                limit=limit,
+                _preload_content=False,
+                **kwargs,
+            )
+            break
+        except client.exceptions.ApiException as e:
+            if e.status != 410 or not continue_token:
+                raise
+            fresh = _status_continue(e.body)
+            if not fresh or fresh == continue_token:
+                raise ContinueExpired(f"Continue token for {namespace} expired")
+            continue_token = fresh
+    data = getattr(response, "data", None)
+    if not isinstance(data, (bytes, str)):
+        return records_from_models(namespace, response.items), None
+    try:
+        return records_from_json(namespace, json.loads(data))
+    finally:
+        release = getattr(response, "release_conn", None)
+        if release is not None:
+            release()
+
+
+def _status_continue(body: Any) -> Optional[str]:
+    """The continue token in a Status error body, if any"""
+    try:
+        token = json.loads(body)["metadata"]["continue"]
+    except (TypeError, ValueError, KeyError):
+        return None
+    return token if isinstance(token, str) else None
+
+
+def iter_pod_pages(
+    core_api: Any,
+    namespace: str,
+    label_selector: str = "",
+    page_size: int = PAGE_SIZE,
+) -> Iterator[List[PodRecord]]:
+    """Yield a namespace's pods page by page, following continue tokens.
+
+    If a token expires with no replacement the list starts over, skipping
+    as many pods as were already yielded: lists are ordered by name, so
+    those come first again.
+    """
+    token: Optional[str] = None
+    yielded = skip = 0
+    while True:
+        try:
+            records, token = fetch_page(
+                core_api, namespace, label_selector, page_size, token
+            )
+        except ContinueExpired:
+            token, skip = None, yielded
+            continue
+        page = records[skip:]
+        skip = max(skip - len(records), 0)
+        yielded += len(page)
+        yield page
+        if not token:
+            return
+
+
+def iter_pods(
+    core_api: Any,
+    namespace: str,
+    label_selector: str = "",
+    page_size: int = PAGE_SIZE,
+) -> Iterator[PodRecord]:
+    """Yield a namespace's pods as records while pages arrive"""
+    for page in iter_pod_pages(core_api, namespace, label_selector, page_size):
+        yield from page
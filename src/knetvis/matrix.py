@@ -0,0 +1,345 @@
+from collections import defaultdict
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .engine import (
+    EGRESS,
+    INGRESS,
+    RULES,
+    CompiledPeer,
+    CompiledPolicy,
+    Explanation,
+    PolicyEngine,
+)
+from .models import Endpoint
+from .parallel import fork_map, split
+from .selector import LabelSelector, NamespaceIndex
+
+# Rows per block when multiplying selection by allowed-peer matrices
+BLOCK_ROWS = 4096
+
+# Largest source × destination matrix evaluated exactly. Each pair is a
+# byte, and only the result is held whole: the other direction is applied a
+# block of rows at a time
+MAX_PAIRS = 1 << 31
+
+
+class LabelMatrix:
+    """Sparse incidence matrix of pods against label columns.
+
+    Each ``key=value`` pair and each ``key`` (present) is a column, stored
+    as the sorted array of pod rows that have it, i.e. compressed sparse
+    columns. A selector is evaluated against all pods at once by combining
+    the columns it references into a boolean mask over the rows.
+    """
+
+    def __init__(
+        self,
+        label_sets: Sequence[Dict[str, str]],
+        namespaces: Optional[Sequence[str]] = None,
+    ) -> None:
+        self.size = len(label_sets)
+        value_columns: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        key_columns: Dict[str, List[int]] = defaultdict(list)
+        for row, labels in enumerate(label_sets):
+            for key, value in labels.items():
+                value_columns[(key, value)].append(row)
+                key_columns[key].append(row)
+        namespace_rows: Dict[str, List[int]] = defaultdict(list)
+        for row, namespace in enumerate(namespaces or ()):
+            namespace_rows[namespace].append(row)
+
+        self._values = {
+            c: np.asarray(r, dtype=np.intp) for c, r in value_columns.items()
+        }
+        self._keys = {k: np.asarray(r, dtype=np.intp) for k, r in key_columns.items()}
+        self._namespaces = {
+            ns: np.asarray(r, dtype=np.intp) for ns, r in namespace_rows.items()
+        }
+        self._cache: Dict[Hashable, np.ndarray] = {}
+
+    @property
+    def column_count(self) -> int:
+        return len(self._values) + len(self._keys)
+
+    def _rows(self, rows: Optional[np.ndarray]) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        if rows is not None:
+            mask[rows] = True
+        return mask
+
+    def namespace_mask(self, namespaces: Sequence[str]) -> np.ndarray:
+        """Rows belonging to any of the namespaces"""
+        mask = np.zeros(self.size, dtype=bool)
+        for namespace in namespaces:
+            rows = self._namespaces.get(namespace)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def select(
+        self, selector: LabelSelector, namespace: Optional[str] = None
+    ) -> np.ndarray:
+        """Boolean mask of the rows matched by a selector"""
+        cache_key = (selector.key, namespace)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if namespace is not None:
+            mask = self.namespace_mask([namespace])
+        else:
+            mask = np.ones(self.size, dtype=bool)
+
+        for key, value in selector.match_labels:
+            mask &= self._rows(self._values.get((key, value)))
+        for key, operator, values in selector.expressions:
+            if operator == "In":
+                allowed = np.zeros(self.size, dtype=bool)
+                for value in values:
+                    rows = self._values.get((key, value))
+                    if rows is not None:
+                        allowed[rows] = True
+                mask &= allowed
+            elif operator == "NotIn":
+                for value in values:
+                    rows = self._values.get((key, value))
+                    if rows is not None:
+                        mask[rows] = False
+            elif operator == "Exists":
+                mask &= self._rows(self._keys.get(key))
+            else:  # DoesNotExist
+                rows = self._keys.get(key)
+                if rows is not None:
+                    mask[rows] = False
+
+        mask.setflags(write=False)
+        self._cache[cache_key] = mask
+        return mask
+
+    def selection_matrix(
+        self,
+        selectors: Sequence[LabelSelector],
+        namespaces: Optional[Sequence[Optional[str]]] = None,
+    ) -> np.ndarray:
+        """Selectors × rows boolean matrix, optionally scoped per namespace"""
+        scopes = namespaces if namespaces is not None else [None] * len(selectors)
+        matrix = np.zeros((len(selectors), self.size), dtype=bool)
+        for i, (selector, namespace) in enumerate(zip(selectors, scopes)):
+            matrix[i] = self.select(selector, namespace)
+        return matrix
+
+
+def _peer_mask(
+    peer: CompiledPeer, labels: LabelMatrix, namespace_index: NamespaceIndex
+) -> np.ndarray:
+    if not peer.selects_pods():
+        return np.zeros(labels.size, dtype=bool)
+    if peer.namespace_selector is None:
+        mask = labels.namespace_mask([peer.namespace])
+    elif peer.namespace_selector.is_empty():
+        mask = np.ones(labels.size, dtype=bool)
+    else:
+        mask = labels.namespace_mask(
+            sorted(namespace_index.resolve(peer.namespace_selector))
+        )
+    if peer.pod_selector is not None:
+        mask &= labels.select(peer.pod_selector)
+    return mask
+
+
+def _allowed_peers(
+    policy: CompiledPolicy,
+    direction: str,
+    labels: LabelMatrix,
+    namespace_index: NamespaceIndex,
+) -> np.ndarray:
+    mask = np.zeros(labels.size, dtype=bool)
+    if policy.modes[direction] != RULES:
+        return mask
+    for rule in policy.rules[direction]:
+        if not rule.peers:
+            return np.ones(labels.size, dtype=bool)
+        for peer in rule.peers:
+            mask |= _peer_mask(peer, labels, namespace_index)
+    return mask
+
+
+def policy_selection(
+    engine: PolicyEngine, labels: LabelMatrix
+) -> Tuple[List[CompiledPolicy], np.ndarray]:
+    """Policies × pods matrix of which pods each policy's podSelector selects"""
+    policies = [p for compiled in engine.by_namespace.values() for p in compiled]
+    selection = labels.selection_matrix(
+        [p.selector for p in policies], [p.namespace for p in policies]
+    )
+    return policies, selection
+
+
+def active_policies(
+    policies: List[CompiledPolicy], selection: np.ndarray, direction: str
+) -> np.ndarray:
+    """Indices of the policies that can affect flows in one direction"""
+    # Policies that select no pod, or leave this direction alone, cannot
+    # affect its flows
+    isolating = np.array([p.isolates(direction) for p in policies], dtype=bool)
+    return np.flatnonzero(selection.any(axis=1) & isolating)
+
+
+def permitted_flows(
+    engine: PolicyEngine,
+    labels: LabelMatrix,
+    direction: str,
+    policies: List[CompiledPolicy],
+    selection: np.ndarray,
+    active: np.ndarray,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Row blocks of the subject × peer matrix of flows the active policies allow.
+
+    Yields ``(start, block)`` for ``BLOCK_ROWS`` subjects at a time, so the
+    caller decides whether to keep, pack or merge each block.
+    """
+    n = labels.size
+    # Policies × pods, as floats so the product runs as one matrix multiply
+    allowed_peers = np.zeros((len(active), n), dtype=np.float32)
+    for row, i in enumerate(active):
+        allowed_peers[row] = _allowed_peers(
+            policies[i], direction, labels, engine.namespace_index
+        )
+    selected = selection[active].T
+
+    for start in range(0, n, BLOCK_ROWS):
+        block = selected[start : start + BLOCK_ROWS].astype(np.float32)
+        yield start, (block @ allowed_peers) > 0
+
+
+def direction_matrix(
+    engine: PolicyEngine,
+    labels: LabelMatrix,
+    direction: str,
+    policies: List[CompiledPolicy],
+    selection: np.ndarray,
+) -> np.ndarray:
+    """Subject × peer matrix of whether one direction permits the flow"""
+    active = active_policies(policies, selection, direction)
+    isolated: np.ndarray = np.asarray(selection[active].any(axis=0))
+    result = np.empty((labels.size, labels.size), dtype=bool)
+    for start, block in permitted_flows(
+        engine, labels, direction, policies, selection, active
+    ):
+        result[start : start + len(block)] = block
+    result |= ~isolated[:, None]
+    return result
+
+
+def _permitted_part(
+    state: Tuple[PolicyEngine, LabelMatrix, List[CompiledPolicy], np.ndarray],
+    task: Tuple[str, Sequence[int]],
+) -> np.ndarray:
+    engine, labels, policies, selection = state
+    direction, active = task
+    rows = np.asarray(active, dtype=np.intp)
+    packed = np.empty((labels.size, (labels.size + 7) // 8), dtype=np.uint8)
+    for start, block in permitted_flows(
+        engine, labels, direction, policies, selection, rows
+    ):
+        packed[start : start + len(block)] = np.packbits(block, axis=1)
+    return packed
+
+
+def _parallel_pairs(
+    engine: PolicyEngine,
+    labels: LabelMatrix,
+    policies: List[CompiledPolicy],
+    selection: np.ndarray,
+    jobs: int,
+) -> np.ndarray:
+    """Both directions, with each direction's policies split across workers.
+
+    Every worker returns the flows its share of the policies allows, packed
+    to bits; a flow is allowed when any share allows it, so the parts are
+    merged with OR while still packed. Egress is then unpacked into the
+    result and ingress a block of rows at a time.
+    """
+    n = labels.size
+    tasks: List[Tuple[str, Sequence[int]]] = []
+    isolated = {}
+    for direction in (EGRESS, INGRESS):
+        active = active_policies(policies, selection, direction)
+        isolated[direction] = np.asarray(selection[active].any(axis=0))
+        tasks.extend((direction, part) for part in split(active.tolist(), jobs))
+
+    state = (engine, labels, policies, selection)
+    packed = {d: np.zeros((n, (n + 7) // 8), dtype=np.uint8) for d in (EGRESS, INGRESS)}
+    for (direction, _), part in zip(
+        tasks, fork_map(_permitted_part, state, tasks, jobs)
+    ):
+        packed[direction] |= part
+    allowed: np.ndarray = np.unpackbits(packed.pop(EGRESS), axis=1, count=n)
+    allowed = allowed.view(bool)
+    allowed |= ~isolated[EGRESS][:, None]
+    ingress = packed.pop(INGRESS)
+    for start in range(0, n, BLOCK_ROWS):
+        block = np.unpackbits(ingress[start : start + BLOCK_ROWS], axis=1, count=n)
+        _apply_ingress(allowed, start, block.view(bool), isolated[INGRESS])
+    return allowed
+
+
+def _apply_ingress(
+    allowed: np.ndarray, start: int, block: np.ndarray, isolated: np.ndarray
+) -> None:
+    """AND rows of the destination × source ingress matrix into ``allowed``"""
+    stop = start + len(block)
+    block |= ~isolated[start:stop, None]
+    allowed[:, start:stop] &= block.T
+
+
+def evaluate_pairs(
+    engine: PolicyEngine, endpoints: List[Endpoint], jobs: int = 1
+) -> np.ndarray:
+    """Source × destination matrix of allowed flows, evaluated vectorized.
+
+    With ``jobs`` above one the policies are split across forked worker
+    processes, which share the compiled engine and label matrix.
+    """
+    if len(endpoints) ** 2 > MAX_PAIRS:
+        raise ValueError(
+            f"{len(endpoints)} endpoints are more than an exact matrix of "
+            f"{MAX_PAIRS} pairs holds; sample label classes instead"
+        )
+    labels = LabelMatrix(
+        [e.labels for e in endpoints], [e.namespace for e in endpoints]
+    )
+    policies, selection = policy_selection(engine, labels)
+    if jobs > 1:
+        return _parallel_pairs(engine, labels, policies, selection, jobs)
+    allowed = direction_matrix(engine, labels, EGRESS, policies, selection)
+    active = active_policies(policies, selection, INGRESS)
+    isolated = np.asarray(selection[active].any(axis=0))
+    for start, block in permitted_flows(
+        engine, labels, INGRESS, policies, selection, active
+    ):
+        _apply_ingress(allowed, start, block, isolated)
+    return allowed
+
+
+class ConnectivityMatrix:
+    """Allowed/blocked results for every pair of endpoints.
+
+    Only booleans are stored; :meth:`explain` traces a single pair on
+    demand from the engine's compiled rules.
+    """
+
+    def __init__(
+        self, engine: PolicyEngine, endpoints: List[Endpoint], jobs: int = 1
+    ) -> None:
+        self.engine = engine
+        self.endpoints = endpoints
+        self.array = evaluate_pairs(engine, endpoints, jobs=jobs)
+
+    def allowed(self, i: int, j: int) -> bool:
+        return bool(self.array[i, j])
+
+    def explain(self, i: int, j: int) -> Explanation:
+        return self.engine.explain(self.endpoints[i], self.endpoints[j])
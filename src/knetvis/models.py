@@ -1,6 +1,6 @@
 import re
-from dataclasses import dataclass
-from typing import ClassVar, Pattern
+from dataclasses import dataclass, field
+from typing import ClassVar, Dict, Pattern
 
 
 @dataclass
@@ -24,3 +24,15 @@ class Target:
     def __str__(self) -> str:
         """Return string representation in format namespace/kind/name"""
         return f"{self.namespace}/{self.kind}/{self.name}"
+
+
+@dataclass
+class Endpoint:
+    """A pod as seen by policy evaluation: where it lives and its labels"""
+
+    namespace: str
+    name: str
+    labels: Dict[str, str] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        return f"{self.namespace}/{self.name}"
@@ -0,0 +1,95 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Iterator, List, Sequence, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Read-only state inherited by forked workers, or installed by _install
+_STATE: Any = None
+
+
+def fork_available() -> bool:
+    """Whether workers can inherit state by forking"""
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def split(items: Sequence[T], parts: int) -> List[Sequence[T]]:
+    """Split items into at most ``parts`` contiguous, non-empty chunks"""
+    bounds = np.linspace(0, len(items), min(parts, len(items)) + 1).astype(int)
+    return [items[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def pool_context() -> BaseContext:
+    """Fork when no other thread is alive, else start workers from scratch.
+
+    A forked child gets a copy of every lock, including those held by other
+    threads, which then stay locked in the child forever.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+def _install(state: Any) -> None:
+    global _STATE
+    _STATE = state
+
+
+def _run(func: Callable[[Any, T], R], task: T) -> R:
+    return func(_STATE, task)
+
+
+def fork_map(
+    func: Callable[[Any, T], R], state: Any, tasks: Sequence[T], jobs: int
+) -> Iterator[R]:
+    """Yield ``func(state, task)`` for every task in order, using worker processes.
+
+    When this process has no other live threads, workers are forked:
+    ``state`` is installed as a module global before the pool starts, so
+    they inherit it through copy-on-write memory. Forking while another
+    thread runs (API client pools, watches, the profiler's sampler) could
+    leave a lock it holds locked forever in the child, so then workers start
+    from a clean forkserver process instead and ``state`` is pickled to each
+    of them once, through the pool initializer. Either way only the tasks
+    and results are pickled per call. Callers stop their API client's
+    threads (:meth:`ClusterClient.close`) once the state is loaded, so
+    normally workers are forked; with ``--profile-out`` the sampler thread
+    is running and the forkserver is used.
+
+    ``func`` must be a module-level function. Results are yielded as they
+    arrive, so callers can consume each one before the rest are done. Runs
+    in this process when ``jobs`` is 1, there is a single task, or the
+    platform cannot fork.
+    """
+    global _STATE
+    if jobs <= 1 or len(tasks) <= 1 or not fork_available():
+        for task in tasks:
+            yield func(state, task)
+        return
+
+    workers = min(jobs, len(tasks))
+    context = pool_context()
+    if context.get_start_method() != "fork":
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_install,
+            initargs=(state,),
+        ) as pool:
+            yield from pool.map(_run, [func] * len(tasks), tasks)
+        return
+
+    _STATE = state
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            yield from pool.map(_run, [func] * len(tasks), tasks)
+    finally:
+        _STATE = None
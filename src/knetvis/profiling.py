@@ -0,0 +1,210 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+# Files of one capture
+META = "meta.json"
+PSTATS = "profile.pstats"
+MEMORY = "memory.json"
+STACKS = "stacks.collapsed"
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Allocation sites kept in memory.json
+MEMORY_TOP = 50
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval.
+
+    Counts are kept per stack, root first, so they can be written in the
+    collapsed format flame graph tools read (``a;b;c 12``).
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame: Optional[FrameType] = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.counts[";".join(reversed(names))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """Captures cProfile stats, allocations and stack samples of a command.
+
+    Nothing is installed until :meth:`start`. :meth:`stop` writes the
+    capture to a new directory under ``out_dir``, named after the time and
+    the command, and returns its path. Only the calling thread is profiled
+    and sampled; allocations are traced in every thread.
+    """
+
+    def __init__(
+        self, out_dir: str, command: str, interval: float = SAMPLE_INTERVAL
+    ) -> None:
+        self.out_dir = out_dir
+        self.command = command
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self._started = 0.0
+        self._started_at = 0.0
+        self._tracing = False
+
+    def start(self) -> None:
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        self.sampler.start()
+        self._started_at = time.time()
+        self._started = time.perf_counter()
+        self.profile.enable()
+
+    def stop(self) -> str:
+        self.profile.disable()
+        seconds = time.perf_counter() - self._started
+        self.sampler.stop()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            )
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        if self._tracing:
+            tracemalloc.stop()
+
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.out_dir, f"{stamp}-{self.command}-{os.getpid()}")
+        os.makedirs(path, exist_ok=True)
+        self.profile.dump_stats(os.path.join(path, PSTATS))
+        self.sampler.write(os.path.join(path, STACKS))
+        sites = snapshot.statistics("lineno")[:MEMORY_TOP]
+        with open(os.path.join(path, MEMORY), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "current": current,
+                    "peak": peak,
+                    "top": [
+                        {
+                            "file": site.traceback[0].filename,
+                            "line": site.traceback[0].lineno,
+                            "size": site.size,
+                            "count": site.count,
+                        }
+                        for site in sites
+                    ],
+                },
+                f,
+                indent=2,
+            )
+        with open(os.path.join(path, META), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "command": self.command,
+                    "argv": sys.argv,
+                    "started": self._started_at,
+                    "seconds": seconds,
+                    "samples": sum(self.sampler.counts.values()),
+                    "interval": self.sampler.interval,
+                    "python": sys.version.split()[0],
+                },
+                f,
+                indent=2,
+            )
+        return path
+
+
+def find_captures(path: str) -> List[str]:
+    """A capture directory itself, or the captures inside a --profile-out dir"""
+    if os.path.exists(os.path.join(path, META)):
+        return [path]
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if os.path.exists(os.path.join(path, name, META))
+    )
+
+
+def summarize(path: str, top: int = 15) -> Dict[str, Any]:
+    """Top functions, allocation sites and sampled frames of one capture"""
+    try:
+        with open(os.path.join(path, META), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(path, MEMORY), encoding="utf-8") as f:
+            memory = json.load(f)
+
+        stats = pstats.Stats(os.path.join(path, PSTATS))
+        rows = []
+        # {(file, line, name): (primitive calls, calls, own, cumulative, callers)}
+        entries: Dict[Any, Any] = getattr(stats, "stats")
+        for func, (_, calls, own, total, _) in entries.items():
+            filename, lineno, name = func
+            location = f"{os.path.basename(filename)}:{lineno}" if lineno else filename
+            rows.append(
+                {
+                    "function": f"{name} ({location})",
+                    "calls": calls,
+                    "own": own,
+                    "cumulative": total,
+                }
+            )
+        rows.sort(key=lambda row: -row["own"])
+
+        leaves: Counter = Counter()
+        samples = 0
+        with open(os.path.join(path, STACKS), encoding="utf-8") as f:
+            for record in f:
+                stack, _, count = record.rstrip("\n").rpartition(" ")
+                leaves[stack.rsplit(";", 1)[-1]] += int(count)
+                samples += int(count)
+    except Exception as e:
+        raise Exception(f"Failed to read profile capture: {str(e)}")
+
+    return {
+        "path": path,
+        "meta": meta,
+        "peak": memory["peak"],
+        "functions": rows[:top],
+        "allocations": memory["top"][:top],
+        "frames": [
+            {"frame": frame, "samples": count, "share": count / samples}
+            for frame, count in leaves.most_common(top)
+        ],
+    }
@@ -0,0 +1,124 @@
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from .engine import EGRESS, INGRESS, CompiledPeer, PolicyEngine
+from .models import Endpoint
+from .sampling import PodClass, classify
+from .selector import LabelSelector
+
+
+class ReachabilityIndex:
+    """Answers "who can reach X" and "what can X reach" per label class.
+
+    Pods are grouped into label classes, and each ``key=value`` label and
+    each namespace is indexed to the classes that have it. A query starts
+    from the policies selecting the queried pod. Their peers are looked up
+    in the index to find candidate classes, and only those candidates are
+    evaluated, once per class rather than once per pod. A pod that no
+    policy isolates has every class as a candidate.
+    """
+
+    def __init__(self, engine: PolicyEngine, endpoints: Iterable[Endpoint]) -> None:
+        self.engine = engine
+        self.classes: List[PodClass] = classify(list(endpoints))
+        self.all: FrozenSet[int] = frozenset(range(len(self.classes)))
+        by_label: Dict[Tuple[str, str], Set[int]] = defaultdict(set)
+        by_key: Dict[str, Set[int]] = defaultdict(set)
+        by_namespace: Dict[str, Set[int]] = defaultdict(set)
+        for i, pod_class in enumerate(self.classes):
+            by_namespace[pod_class.namespace].add(i)
+            for key, value in pod_class.labels.items():
+                by_label[(key, value)].add(i)
+                by_key[key].add(i)
+        self._by_label = {k: frozenset(v) for k, v in by_label.items()}
+        self._by_key = {k: frozenset(v) for k, v in by_key.items()}
+        self._by_namespace = {k: frozenset(v) for k, v in by_namespace.items()}
+        # Number of classes evaluated by the last query
+        self.evaluated = 0
+
+    def _selector_candidates(self, selector: LabelSelector) -> FrozenSet[int]:
+        """Classes that may match a selector, from its required labels"""
+        candidates = self.all
+        for key, value in selector.match_labels:
+            candidates = candidates & self._by_label.get((key, value), frozenset())
+        for key, operator, values in selector.expressions:
+            if operator == "In":
+                matching: Set[int] = set()
+                for value in values:
+                    matching |= self._by_label.get((key, value), frozenset())
+                candidates = candidates & matching
+            elif operator == "Exists":
+                candidates = candidates & self._by_key.get(key, frozenset())
+        return candidates
+
+    def _namespace_candidates(self, namespaces: Iterable[str]) -> FrozenSet[int]:
+        candidates: Set[int] = set()
+        for namespace in namespaces:
+            candidates |= self._by_namespace.get(namespace, frozenset())
+        return frozenset(candidates)
+
+    def _peer_candidates(self, peer: CompiledPeer) -> FrozenSet[int]:
+        if not peer.selects_pods():
+            return frozenset()
+        if peer.namespace_selector is None:
+            candidates = self._namespace_candidates([peer.namespace])
+        elif peer.namespace_selector.is_empty():
+            candidates = self.all
+        else:
+            resolved = self.engine.namespace_index.resolve(peer.namespace_selector)
+            candidates = self._namespace_candidates(resolved)
+        if peer.pod_selector is not None:
+            candidates &= self._selector_candidates(peer.pod_selector)
+        return candidates
+
+    def selector_classes(self, selector: LabelSelector) -> List[PodClass]:
+        """Classes in any namespace whose labels a pod selector matches"""
+        return [
+            self.classes[i]
+            for i in sorted(self._selector_candidates(selector))
+            if selector.matches(self.classes[i].labels)
+        ]
+
+    def _candidates(self, direction: str, endpoint: Endpoint) -> FrozenSet[int]:
+        """Classes that the endpoint's policies could allow in a direction"""
+        isolating = [
+            p for p in self.engine.selecting(endpoint) if p.isolates(direction)
+        ]
+        if not isolating:
+            return self.all
+        candidates: FrozenSet[int] = frozenset()
+        for policy in isolating:
+            for rule in policy.rules[direction]:
+                if not rule.peers:
+                    return self.all
+                for peer in rule.peers:
+                    candidates |= self._peer_candidates(peer)
+        return candidates
+
+    def _members(self, classes: List[int]) -> List[Endpoint]:
+        return sorted(
+            (member for i in classes for member in self.classes[i].members),
+            key=lambda e: (e.namespace, e.name),
+        )
+
+    def who_can_reach(self, target: Endpoint) -> List[Endpoint]:
+        """Pods whose traffic to target is allowed in both directions"""
+        candidates = sorted(self._candidates(INGRESS, target))
+        self.evaluated = len(candidates)
+        allowed = [
+            i
+            for i in candidates
+            if self.engine.allowed(self.classes[i].representative, target)
+        ]
+        return self._members(allowed)
+
+    def reachable_from(self, source: Endpoint) -> List[Endpoint]:
+        """Pods that source's traffic is allowed to reach in both directions"""
+        candidates = sorted(self._candidates(EGRESS, source))
+        self.evaluated = len(candidates)
+        allowed = [
+            i
+            for i in candidates
+            if self.engine.allowed(source, self.classes[i].representative)
+        ]
+        return self._members(allowed)
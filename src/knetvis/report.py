@@ -0,0 +1,232 @@
+import csv
+from dataclasses import asdict, dataclass, field
+from typing import IO, Any, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from .engine import (
+    EGRESS,
+    INGRESS,
+    CompiledPeer,
+    CompiledPolicy,
+    CompiledRule,
+    PolicyEngine,
+)
+from .models import Endpoint
+from .policy import PolicyParser
+from .reachability import ReachabilityIndex
+from .sampling import classify
+from .selector import LabelSelector
+from .snapshot import ClusterSnapshot
+
+CSV_FIELDS = (
+    "namespace",
+    "pod",
+    "selected_by",
+    "ingress_isolated",
+    "egress_isolated",
+    "reachable_from_all_namespaces",
+    "open_ports",
+)
+
+# A rule's port list; None admits every port
+PortSpecs = Optional[List[dict]]
+
+
+@dataclass
+class PodReport:
+    """Coverage and exposure of one pod"""
+
+    namespace: str
+    pod: str
+    selected_by: int
+    ingress_isolated: bool
+    egress_isolated: bool
+    reachable_from_all_namespaces: bool
+    open_ports: List[str] = field(default_factory=list)
+
+
+@dataclass
+class NamespaceReport:
+    """Per-namespace totals of a :class:`CoverageReport`"""
+
+    pods: int = 0
+    unselected: int = 0
+    reachable_from_all_namespaces: int = 0
+    open_ports: Set[str] = field(default_factory=set)
+
+
+def _port_strings(specs: PortSpecs, ports: List[list]) -> Set[str]:
+    """``port/PROTOCOL`` strings a rule's port list admits on a pod"""
+    if specs is None:
+        return {f"{port}/{protocol}" for _, port, protocol in ports} or {"*"}
+    opened = set()
+    for spec in specs:
+        protocol = spec.get("protocol") or "TCP"
+        port = spec.get("port")
+        if port is None:
+            opened.add(f"*/{protocol}")
+        elif isinstance(port, str) and not port.isdigit():
+            # A named port only opens the pod's container port of that name
+            opened.update(
+                f"{number}/{protocol}"
+                for name, number, proto in ports
+                if name == port and proto == protocol
+            )
+        elif spec.get("endPort"):
+            opened.add(f"{port}-{spec['endPort']}/{protocol}")
+        else:
+            opened.add(f"{port}/{protocol}")
+    return opened
+
+
+class CoverageReport:
+    """Policy coverage and exposure of every pod, in one pass over a snapshot.
+
+    Pods are grouped into label classes, and each class is evaluated once:
+    the policies selecting it, whether they isolate each direction, and the
+    namespaces its ingress rules admit traffic from. Peer pod selectors are
+    resolved through the label index of a :class:`ReachabilityIndex`, once
+    per distinct selector, and rules once however many classes share them.
+    A pod is reachable from all namespaces when every namespace with pods
+    has one its ingress admits. Its open ports are those of the ingress
+    rules admitting pods from at least one namespace, whether or not the
+    pod is reachable from all of them.
+    """
+
+    def __init__(self, snapshot: ClusterSnapshot) -> None:
+        self.snapshot = snapshot
+        parser = PolicyParser(snapshot=snapshot)
+        self.engine = PolicyEngine(snapshot.policies, parser.namespace_index)
+        self.raw = {
+            ns: dict(zip(self.engine.by_namespace.get(ns, ()), docs))
+            for ns, docs in snapshot.policies.items()
+        }
+        endpoints = [
+            Endpoint(ns, name, labels)
+            for ns, pods in snapshot.pods.items()
+            for name, labels in pods.items()
+        ]
+        self.index = ReachabilityIndex(self.engine, endpoints)
+        self.sources: FrozenSet[str] = frozenset(
+            ns for ns, pods in snapshot.pods.items() if pods
+        )
+        self.namespaces: Dict[str, NamespaceReport] = {}
+        self._rules: Dict[int, Tuple[FrozenSet[str], PortSpecs]] = {}
+        self._selectors: Dict[LabelSelector, FrozenSet[str]] = {}
+
+    def _peer(self, peer: CompiledPeer) -> FrozenSet[str]:
+        """Namespaces with a pod that a rule's peer matches"""
+        if not peer.selects_pods():
+            return frozenset()
+        if peer.namespace_selector is None:
+            scope = self.sources & {peer.namespace}
+        elif peer.namespace_selector.is_empty():
+            scope = self.sources
+        else:
+            scope = self.sources & self.engine.namespace_index.resolve(
+                peer.namespace_selector
+            )
+        selector = peer.pod_selector
+        if selector is None or selector.is_empty():
+            return scope
+        if selector not in self._selectors:
+            self._selectors[selector] = frozenset(
+                pod_class.namespace
+                for pod_class in self.index.selector_classes(selector)
+            )
+        return scope & self._selectors[selector]
+
+    def _rule(
+        self, policy: CompiledPolicy, rule: CompiledRule
+    ) -> Tuple[FrozenSet[str], PortSpecs]:
+        """Namespaces with pods the rule admits, and the ports it opens"""
+        if id(rule) not in self._rules:
+            if not rule.peers:
+                covered = self.sources
+            else:
+                covered = frozenset().union(*map(self._peer, rule.peers))
+            spec = self.raw[policy.namespace][policy].get("spec") or {}
+            ports = spec[INGRESS][rule.index].get("ports") or None
+            self._rules[id(rule)] = (covered, ports)
+        return self._rules[id(rule)]
+
+    def _ingress(
+        self, policies: List[CompiledPolicy]
+    ) -> List[Tuple[FrozenSet[str], PortSpecs]]:
+        """Namespaces admitted and ports opened by each ingress rule"""
+        isolating = [p for p in policies if p.isolates(INGRESS)]
+        if not isolating:
+            return [(self.sources, None)]
+        return [
+            self._rule(policy, rule)
+            for policy in isolating
+            for rule in policy.rules[INGRESS]
+        ]
+
+    def rows(self) -> Iterator[PodReport]:
+        """A report per pod, namespace by namespace; updates the totals"""
+        self.namespaces = {}
+        for namespace in sorted(self.snapshot.pods):
+            totals = self.namespaces.setdefault(namespace, NamespaceReport())
+            pods = [
+                Endpoint(namespace, name, labels)
+                for name, labels in self.snapshot.pods[namespace].items()
+            ]
+            ports = self.snapshot.ports.get(namespace, {})
+            for pod_class in classify(pods):
+                policies = self.engine.selecting(pod_class.representative)
+                rules = self._ingress(policies)
+                covered: Set[str] = set().union(*(ns for ns, _ in rules))
+                exposed = covered >= self.sources
+                specs = [spec for ns, spec in rules if ns]
+                for pod in pod_class.members:
+                    opened: Set[str] = set()
+                    for spec in specs:
+                        opened |= _port_strings(spec, ports.get(pod.name, []))
+                    totals.pods += 1
+                    totals.unselected += not policies
+                    totals.reachable_from_all_namespaces += exposed
+                    totals.open_ports |= opened
+                    yield PodReport(
+                        namespace,
+                        pod.name,
+                        len(policies),
+                        any(p.isolates(INGRESS) for p in policies),
+                        any(p.isolates(EGRESS) for p in policies),
+                        exposed,
+                        sorted(opened),
+                    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary, per-namespace totals, unselected and exposed pods"""
+        unselected, exposed = [], []
+        for row in self.rows():
+            name = f"{row.namespace}/{row.pod}"
+            if not row.selected_by:
+                unselected.append(name)
+            if row.reachable_from_all_namespaces:
+                exposed.append(name)
+        return {
+            "context": self.snapshot.context,
+            "summary": {
+                "namespaces": len(self.namespaces),
+                "pods": sum(ns.pods for ns in self.namespaces.values()),
+                "policies": sum(len(p) for p in self.snapshot.policies.values()),
+                "unselected": len(unselected),
+                "reachable_from_all_namespaces": len(exposed),
+            },
+            "namespaces": {
+                name: dict(asdict(ns), open_ports=sorted(ns.open_ports))
+                for name, ns in self.namespaces.items()
+            },
+            "unselected": unselected,
+            "reachable_from_all_namespaces": exposed,
+        }
+
+    def write_csv(self, out: IO[str]) -> None:
+        """Stream one CSV row per pod"""
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for row in self.rows():
+            record = asdict(row)
+            record["open_ports"] = " ".join(row.open_ports)
+            writer.writerow(record)
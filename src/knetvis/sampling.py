@@ -0,0 +1,174 @@
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .engine import PolicyEngine
+from .matrix import evaluate_pairs
+
+# Classes evaluated in the first round; each later round doubles the total
+FIRST_ROUND = 16
+
+
+@dataclass
+class PodClass:
+    """Pods with the same namespace and labels.
+
+    Policy evaluation only looks at a pod's namespace and labels, so one
+    representative stands for every member of its class.
+    """
+
+    namespace: str
+    labels: Dict[str, str]
+    members: List[Any] = field(default_factory=list)
+
+    @property
+    def representative(self) -> Any:
+        return self.members[0]
+
+    @property
+    def size(self) -> int:
+        return len(self.members)
+
+
+def classify(pods: List[Any]) -> List[PodClass]:
+    """Group objects with ``namespace`` and ``labels`` into label classes"""
+    classes: Dict[Tuple[str, FrozenSet[Tuple[str, str]]], PodClass] = {}
+    for pod in pods:
+        key = (pod.namespace, frozenset(pod.labels.items()))
+        if key not in classes:
+            classes[key] = PodClass(pod.namespace, dict(pod.labels))
+        classes[key].members.append(pod)
+    return list(classes.values())
+
+
+def stratified_order(classes: List[PodClass]) -> List[PodClass]:
+    """Order classes round-robin across namespaces, largest class first.
+
+    Any prefix of the result is a stratified sample: every namespace is
+    represented before any namespace gets a second class, and within a
+    namespace the classes covering the most pods come first.
+    """
+    by_namespace: Dict[str, List[PodClass]] = defaultdict(list)
+    for pod_class in classes:
+        by_namespace[pod_class.namespace].append(pod_class)
+    queues = [
+        sorted(group, key=lambda c: (-c.size, sorted(c.labels.items())))
+        for _, group in sorted(by_namespace.items())
+    ]
+
+    ordered: List[PodClass] = []
+    depth = 0
+    while len(ordered) < len(classes):
+        for queue in queues:
+            if depth < len(queue):
+                ordered.append(queue[depth])
+        depth += 1
+    return ordered
+
+
+class ProgressiveSampler:
+    """Yields growing stratified samples of pod classes.
+
+    Rounds double in size until ``sample`` classes have been taken, the
+    ``budget_seconds`` deadline has passed, or every class is included.
+    The deadline is checked between rounds, so a round that has started
+    always completes.
+    """
+
+    def __init__(
+        self,
+        pods: List[Any],
+        sample: Optional[int] = None,
+        budget_seconds: Optional[float] = None,
+        first_round: int = FIRST_ROUND,
+    ) -> None:
+        self.classes = stratified_order(classify(pods))
+        self.total_pods = len(pods)
+        self.sample = sample
+        self.budget_seconds = budget_seconds
+        self.first_round = max(1, first_round)
+
+    @property
+    def limit(self) -> int:
+        if self.sample is None:
+            return len(self.classes)
+        return min(self.sample, len(self.classes))
+
+    def coverage(self, classes: List[PodClass]) -> float:
+        """Fraction of pods represented by the given classes"""
+        if not self.total_pods:
+            return 1.0
+        return sum(c.size for c in classes) / self.total_pods
+
+    def rounds(self) -> Iterator[List[PodClass]]:
+        deadline = None
+        if self.budget_seconds is not None:
+            deadline = time.monotonic() + self.budget_seconds
+
+        taken = 0
+        size = self.first_round
+        while taken < self.limit:
+            if taken and deadline is not None and time.monotonic() >= deadline:
+                return
+            taken = min(taken + size, self.limit)
+            size = taken
+            yield self.classes[:taken]
+
+
+@dataclass
+class MatrixEstimate:
+    """Connectivity over a sample of pod classes, weighted by class size"""
+
+    round: int
+    classes: List[PodClass]
+    total_classes: int
+    coverage: float
+    allowed: np.ndarray
+
+    @property
+    def weights(self) -> np.ndarray:
+        return np.array([c.size for c in self.classes], dtype=np.float64)
+
+    @property
+    def allowed_fraction(self) -> float:
+        """Estimated fraction of pod pairs whose traffic is allowed"""
+        w = self.weights
+        total = w.sum() ** 2
+        return float(w @ self.allowed @ w / total) if total else 1.0
+
+    def namespace_summary(self) -> Dict[Tuple[str, str], float]:
+        """Estimated allowed fraction for each (source, destination) namespace"""
+        w = self.weights
+        namespaces = sorted({c.namespace for c in self.classes})
+        masks = {
+            ns: np.array([c.namespace == ns for c in self.classes]) for ns in namespaces
+        }
+        summary = {}
+        for src in namespaces:
+            for dst in namespaces:
+                ws = w * masks[src]
+                wd = w * masks[dst]
+                summary[(src, dst)] = float(
+                    ws @ self.allowed @ wd / (ws.sum() * wd.sum())
+                )
+        return summary
+
+
+def progressive_matrix(
+    engine: PolicyEngine,
+    sampler: ProgressiveSampler,
+    jobs: int = 1,
+) -> Iterator[MatrixEstimate]:
+    """Evaluate connectivity on progressively larger class samples"""
+    for i, classes in enumerate(sampler.rounds(), 1):
+        representatives = [c.representative for c in classes]
+        yield MatrixEstimate(
+            round=i,
+            classes=classes,
+            total_classes=len(sampler.classes),
+            coverage=sampler.coverage(classes),
+            allowed=evaluate_pairs(engine, representatives, jobs).astype(np.float64),
+        )
@@ -0,0 +1,223 @@
+import threading
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple, Union
+
+from kubernetes import watch
+
+OPERATORS = ("In", "NotIn", "Exists", "DoesNotExist")
+
+
+class LabelSelector:
+    """Compiled Kubernetes label selector.
+
+    Accepts both the camelCase form found in YAML and the snake_case form
+    produced by ``to_dict()`` on kubernetes client models, and supports the
+    full set of ``matchExpressions`` operators. An empty selector matches
+    every label set.
+    """
+
+    __slots__ = ("match_labels", "expressions", "key")
+
+    def __init__(self, selector: Optional[dict]) -> None:
+        selector = selector or {}
+        match_labels = selector.get("match_labels") or selector.get("matchLabels") or {}
+        match_expressions = (
+            selector.get("match_expressions") or selector.get("matchExpressions") or []
+        )
+
+        self.match_labels: Tuple[Tuple[str, str], ...] = tuple(
+            sorted((str(k), str(v)) for k, v in match_labels.items())
+        )
+        expressions = []
+        for expr in match_expressions:
+            operator = expr.get("operator")
+            if operator not in OPERATORS:
+                raise ValueError(f"Invalid selector operator: {operator}")
+            values = frozenset(str(v) for v in expr.get("values") or [])
+            expressions.append((str(expr["key"]), operator, values))
+        self.expressions: Tuple[Tuple[str, str, FrozenSet[str]], ...] = tuple(
+            sorted(expressions, key=lambda e: (e[0], e[1], sorted(e[2])))
+        )
+        self.key: Hashable = (self.match_labels, self.expressions)
+
+    def is_empty(self) -> bool:
+        return not self.match_labels and not self.expressions
+
+    def matches(self, labels: Dict[str, str]) -> bool:
+        for key, value in self.match_labels:
+            if labels.get(key) != value:
+                return False
+
+        for key, operator, values in self.expressions:
+            if operator == "In":
+                if labels.get(key) not in values:
+                    return False
+            elif operator == "NotIn":
+                if key in labels and labels[key] in values:
+                    return False
+            elif operator == "Exists":
+                if key not in labels:
+                    return False
+            elif key in labels:  # DoesNotExist
+                return False
+        return True
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, LabelSelector) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f"LabelSelector({self.to_string()!r})"
+
+    def to_string(self) -> str:
+        """Render as a Kubernetes label selector query string"""
+        parts = [f"{k}={v}" for k, v in self.match_labels]
+        for key, operator, values in self.expressions:
+            if operator == "In":
+                parts.append(f"{key} in ({','.join(sorted(values))})")
+            elif operator == "NotIn":
+                parts.append(f"{key} notin ({','.join(sorted(values))})")
+            elif operator == "Exists":
+                parts.append(key)
+            else:
+                parts.append(f"!{key}")
+        return ",".join(parts)
+
+
+def selector_key(selector: Optional[dict]) -> Hashable:
+    """Canonical hashable form of a selector dict"""
+    return LabelSelector(selector).key
+
+
+class NamespaceIndex:
+    """Shared namespace label table with memoized selector resolution.
+
+    The table is loaded with a single ``list_namespace`` call on first use
+    and reused for the rest of the run; each distinct namespaceSelector is
+    resolved to its set of namespace names once. Call :meth:`refresh` to
+    reload, or :meth:`watch` to keep the table current from watch events.
+    """
+
+    def __init__(self, core_api: Any) -> None:
+        self.core_api = core_api
+        self._labels: Optional[Dict[str, Dict[str, str]]] = None
+        self._resolved: Dict[Hashable, Tuple[LabelSelector, FrozenSet[str]]] = {}
+        self._resource_version: Optional[str] = None
+        self._lock = threading.RLock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Worker processes get the loaded table, not the API client or lock
+        with self._lock:
+            self._table()
+            state = dict(self.__dict__)
+        state.update(core_api=None, _lock=None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def refresh(self) -> None:
+        """Reload all namespace labels with one API call"""
+        namespaces = self.core_api.list_namespace()
+        table = {
+            ns.metadata.name: dict(ns.metadata.labels or {}) for ns in namespaces.items
+        }
+        metadata = getattr(namespaces, "metadata", None)
+        with self._lock:
+            self._labels = table
+            self._resource_version = getattr(metadata, "resource_version", None)
+            self._resolved.clear()
+
+    def _table(self) -> Dict[str, Dict[str, str]]:
+        if self._labels is None:
+            self.refresh()
+        assert self._labels is not None
+        return self._labels
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._table())
+
+    def table(self) -> Dict[str, Dict[str, str]]:
+        """Copy of the labels of every namespace"""
+        with self._lock:
+            return {name: dict(labels) for name, labels in self._table().items()}
+
+    def labels(self, namespace: str) -> Dict[str, str]:
+        """Labels of a namespace, or an empty dict if it is unknown"""
+        with self._lock:
+            return self._table().get(namespace, {})
+
+    def resolve(self, selector: Union[None, dict, LabelSelector]) -> FrozenSet[str]:
+        """Names of the namespaces selected by a namespaceSelector"""
+        if isinstance(selector, LabelSelector):
+            compiled = selector
+        else:
+            compiled = LabelSelector(selector)
+        with self._lock:
+            cached = self._resolved.get(compiled.key)
+            if cached is not None:
+                return cached[1]
+            names = frozenset(
+                name
+                for name, labels in self._table().items()
+                if compiled.matches(labels)
+            )
+            self._resolved[compiled.key] = (compiled, names)
+            return names
+
+    def matches(
+        self, namespace: str, selector: Union[None, dict, LabelSelector]
+    ) -> bool:
+        return namespace in self.resolve(selector)
+
+    def apply_event(self, event_type: str, namespace: Any) -> None:
+        """Update the table and every memoized resolution for one event"""
+        name = namespace.metadata.name
+        labels = dict(namespace.metadata.labels or {})
+        with self._lock:
+            table = self._table()
+            if event_type == "DELETED":
+                table.pop(name, None)
+            else:
+                table[name] = labels
+            version = getattr(namespace.metadata, "resource_version", None)
+            if version:
+                self._resource_version = version
+
+            for key, (compiled, names) in list(self._resolved.items()):
+                selected = event_type != "DELETED" and compiled.matches(labels)
+                if selected != (name in names):
+                    updated = names | {name} if selected else names - {name}
+                    self._resolved[key] = (compiled, updated)
+
+    def watch(
+        self,
+        timeout_seconds: Optional[int] = None,
+        stop: Optional[threading.Event] = None,
+    ) -> None:
+        """Apply namespace watch events until the stream ends or stop is set"""
+        with self._lock:
+            self._table()
+            resource_version = self._resource_version
+
+        watcher = watch.Watch()
+        kwargs: Dict[str, Any] = {}
+        if resource_version:
+            kwargs["resource_version"] = resource_version
+        if timeout_seconds is not None:
+            kwargs["timeout_seconds"] = timeout_seconds
+        for event in watcher.stream(self.core_api.list_namespace, **kwargs):
+            self.apply_event(event["type"], event["object"])
+            if stop is not None and stop.is_set():
+                watcher.stop()
+                break
+
+    def start_watch(self) -> threading.Event:
+        """Watch in a daemon thread; set the returned event to stop it"""
+        stop = threading.Event()
+        thread = threading.Thread(target=self.watch, kwargs={"stop": stop}, daemon=True)
+        thread.start()
+        return stop
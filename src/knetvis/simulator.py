@@ -1,18 +1,48 @@
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from kubernetes import client
 
-from .models import Target
+from .cache import (
+    ResultCache,
+    cache_key,
+    content_hash,
+    default_cache,
+    policies_hash,
+)
+from .engine import Explanation, PolicyEngine, uses_namespace_selectors
+from .matrix import ConnectivityMatrix
+from .models import Endpoint, Target
 from .policy import PolicyParser
+from .reachability import ReachabilityIndex
+from .sampling import MatrixEstimate, ProgressiveSampler, classify, progressive_matrix
+from .sources import ClusterSource
+from .workloads import WorkloadIndex, canonical_kind
 
 
 class TrafficSimulator:
-    def __init__(self, policy_parser: PolicyParser) -> None:
+    def __init__(
+        self,
+        policy_parser: Optional[PolicyParser] = None,
+        cache: Optional[ResultCache] = None,
+        source: Optional[ClusterSource] = None,
+    ) -> None:
+        if policy_parser is None:
+            policy_parser = PolicyParser(source=source)
         self.policy_parser = policy_parser
-        self.core_api = client.CoreV1Api()
+        self.source = policy_parser.source
+        self.core_api = policy_parser.core_api
+        self.namespace_index = policy_parser.namespace_index
+        self.cache = cache if cache is not None else default_cache()
+
+    def workload_index(self, namespaces: Iterable[str]) -> WorkloadIndex:
+        """Index the pods and services of the namespaces in one batch"""
+        pods, services = self.policy_parser.cluster.list_workloads(namespaces)
+        return WorkloadIndex(pods, services)
 
     def check_resource_exists(self, target: "Target") -> bool:
-        """Check if a pod exists in the specified namespace"""
+        """Check if a pod, a workload with pods, or a service exists"""
+        if canonical_kind(target.kind) != "pod":
+            return self.workload_index([target.namespace]).exists(target)
         try:
             self.core_api.read_namespaced_pod(target.name, target.namespace)
             return True
@@ -21,203 +51,209 @@ class TrafficSimulator:
                 return False
             raise e
 
-    def test_connectivity(self, source: "Target", dest: "Target") -> bool:
+    def build_engine(self, namespaces: Iterable[str]) -> PolicyEngine:
+        """Compile the NetworkPolicies of the given namespaces"""
+        policies = self.policy_parser.get_policies(namespaces)
+        return PolicyEngine(policies, self.namespace_index)
+
+    def resolve_endpoint(self, target: "Target") -> Endpoint:
+        """Read a pod's labels once for evaluation"""
+        pod = self.core_api.read_namespaced_pod(target.name, target.namespace)
+        labels = dict(pod.metadata.labels or {})
+        return Endpoint(namespace=target.namespace, name=target.name, labels=labels)
+
+    def resolve_targets(self, targets: List["Target"]) -> List[List[Endpoint]]:
+        """The pods each target stands for.
+
+        Pods are read directly. Workloads and services are resolved through
+        one :class:`WorkloadIndex` over the targets' namespaces, so replicas
+        need no API call each.
+        """
+        if all(canonical_kind(t.kind) == "pod" for t in targets):
+            return [[self.resolve_endpoint(t)] for t in targets]
+        index = self.workload_index(t.namespace for t in targets)
+        return [
+            [Endpoint(p.namespace, p.name, p.labels) for p in index.resolve(t)]
+            for t in targets
+        ]
+
+    def cache_key(
+        self, kind: str, policies: Dict[str, List[dict]], endpoints: List[Endpoint]
+    ) -> str:
+        """Key covering the policies, pod labels and namespace labels used.
+
+        Endpoints are hashed in order and without pod names, since only the
+        namespace and labels of a pod affect evaluation.
+        """
+        namespaces = ""
+        if uses_namespace_selectors(policies):
+            namespaces = content_hash(self.namespace_index.table())
+        return cache_key(
+            kind,
+            policies_hash(policies),
+            content_hash([[e.namespace, e.labels] for e in endpoints]),
+            namespaces,
+        )
+
+    def count_connectivity(self, source: "Target", dest: "Target") -> Tuple[int, int]:
+        """Allowed and total (source pod, destination pod) pairs.
+
+        Pods with the same namespace and labels are evaluated once, so a
+        workload costs one evaluation per label class of its replicas.
+        """
         try:
-            source_policies = self.policy_parser.get_namespace_policies(
-                source.namespace
+            policies = self.policy_parser.get_policies(
+                [source.namespace, dest.namespace]
             )
-            dest_policies = self.policy_parser.get_namespace_policies(dest.namespace)
-
-            # If no policies affect either pod, traffic is allowed
-            source_affected = self._policies_affect_pod(source_policies, source)
-            dest_affected = self._policies_affect_pod(dest_policies, dest)
-
-            if not source_affected and not dest_affected:
-                return True
-
-            egress_allowed = self._check_egress_policies(source, dest, source_policies)
-            ingress_allowed = self._check_ingress_policies(source, dest, dest_policies)
-
-            print(f"Source affected: {source_affected}")
-            print(f"Dest affected: {dest_affected}")
-            print(f"Egress allowed: {egress_allowed}")
-            print(f"Ingress allowed: {ingress_allowed}")
-
-            return egress_allowed and ingress_allowed
-
+            sources, dests = self.resolve_targets([source, dest])
+            engine = None
+            allowed = 0
+            for src in classify(sources):
+                for dst in classify(dests):
+                    pair = [src.representative, dst.representative]
+                    key = self.cache_key("connectivity", policies, pair)
+                    result = self.cache.get(key)
+                    if result is None:
+                        if engine is None:
+                            engine = PolicyEngine(policies, self.namespace_index)
+                        result = engine.allowed(*pair)
+                        self.cache.put(key, result)
+                    if result:
+                        allowed += src.size * dst.size
+            return allowed, len(sources) * len(dests)
         except Exception as e:
             raise Exception(f"Failed to test connectivity: {str(e)}")
 
-    def _policies_affect_pod(self, policies: List[dict], target: "Target") -> bool:
-        for policy in policies:
-            spec = policy.get("spec", {})
-            pod_selector = spec.get("pod_selector", {}) or spec.get("podSelector", {})
-            if self._matches_selector(target, pod_selector):
-                return True
-        return False
-
-    def _check_egress_policies(
-        self, source: "Target", dest: "Target", policies: List[dict]
-    ) -> bool:
-        matching_policies = [
-            p
-            for p in policies
-            if self._matches_selector(
-                source,
-                p["spec"].get("pod_selector", {}) or p["spec"].get("podSelector", {}),
-            )
-        ]
+    def test_connectivity(self, source: "Target", dest: "Target") -> bool:
+        """Whether every source pod may send traffic to every destination pod"""
+        allowed, total = self.count_connectivity(source, dest)
+        return total > 0 and allowed == total
 
-        if not matching_policies:
-            return True
+    def explain_connectivity(self, source: "Target", dest: "Target") -> Explanation:
+        """Report the policy, rule and peer that decided a flow.
+
+        For workloads and services the first blocked pod pair is explained,
+        or the first pair when all are allowed.
+        """
+        try:
+            engine = self.build_engine([source.namespace, dest.namespace])
+            sources, dests = self.resolve_targets([source, dest])
+            for target, pods in ((source, sources), (dest, dests)):
+                if not pods:
+                    raise ValueError(f"{target} has no pods")
+            pairs = [
+                (src.representative, dst.representative)
+                for src in classify(sources)
+                for dst in classify(dests)
+            ]
+            blocked = [pair for pair in pairs if not engine.allowed(*pair)]
+            return engine.explain(*(blocked or pairs)[0])
+        except Exception as e:
+            raise Exception(f"Failed to explain connectivity: {str(e)}")
 
-        for policy in matching_policies:
-            if self._policy_allows_egress(policy, source, dest):
-                return True
-        return False
-
-    def _check_ingress_policies(
-        self, source: "Target", dest: "Target", policies: List[dict]
-    ) -> bool:
-        matching_policies = [
-            p
-            for p in policies
-            if self._matches_selector(
-                dest,
-                p["spec"].get("pod_selector", {}) or p["spec"].get("podSelector", {}),
+    def connectivity_matrix(
+        self, targets: List["Target"], jobs: int = 1
+    ) -> ConnectivityMatrix:
+        """Evaluate every pair of targets; explain pairs later on demand"""
+        try:
+            engine = self.build_engine(t.namespace for t in targets)
+            pods = self.policy_parser.cluster.read_pods(
+                (t.namespace, t.name) for t in targets
             )
+            endpoints = [
+                Endpoint(
+                    namespace=t.namespace,
+                    name=t.name,
+                    labels=dict(pods[(t.namespace, t.name)].metadata.labels or {}),
+                )
+                for t in targets
+            ]
+            if jobs > 1:
+                # Stop the API threads so the workers can be forked
+                self.policy_parser.cluster.close()
+            return ConnectivityMatrix(engine, endpoints, jobs=jobs)
+        except Exception as e:
+            raise Exception(f"Failed to build connectivity matrix: {str(e)}")
+
+    def list_endpoints(self, namespaces: List[str]) -> List[Endpoint]:
+        """Every pod in the namespaces as an endpoint"""
+        records = self.policy_parser.cluster.list_pod_records(namespaces)
+        return [
+            Endpoint(namespace=ns, name=pod.name, labels=pod.labels)
+            for ns, pods in records.items()
+            for pod in pods
         ]
 
-        if not matching_policies:
-            return True
-
-        for policy in matching_policies:
-            if self._policy_allows_ingress(policy, source, dest):
-                return True
-        return False
-
-    def _matches_selector(self, target: "Target", selector: dict) -> bool:
+    def sampled_matrix(
+        self,
+        namespaces: List[str],
+        sample: Optional[int] = None,
+        budget_seconds: Optional[float] = None,
+        jobs: int = 1,
+    ) -> Iterator[MatrixEstimate]:
+        """Estimate connectivity between namespaces from representative pods.
+
+        Yields one estimate per round over a growing stratified sample of
+        label classes, so callers can stream results as they refine. With
+        ``jobs`` above one, each round is evaluated in worker processes.
+        """
         try:
-            obj = self.core_api.read_namespaced_pod(target.name, target.namespace)
-            pod_labels = obj.metadata.labels or {}
-
-            match_labels = selector.get("match_labels", {}) or selector.get(
-                "matchLabels", {}
+            engine = self.build_engine(namespaces)
+            sampler = ProgressiveSampler(
+                self.list_endpoints(namespaces),
+                sample=sample,
+                budget_seconds=budget_seconds,
             )
-            match_expressions = selector.get("match_expressions", []) or selector.get(
-                "matchExpressions", []
+            if jobs > 1:
+                self.policy_parser.cluster.close()
+        except Exception as e:
+            raise Exception(f"Failed to sample connectivity: {str(e)}")
+        return progressive_matrix(engine, sampler, jobs=jobs)
+
+    def reachability_index(
+        self, namespaces: Optional[List[str]] = None, queried: Optional[str] = None
+    ) -> ReachabilityIndex:
+        """Index the pods of the namespaces (default: all) for reach queries.
+
+        Policies of the queried pod's namespace are compiled even when its
+        pods are outside the indexed namespaces.
+        """
+        if namespaces is None:
+            namespaces = self.namespace_index.names()
+        engine = self.build_engine(namespaces + ([queried] if queried else []))
+        return ReachabilityIndex(engine, self.list_endpoints(namespaces))
+
+    def who_can_reach(
+        self, target: "Target", namespaces: Optional[List[str]] = None
+    ) -> List[Endpoint]:
+        """Pods in the namespaces (default: all) allowed to reach the target"""
+        try:
+            index = self.reachability_index(namespaces, target.namespace)
+            return _union(
+                index.who_can_reach(pod_class.representative)
+                for pod_class in classify(self.resolve_targets([target])[0])
             )
-
-            if match_labels and not all(
-                pod_labels.get(k) == v for k, v in match_labels.items()
-            ):
-                return False
-
-            for expr in match_expressions:
-                key = expr["key"]
-                operator = expr["operator"]
-                values = expr.get("values", [])
-
-                if operator == "In" and pod_labels.get(key) not in values:
-                    return False
-                elif operator == "NotIn" and pod_labels.get(key) in values:
-                    return False
-                elif operator == "Exists" and key not in pod_labels:
-                    return False
-                elif operator == "DoesNotExist" and key in pod_labels:
-                    return False
-
-            return True
         except Exception as e:
-            print(f"Error matching selector: {e}")
-            return False
-
-    def _policy_allows_egress(
-        self, policy: dict, source: "Target", dest: "Target"
-    ) -> bool:
-        spec = policy.get("spec", {})
-        if "egress" not in spec and "policyTypes" not in spec:
-            return True
-
-        egress_rules = spec.get("egress", [])
-        if not egress_rules:
-            return "Egress" not in spec.get("policyTypes", [])
-
-        for rule in egress_rules:
-            if self._egress_rule_matches(rule, dest):
-                return True
-        return False
+            raise Exception(f"Failed to find sources: {str(e)}")
 
-    def _policy_allows_ingress(
-        self, policy: dict, source: "Target", dest: "Target"
-    ) -> bool:
-        spec = policy.get("spec", {})
-        if "ingress" not in spec and "policyTypes" not in spec:
-            return True
-
-        ingress_rules = spec.get("ingress", [])
-        if not ingress_rules:
-            return "Ingress" not in spec.get("policyTypes", [])
-
-        for rule in ingress_rules:
-            if self._ingress_rule_matches(rule, source):
-                return True
-        return False
-
-    def _egress_rule_matches(self, rule: dict, dest: "Target") -> bool:
-        if not rule.get("to", []):
-            return True
-
-        for to_peer in rule.get("to", []):
-            pod_selector = to_peer.get("pod_selector", {}) or to_peer.get(
-                "podSelector", {}
+    def reachable_from(
+        self, source: "Target", namespaces: Optional[List[str]] = None
+    ) -> List[Endpoint]:
+        """Pods in the namespaces (default: all) the source may reach"""
+        try:
+            index = self.reachability_index(namespaces, source.namespace)
+            return _union(
+                index.reachable_from(pod_class.representative)
+                for pod_class in classify(self.resolve_targets([source])[0])
             )
-            if pod_selector and self._matches_selector(dest, pod_selector):
-                return True
+        except Exception as e:
+            raise Exception(f"Failed to find destinations: {str(e)}")
 
-            namespace_selector = to_peer.get("namespace_selector", {}) or to_peer.get(
-                "namespaceSelector", {}
-            )
-            if namespace_selector:
-                try:
-                    ns = self.core_api.read_namespace(dest.namespace)
-                    ns_labels = ns.metadata.labels or {}
-                    match_labels = namespace_selector.get(
-                        "match_labels", {}
-                    ) or namespace_selector.get("matchLabels", {})
-                    if all(ns_labels.get(k) == v for k, v in match_labels.items()):
-                        return True
-                except client.exceptions.ApiException as e:
-                    print(f"Error checking namespace: {e}")
-                    return False
-        return False
-
-    def _ingress_rule_matches(self, rule: dict, source: "Target") -> bool:
-        # Handle both 'from' and '_from' keys
-        from_peers = rule.get("from", []) or rule.get("_from", [])
-        if not from_peers:
-            return True
 
-        for from_peer in from_peers:
-            pod_selector = from_peer.get("pod_selector", {}) or from_peer.get(
-                "podSelector", {}
-            )
-            if pod_selector and self._matches_selector(source, pod_selector):
-                return True
-
-            namespace_selector = from_peer.get(
-                "namespace_selector", {}
-            ) or from_peer.get("namespaceSelector", {})
-            if namespace_selector:
-                try:
-                    ns = self.core_api.read_namespace(source.namespace)
-                    ns_labels = ns.metadata.labels or {}
-                    match_labels = namespace_selector.get(
-                        "match_labels", {}
-                    ) or namespace_selector.get("matchLabels", {})
-                    if all(ns_labels.get(k) == v for k, v in match_labels.items()):
-                        return True
-                except client.exceptions.ApiException as e:
-                    print(f"Error checking namespace: {e}")
-                    return False
-        return False
+def _union(groups: Iterable[List[Endpoint]]) -> List[Endpoint]:
+    """Endpoints of every group, each pod once, in first-seen order"""
+    seen: Dict[Tuple[str, str], Endpoint] = {}
+    for group in groups:
+        for endpoint in group:
+            seen.setdefault((endpoint.namespace, endpoint.name), endpoint)
+    return list(seen.values())
@@ -0,0 +1,241 @@
+import json
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+from kubernetes import client
+
+from .aio import ClusterClient
+
+
+@dataclass
+class ClusterSnapshot:
+    """Point-in-time copy of the cluster state knetvis evaluates.
+
+    Holds namespace labels, pod labels and NetworkPolicies (as camelCase
+    dicts, the same shape as ``kubectl get -o json``) so that evaluation can
+    run offline and in other processes. Pod owners (``[kind, name]`` pairs)
+    and service selectors let workload and service targets resolve;
+    container ports (``[name, port, protocol]``) feed exposure reports.
+    """
+
+    context: str
+    namespaces: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    pods: Dict[str, Dict[str, Dict[str, str]]] = field(default_factory=dict)
+    policies: Dict[str, List[dict]] = field(default_factory=dict)
+    owners: Dict[str, Dict[str, List[List[str]]]] = field(default_factory=dict)
+    ports: Dict[str, Dict[str, List[list]]] = field(default_factory=dict)
+    services: Dict[str, Dict[str, Optional[Dict[str, str]]]] = field(
+        default_factory=dict
+    )
+
+    @classmethod
+    def fetch(
+        cls,
+        cluster: ClusterClient,
+        context: str = "",
+        namespaces: Optional[Iterable[str]] = None,
+    ) -> "ClusterSnapshot":
+        """Fetch a snapshot concurrently through a :class:`ClusterClient`.
+
+        Labels are kept for every namespace so namespaceSelectors resolve;
+        pods and policies are fetched only for ``namespaces`` (default: all).
+        """
+        serializer = client.ApiClient()
+        ns_list = cluster.list_namespaces()
+        ns_labels = {ns.metadata.name: ns.metadata.labels or {} for ns in ns_list.items}
+        names = list(namespaces) if namespaces is not None else sorted(ns_labels)
+
+        records, services = cluster.list_workloads(names)
+        pods = {
+            ns: {pod.name: pod.labels for pod in pods} for ns, pods in records.items()
+        }
+        owners = {
+            ns: {pod.name: [list(o) for o in pod.owners] for pod in pods if pod.owners}
+            for ns, pods in records.items()
+        }
+        ports = {
+            ns: {pod.name: [list(p) for p in pod.ports] for pod in pods if pod.ports}
+            for ns, pods in records.items()
+        }
+        policies = {}
+        for ns, res in cluster.list_policy_objects(names).items():
+            docs = []
+            for item in res.items:
+                doc = serializer.sanitize_for_serialization(item)
+                doc.setdefault("apiVersion", "networking.k8s.io/v1")
+                doc.setdefault("kind", "NetworkPolicy")
+                docs.append(doc)
+            policies[ns] = docs
+
+        return cls(
+            context=context,
+            namespaces=ns_labels,
+            pods=pods,
+            policies=policies,
+            owners=owners,
+            ports=ports,
+            services={
+                ns: {svc.name: svc.selector for svc in svcs}
+                for ns, svcs in services.items()
+            },
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "context": self.context,
+            "namespaces": self.namespaces,
+            "pods": self.pods,
+            "policies": self.policies,
+            "owners": self.owners,
+            "ports": self.ports,
+            "services": self.services,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ClusterSnapshot":
+        return cls(
+            context=data.get("context", ""),
+            namespaces=data.get("namespaces") or {},
+            pods=data.get("pods") or {},
+            policies=data.get("policies") or {},
+            owners=data.get("owners") or {},
+            ports=data.get("ports") or {},
+            services=data.get("services") or {},
+        )
+
+    def save(self, filename: str) -> None:
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, filename: str) -> "ClusterSnapshot":
+        """Load a snapshot from a JSON or YAML file"""
+        with open(filename, "r") as f:
+            if filename.endswith((".yaml", ".yml")):
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid snapshot file: {filename}")
+        return cls.from_dict(data)
+
+
+def _parse_label_selector(label_selector: str) -> List[Tuple[str, str, str]]:
+    """Parse an equality-based label selector string into (key, op, value)"""
+    requirements = []
+    for part in filter(None, (p.strip() for p in label_selector.split(","))):
+        if "!=" in part:
+            key, value = part.split("!=", 1)
+            requirements.append((key.strip(), "!=", value.strip()))
+        elif "=" in part:
+            key, value = part.replace("==", "=").split("=", 1)
+            requirements.append((key.strip(), "=", value.strip()))
+        elif part.startswith("!"):
+            requirements.append((part[1:].strip(), "!", ""))
+        else:
+            requirements.append((part, "exists", ""))
+    return requirements
+
+
+def _labels_match(labels: Dict[str, str], label_selector: str) -> bool:
+    for key, op, value in _parse_label_selector(label_selector):
+        if op == "=" and labels.get(key) != value:
+            return False
+        if op == "!=" and labels.get(key) == value:
+            return False
+        if op == "!" and key in labels:
+            return False
+        if op == "exists" and key not in labels:
+            return False
+    return True
+
+
+def _object(
+    name: str,
+    labels: Dict[str, str],
+    namespace: str = "",
+    owners: Optional[List[List[str]]] = None,
+) -> Any:
+    refs = [SimpleNamespace(kind=kind, name=owner) for kind, owner in owners or []]
+    return SimpleNamespace(
+        metadata=SimpleNamespace(
+            name=name, namespace=namespace, labels=dict(labels), owner_references=refs
+        )
+    )
+
+
+class _SnapshotPolicy(SimpleNamespace):
+    def to_dict(self) -> dict:
+        return dict(self.doc)
+
+
+class SnapshotApi:
+    """Read-only stand-in for ``CoreV1Api``/``NetworkingV1Api`` over a snapshot.
+
+    Implements the subset of calls knetvis makes, so the existing classes can
+    evaluate a :class:`ClusterSnapshot` without a cluster.
+    """
+
+    def __init__(self, snapshot: ClusterSnapshot) -> None:
+        self.snapshot = snapshot
+
+    def _not_found(self, kind: str, name: str) -> client.exceptions.ApiException:
+        return client.exceptions.ApiException(
+            status=404, reason=f'{kind} "{name}" not found'
+        )
+
+    def list_namespace(self, label_selector: str = "", **kwargs: Any) -> Any:
+        return SimpleNamespace(
+            items=[
+                _object(name, labels)
+                for name, labels in self.snapshot.namespaces.items()
+                if _labels_match(labels, label_selector)
+            ]
+        )
+
+    def read_namespace(self, name: str, **kwargs: Any) -> Any:
+        if name not in self.snapshot.namespaces:
+            raise self._not_found("namespaces", name)
+        return _object(name, self.snapshot.namespaces[name])
+
+    def list_namespaced_pod(
+        self, namespace: str, label_selector: str = "", **kwargs: Any
+    ) -> Any:
+        pods = self.snapshot.pods.get(namespace, {})
+        owners = self.snapshot.owners.get(namespace, {})
+        return SimpleNamespace(
+            items=[
+                _object(name, labels, namespace, owners.get(name))
+                for name, labels in pods.items()
+                if _labels_match(labels, label_selector)
+            ]
+        )
+
+    def read_namespaced_pod(self, name: str, namespace: str, **kwargs: Any) -> Any:
+        pods = self.snapshot.pods.get(namespace, {})
+        if name not in pods:
+            raise self._not_found("pods", name)
+        owners = self.snapshot.owners.get(namespace, {})
+        return _object(name, pods[name], namespace, owners.get(name))
+
+    def list_namespaced_service(self, namespace: str, **kwargs: Any) -> Any:
+        services = self.snapshot.services.get(namespace, {})
+        return SimpleNamespace(
+            items=[
+                SimpleNamespace(
+                    metadata=SimpleNamespace(name=name, namespace=namespace),
+                    spec=SimpleNamespace(selector=selector),
+                )
+                for name, selector in services.items()
+            ]
+        )
+
+    def list_namespaced_network_policy(self, namespace: str, **kwargs: Any) -> Any:
+        return SimpleNamespace(
+            items=[
+                _SnapshotPolicy(doc=doc)
+                for doc in self.snapshot.policies.get(namespace, [])
+            ]
+        )
@@ -0,0 +1,354 @@
+import json
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+from kubernetes import client, config, watch
+
+from .aio import ClusterClient
+from .inventory import json_ports
+from .selector import NamespaceIndex
+from .snapshot import ClusterSnapshot, SnapshotApi
+
+
+class ClusterSource:
+    """Where PolicyParser, TrafficSimulator and NetworkVisualizer read from.
+
+    Holds the ``CoreV1Api``/``NetworkingV1Api`` pair and the objects built on
+    them, a :class:`ClusterClient` and a :class:`NamespaceIndex`, created on
+    first use and shared by every class given the same source. Subclasses
+    choose the APIs: a live cluster, a snapshot, a file or a cache in front
+    of another source.
+    """
+
+    def __init__(
+        self,
+        core_api: Optional[Any] = None,
+        networking_api: Optional[Any] = None,
+        context: Optional[str] = None,
+    ) -> None:
+        self.core_api: Any = core_api if core_api is not None else client.CoreV1Api()
+        self.networking_api: Any = (
+            networking_api if networking_api is not None else client.NetworkingV1Api()
+        )
+        self.context = context
+        self._cluster: Optional[ClusterClient] = None
+        self._namespace_index: Optional[NamespaceIndex] = None
+        self._lock = threading.Lock()
+
+    @property
+    def cluster(self) -> ClusterClient:
+        with self._lock:
+            if self._cluster is None:
+                self._cluster = ClusterClient(
+                    core_api=self.core_api, networking_api=self.networking_api
+                )
+            return self._cluster
+
+    @property
+    def namespace_index(self) -> NamespaceIndex:
+        with self._lock:
+            if self._namespace_index is None:
+                self._namespace_index = NamespaceIndex(self.core_api)
+            return self._namespace_index
+
+    def close(self) -> None:
+        with self._lock:
+            if self._cluster is not None:
+                self._cluster.close()
+                self._cluster = None
+
+
+class LiveSource(ClusterSource):
+    """A cluster reached through the kubeconfig, in-cluster config or a client"""
+
+    def __init__(
+        self, context: Optional[str] = None, api_client: Optional[Any] = None
+    ) -> None:
+        if api_client is None:
+            if context is not None:
+                # A dedicated client, so several contexts can be used at once
+                api_client = config.new_client_from_config(context=context)
+            else:
+                # Load kubernetes configuration
+                try:
+                    config.load_kube_config()
+                except Exception:
+                    config.load_incluster_config()
+        super().__init__(
+            client.CoreV1Api(api_client), client.NetworkingV1Api(api_client), context
+        )
+
+
+class SnapshotSource(ClusterSource):
+    """A :class:`ClusterSnapshot` evaluated offline"""
+
+    def __init__(self, snapshot: ClusterSnapshot) -> None:
+        api = SnapshotApi(snapshot)
+        super().__init__(api, api, snapshot.context)
+        self.snapshot = snapshot
+
+
+class FileSource(SnapshotSource):
+    """A snapshot file, or Kubernetes manifests as ``kubectl get -o yaml`` writes.
+
+    Manifests may be multi-document YAML, a JSON/YAML ``List`` or both, with
+    Namespace, Pod, Service and NetworkPolicy objects; other kinds are
+    skipped.
+    """
+
+    def __init__(self, path: str, context: Optional[str] = None) -> None:
+        with open(path, "r") as f:
+            docs = [doc for doc in yaml.safe_load_all(f) if doc]
+        if len(docs) == 1 and isinstance(docs[0], dict) and "kind" not in docs[0]:
+            snapshot = ClusterSnapshot.from_dict(docs[0])
+            if context is not None:
+                snapshot.context = context
+        else:
+            snapshot = from_manifests(docs, context if context is not None else path)
+        super().__init__(snapshot)
+        self.path = path
+
+
+class _CachedResponse:
+    """A raw (``_preload_content=False``) response kept in memory"""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.status = 200
+
+    def release_conn(self) -> None:
+        pass
+
+
+class _CachingApi:
+    """Proxy caching the list and read calls of an API for ``ttl`` seconds"""
+
+    def __init__(self, api: Any, ttl: float) -> None:
+        self.api = api
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[Any, ...], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self.api, name)
+        if not name.startswith(("list_", "read_")):
+            return method
+
+        def cached(*args: Any, **kwargs: Any) -> Any:
+            # Watches stream and must reach the server
+            if kwargs.get("watch"):
+                return method(*args, **kwargs)
+            key = (name, args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[0] < self.ttl:
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+            result = method(*args, **kwargs)
+            if kwargs.get("_preload_content") is False:
+                # The stream can be read only once; keep its bytes instead
+                data = result.data
+                release = getattr(result, "release_conn", None)
+                if release is not None:
+                    release()
+                result = _CachedResponse(data)
+            with self._lock:
+                self._entries[key] = (now, result)
+            return result
+
+        # Keep the original for watch.Watch, which reads its docstring
+        cached.__doc__ = method.__doc__
+        return cached
+
+
+class CachedSource(ClusterSource):
+    """Another source behind a read cache.
+
+    List and read calls are answered from memory for ``ttl`` seconds, so
+    repeated runs in one process (or several classes asking for the same
+    namespace) make one API request. Watches always reach the inner source.
+    """
+
+    def __init__(self, source: ClusterSource, ttl: float = 30.0) -> None:
+        super().__init__(
+            _CachingApi(source.core_api, ttl),
+            _CachingApi(source.networking_api, ttl),
+            source.context,
+        )
+        self.source = source
+
+    @property
+    def hits(self) -> int:
+        return int(self.core_api.hits + self.networking_api.hits)
+
+    @property
+    def misses(self) -> int:
+        return int(self.core_api.misses + self.networking_api.misses)
+
+    def invalidate(self) -> None:
+        """Drop every cached response"""
+        self.core_api.invalidate()
+        self.networking_api.invalidate()
+
+
+def _flatten(docs: Iterable[Any]) -> Iterable[dict]:
+    for doc in docs:
+        if not isinstance(doc, dict):
+            continue
+        if str(doc.get("kind", "")).endswith("List"):
+            yield from _flatten(doc.get("items") or [])
+        else:
+            yield doc
+
+
+def from_manifests(docs: Iterable[Any], context: str = "") -> ClusterSnapshot:
+    """A snapshot of the Namespace, Pod, Service and NetworkPolicy manifests"""
+    snapshot = ClusterSnapshot(context=context)
+    for doc in _flatten(docs):
+        kind = doc.get("kind")
+        metadata = doc.get("metadata") or {}
+        name = metadata.get("name", "")
+        namespace = metadata.get("namespace") or "default"
+        labels = metadata.get("labels") or {}
+        if kind == "Namespace":
+            snapshot.namespaces[name] = labels
+            continue
+        if kind not in ("Pod", "Service", "NetworkPolicy"):
+            continue
+        # Objects may name namespaces the manifests do not define
+        snapshot.namespaces.setdefault(namespace, {})
+        if kind == "Pod":
+            snapshot.pods.setdefault(namespace, {})[name] = labels
+            owners = [
+                [ref.get("kind", ""), ref.get("name", "")]
+                for ref in metadata.get("ownerReferences") or []
+            ]
+            if owners:
+                snapshot.owners.setdefault(namespace, {})[name] = owners
+            ports = [list(port) for port in json_ports(doc.get("spec") or {})]
+            if ports:
+                snapshot.ports.setdefault(namespace, {})[name] = ports
+        elif kind == "Service":
+            selector = (doc.get("spec") or {}).get("selector")
+            snapshot.services.setdefault(namespace, {})[name] = selector
+        else:
+            snapshot.policies.setdefault(namespace, []).append(doc)
+    for namespace in snapshot.namespaces:
+        snapshot.pods.setdefault(namespace, {})
+    return snapshot
+
+
+def to_manifests(snapshot: ClusterSnapshot) -> List[dict]:
+    """The snapshot as Namespace, Pod, Service and NetworkPolicy manifests"""
+    docs: List[dict] = []
+    for name, labels in snapshot.namespaces.items():
+        docs.append(
+            {
+                "apiVersion": "v1",
+                "kind": "Namespace",
+                "metadata": {"name": name, "labels": dict(labels)},
+            }
+        )
+    for namespace, pods in snapshot.pods.items():
+        owners = snapshot.owners.get(namespace, {})
+        ports = snapshot.ports.get(namespace, {})
+        for name, labels in pods.items():
+            metadata: Dict[str, Any] = {
+                "name": name,
+                "namespace": namespace,
+                "labels": dict(labels),
+            }
+            if owners.get(name):
+                metadata["ownerReferences"] = [
+                    {"apiVersion": "apps/v1", "kind": kind, "name": owner, "uid": owner}
+                    for kind, owner in owners[name]
+                ]
+            container: Dict[str, Any] = {"name": "app", "image": "app"}
+            if ports.get(name):
+                container["ports"] = [
+                    (
+                        {"name": port_name, "containerPort": port, "protocol": protocol}
+                        if port_name
+                        else {"containerPort": port, "protocol": protocol}
+                    )
+                    for port_name, port, protocol in ports[name]
+                ]
+            docs.append(
+                {
+                    "apiVersion": "v1",
+                    "kind": "Pod",
+                    "metadata": metadata,
+                    "spec": {"containers": [container]},
+                }
+            )
+    for namespace, services in snapshot.services.items():
+        for name, selector in services.items():
+            spec = {"selector": dict(selector)} if selector is not None else {}
+            docs.append(
+                {
+                    "apiVersion": "v1",
+                    "kind": "Service",
+                    "metadata": {"name": name, "namespace": namespace},
+                    "spec": spec,
+                }
+            )
+    for namespace, policies in snapshot.policies.items():
+        for doc in policies:
+            doc = json.loads(json.dumps(doc))
+            doc.update(apiVersion="networking.k8s.io/v1", kind="NetworkPolicy")
+            doc.setdefault("metadata", {})["namespace"] = namespace
+            docs.append(doc)
+    return docs
+
+
+def list_and_watch(
+    func: Callable[..., Any],
+    kind: str,
+    events: "queue.Queue[Tuple[str, str, Any]]",
+    stop: threading.Event,
+    timeout_seconds: int,
+) -> None:
+    """List one resource, then put its watch events on the queue until stopped.
+
+    The list is put as ``(kind, "SYNC", items)`` and each event as
+    ``(kind, type, object)``. An expired resourceVersion (410) lists
+    again; any other error is put as ``(kind, "ERROR", exception)``.
+    """
+    resource_version: Optional[str] = None
+    while not stop.is_set():
+        try:
+            if resource_version is None:
+                listing = func()
+                events.put((kind, "SYNC", listing.items))
+                resource_version = listing.metadata.resource_version
+            watcher = watch.Watch()
+            for event in watcher.stream(
+                func,
+                resource_version=resource_version,
+                timeout_seconds=timeout_seconds,
+            ):
+                events.put((kind, event["type"], event["object"]))
+                if stop.is_set():
+                    watcher.stop()
+                    break
+            resource_version = watcher.resource_version
+        except client.exceptions.ApiException as e:
+            if e.status != 410:
+                events.put((kind, "ERROR", e))
+                return
+            # Too old to resume: list and reconcile again
+            resource_version = None
+        except Exception as e:
+            events.put((kind, "ERROR", e))
+            return
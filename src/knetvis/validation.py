@@ -0,0 +1,487 @@
+import importlib.util
+import ipaddress
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .selector import OPERATORS
+
+# Where in a document a rule is applied
+DOCUMENT = "document"  # every document, whatever its kind
+POLICY = "policy"  # NetworkPolicy documents
+SPEC = "spec"  # NetworkPolicy spec
+RULE = "rule"  # each ingress or egress rule
+PORT = "port"  # each entry of a rule's ports
+PEER = "peer"  # each entry of a rule's from/to
+IP_BLOCK = "ipBlock"  # a peer's ipBlock
+SELECTOR = "selector"  # spec.podSelector and peer pod/namespace selectors
+SCOPES = (DOCUMENT, POLICY, SPEC, RULE, PORT, PEER, IP_BLOCK, SELECTOR)
+
+PROTOCOLS = frozenset(["TCP", "UDP", "SCTP"])
+POLICY_TYPES = frozenset(["Ingress", "Egress"])
+# IANA service names, which is what a named port must be
+PORT_NAME = re.compile(r"^(?=.*[a-z])[a-z0-9]([a-z0-9-]{0,13}[a-z0-9])?$")
+
+# Documents per worker task when validating with several processes
+CHUNK_SIZE = 2000
+
+Check = Callable[[Any, "Location"], Iterable[str]]
+
+
+@dataclass(frozen=True)
+class Location:
+    """What a rule is looking at and where it sits in the document"""
+
+    kind: str = ""
+    direction: str = ""  # "Ingress" or "Egress" below spec
+    rule: int = 0  # 1-based rule index below spec
+    field: str = ""  # selector field name for SELECTOR rules
+
+    @property
+    def prefix(self) -> str:
+        return f"{self.direction} rule {self.rule}: " if self.rule else ""
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A named check applied to every node of one scope"""
+
+    name: str
+    scope: str
+    check: Check
+    description: str = ""
+
+
+@dataclass(frozen=True)
+class Issue:
+    """A problem found by a rule in one document"""
+
+    document: int
+    rule: str
+    message: str
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class RuleRegistry:
+    """Named validation rules, compiled into a :class:`Validator`.
+
+    Custom rules are plain functions taking the node and its
+    :class:`Location` and yielding messages::
+
+        @registry.rule(PORT, "no-privileged-ports")
+        def no_privileged_ports(port, location):
+            if isinstance(port.get("port"), int) and port["port"] < 1024:
+                yield f"Privileged port {port['port']}"
+    """
+
+    def __init__(self, rules: Iterable[Rule] = ()) -> None:
+        self._rules: Dict[str, Rule] = {}
+        for rule in rules:
+            self.register(rule)
+
+    def __iter__(self) -> Any:
+        return iter(self._rules.values())
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._rules
+
+    def register(self, rule: Rule) -> Rule:
+        if rule.scope not in SCOPES:
+            raise ValueError(f"Unknown rule scope: {rule.scope}")
+        if rule.name in self._rules:
+            raise ValueError(f"Rule already registered: {rule.name}")
+        self._rules[rule.name] = rule
+        return rule
+
+    def rule(
+        self, scope: str, name: Optional[str] = None, description: str = ""
+    ) -> Callable[[Check], Check]:
+        """Decorator registering a check function as a rule"""
+
+        def decorator(check: Check) -> Check:
+            rule_name = name or check.__name__.replace("_", "-")
+            doc = description or (check.__doc__ or "").strip()
+            self.register(Rule(rule_name, scope, check, doc))
+            return check
+
+        return decorator
+
+    def unregister(self, name: str) -> None:
+        del self._rules[name]
+
+    def copy(self) -> "RuleRegistry":
+        return RuleRegistry(self._rules.values())
+
+    def compile(self, jobs: int = 1, timed: bool = False) -> "Validator":
+        return Validator(list(self._rules.values()), jobs=jobs, timed=timed)
+
+
+class Validator:
+    """Rules grouped by scope and applied in a single walk of each document.
+
+    With ``timed`` each rule's cumulative time and call count are recorded
+    in :attr:`timings`. With ``jobs`` above one, large batches are split
+    across worker processes.
+    """
+
+    def __init__(self, rules: List[Rule], jobs: int = 1, timed: bool = False) -> None:
+        self.rules = rules
+        self.jobs = jobs
+        self.timed = timed
+        self._compile()
+
+    def _compile(self) -> None:
+        # {rule name: [seconds, calls]}
+        self.timings: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        scoped: Dict[str, List[Tuple[str, Check]]] = {s: [] for s in SCOPES}
+        for rule in self.rules:
+            check = self._timed(rule) if self.timed else rule.check
+            scoped[rule.scope].append((rule.name, check))
+        self._checks = {s: tuple(checks) for s, checks in scoped.items()}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"rules": self.rules, "jobs": self.jobs, "timed": self.timed}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._compile()
+
+    def _timed(self, rule: Rule) -> Check:
+        check = rule.check
+        entry = self.timings[rule.name]
+
+        def timed_check(node: Any, location: Location) -> List[str]:
+            start = time.perf_counter()
+            try:
+                return list(check(node, location))
+            finally:
+                entry[0] += time.perf_counter() - start
+                entry[1] += 1
+
+        return timed_check
+
+    def _apply(
+        self,
+        scope: str,
+        node: Any,
+        location: Location,
+        document: int,
+        issues: List[Issue],
+    ) -> None:
+        for name, check in self._checks[scope]:
+            for message in check(node, location):
+                issues.append(Issue(document, name, location.prefix + message))
+
+    def validate(self, doc: Any, document: int = 0) -> List[Issue]:
+        """Issues found in one document"""
+        issues: List[Issue] = []
+        if not isinstance(doc, dict):
+            issues.append(Issue(document, "document", "Document is not a mapping"))
+            return issues
+
+        kind = str(doc.get("kind") or "")
+        location = Location(kind=kind)
+        self._apply(DOCUMENT, doc, location, document, issues)
+        if kind != "NetworkPolicy":
+            return issues
+
+        self._apply(POLICY, doc, location, document, issues)
+        spec = doc.get("spec")
+        if not isinstance(spec, dict) or not spec:
+            return issues
+        self._apply(SPEC, spec, location, document, issues)
+        self._validate_selector(spec, "podSelector", location, document, issues)
+
+        for direction, key, peer_key in (
+            ("Ingress", "ingress", "from"),
+            ("Egress", "egress", "to"),
+        ):
+            rules = spec.get(key)
+            if not isinstance(rules, list):
+                continue
+            for i, rule in enumerate(rules, 1):
+                rule_location = Location(kind, direction, i)
+                if not isinstance(rule, dict):
+                    issues.append(
+                        Issue(document, "rule", f"{direction} rule {i}: Not a mapping")
+                    )
+                    continue
+                self._apply(RULE, rule, rule_location, document, issues)
+                ports = rule.get("ports")
+                if isinstance(ports, list):
+                    for port in ports:
+                        if isinstance(port, dict):
+                            self._apply(PORT, port, rule_location, document, issues)
+                peers = rule.get(peer_key)
+                if isinstance(peers, list):
+                    for peer in peers:
+                        if isinstance(peer, dict):
+                            self._validate_peer(peer, rule_location, document, issues)
+        return issues
+
+    def _validate_peer(
+        self, peer: dict, location: Location, document: int, issues: List[Issue]
+    ) -> None:
+        self._apply(PEER, peer, location, document, issues)
+        ip_block = peer.get("ipBlock")
+        if isinstance(ip_block, dict):
+            self._apply(IP_BLOCK, ip_block, location, document, issues)
+        self._validate_selector(peer, "podSelector", location, document, issues)
+        self._validate_selector(peer, "namespaceSelector", location, document, issues)
+
+    def _validate_selector(
+        self,
+        parent: dict,
+        field: str,
+        location: Location,
+        document: int,
+        issues: List[Issue],
+    ) -> None:
+        selector = parent.get(field)
+        if isinstance(selector, dict) and self._checks[SELECTOR]:
+            selector_location = Location(
+                location.kind, location.direction, location.rule, field
+            )
+            self._apply(SELECTOR, selector, selector_location, document, issues)
+
+    def validate_all(self, docs: List[Any]) -> List[Issue]:
+        """Issues found in a batch of documents, in document order"""
+        if self.jobs > 1 and len(docs) > CHUNK_SIZE:
+            return self._validate_parallel(docs)
+        issues: List[Issue] = []
+        for i, doc in enumerate(docs):
+            issues.extend(self.validate(doc, i))
+        return issues
+
+    def _validate_parallel(self, docs: List[Any]) -> List[Issue]:
+        chunks = [
+            (start, docs[start : start + CHUNK_SIZE])
+            for start in range(0, len(docs), CHUNK_SIZE)
+        ]
+        issues: List[Issue] = []
+        with ProcessPoolExecutor(
+            max_workers=self.jobs, initializer=_init_worker, initargs=(self,)
+        ) as pool:
+            for chunk_issues, timings in pool.map(_validate_chunk, chunks):
+                issues.extend(chunk_issues)
+                for name, (seconds, calls) in timings.items():
+                    self.timings[name][0] += seconds
+                    self.timings[name][1] += calls
+        return issues
+
+
+_worker_validator: Optional[Validator] = None
+
+
+def _init_worker(validator: Validator) -> None:
+    global _worker_validator
+    validator.jobs = 1
+    _worker_validator = validator
+
+
+def _validate_chunk(
+    chunk: Tuple[int, List[Any]],
+) -> Tuple[List[Issue], Dict[str, List[float]]]:
+    assert _worker_validator is not None
+    for entry in _worker_validator.timings.values():
+        entry[0] = entry[1] = 0
+    start, docs = chunk
+    issues: List[Issue] = []
+    for i, doc in enumerate(docs, start):
+        issues.extend(_worker_validator.validate(doc, i))
+    return issues, dict(_worker_validator.timings)
+
+
+def load_rules(path: str, registry: RuleRegistry) -> None:
+    """Load custom rules from a Python file defining ``register(registry)``"""
+    spec = importlib.util.spec_from_file_location(
+        f"knetvis_rules_{abs(hash(path))}", path
+    )
+    if spec is None or spec.loader is None:
+        raise Exception(f"Cannot load rules from {path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    register = getattr(module, "register", None)
+    if register is None:
+        raise Exception(f"{path} does not define register(registry)")
+    register(registry)
+
+
+DEFAULT_RULES = RuleRegistry()
+
+
+@DEFAULT_RULES.rule(DOCUMENT)
+def metadata_name(doc: dict, location: Location) -> Iterable[str]:
+    """Namespaces and pods must be named"""
+    if location.kind in ("Namespace", "Pod"):
+        metadata = doc.get("metadata")
+        if not isinstance(metadata, dict) or "name" not in metadata:
+            yield f"{location.kind} missing required metadata.name field"
+
+
+@DEFAULT_RULES.rule(POLICY)
+def required_fields(doc: dict, location: Location) -> Iterable[str]:
+    """NetworkPolicies need apiVersion, kind, metadata and spec"""
+    for field in ("apiVersion", "kind", "metadata", "spec"):
+        if field not in doc:
+            yield f"Missing required field: {field}"
+    if "spec" in doc and not doc["spec"]:
+        yield "Empty spec in NetworkPolicy"
+
+
+@DEFAULT_RULES.rule(SPEC)
+def pod_selector(spec: dict, location: Location) -> Iterable[str]:
+    """spec.podSelector is required"""
+    if "podSelector" not in spec:
+        yield "Missing podSelector in spec"
+
+
+@DEFAULT_RULES.rule(SPEC)
+def policy_types(spec: dict, location: Location) -> Iterable[str]:
+    """policyTypes may only list Ingress and Egress, once each"""
+    types = spec.get("policyTypes")
+    if types is None:
+        return
+    if not isinstance(types, list):
+        yield "policyTypes must be a list"
+        return
+    for value in types:
+        if value not in POLICY_TYPES:
+            yield f"Invalid policyType {value!r}, expected Ingress or Egress"
+    for value in sorted({v for v in types if types.count(v) > 1}, key=str):
+        yield f"Duplicate policyType {value!r}"
+
+
+@DEFAULT_RULES.rule(SPEC)
+def rule_lists(spec: dict, location: Location) -> Iterable[str]:
+    """ingress and egress must be lists of rules"""
+    for key in ("ingress", "egress"):
+        if spec.get(key) is not None and not isinstance(spec[key], list):
+            yield f"{key} must be a list of rules"
+
+
+@DEFAULT_RULES.rule(RULE)
+def rule_fields(rule: dict, location: Location) -> Iterable[str]:
+    """A rule's ports and peers must be lists"""
+    peer_key = "from" if location.direction == "Ingress" else "to"
+    for key in ("ports", peer_key):
+        if rule.get(key) is not None and not isinstance(rule[key], list):
+            yield f"{key} must be a list"
+
+
+@DEFAULT_RULES.rule(PORT)
+def port_number(port: dict, location: Location) -> Iterable[str]:
+    """Ports are 1-65535 or an IANA service name"""
+    if "port" not in port:
+        yield "Port specification missing port number"
+        return
+    value = port["port"]
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        yield f"Invalid port {value!r}"
+    elif isinstance(value, int):
+        if not 1 <= value <= 65535:
+            yield f"Port {value} out of range 1-65535"
+    elif not value.isdigit() and not PORT_NAME.match(value):
+        yield f"Invalid named port {value!r}"
+
+
+@DEFAULT_RULES.rule(PORT)
+def port_protocol(port: dict, location: Location) -> Iterable[str]:
+    """protocol is TCP, UDP or SCTP"""
+    if "protocol" in port and port["protocol"] not in PROTOCOLS:
+        yield f"Invalid protocol {port['protocol']}"
+
+
+@DEFAULT_RULES.rule(PORT)
+def end_port(port: dict, location: Location) -> Iterable[str]:
+    """endPort needs a numeric port and must not be below it"""
+    end = port.get("endPort")
+    if end is None:
+        return
+    if isinstance(end, bool) or not isinstance(end, int):
+        yield f"endPort must be an integer, got {end!r}"
+        return
+    if not 1 <= end <= 65535:
+        yield f"endPort {end} out of range 1-65535"
+    start = port.get("port")
+    if isinstance(start, bool) or not isinstance(start, int):
+        yield "endPort requires a numeric port"
+    elif end < start:
+        yield f"endPort {end} is less than port {start}"
+
+
+@DEFAULT_RULES.rule(PEER)
+def peer_selector(peer: dict, location: Location) -> Iterable[str]:
+    """A peer needs a podSelector, namespaceSelector or ipBlock"""
+    if not any(k in peer for k in ("podSelector", "namespaceSelector", "ipBlock")):
+        yield "Peer missing selector"
+
+
+@DEFAULT_RULES.rule(PEER)
+def ip_block_exclusive(peer: dict, location: Location) -> Iterable[str]:
+    """ipBlock cannot be combined with selectors in the same peer"""
+    if "ipBlock" in peer and ("podSelector" in peer or "namespaceSelector" in peer):
+        yield "ipBlock cannot be combined with podSelector or namespaceSelector"
+
+
+def _network(value: Any) -> Optional[Any]:
+    if not isinstance(value, str) or "/" not in value:
+        return None
+    try:
+        return ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return None
+
+
+@DEFAULT_RULES.rule(IP_BLOCK)
+def ip_block_cidr(block: dict, location: Location) -> Iterable[str]:
+    """ipBlock.cidr and except entries are CIDRs inside the block"""
+    if "cidr" not in block:
+        yield "ipBlock missing cidr"
+        return
+    network = _network(block["cidr"])
+    if network is None:
+        yield f"Invalid ipBlock cidr {block['cidr']!r}"
+        return
+    excepts = block.get("except") or []
+    if not isinstance(excepts, list):
+        yield "ipBlock except must be a list"
+        return
+    for value in excepts:
+        excluded = _network(value)
+        if excluded is None:
+            yield f"Invalid ipBlock except {value!r}"
+        elif excluded.version != network.version or not excluded.subnet_of(network):
+            yield f"ipBlock except {value} is not within {block['cidr']}"
+
+
+@DEFAULT_RULES.rule(SELECTOR)
+def selector_expressions(selector: dict, location: Location) -> Iterable[str]:
+    """matchLabels is a map and matchExpressions use valid operators"""
+    labels = selector.get("matchLabels")
+    if labels is not None and not isinstance(labels, dict):
+        yield f"{location.field}.matchLabels must be a map"
+    expressions = selector.get("matchExpressions") or []
+    if not isinstance(expressions, list):
+        yield f"{location.field}.matchExpressions must be a list"
+        return
+    for expr in expressions:
+        if not isinstance(expr, dict) or "key" not in expr:
+            yield f"{location.field} expression missing key"
+            continue
+        operator = expr.get("operator")
+        values = expr.get("values")
+        if operator not in OPERATORS:
+            yield f"{location.field} has invalid operator {operator!r}"
+        elif operator in ("In", "NotIn") and not values:
+            yield f"{location.field} operator {operator} requires values"
+        elif operator in ("Exists", "DoesNotExist") and values:
+            yield f"{location.field} operator {operator} must not have values"
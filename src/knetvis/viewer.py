@@ -0,0 +1,636 @@
+import base64
+import json
+import math
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+# Graphs up to this many nodes get a force-directed layout; larger ones are
+# packed per namespace, which is linear in the node count
+SPRING_LAYOUT_LIMIT = 500
+
+KINDS = ["pod", "namespace", "ipblock", "workload"]
+EDGE_TYPES = ["allow", "deny"]
+
+DEFAULT_COLORS = {
+    "pod": "#4299E1",
+    "namespace": "#48BB78",
+    "ipblock": "#F6AD55",
+    "workload": "#9F7AEA",
+    "allow": "#48BB78",
+    "deny": "#F56565",
+}
+
+# Angle between successive points of a sunflower (Vogel) spiral
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+
+def _sunflower(count: int) -> np.ndarray:
+    """``count`` evenly spread points in a disc of radius ~sqrt(count)"""
+    i = np.arange(count, dtype=np.float64)
+    radius = np.sqrt(i + 0.5)
+    theta = i * GOLDEN_ANGLE
+    return np.column_stack([radius * np.cos(theta), radius * np.sin(theta)])
+
+
+def cluster_layout(graph: nx.DiGraph) -> Dict[str, Tuple[float, float]]:
+    """Pack each namespace into a disc and the discs into rows.
+
+    Namespace nodes form their own group. Groups are placed largest first,
+    left to right, wrapping rows at roughly the square root of the total
+    area, so the layout stays compact for tens of thousands of nodes.
+    """
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for node, attrs in graph.nodes(data=True):
+        groups[attrs.get("namespace", "")].append(node)
+
+    ordered = sorted(groups.items(), key=lambda item: (-len(item[1]), item[0]))
+    gap = 4.0
+    total_width = sum(2 * math.sqrt(len(nodes)) + gap for _, nodes in ordered)
+    row_width = max(
+        math.sqrt(sum((2 * math.sqrt(len(n)) + gap) ** 2 for _, n in ordered)),
+        max((2 * math.sqrt(len(n)) + gap for _, n in ordered), default=0.0),
+    )
+    row_width = min(row_width, total_width)
+
+    positions: Dict[str, Tuple[float, float]] = {}
+    x = y = row_height = 0.0
+    for _, nodes in ordered:
+        radius = math.sqrt(len(nodes)) + 1
+        if x > 0 and x + 2 * radius > row_width:
+            x = 0.0
+            y += row_height + gap
+            row_height = 0.0
+        points = _sunflower(len(nodes))
+        for node, (px, py) in zip(sorted(nodes), points):
+            positions[node] = (x + radius + float(px), y + radius + float(py))
+        x += 2 * radius + gap
+        row_height = max(row_height, 2 * radius)
+    return positions
+
+
+def layout(graph: nx.DiGraph) -> Dict[str, Tuple[float, float]]:
+    """Node positions: force-directed for small graphs, packed for large"""
+    if 0 < graph.number_of_nodes() <= SPRING_LAYOUT_LIMIT:
+        pos = nx.spring_layout(graph, k=1, iterations=50, seed=0)
+        return {node: (float(p[0]), float(p[1])) for node, p in pos.items()}
+    return cluster_layout(graph)
+
+
+def _b64(values: Any, dtype: str) -> str:
+    array = np.ascontiguousarray(np.asarray(values, dtype=dtype))
+    return base64.b64encode(array.tobytes()).decode("ascii")
+
+
+def graph_payload(
+    graph: nx.DiGraph,
+    title: str = "Network Policy Visualization",
+    colors: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """Compact, JSON-serializable form of a graph and its layout.
+
+    Per-node and per-edge columns are little-endian typed arrays in base64;
+    namespaces and label sets are stored once and referenced by index.
+    """
+    positions = layout(graph)
+    nodes = list(graph.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+
+    namespaces: Dict[str, int] = {}
+    label_sets: Dict[str, int] = {}
+    kinds, namespace_ids, label_ids, names = [], [], [], []
+    for node in nodes:
+        attrs = graph.nodes[node]
+        kind = attrs.get("kind", "pod")
+        kinds.append(KINDS.index(kind) if kind in KINDS else 0)
+        namespace = attrs.get("namespace", "")
+        namespace_ids.append(namespaces.setdefault(namespace, len(namespaces)))
+        labels = json.dumps(attrs.get("labels") or {}, sort_keys=True)
+        label_ids.append(label_sets.setdefault(labels, len(label_sets)))
+        names.append(node.split("/", 1)[-1])
+
+    sources, targets, types = [], [], []
+    for source, target, attrs in graph.edges(data=True):
+        sources.append(index[source])
+        targets.append(index[target])
+        edge_type = attrs.get("type", "allow")
+        types.append(EDGE_TYPES.index(edge_type) if edge_type in EDGE_TYPES else 0)
+
+    return {
+        "title": title,
+        "kinds": KINDS,
+        "edgeTypes": EDGE_TYPES,
+        "colors": {**DEFAULT_COLORS, **(colors or {})},
+        "namespaces": list(namespaces),
+        "labelSets": [json.loads(labels) for labels in label_sets],
+        "nodes": {
+            "count": len(nodes),
+            "names": names,
+            "kind": _b64(kinds, "<u1"),
+            "namespace": _b64(namespace_ids, "<u4"),
+            "labels": _b64(label_ids, "<u4"),
+            "x": _b64([positions[n][0] for n in nodes], "<f4"),
+            "y": _b64([positions[n][1] for n in nodes], "<f4"),
+        },
+        "edges": {
+            "count": len(sources),
+            "source": _b64(sources, "<u4"),
+            "target": _b64(targets, "<u4"),
+            "type": _b64(types, "<u1"),
+        },
+    }
+
+
+def write_html(
+    graph: nx.DiGraph,
+    output_file: str,
+    title: str = "Network Policy Visualization",
+    colors: Optional[Dict[str, str]] = None,
+) -> None:
+    """Write a single self-contained HTML viewer for a graph"""
+    data = json.dumps(graph_payload(graph, title, colors), separators=(",", ":"))
+    # Keep "</script>" inside string values from closing the data block
+    data = data.replace("</", "<\\/")
+    parts = {"TITLE": _html_escape(title), "SCRIPT": VIEWER_SCRIPT, "DATA": data}
+    page = re.sub(
+        r"__(TITLE|SCRIPT|DATA)__", lambda m: parts[m.group(1)], VIEWER_TEMPLATE
+    )
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(page)
+
+
+def _html_escape(text: str) -> str:
+    return (
+        text.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+    )
+
+
+VIEWER_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>__TITLE__</title>
+<style>
+  html, body { margin: 0; height: 100%; font: 13px system-ui, sans-serif; }
+  body { display: flex; color: #1a202c; }
+  #sidebar { width: 320px; padding: 12px; overflow-y: auto; box-sizing: border-box;
+             border-right: 1px solid #e2e8f0; background: #f7fafc; }
+  #sidebar h1 { font-size: 15px; margin: 0 0 8px; }
+  #sidebar h2 { font-size: 13px; margin: 14px 0 6px; }
+  #sidebar input[type=text] { width: 100%; box-sizing: border-box; padding: 5px; }
+  #stage { flex: 1; position: relative; }
+  canvas { position: absolute; inset: 0; width: 100%; height: 100%; cursor: grab; }
+  .muted { color: #718096; }
+  .list div { padding: 2px 0; cursor: pointer; white-space: nowrap;
+              overflow: hidden; text-overflow: ellipsis; }
+  .list div:hover { text-decoration: underline; }
+  #namespaces label { display: block; white-space: nowrap; }
+  button { font: inherit; margin: 2px 4px 2px 0; }
+  pre { white-space: pre-wrap; margin: 4px 0; }
+</style>
+</head>
+<body>
+<div id="sidebar">
+  <h1>__TITLE__</h1>
+  <div id="stats" class="muted"></div>
+  <h2>Search</h2>
+  <input id="search" type="text" placeholder="namespace/name, Enter to select">
+  <div id="matches" class="list"></div>
+  <h2>Label filter</h2>
+  <input id="label-filter" type="text" placeholder="app=web, tier, !canary">
+  <h2>Namespaces</h2>
+  <button id="ns-all">All</button><button id="ns-none">None</button>
+  <div id="namespaces"></div>
+  <h2>Details</h2>
+  <div id="details" class="muted">Click a node.</div>
+</div>
+<div id="stage"><canvas id="canvas"></canvas></div>
+<script id="graph-data" type="application/json">__DATA__</script>
+<script>
+__SCRIPT__
+</script>
+</body>
+</html>
+"""
+
+VIEWER_SCRIPT = r"""
+(function () {
+  "use strict";
+  // Edges are drawn only while this many or fewer are visible; otherwise
+  // just the selected node's edges are drawn
+  var EDGE_DRAW_LIMIT = 20000;
+  var NAME_DRAW_LIMIT = 1500;
+  var PAGE = 100;
+
+  var data = JSON.parse(document.getElementById("graph-data").textContent);
+
+  function decode(b64, Type) {
+    var bin = atob(b64);
+    var bytes = new Uint8Array(bin.length);
+    for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+    return new Type(bytes.buffer);
+  }
+
+  var n = data.nodes.count, m = data.edges.count;
+  var names = data.nodes.names;
+  var kind = decode(data.nodes.kind, Uint8Array);
+  var nsOf = decode(data.nodes.namespace, Uint32Array);
+  var labelOf = decode(data.nodes.labels, Uint32Array);
+  var xs = decode(data.nodes.x, Float32Array);
+  var ys = decode(data.nodes.y, Float32Array);
+  var src = decode(data.edges.source, Uint32Array);
+  var dst = decode(data.edges.target, Uint32Array);
+  var etype = decode(data.edges.type, Uint8Array);
+
+  var visible = new Uint8Array(n).fill(1);
+  var nsEnabled = new Uint8Array(data.namespaces.length).fill(1);
+  var labelOk = new Uint8Array(data.labelSets.length).fill(1);
+  var selected = -1;
+  var highlighted = new Set();
+
+  function nodeId(i) { return data.namespaces[nsOf[i]] + "/" + names[i]; }
+
+  // ---- lazy adjacency (built on first selection) ----
+  var outStart = null, outEdges = null, inStart = null, inEdges = null;
+  function csr(keys) {
+    var start = new Uint32Array(n + 1), order = new Uint32Array(m);
+    for (var e = 0; e < m; e++) start[keys[e] + 1]++;
+    for (var i = 0; i < n; i++) start[i + 1] += start[i];
+    var fill = start.slice(0, n);
+    for (e = 0; e < m; e++) order[fill[keys[e]]++] = e;
+    return [start, order];
+  }
+  function adjacency() {
+    if (outStart === null) {
+      var out = csr(src), inc = csr(dst);
+      outStart = out[0]; outEdges = out[1]; inStart = inc[0]; inEdges = inc[1];
+    }
+  }
+
+  // ---- view ----
+  var canvas = document.getElementById("canvas");
+  var ctx = canvas.getContext("2d");
+  var dpr = window.devicePixelRatio || 1;
+  var scale = 1, ox = 0, oy = 0, width = 0, height = 0;
+  var pending = false;
+
+  function resize() {
+    width = canvas.clientWidth; height = canvas.clientHeight;
+    canvas.width = Math.round(width * dpr); canvas.height = Math.round(height * dpr);
+    redraw();
+  }
+
+  function fit() {
+    var minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+    for (var i = 0; i < n; i++) {
+      if (!visible[i]) continue;
+      if (xs[i] < minX) minX = xs[i]; if (xs[i] > maxX) maxX = xs[i];
+      if (ys[i] < minY) minY = ys[i]; if (ys[i] > maxY) maxY = ys[i];
+    }
+    if (minX === Infinity) { minX = minY = 0; maxX = maxY = 1; }
+    var w = Math.max(maxX - minX, 1e-6), h = Math.max(maxY - minY, 1e-6);
+    scale = 0.9 * Math.min(width / w, height / h);
+    ox = width / 2 - scale * (minX + maxX) / 2;
+    oy = height / 2 - scale * (minY + maxY) / 2;
+    redraw();
+  }
+
+  function redraw() {
+    if (!pending) { pending = true; requestAnimationFrame(draw); }
+  }
+
+  function radius() { return Math.max(1, Math.min(8, scale * 0.35)); }
+
+  function drawEdge(e) {
+    ctx.moveTo(xs[src[e]] * scale + ox, ys[src[e]] * scale + oy);
+    ctx.lineTo(xs[dst[e]] * scale + ox, ys[dst[e]] * scale + oy);
+  }
+
+  function draw() {
+    pending = false;
+    ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+    ctx.clearRect(0, 0, width, height);
+
+    var shown = 0;
+    for (var e = 0; e < m; e++) if (visible[src[e]] && visible[dst[e]]) shown++;
+    ctx.lineWidth = 0.6;
+    ctx.globalAlpha = shown > 2000 ? 0.25 : 0.6;
+    for (var t = 0; t < data.edgeTypes.length; t++) {
+      ctx.strokeStyle = data.colors[data.edgeTypes[t]];
+      ctx.beginPath();
+      if (shown <= EDGE_DRAW_LIMIT) {
+        for (e = 0; e < m; e++) {
+          if (etype[e] === t && visible[src[e]] && visible[dst[e]]) drawEdge(e);
+        }
+      } else if (selected >= 0) {
+        adjacency();
+        for (var k = outStart[selected]; k < outStart[selected + 1]; k++) {
+          if (etype[outEdges[k]] === t) drawEdge(outEdges[k]);
+        }
+        for (k = inStart[selected]; k < inStart[selected + 1]; k++) {
+          if (etype[inEdges[k]] === t) drawEdge(inEdges[k]);
+        }
+      }
+      ctx.stroke();
+    }
+    ctx.globalAlpha = 1;
+
+    var r = radius(), onScreen = [];
+    for (t = 0; t < data.kinds.length; t++) {
+      ctx.fillStyle = data.colors[data.kinds[t]];
+      for (var i = 0; i < n; i++) {
+        if (!visible[i] || kind[i] !== t) continue;
+        var x = xs[i] * scale + ox, y = ys[i] * scale + oy;
+        if (x < -r || y < -r || x > width + r || y > height + r) continue;
+        ctx.fillRect(x - r, y - r, 2 * r, 2 * r);
+        if (onScreen.length <= NAME_DRAW_LIMIT) onScreen.push(i);
+      }
+    }
+
+    ctx.strokeStyle = "#1a202c";
+    ctx.lineWidth = 2;
+    highlighted.forEach(function (i) {
+      ctx.strokeRect(xs[i] * scale + ox - r - 2, ys[i] * scale + oy - r - 2,
+                     2 * r + 4, 2 * r + 4);
+    });
+    if (selected >= 0) {
+      ctx.strokeStyle = "#E53E3E";
+      ctx.strokeRect(xs[selected] * scale + ox - r - 3,
+                     ys[selected] * scale + oy - r - 3,
+                     2 * r + 6, 2 * r + 6);
+    }
+
+    if (onScreen.length <= NAME_DRAW_LIMIT && r >= 3) {
+      ctx.fillStyle = "#1a202c";
+      ctx.font = "11px system-ui, sans-serif";
+      onScreen.forEach(function (i) {
+        ctx.fillText(names[i], xs[i] * scale + ox + r + 2, ys[i] * scale + oy + 4);
+      });
+    }
+  }
+
+  // ---- picking, via a uniform grid over layout coordinates ----
+  var grid = null, cell = 1, gx0 = 0, gy0 = 0;
+  function buildGrid() {
+    var minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+    for (var i = 0; i < n; i++) {
+      minX = Math.min(minX, xs[i]); maxX = Math.max(maxX, xs[i]);
+      minY = Math.min(minY, ys[i]); maxY = Math.max(maxY, ys[i]);
+    }
+    gx0 = minX; gy0 = minY;
+    cell = Math.max((maxX - minX) * (maxY - minY) / Math.max(n, 1), 1e-12);
+    cell = Math.sqrt(cell) * 2 || 1;
+    grid = new Map();
+    for (i = 0; i < n; i++) {
+      var key = Math.floor((xs[i] - gx0) / cell) + "," +
+        Math.floor((ys[i] - gy0) / cell);
+      var bucket = grid.get(key);
+      if (bucket) bucket.push(i); else grid.set(key, [i]);
+    }
+  }
+
+  function pick(px, py) {
+    if (grid === null) buildGrid();
+    var wx = (px - ox) / scale, wy = (py - oy) / scale;
+    var reach = Math.max((radius() + 4) / scale, 1e-9);
+    var span = Math.ceil(reach / cell);
+    var cx = Math.floor((wx - gx0) / cell), cy = Math.floor((wy - gy0) / cell);
+    var best = -1, bestDist = reach * reach;
+    if ((2 * span + 1) * (2 * span + 1) > n) {
+      // Zoomed far out: scanning every node is cheaper than the cells
+      for (var j = 0; j < n; j++) {
+        if (!visible[j]) continue;
+        var dj = (xs[j] - wx) * (xs[j] - wx) + (ys[j] - wy) * (ys[j] - wy);
+        if (dj <= bestDist) { best = j; bestDist = dj; }
+      }
+      return best;
+    }
+    for (var dx = -span; dx <= span; dx++) {
+      for (var dy = -span; dy <= span; dy++) {
+        var bucket = grid.get((cx + dx) + "," + (cy + dy));
+        if (!bucket) continue;
+        for (var k = 0; k < bucket.length; k++) {
+          var i = bucket[k];
+          if (!visible[i]) continue;
+          var d = (xs[i] - wx) * (xs[i] - wx) + (ys[i] - wy) * (ys[i] - wy);
+          if (d <= bestDist) { best = i; bestDist = d; }
+        }
+      }
+    }
+    return best;
+  }
+
+  // ---- details, loaded page by page ----
+  var details = document.getElementById("details");
+
+  function edgeList(node, title, start, order, other) {
+    var box = document.createElement("div");
+    var total = start[node + 1] - start[node];
+    var head = document.createElement("h2");
+    head.textContent = title + " (" + total + ")";
+    box.appendChild(head);
+    var list = document.createElement("div");
+    list.className = "list";
+    box.appendChild(list);
+    var shown = 0;
+    var more = document.createElement("button");
+    function page() {
+      var end = Math.min(shown + PAGE, total);
+      for (; shown < end; shown++) {
+        var e = order[start[node] + shown];
+        var peer = other[e];
+        var row = document.createElement("div");
+        row.textContent = data.edgeTypes[etype[e]] + "  " + nodeId(peer);
+        row.dataset.node = peer;
+        list.appendChild(row);
+      }
+      more.style.display = shown < total ? "" : "none";
+      more.textContent = "Show " + Math.min(PAGE, total - shown) + " more";
+    }
+    more.onclick = page;
+    box.appendChild(more);
+    page();
+    return box;
+  }
+
+  function select(i, center) {
+    selected = i;
+    details.textContent = "";
+    details.className = "";
+    if (i < 0) {
+      details.className = "muted";
+      details.textContent = "Click a node.";
+      redraw();
+      return;
+    }
+    adjacency();
+    var head = document.createElement("div");
+    head.innerHTML = "<b></b><div class='muted'></div><pre></pre>";
+    head.querySelector("b").textContent = nodeId(i);
+    head.querySelector("div").textContent = data.kinds[kind[i]];
+    head.querySelector("pre").textContent =
+      JSON.stringify(data.labelSets[labelOf[i]], null, 1);
+    details.appendChild(head);
+    details.appendChild(edgeList(i, "Outgoing", outStart, outEdges, dst));
+    details.appendChild(edgeList(i, "Incoming", inStart, inEdges, src));
+    if (center) {
+      ox = width / 2 - xs[i] * scale;
+      oy = height / 2 - ys[i] * scale;
+    }
+    redraw();
+  }
+
+  document.getElementById("sidebar").addEventListener("click", function (event) {
+    var node = event.target.dataset && event.target.dataset.node;
+    if (node !== undefined) select(Number(node), true);
+  });
+
+  // ---- filters ----
+  function parseLabelFilter(text) {
+    return text.split(",").map(function (s) { return s.trim(); }).filter(Boolean)
+      .map(function (part) {
+        if (part[0] === "!") return { key: part.slice(1), op: "absent" };
+        var eq = part.indexOf("=");
+        if (eq < 0) return { key: part, op: "exists" };
+        return {
+          key: part.slice(0, eq).trim(), op: "eq", value: part.slice(eq + 1).trim()
+        };
+      });
+  }
+
+  function applyFilters() {
+    var reqs = parseLabelFilter(document.getElementById("label-filter").value);
+    for (var s = 0; s < data.labelSets.length; s++) {
+      var labels = data.labelSets[s], ok = 1;
+      for (var q = 0; q < reqs.length && ok; q++) {
+        var has = Object.prototype.hasOwnProperty.call(labels, reqs[q].key);
+        if (reqs[q].op === "absent") ok = has ? 0 : 1;
+        else if (reqs[q].op === "exists") ok = has ? 1 : 0;
+        else ok = has && labels[reqs[q].key] === reqs[q].value ? 1 : 0;
+      }
+      labelOk[s] = ok;
+    }
+    var count = 0;
+    for (var i = 0; i < n; i++) {
+      // Label filters apply to pods; namespace and ipBlock nodes stay
+      visible[i] = nsEnabled[nsOf[i]] && (kind[i] !== 0 || labelOk[labelOf[i]]) ? 1 : 0;
+      count += visible[i];
+    }
+    if (selected >= 0 && !visible[selected]) select(-1, false);
+    document.getElementById("stats").textContent =
+      count + " of " + n + " nodes, " + m + " edges";
+    redraw();
+  }
+
+  var nsBox = document.getElementById("namespaces");
+  data.namespaces.forEach(function (ns, k) {
+    var label = document.createElement("label");
+    var box = document.createElement("input");
+    box.type = "checkbox"; box.checked = true;
+    box.onchange = function () { nsEnabled[k] = box.checked ? 1 : 0; applyFilters(); };
+    label.appendChild(box);
+    label.appendChild(document.createTextNode(" " + (ns || "(namespaces)")));
+    nsBox.appendChild(label);
+  });
+  function setAll(on) {
+    nsEnabled.fill(on ? 1 : 0);
+    nsBox.querySelectorAll("input").forEach(function (box) { box.checked = on; });
+    applyFilters();
+  }
+  document.getElementById("ns-all").onclick = function () { setAll(true); };
+  document.getElementById("ns-none").onclick = function () { setAll(false); };
+
+  var filterTimer = null;
+  document.getElementById("label-filter").addEventListener("input", function () {
+    clearTimeout(filterTimer);
+    filterTimer = setTimeout(applyFilters, 150);
+  });
+
+  // ---- search ----
+  var search = document.getElementById("search");
+  var matchBox = document.getElementById("matches");
+  var matches = [];
+  var searchTimer = null;
+  function runSearch() {
+    var query = search.value.trim().toLowerCase();
+    matches = [];
+    highlighted = new Set();
+    matchBox.textContent = "";
+    if (query) {
+      for (var i = 0; i < n && matches.length < 200; i++) {
+        if (visible[i] && nodeId(i).toLowerCase().indexOf(query) >= 0) matches.push(i);
+      }
+      matches.forEach(function (i) { highlighted.add(i); });
+      matches.slice(0, 50).forEach(function (i) {
+        var row = document.createElement("div");
+        row.textContent = nodeId(i);
+        row.dataset.node = i;
+        matchBox.appendChild(row);
+      });
+      if (matches.length > 50) {
+        var note = document.createElement("span");
+        note.className = "muted";
+        note.textContent =
+          "first 50 of " + matches.length + (matches.length === 200 ? "+" : "");
+        matchBox.appendChild(note);
+      }
+    }
+    redraw();
+  }
+  search.addEventListener("input", function () {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(runSearch, 150);
+  });
+  search.addEventListener("keydown", function (event) {
+    if (event.key === "Enter") {
+      runSearch();
+      if (matches.length) select(matches[0], true);
+    }
+  });
+
+  // ---- pan and zoom ----
+  var drag = null;
+  canvas.addEventListener("mousedown", function (event) {
+    drag = { x: event.offsetX, y: event.offsetY, ox: ox, oy: oy, moved: false };
+    canvas.style.cursor = "grabbing";
+  });
+  window.addEventListener("mousemove", function (event) {
+    if (!drag) return;
+    var rect = canvas.getBoundingClientRect();
+    var dx = event.clientX - rect.left - drag.x, dy = event.clientY - rect.top - drag.y;
+    if (Math.abs(dx) + Math.abs(dy) > 3) drag.moved = true;
+    ox = drag.ox + dx; oy = drag.oy + dy;
+    redraw();
+  });
+  window.addEventListener("mouseup", function (event) {
+    if (drag && !drag.moved) {
+      var rect = canvas.getBoundingClientRect();
+      select(pick(event.clientX - rect.left, event.clientY - rect.top), false);
+    }
+    drag = null;
+    canvas.style.cursor = "grab";
+  });
+  canvas.addEventListener("wheel", function (event) {
+    event.preventDefault();
+    var factor = Math.exp(-event.deltaY * 0.0015);
+    ox = event.offsetX - (event.offsetX - ox) * factor;
+    oy = event.offsetY - (event.offsetY - oy) * factor;
+    scale *= factor;
+    redraw();
+  }, { passive: false });
+  canvas.addEventListener("dblclick", fit);
+
+  window.addEventListener("resize", resize);
+  width = canvas.clientWidth; height = canvas.clientHeight;
+  resize();
+  applyFilters();
+  fit();
+})();
+"""
@@ -1,12 +1,32 @@
 # src/visualzer.py
 from dataclasses import dataclass
-from typing import Dict, List, Set
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 import matplotlib.pyplot as plt
 import networkx as nx
-from kubernetes import client
+import numpy as np
 from rich.console import Console
 
+from .aggregate import LEVELS, GraphAggregation
+from .cache import (
+    ResultCache,
+    cache_key,
+    content_hash,
+    default_cache,
+    labels_hash,
+    policies_hash,
+)
+from .engine import peer_selectors, policy_types, uses_namespace_selectors
+from .export import GraphWriter
+from .inventory import PodRecord, iter_pods
+from .matrix import LabelMatrix
+from .parallel import fork_available, fork_map, split
+from .sampling import ProgressiveSampler
+from .selector import LabelSelector, NamespaceIndex
+from .sources import ClusterSource
+from .viewer import write_html
+from .workloads import workload_owners
+
 console = Console()
 
 
@@ -16,29 +36,140 @@ class NetworkNode:
     kind: str
     namespace: str
     labels: Dict[str, str]
+    # "kind/name" of the pod's top-level owner, e.g. "deployment/web"
+    workload: str = ""
 
     def __hash__(self) -> int:
         return hash((self.name, self.namespace))
 
 
 class NetworkVisualizer:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        core_api: Optional[Any] = None,
+        namespace_index: Optional[NamespaceIndex] = None,
+        cache: Optional[ResultCache] = None,
+        jobs: int = 1,
+        level: str = "pod",
+        source: Optional[ClusterSource] = None,
+        verbose: bool = False,
+    ) -> None:
+        if level not in LEVELS:
+            raise ValueError(f"Unknown aggregation level: {level}")
         self.graph = nx.DiGraph()
-        self.core_api = client.CoreV1Api()
+        if source is None:
+            source = ClusterSource(core_api=core_api)
+        elif core_api is not None:
+            raise ValueError("Pass either core_api or source, not both")
+        self.source = source
+        self.core_api = source.core_api
+        self.cluster = source.cluster
+        self.namespace_index = (
+            namespace_index if namespace_index is not None else source.namespace_index
+        )
+        self.namespace = ""
+        self.namespace_pods: List[NetworkNode] = []
+        self.label_matrix: Optional[LabelMatrix] = None
+        self.selection: Optional[np.ndarray] = None
+        self.coverage = 1.0
+        self.cache = cache if cache is not None else default_cache()
+        self.writers: List[GraphWriter] = []
+        self.jobs = jobs
+        self.level = level
+        # Log every pod, rule and edge as the graph is built
+        self.verbose = verbose
+        # Pods of combined-selector namespaces, listed before forking workers
+        self._peer_pods: Optional[Dict[str, List[PodRecord]]] = None
         self.colors: Dict[str, str] = {
             "pod": "#4299E1",
             "namespace": "#48BB78",
             "ipblock": "#F6AD55",
+            "workload": "#9F7AEA",
             "allow": "#48BB78",
             "deny": "#F56565",
         }
 
-    def create_graph(self, namespace: str, policies: List[dict]) -> None:
+    def __getstate__(self) -> Dict[str, Any]:
+        # Worker processes build subgraphs from loaded state; API clients,
+        # the cache and the writers stay in this process
+        state = dict(self.__dict__)
+        state.update(source=None, core_api=None, cluster=None, cache=None, writers=[])
+        return state
+
+    def create_graph(
+        self,
+        namespace: str,
+        policies: List[dict],
+        sample: Optional[int] = None,
+        budget_seconds: Optional[float] = None,
+        writers: Optional[List[GraphWriter]] = None,
+    ) -> None:
+        """Build the policy graph for a namespace.
+
+        With ``sample`` or ``budget_seconds`` only representative pods of
+        each label class are drawn. The graph is rebuilt over progressively
+        larger stratified samples until the sample size or time budget is
+        reached, and :attr:`coverage` records the fraction of pods covered.
+
+        ``writers`` receive nodes and edges as they are added. Sampled and
+        cached graphs are written once complete instead, since sampling
+        rebuilds the graph every round, and so is the aggregated
+        :attr:`view` when :attr:`level` is above ``pod``.
+        """
+        if writers and self.level != "pod":
+            self.create_graph(namespace, policies, sample, budget_seconds)
+            view = self.view
+            for writer in writers:
+                writer.write_graph(view)
+            return
+
         self.namespace = namespace
-        self.graph.clear()
-        self._add_namespace_pods(namespace)
-        for policy in policies:
-            self._add_policy_to_graph(policy)
+        pods = self._fetch_namespace_pods(namespace)
+
+        # A time budget makes the result depend on timing, so it isn't cached
+        key = None
+        if budget_seconds is None:
+            records = [(p.namespace, p.name, p.labels, p.workload) for p in pods]
+            key = self._graph_key(namespace, policies, records, sample)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._load_cache_entry(cached)
+                for writer in writers or []:
+                    writer.write_graph(self.graph)
+                console.print(
+                    f"[green]Loaded cached graph with {self.graph.number_of_nodes()} "
+                    f"nodes and {self.graph.number_of_edges()} edges[/green]"
+                )
+                return
+
+        if sample is None and budget_seconds is None:
+            self.coverage = 1.0
+            self.writers = list(writers or [])
+            try:
+                self._build_graph(pods, policies)
+            finally:
+                self.writers = []
+        else:
+            sampler = ProgressiveSampler(
+                pods, sample=sample, budget_seconds=budget_seconds
+            )
+            self.graph.clear()
+            self._set_namespace_pods([])
+            for classes in sampler.rounds():
+                self.coverage = sampler.coverage(classes)
+                self._build_graph(
+                    [c.representative for c in classes],
+                    policies,
+                    class_sizes={c.representative: c.size for c in classes},
+                )
+                console.print(
+                    f"[cyan]Sampled {len(classes)}/{len(sampler.classes)} label "
+                    f"classes covering {self.coverage:.1%} of pods[/cyan]"
+                )
+            for writer in writers or []:
+                writer.write_graph(self.graph)
+        if key is not None:
+            self.cache.put(key, self._cache_entry())
 
         nodes_count = self.graph.number_of_nodes()
         edges_count = self.graph.number_of_edges()
@@ -47,12 +178,190 @@ class NetworkVisualizer:
             f"and {edges_count} edges[/green]"
         )
 
+    def _cache_entry(self) -> Dict[str, Any]:
+        """The built graph and its pods as a JSON value for the result cache"""
+        selection = None
+        if self.selection is not None:
+            selection = [np.flatnonzero(row).tolist() for row in self.selection]
+        return {
+            "nodes": [[node, attrs] for node, attrs in self.graph.nodes(data=True)],
+            "edges": [[u, v, attrs] for u, v, attrs in self.graph.edges(data=True)],
+            "pods": [
+                [p.name, p.kind, p.namespace, p.labels, p.workload]
+                for p in self.namespace_pods
+            ],
+            "selection": selection,
+            "coverage": self.coverage,
+        }
+
+    def _load_cache_entry(self, entry: Dict[str, Any]) -> None:
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from((node, dict(attrs)) for node, attrs in entry["nodes"])
+        self.graph.add_edges_from((u, v, dict(attrs)) for u, v, attrs in entry["edges"])
+        self.namespace_pods = [NetworkNode(*pod) for pod in entry["pods"]]
+        self.label_matrix = LabelMatrix([p.labels for p in self.namespace_pods])
+        self.selection = None
+        if entry["selection"] is not None:
+            rows = entry["selection"]
+            self.selection = np.zeros((len(rows), len(self.namespace_pods)), bool)
+            for i, columns in enumerate(rows):
+                self.selection[i, columns] = True
+        self.coverage = entry["coverage"]
+
+    def graph_key(
+        self, namespace: str, policies: List[dict], sample: Optional[int] = None
+    ) -> str:
+        """Hash of everything :meth:`create_graph` would draw, without drawing"""
+        records = [
+            (namespace, pod.name, pod.labels, _workload(pod))
+            for pod in iter_pods(self.core_api, namespace)
+        ]
+        return self._graph_key(namespace, policies, records, sample)
+
+    def _graph_key(
+        self,
+        namespace: str,
+        policies: List[dict],
+        pods: List[Tuple[str, str, Dict[str, str], str]],
+        sample: Optional[int],
+    ) -> str:
+        """Key covering every input the graph is built from.
+
+        ``pods`` are (namespace, name, labels, workload) of the namespace's
+        pods; workloads are hashed because nodes carry them, and a rollout
+        can change a pod's owner without changing its labels. Besides the
+        namespace's own pods and policies, the graph includes namespaces
+        picked by namespaceSelectors and the pods picked in them by combined
+        selectors, so those are hashed too.
+        """
+        by_namespace = {namespace: policies}
+        namespaces = ""
+        if uses_namespace_selectors(by_namespace):
+            namespaces = content_hash(self.namespace_index.table())
+            peer_namespaces: Set[str] = set()
+            for selector in self._dual_namespace_selectors(policies):
+                peer_namespaces |= self.namespace_index.resolve(selector)
+            peer_namespaces.discard(namespace)
+            records = self.cluster.list_pod_records(sorted(peer_namespaces))
+            for ns, ns_pods in records.items():
+                pods.extend(
+                    (ns, pod.name, pod.labels, _workload(pod)) for pod in ns_pods
+                )
+        return cache_key(
+            "graph",
+            namespace,
+            policies_hash(by_namespace),
+            labels_hash((ns, name, labels) for ns, name, labels, _ in pods),
+            content_hash(
+                sorted(
+                    [ns, name, workload] for ns, name, _, workload in pods if workload
+                )
+            ),
+            namespaces,
+            sample,
+        )
+
+    def _dual_namespace_selectors(self, policies: List[dict]) -> List[dict]:
+        """namespaceSelectors of peers that also have a podSelector"""
+        selectors = []
+        for policy in policies:
+            spec = policy.get("spec", {})
+            rules = (spec.get("ingress") or []) + (spec.get("egress") or [])
+            for rule in rules:
+                peers = rule.get("from") or rule.get("_from") or rule.get("to") or []
+                for peer in peers:
+                    pod_selector, ns_selector = peer_selectors(peer)
+                    if ns_selector is not None and pod_selector is not None:
+                        selectors.append(ns_selector)
+        return selectors
+
+    def _build_graph(
+        self,
+        pods: List[NetworkNode],
+        policies: List[dict],
+        class_sizes: Optional[Dict[NetworkNode, int]] = None,
+    ) -> None:
+        self.graph.clear()
+        self._set_namespace_pods(pods, class_sizes)
+
+        # Evaluate every policy's podSelector against all pods at once
+        selectors = [self._compile_selector(self._pod_selector(p)) for p in policies]
+        self.selection = self.selection_matrix(selectors)
+        if self.jobs > 1 and len(policies) > 1 and fork_available():
+            self._build_policies_parallel(policies)
+            return
+        for policy, row in zip(policies, self.selection):
+            selected = {self.namespace_pods[i] for i in np.flatnonzero(row)}
+            self._add_policy_to_graph(policy, selected_pods=selected)
+
+    def _build_policies_parallel(self, policies: List[dict]) -> None:
+        """Add the policies' edges from worker processes, merged in order.
+
+        Namespace labels and the pods of combined-selector namespaces are
+        loaded first, so forked workers inherit them and make no API calls,
+        and the API client's threads are stopped before forking.
+        Each worker returns the nodes and edges its share of the policies
+        adds; merging them in policy order gives the serial graph.
+        """
+        self.namespace_index.table()
+        peer_namespaces: Set[str] = set()
+        for selector in self._dual_namespace_selectors(policies):
+            peer_namespaces |= self.namespace_index.resolve(selector)
+        self._peer_pods = self.cluster.list_pod_records(sorted(peer_namespaces))
+        # Everything is loaded; stop the API threads so workers can be forked
+        self.cluster.close()
+        try:
+            chunks = split(range(len(policies)), self.jobs)
+            parts = fork_map(_policy_subgraph, (self, policies), chunks, self.jobs)
+            # Each part is written as soon as its worker returns it
+            for nodes, edges in parts:
+                for node_id, attrs in nodes:
+                    if node_id not in self.graph:
+                        self.graph.add_node(node_id, **attrs)
+                        for writer in self.writers:
+                            writer.write_node(node_id, self.graph.nodes[node_id])
+                for source_id, target_id, attrs in edges:
+                    if self.writers and not self.graph.has_edge(source_id, target_id):
+                        for writer in self.writers:
+                            writer.write_edge(source_id, target_id, attrs)
+                    self.graph.add_edge(source_id, target_id, **attrs)
+        finally:
+            self._peer_pods = None
+
+    def policy_subgraph(
+        self, policies: List[dict], indices: Sequence[int]
+    ) -> Tuple[List[Tuple[str, dict]], List[Tuple[str, str, dict]]]:
+        """New nodes and all edges that some of the policies add to the graph.
+
+        The graph itself is left unchanged.
+        """
+        assert self.selection is not None
+        graph, writers, quiet = self.graph, self.writers, console.quiet
+        self.graph, self.writers, console.quiet = nx.DiGraph(graph), [], True
+        try:
+            for i in indices:
+                row = self.selection[i]
+                selected = {self.namespace_pods[j] for j in np.flatnonzero(row)}
+                self._add_policy_to_graph(policies[i], selected_pods=selected)
+            nodes = [(n, d) for n, d in self.graph.nodes(data=True) if n not in graph]
+            return nodes, list(self.graph.edges(data=True))
+        finally:
+            self.graph, self.writers, console.quiet = graph, writers, quiet
+
+    @property
+    def view(self) -> nx.DiGraph:
+        """The graph at :attr:`level`: pods, or workload/namespace groups"""
+        if self.level == "pod":
+            return self.graph
+        return GraphAggregation(self.graph, self.level).graph
+
     def save_graph(self, output_file: str) -> None:
+        graph = self.view
         plt.figure(figsize=(12, 8))
-        pos = nx.spring_layout(self.graph, k=1, iterations=50)
-        self._draw_nodes(pos)
-        self._draw_edges(pos)
-        self._add_labels(pos)
+        pos = nx.spring_layout(graph, k=1, iterations=50)
+        self._draw_nodes(graph, pos)
+        self._draw_edges(graph, pos)
+        self._add_labels(graph, pos)
         plt.title("Network Policy Visualization")
         plt.axis("off")
         plt.tight_layout()
@@ -61,71 +370,133 @@ class NetworkVisualizer:
 
         console.print(f"[green]Network visualization saved to {output_file}[/green]")
 
+    def save_html(self, output_file: str) -> None:
+        """Write a self-contained interactive viewer of the graph"""
+        title = f"Network policies in {self.namespace}"
+        write_html(self.view, output_file, title=title, colors=self.colors)
+        console.print(f"[green]Interactive viewer saved to {output_file}[/green]")
+
+    def selection_matrix(self, selectors: List[Optional[LabelSelector]]) -> np.ndarray:
+        """Selectors × namespace pods selection matrix"""
+        assert self.label_matrix is not None
+        selection = np.zeros((len(selectors), self.label_matrix.size), dtype=bool)
+        for i, selector in enumerate(selectors):
+            if selector is not None:
+                selection[i] = self.label_matrix.select(selector)
+        return selection
+
+    def _pod_selector(self, policy: dict) -> dict:
+        spec = policy.get("spec", {})
+        selector: dict = spec.get("pod_selector") or spec.get("podSelector", {})
+        return selector
+
+    def _compile_selector(self, selector: Optional[dict]) -> Optional[LabelSelector]:
+        try:
+            return LabelSelector(selector)
+        except (KeyError, ValueError) as e:
+            console.print(f"[yellow]Warning: Invalid selector: {str(e)}[/yellow]")
+            return None
+
     def _add_namespace_pods(self, namespace: str) -> None:
         """Add all pods in the namespace to the graph"""
+        self._set_namespace_pods(self._fetch_namespace_pods(namespace))
+
+    def _fetch_namespace_pods(self, namespace: str) -> List[NetworkNode]:
+        """Pods of a namespace, read page by page as minimal records"""
+        nodes = []
         try:
-            pods = self.core_api.list_namespaced_pod(namespace)
-            console.print("\nPod Label Information:")
-            for pod in pods.items:
-                console.print(
-                    f"Pod: {pod.metadata.name}, " f"Labels: {pod.metadata.labels}"
-                )
-                node = NetworkNode(
-                    name=pod.metadata.name,
-                    kind="pod",
-                    namespace=namespace,
-                    labels=pod.metadata.labels or {},
+            if self.verbose:
+                console.print("\nPod Label Information:")
+            for pod in iter_pods(self.core_api, namespace):
+                if self.verbose:
+                    console.print(f"Pod: {pod.name}, " f"Labels: {pod.labels}")
+                nodes.append(
+                    NetworkNode(
+                        name=pod.name,
+                        kind="pod",
+                        namespace=namespace,
+                        labels=pod.labels,
+                        workload=_workload(pod),
+                    )
                 )
-                self._add_node(node)
         except Exception as e:
             message = f"[yellow]Warning: Failed to fetch pods: {str(e)}[/yellow]"
             console.print(message)
+        return nodes
 
-    def _add_policy_to_graph(self, policy: dict) -> None:
+    def _set_namespace_pods(
+        self,
+        pods: List[NetworkNode],
+        class_sizes: Optional[Dict[NetworkNode, int]] = None,
+    ) -> None:
+        self.namespace_pods = list(pods)
+        for node in self.namespace_pods:
+            if class_sizes is not None:
+                self._add_node(node, class_size=class_sizes[node])
+            else:
+                self._add_node(node)
+        self.label_matrix = LabelMatrix([pod.labels for pod in self.namespace_pods])
+
+    def _add_policy_to_graph(
+        self, policy: dict, selected_pods: Optional[Set[NetworkNode]] = None
+    ) -> None:
         """Process a network policy and add its rules to the graph"""
         spec = policy.get("spec", {})
 
         # Get pods selected by this policy
-        pod_selector = spec.get("pod_selector") or spec.get("podSelector", {})
-        selected_pods = self._get_selected_pods(self.namespace, pod_selector)
+        if selected_pods is None:
+            pod_selector = self._pod_selector(policy)
+            selected_pods = self._get_selected_pods(self.namespace, pod_selector)
 
-        pod_names = [pod.name for pod in selected_pods]
-        console.print(f"Selected pods: {pod_names}")
+        if self.verbose:
+            pod_names = [pod.name for pod in selected_pods]
+            console.print(f"Selected pods: {pod_names}")
+
+        # Rules for a direction missing from policyTypes are ignored
+        types = policy_types(spec)
 
         # Process ingress rules if they exist
         ingress_rules = spec.get("ingress", [])
-        if ingress_rules is not None:  # Check if ingress rules are defined
-            console.print("Processing ingress rules")
+        if ingress_rules is not None and "Ingress" in types:
+            if self.verbose:
+                console.print("Processing ingress rules")
             for rule in ingress_rules:
                 self._process_ingress_rule(rule, selected_pods)
 
         # Process egress rules if they exist
         egress_rules = spec.get("egress", [])
-        if egress_rules is not None:  # Check if egress rules are defined
-            console.print("Processing egress rules")
+        if egress_rules is not None and "Egress" in types:
+            if self.verbose:
+                console.print("Processing egress rules")
             for rule in egress_rules:
                 self._process_egress_rule(rule, selected_pods)
 
     def _get_selected_pods(self, namespace: str, selector: dict) -> Set[NetworkNode]:
         """Get pods that match a label selector"""
+        if self.label_matrix is not None and namespace == self.namespace:
+            # Already fetched; select from the label matrix without an API call
+            compiled = self._compile_selector(selector)
+            if compiled is None:
+                return set()
+            rows = np.flatnonzero(self.label_matrix.select(compiled))
+            return {self.namespace_pods[i] for i in rows}
+
         try:
             label_selector = self._build_label_selector(selector)
-            pods = self.core_api.list_namespaced_pod(
-                namespace, label_selector=label_selector
-            )
-
             selected = {
                 NetworkNode(
-                    name=pod.metadata.name,
+                    name=pod.name,
                     kind="pod",
                     namespace=namespace,
-                    labels=pod.metadata.labels or {},
+                    labels=pod.labels,
+                    workload=_workload(pod),
                 )
-                for pod in pods.items
+                for pod in iter_pods(self.core_api, namespace, label_selector)
             }
 
-            pod_names = [pod.name for pod in selected]
-            console.print(f"Found matching pods: {pod_names}")
+            if self.verbose:
+                pod_names = [pod.name for pod in selected]
+                console.print(f"Found matching pods: {pod_names}")
             return selected
 
         except Exception as e:
@@ -139,20 +510,17 @@ class NetworkVisualizer:
             return
 
         for from_peer in from_peers:
-            ns_selector = from_peer.get("namespace_selector") or from_peer.get(
-                "namespaceSelector"
-            )
-            pod_selector = from_peer.get("pod_selector") or from_peer.get("podSelector")
+            pod_selector, ns_selector = peer_selectors(from_peer)
 
             try:
                 # When we have both selectors in same peer (AND condition)
-                if ns_selector and pod_selector:
+                if ns_selector is not None and pod_selector is not None:
                     self._handle_dual_selector(ns_selector, pod_selector, target_pods)
-                # Handle single namespace selector
-                elif ns_selector:
+                # Handle single namespace selector; {} selects every namespace
+                elif ns_selector is not None:
                     self._handle_namespace_selector(ns_selector, target_pods)
-                # Handle single pod selector
-                elif pod_selector:
+                # Handle single pod selector, scoped to the policy's namespace
+                elif pod_selector is not None:
                     self._handle_pod_selector(pod_selector, self.namespace, target_pods)
 
             except Exception as e:
@@ -169,50 +537,53 @@ class NetworkVisualizer:
         target_pods: Set[NetworkNode],
     ) -> None:
         """Handle both namespace and pod selectors"""
-        ns_label_selector = self._build_label_selector(ns_selector)
-        namespaces = self.core_api.list_namespace(label_selector=ns_label_selector)
-
-        ns_names = [ns.metadata.name for ns in namespaces.items]
-        console.print(f"Found namespaces matching selector: {ns_names}")
-
-        for ns in namespaces.items:
-            pod_label_selector = self._build_label_selector(pod_selector)
-            pods = self.core_api.list_namespaced_pod(
-                ns.metadata.name, label_selector=pod_label_selector
-            )
-            console.print(f"Checking pods in namespace {ns.metadata.name}")
+        ns_names = sorted(self.namespace_index.resolve(ns_selector))
+        if self.verbose:
+            console.print(f"Found namespaces matching selector: {ns_names}")
 
-            for pod in pods.items:
+        compiled = LabelSelector(pod_selector)
+        pod_label_selector = self._build_label_selector(pod_selector)
+        pods_by_ns = self._peer_pod_records(ns_names, pod_label_selector)
+        for ns_name, pods in pods_by_ns.items():
+            if self.verbose:
+                console.print(f"Checking pods in namespace {ns_name}")
+
+            for pod in pods:
+                if not compiled.matches(pod.labels):
+                    continue
                 source = NetworkNode(
-                    name=pod.metadata.name,
+                    name=pod.name,
                     kind="pod",
-                    namespace=ns.metadata.name,
-                    labels=pod.metadata.labels or {},
+                    namespace=ns_name,
+                    labels=pod.labels,
+                    workload=_workload(pod),
                 )
                 self._add_node(source)
-                for target in target_pods:
-                    console.print(
-                        f"Adding edge: {source.namespace}/{source.name} "
-                        f"-> {target.namespace}/{target.name}"
-                    )
+                for target in _ordered(target_pods):
+                    if self.verbose:
+                        console.print(
+                            f"Adding edge: {source.namespace}/{source.name} "
+                            f"-> {target.namespace}/{target.name}"
+                        )
                     self._add_edge(source, target, "allow")
 
     def _handle_namespace_selector(
         self, ns_selector: dict, target_pods: Set[NetworkNode]
     ) -> None:
         """Handle namespace selector only"""
-        label_selector = self._build_label_selector(ns_selector)
-        namespaces = self.core_api.list_namespace(label_selector=label_selector)
-        for ns in namespaces.items:
+        for ns_name in sorted(self.namespace_index.resolve(ns_selector)):
             source = NetworkNode(
-                name=ns.metadata.name,
+                name=ns_name,
                 kind="namespace",
                 namespace="",
-                labels=ns.metadata.labels or {},
+                labels=self.namespace_index.labels(ns_name),
             )
             self._add_node(source)
-            for target in target_pods:
-                console.print(f"Adding namespace edge: {source.name} -> {target.name}")
+            for target in _ordered(target_pods):
+                if self.verbose:
+                    console.print(
+                        f"Adding namespace edge: {source.name} -> {target.name}"
+                    )
                 self._add_edge(source, target, "allow")
 
     def _handle_pod_selector(
@@ -223,25 +594,31 @@ class NetworkVisualizer:
     ) -> None:
         """Handle pod selector only"""
         source_pods = self._get_selected_pods(namespace, pod_selector)
-        for source in source_pods:
-            for target in target_pods:
-                console.print(f"Adding edge: {source.name} -> {target.name}")
+        targets = _ordered(target_pods)
+        for source in _ordered(source_pods):
+            for target in targets:
+                if self.verbose:
+                    console.print(f"Adding edge: {source.name} -> {target.name}")
                 self._add_node(source)
                 self._add_edge(source, target, "allow")
 
     def _process_egress_rule(self, rule: dict, source_pods: Set[NetworkNode]) -> None:
         """Process an egress rule and add relevant edges"""
-        pod_names = [pod.name for pod in source_pods]
-        console.print(f"Processing egress rule for sources: {pod_names}")
+        if self.verbose:
+            pod_names = [pod.name for pod in source_pods]
+            console.print(f"Processing egress rule for sources: {pod_names}")
 
-        for to_peer in rule.get("to", []):
+        for to_peer in rule.get("to") or []:
             target_pods = self._get_pods_from_peer(to_peer)
-            target_names = [pod.name for pod in target_pods]
-            console.print(f"Found target pods: {target_names}")
-
-            for source in source_pods:
-                for target in target_pods:
-                    console.print(f"Adding edge: {source.name} -> {target.name}")
+            if self.verbose:
+                target_names = [pod.name for pod in target_pods]
+                console.print(f"Found target pods: {target_names}")
+
+            targets = _ordered(target_pods)
+            for source in _ordered(source_pods):
+                for target in targets:
+                    if self.verbose:
+                        console.print(f"Adding edge: {source.name} -> {target.name}")
                     self._add_node(target)
                     self._add_edge(source, target, "allow")
 
@@ -249,15 +626,14 @@ class NetworkVisualizer:
         """Get pods that match both namespace and pod selectors"""
         pods = set()
 
-        pod_selector = peer.get("pod_selector") or peer.get("podSelector")
-        ns_selector = peer.get("namespace_selector") or peer.get("namespaceSelector")
+        pod_selector, ns_selector = peer_selectors(peer)
 
         try:
-            if ns_selector and pod_selector:
+            if ns_selector is not None and pod_selector is not None:
                 pods = self._get_pods_with_dual_selector(ns_selector, pod_selector)
-            elif ns_selector:
+            elif ns_selector is not None:
                 pods = self._get_pods_with_ns_selector(ns_selector)
-            elif pod_selector:
+            elif pod_selector is not None:
                 pods = self._get_selected_pods(self.namespace, pod_selector)
 
         except Exception as e:
@@ -273,46 +649,58 @@ class NetworkVisualizer:
     ) -> Set[NetworkNode]:
         """Get pods matching both namespace and pod selectors"""
         pods = set()
-        ns_label_selector = self._build_label_selector(ns_selector)
-        namespaces = self.core_api.list_namespace(label_selector=ns_label_selector)
-
+        compiled = LabelSelector(pod_selector)
         pod_label_selector = self._build_label_selector(pod_selector)
-        for ns in namespaces.items:
-            ns_pods = self.core_api.list_namespaced_pod(
-                ns.metadata.name, label_selector=pod_label_selector
-            )
-            for pod in ns_pods.items:
+        pods_by_ns = self._peer_pod_records(
+            sorted(self.namespace_index.resolve(ns_selector)), pod_label_selector
+        )
+        for ns_name, ns_pods in pods_by_ns.items():
+            for pod in ns_pods:
+                if not compiled.matches(pod.labels):
+                    continue
                 pods.add(
                     NetworkNode(
-                        name=pod.metadata.name,
+                        name=pod.name,
                         kind="pod",
-                        namespace=ns.metadata.name,
-                        labels=pod.metadata.labels or {},
+                        namespace=ns_name,
+                        labels=pod.labels,
+                        workload=_workload(pod),
                     )
                 )
-            pod_names = [p.name for p in pods]
-            console.print(f"Found pods in namespace {ns.metadata.name}: {pod_names}")
+            if self.verbose:
+                pod_names = [p.name for p in pods]
+                console.print(f"Found pods in namespace {ns_name}: {pod_names}")
 
         return pods
 
+    def _peer_pod_records(
+        self, namespaces: List[str], label_selector: str
+    ) -> Dict[str, List[PodRecord]]:
+        """Pods of combined-selector namespaces; callers match the labels"""
+        if self._peer_pods is not None:
+            return {ns: self._peer_pods.get(ns, []) for ns in namespaces}
+        return self.cluster.list_pod_records(namespaces, label_selector)
+
     def _get_pods_with_ns_selector(self, ns_selector: dict) -> Set[NetworkNode]:
         """Get pods using namespace selector only"""
         pods = set()
-        label_selector = self._build_label_selector(ns_selector)
-        namespaces = self.core_api.list_namespace(label_selector=label_selector)
-        for ns in namespaces.items:
+        for ns_name in sorted(self.namespace_index.resolve(ns_selector)):
             pods.add(
                 NetworkNode(
-                    name=ns.metadata.name,
+                    name=ns_name,
                     kind="namespace",
                     namespace="",
-                    labels=ns.metadata.labels or {},
+                    labels=self.namespace_index.labels(ns_name),
                 )
             )
         return pods
 
     def _build_label_selector(self, selector: dict) -> str:
-        """Build a label selector string from a selector dict"""
+        """Build a label selector string from a selector dict.
+
+        Only matchLabels are sent to the API server; matchExpressions are
+        applied to the listed pods afterwards.
+        """
         if not selector:
             return ""
 
@@ -323,16 +711,21 @@ class NetworkVisualizer:
 
         return ",".join(parts)
 
-    def _add_node(self, node: NetworkNode) -> None:
+    def _add_node(self, node: NetworkNode, **attrs: Any) -> None:
         """Add a node to the graph if it doesn't exist"""
         node_id = f"{node.namespace}/{node.name}"
         if node_id not in self.graph:
+            if node.workload:
+                attrs["workload"] = node.workload
             self.graph.add_node(
                 node_id,
                 kind=node.kind,
                 namespace=node.namespace,
                 labels=node.labels,
+                **attrs,
             )
+            for writer in self.writers:
+                writer.write_node(node_id, self.graph.nodes[node_id])
 
     def _add_edge(
         self, source: NetworkNode, target: NetworkNode, policy_type: str
@@ -340,48 +733,79 @@ class NetworkVisualizer:
         """Add an edge between nodes"""
         source_id = f"{source.namespace}/{source.name}"
         target_id = f"{target.namespace}/{target.name}"
+        if self.writers and not self.graph.has_edge(source_id, target_id):
+            for writer in self.writers:
+                writer.write_edge(source_id, target_id, {"type": policy_type})
         self.graph.add_edge(source_id, target_id, type=policy_type)
 
-    def _draw_nodes(self, pos: dict) -> None:
+    def _draw_nodes(self, graph: nx.DiGraph, pos: dict) -> None:
         """Draw nodes with different colors based on type"""
-        for kind in ["pod", "namespace", "ipblock"]:
-            nodes = [n for n, d in self.graph.nodes(data=True) if d["kind"] == kind]
+        for kind in ["pod", "workload", "namespace", "ipblock"]:
+            nodes = [n for n, d in graph.nodes(data=True) if d["kind"] == kind]
             if nodes:
+                # Aggregated nodes grow with the pods they stand for
+                sizes = [
+                    1000 * min(1 + np.log10(graph.nodes[n].get("count", 1)), 3)
+                    for n in nodes
+                ]
                 nx.draw_networkx_nodes(
-                    self.graph,
+                    graph,
                     pos,
                     nodelist=nodes,
                     node_color=self.colors[kind],
-                    node_size=1000,
+                    node_size=sizes,
                     alpha=0.8,
                 )
 
-    def _draw_edges(self, pos: dict) -> None:
+    def _draw_edges(self, graph: nx.DiGraph, pos: dict) -> None:
         """Draw edges with different colors based on policy type"""
         for policy_type in ["allow", "deny"]:
             edges = [
-                (u, v)
-                for u, v, d in self.graph.edges(data=True)
-                if d["type"] == policy_type
+                (u, v) for u, v, d in graph.edges(data=True) if d["type"] == policy_type
             ]
             if edges:
+                widths = [1 + np.log10(graph.edges[e].get("weight", 1)) for e in edges]
                 nx.draw_networkx_edges(
-                    self.graph,
+                    graph,
                     pos,
                     edgelist=edges,
                     edge_color=self.colors[policy_type],
+                    width=widths,
                     arrows=True,
                     arrowsize=20,
                 )
 
-    def _add_labels(self, pos: dict) -> None:
+    def _add_labels(self, graph: nx.DiGraph, pos: dict) -> None:
         """Add labels to nodes"""
         labels = {}
-        for node in self.graph.nodes():
+        for node in graph.nodes():
             name = node.split("/")[-1]
-            kind = self.graph.nodes[node]["kind"]
-            labels[node] = f"{kind}\n{name}"
+            attrs = graph.nodes[node]
+            labels[node] = f"{attrs['kind']}\n{name}"
+            if "count" in attrs:
+                labels[node] += f" ({attrs['count']})"
 
-        nx.draw_networkx_labels(
-            self.graph, pos, labels, font_size=8, font_weight="bold"
-        )
+        nx.draw_networkx_labels(graph, pos, labels, font_size=8, font_weight="bold")
+
+
+def _ordered(nodes: Iterable[NetworkNode]) -> List[NetworkNode]:
+    """Nodes in name order, which is the same in every process"""
+    # Set order follows the string hash seed, which forkserver workers
+    # don't share with this process
+    return sorted(nodes, key=lambda node: (node.namespace, node.name))
+
+
+def _workload(pod: PodRecord) -> str:
+    """ "kind/name" of a pod's top-level owner, or "" for a bare pod"""
+    owners = list(workload_owners(pod))
+    if not owners:
+        return ""
+    kind, name = owners[-1]
+    return f"{kind}/{name}"
+
+
+def _policy_subgraph(
+    state: Tuple[NetworkVisualizer, List[dict]], indices: Sequence[int]
+) -> Tuple[List[Tuple[str, dict]], List[Tuple[str, str, dict]]]:
+    visualizer, policies = state
+    return visualizer.policy_subgraph(policies, indices)
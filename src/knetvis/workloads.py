@@ -0,0 +1,137 @@
+import json
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .inventory import PodRecord
+from .models import Target
+from .selector import LabelSelector
+
+# Accepted spellings of each target kind, as kubectl accepts them
+KIND_ALIASES = {
+    "pod": "pod",
+    "pods": "pod",
+    "po": "pod",
+    "deployment": "deployment",
+    "deployments": "deployment",
+    "deploy": "deployment",
+    "statefulset": "statefulset",
+    "statefulsets": "statefulset",
+    "sts": "statefulset",
+    "daemonset": "daemonset",
+    "daemonsets": "daemonset",
+    "ds": "daemonset",
+    "replicaset": "replicaset",
+    "replicasets": "replicaset",
+    "rs": "replicaset",
+    "service": "service",
+    "services": "service",
+    "svc": "service",
+}
+
+
+def canonical_kind(kind: str) -> str:
+    """The canonical name of a target kind, e.g. ``deploy`` -> ``deployment``"""
+    try:
+        return KIND_ALIASES[kind.lower()]
+    except KeyError:
+        raise ValueError(f"Unsupported target kind: {kind}")
+
+
+class ServiceRecord(NamedTuple):
+    """A service and the pod labels it selects"""
+
+    namespace: str
+    name: str
+    # None for services without a selector, which select no pods
+    selector: Optional[Dict[str, str]]
+
+
+def fetch_services(core_api: Any, namespace: str, **kwargs: Any) -> List[ServiceRecord]:
+    """A namespace's services, parsed from the raw JSON like pod records"""
+    response = core_api.list_namespaced_service(
+        namespace, _preload_content=False, **kwargs
+    )
+    data = getattr(response, "data", None)
+    if not isinstance(data, (bytes, str)):
+        return [
+            ServiceRecord(namespace, svc.metadata.name, svc.spec.selector)
+            for svc in response.items
+        ]
+    try:
+        items = json.loads(data).get("items") or []
+        return [
+            ServiceRecord(
+                namespace,
+                item["metadata"]["name"],
+                (item.get("spec") or {}).get("selector"),
+            )
+            for item in items
+        ]
+    finally:
+        release = getattr(response, "release_conn", None)
+        if release is not None:
+            release()
+
+
+def workload_owners(pod: PodRecord) -> Iterator[Tuple[str, str]]:
+    """(kind, name) of the workloads a pod belongs to.
+
+    A Deployment owns its pods through a ReplicaSet named
+    ``<deployment>-<pod-template-hash>``, so the Deployment is derived from
+    the ReplicaSet's name instead of fetching every ReplicaSet.
+    """
+    for kind, name in pod.owners:
+        kind = kind.lower()
+        yield kind, name
+        template_hash = pod.labels.get("pod-template-hash")
+        if kind == "replicaset" and template_hash:
+            suffix = f"-{template_hash}"
+            if name.endswith(suffix):
+                yield "deployment", name[: -len(suffix)]
+
+
+class WorkloadIndex:
+    """Pods of each workload and service, indexed from one bulk listing.
+
+    Owner references and service selectors are indexed once, so resolving a
+    target to its pods needs no further API calls.
+    """
+
+    def __init__(
+        self,
+        pods: Dict[str, List[PodRecord]],
+        services: Dict[str, List[ServiceRecord]],
+    ) -> None:
+        self.pods = pods
+        self._owned: Dict[Tuple[str, str, str], List[PodRecord]] = {}
+        for namespace, records in pods.items():
+            for pod in records:
+                self._owned.setdefault((namespace, "pod", pod.name), []).append(pod)
+                for kind, name in workload_owners(pod):
+                    self._owned.setdefault((namespace, kind, name), []).append(pod)
+        self._services = {
+            (svc.namespace, svc.name): svc
+            for records in services.values()
+            for svc in records
+        }
+
+    def exists(self, target: Target) -> bool:
+        """Whether the target is a known service, or owns at least one pod"""
+        kind = canonical_kind(target.kind)
+        if kind == "service":
+            return (target.namespace, target.name) in self._services
+        return (target.namespace, kind, target.name) in self._owned
+
+    def resolve(self, target: Target) -> List[PodRecord]:
+        """The pods a target stands for"""
+        kind = canonical_kind(target.kind)
+        if kind != "service":
+            return list(self._owned.get((target.namespace, kind, target.name), []))
+        service = self._services.get((target.namespace, target.name))
+        if service is None or not service.selector:
+            return []
+        selector = LabelSelector({"matchLabels": service.selector})
+        return [
+            pod
+            for pod in self.pods.get(target.namespace, [])
+            if selector.matches(pod.labels)
+        ]
@@ -0,0 +1,111 @@
+"""Slow reference evaluator for NetworkPolicy semantics.
+
+Written directly from the upstream API documentation, on raw policy dicts,
+without sharing code with knetvis so the fast paths can be checked against
+it. Nothing is compiled, indexed or cached.
+"""
+
+from typing import Dict, List, Optional
+
+from knetvis.models import Endpoint
+
+
+def _field(obj: dict, camel: str, snake: str) -> Optional[object]:
+    if obj.get(camel) is not None:
+        return obj[camel]
+    return obj.get(snake)
+
+
+def selector_matches(selector: dict, labels: Dict[str, str]) -> bool:
+    """LabelSelector semantics; ``{}`` matches everything"""
+    match_labels = _field(selector, "matchLabels", "match_labels") or {}
+    for key, value in match_labels.items():
+        if key not in labels or labels[key] != value:
+            return False
+    for expr in _field(selector, "matchExpressions", "match_expressions") or []:
+        key, operator = expr["key"], expr["operator"]
+        values = expr.get("values") or []
+        if operator == "In" and not (key in labels and labels[key] in values):
+            return False
+        if operator == "NotIn" and key in labels and labels[key] in values:
+            return False
+        if operator == "Exists" and key not in labels:
+            return False
+        if operator == "DoesNotExist" and key in labels:
+            return False
+    return True
+
+
+def affected_types(spec: dict) -> List[str]:
+    """policyTypes, defaulted the way the API server does"""
+    types = _field(spec, "policyTypes", "policy_types")
+    if types:
+        return list(types)
+    if spec.get("egress"):
+        return ["Ingress", "Egress"]
+    return ["Ingress"]
+
+
+def peer_matches(
+    peer: dict,
+    policy_namespace: str,
+    pod: Endpoint,
+    namespace_labels: Dict[str, Dict[str, str]],
+) -> bool:
+    if _field(peer, "ipBlock", "ip_block") is not None:
+        return False
+    pod_selector = _field(peer, "podSelector", "pod_selector")
+    namespace_selector = _field(peer, "namespaceSelector", "namespace_selector")
+    if pod_selector is None and namespace_selector is None:
+        return False
+    if namespace_selector is None:
+        in_scope = pod.namespace == policy_namespace
+    else:
+        in_scope = selector_matches(
+            namespace_selector, namespace_labels.get(pod.namespace, {})
+        )
+    if not in_scope:
+        return False
+    return pod_selector is None or selector_matches(pod_selector, pod.labels)
+
+
+def direction_allowed(
+    policies: Dict[str, List[dict]],
+    namespace_labels: Dict[str, Dict[str, str]],
+    policy_type: str,
+    subject: Endpoint,
+    peer: Endpoint,
+) -> bool:
+    """Whether the subject's policies admit traffic with peer in one direction"""
+    direction = policy_type.lower()
+    peer_key = "from" if policy_type == "Ingress" else "to"
+    isolated = False
+    for policy in policies.get(subject.namespace, []):
+        spec = policy.get("spec") or {}
+        pod_selector = _field(spec, "podSelector", "pod_selector") or {}
+        if not selector_matches(pod_selector, subject.labels):
+            continue
+        if policy_type not in affected_types(spec):
+            continue
+        isolated = True
+        for rule in spec.get(direction) or []:
+            peers = rule.get(peer_key)
+            if peers is None:
+                peers = rule.get("_" + peer_key)
+            if not peers:
+                return True
+            for p in peers:
+                if peer_matches(p, subject.namespace, peer, namespace_labels):
+                    return True
+    return not isolated
+
+
+def allowed(
+    policies: Dict[str, List[dict]],
+    namespace_labels: Dict[str, Dict[str, str]],
+    source: Endpoint,
+    dest: Endpoint,
+) -> bool:
+    return direction_allowed(
+        policies, namespace_labels, "Egress", source, dest
+    ) and direction_allowed(policies, namespace_labels, "Ingress", dest, source)
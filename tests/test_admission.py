@@ -0,0 +1,314 @@
+import io
+import json
+import socket
+import ssl
+import subprocess
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from knetvis.admission import (
+    AdmissionChecker,
+    AdmissionServer,
+    ProtectedFlow,
+    load_protected_flows,
+)
+from knetvis.fakeapi import FakeApiServer
+from knetvis.models import Target
+from knetvis.policy import PolicyParser
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+
+
+def _policy(name, pod_selector, ingress=None, types=("Ingress",)):
+    spec = {"podSelector": pod_selector, "policyTypes": list(types)}
+    if ingress is not None:
+        spec["ingress"] = ingress
+    return {"metadata": {"name": name, "namespace": "shop"}, "spec": spec}
+
+
+DEFAULT_DENY = _policy("default-deny", {})
+WEB_TO_DB = _policy(
+    "web-to-db",
+    {"matchLabels": {"app": "db"}},
+    [{"from": [{"podSelector": {"matchLabels": {"app": "web"}}}]}],
+)
+OPS_TO_WEB = _policy(
+    "ops-to-web",
+    {"matchLabels": {"app": "web"}},
+    [{"from": [{"namespaceSelector": {"matchLabels": {"team": "ops"}}}]}],
+)
+FLOWS = [
+    ProtectedFlow(Target("shop", "pod", "web"), Target("shop", "pod", "db")),
+    ProtectedFlow(Target("ops", "pod", "monitor"), Target("shop", "pod", "web")),
+]
+
+
+@pytest.fixture
+def checker():
+    snapshot = ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {"team": "shop"}, "ops": {"team": "ops"}, "misc": {}},
+        pods={
+            "shop": {"web": {"app": "web"}, "db": {"app": "db"}},
+            "ops": {"monitor": {"app": "monitor"}},
+            "misc": {},
+        },
+        policies={"shop": [DEFAULT_DENY, WEB_TO_DB, OPS_TO_WEB]},
+    )
+    simulator = TrafficSimulator(PolicyParser(snapshot=snapshot))
+    return AdmissionChecker(simulator, FLOWS)
+
+
+def _review(operation, policy, uid="123", dry_run=False):
+    request = {
+        "uid": uid,
+        "kind": {"group": "networking.k8s.io", "kind": "NetworkPolicy"},
+        "namespace": policy["metadata"]["namespace"],
+        "name": policy["metadata"]["name"],
+        "operation": operation,
+        "dryRun": dry_run,
+    }
+    if operation == "DELETE":
+        request["oldObject"] = policy
+    else:
+        request["object"] = policy
+    return {
+        "apiVersion": "admission.k8s.io/v1",
+        "kind": "AdmissionReview",
+        "request": request,
+    }
+
+
+def test_protected_flows_start_allowed(checker):
+    assert checker.verdicts == {0: 1, 1: 1}
+    assert checker.unresolved == []
+
+
+def test_deleting_an_allowing_policy_is_rejected(checker):
+    decision = checker.check("shop", "web-to-db", None)
+
+    assert not decision.allowed
+    assert decision.broken == [FLOWS[0]]
+    assert "shop/pod/web -> shop/pod/db" in decision.message
+
+
+def test_replacing_a_policy_is_checked_against_every_flow(checker):
+    narrowed = _policy(
+        "ops-to-web",
+        {"matchLabels": {"app": "web"}},
+        [{"from": [{"namespaceSelector": {"matchLabels": {"team": "other"}}}]}],
+    )
+
+    decision = checker.check("shop", "ops-to-web", narrowed)
+
+    assert decision.broken == [FLOWS[1]]
+    assert decision.checked == 2
+
+
+def test_changes_elsewhere_check_no_flows(checker):
+    policy = dict(DEFAULT_DENY, metadata={"name": "deny", "namespace": "misc"})
+
+    decision = checker.check("misc", "deny", policy)
+
+    assert decision.allowed
+    assert decision.checked == 0
+
+
+def test_applied_changes_update_the_warm_state(checker):
+    all_to_db = _policy(
+        "all-to-db", {"matchLabels": {"app": "db"}}, [{"from": [{"podSelector": {}}]}]
+    )
+
+    checker.apply("shop", "all-to-db", all_to_db)
+    # web -> db is still allowed through the new policy
+    assert checker.check("shop", "web-to-db", None).allowed
+
+
+def test_review_answers_admission_requests(checker):
+    response = checker.review(_review("DELETE", WEB_TO_DB, uid="abc"))
+
+    assert response["kind"] == "AdmissionReview"
+    assert response["response"]["uid"] == "abc"
+    assert response["response"]["allowed"] is False
+    assert response["response"]["status"]["code"] == 403
+
+
+def test_reviews_do_not_change_the_warm_state(checker):
+    allow_all = _policy("allow-all", {}, [{}])
+
+    for dry_run in (True, False):
+        review = _review("CREATE", allow_all, dry_run=dry_run)
+        assert checker.review(review)["response"]["allowed"]
+    # A later webhook or the API server may still reject the change
+    assert not checker.check("shop", "web-to-db", None).allowed
+
+
+def test_other_kinds_are_allowed(checker):
+    review = _review("CREATE", WEB_TO_DB)
+    review["request"]["kind"]["kind"] = "ConfigMap"
+
+    assert checker.review(review)["response"] == {"uid": "123", "allowed": True}
+
+
+def test_flows_with_missing_pods_are_unresolved(checker):
+    missing = ProtectedFlow(Target("shop", "pod", "gone"), Target("shop", "pod", "db"))
+    checker = AdmissionChecker(checker.simulator, FLOWS + [missing])
+
+    assert checker.unresolved == [missing]
+    assert checker.check("shop", "web-to-db", None).checked == 2
+
+
+def test_load_protected_flows(tmp_path):
+    path = tmp_path / "flows.yaml"
+    path.write_text("- from: shop/pod/web\n  to: shop/pod/db\n")
+
+    assert load_protected_flows(str(path)) == [FLOWS[0]]
+
+
+def test_server_answers_and_records_reviews(checker):
+    recording = io.StringIO()
+    server = AdmissionServer(checker, ("127.0.0.1", 0), recording=recording)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        body = json.dumps(_review("DELETE", WEB_TO_DB)).encode()
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{server.server_port}/validate",
+            data=body,
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            answer = json.loads(response.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert answer["response"]["allowed"] is False
+    assert json.loads(recording.getvalue()) == json.loads(body)
+
+
+def test_tls_handshakes_do_not_block_other_clients(checker, tmp_path):
+    cert, key = str(tmp_path / "cert.pem"), str(tmp_path / "key.pem")
+    try:
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+            + ["-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+            check=True,
+            capture_output=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("openssl is not available")
+    server = AdmissionServer(checker, ("127.0.0.1", 0), cert, key)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    # Connects but never starts the handshake
+    stalled = socket.create_connection(("127.0.0.1", server.server_port))
+    try:
+        request = urllib.request.Request(
+            f"https://127.0.0.1:{server.server_port}/validate",
+            data=json.dumps(_review("DELETE", WEB_TO_DB)).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        context = ssl._create_unverified_context()
+        with urllib.request.urlopen(request, timeout=2, context=context) as response:
+            answer = json.loads(response.read())
+    finally:
+        stalled.close()
+        server.shutdown()
+        server.server_close()
+
+    assert answer["response"]["allowed"] is False
+
+
+@pytest.mark.parametrize("failure_policy, allowed", [("Ignore", True), ("Fail", False)])
+def test_failed_checks_follow_the_failure_policy(checker, failure_policy, allowed):
+    checker = AdmissionChecker(checker.simulator, FLOWS, failure_policy)
+    checker.engine = None  # a broken warm state
+
+    response = checker.review(_review("DELETE", WEB_TO_DB))["response"]
+
+    assert response["allowed"] is allowed
+    if allowed:
+        assert "Failed to check policy" in response["warnings"][0]
+        assert "status" not in response
+    else:
+        assert response["status"]["code"] == 500
+
+
+def test_unknown_failure_policy(checker):
+    with pytest.raises(ValueError):
+        AdmissionChecker(checker.simulator, FLOWS, "Maybe")
+
+
+def test_workload_and_service_targets_are_resolved():
+    web = {"app": "web", "pod-template-hash": "abc"}
+    snapshot = ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {}},
+        pods={
+            "shop": {
+                "web-1": web,
+                "web-2": dict(web, track="canary"),
+                "db-0": {"app": "db"},
+            }
+        },
+        policies={"shop": [DEFAULT_DENY, WEB_TO_DB]},
+        owners={
+            "shop": {
+                "web-1": [["ReplicaSet", "web-abc"]],
+                "web-2": [["ReplicaSet", "web-abc"]],
+            }
+        },
+        services={"shop": {"db": {"app": "db"}}},
+    )
+    flow = ProtectedFlow(
+        Target("shop", "deployment", "web"), Target("shop", "service", "db")
+    )
+    checker = AdmissionChecker(
+        TrafficSimulator(PolicyParser(snapshot=snapshot)), [flow]
+    )
+    canary_only = _policy(
+        "web-to-db",
+        {"matchLabels": {"app": "db"}},
+        [{"from": [{"podSelector": {"matchLabels": {"track": "canary"}}}]}],
+    )
+
+    assert checker.unresolved == []
+    assert checker.verdicts == {0: 2}
+    # One of the two replicas loses access
+    assert checker.check("shop", "web-to-db", canary_only).broken == [flow]
+
+
+def test_unsupported_target_kinds_are_rejected(tmp_path):
+    path = tmp_path / "flows.yaml"
+    path.write_text("- from: shop/configmap/web\n  to: shop/pod/db\n")
+
+    with pytest.raises(Exception, match="Unsupported target kind"):
+        load_protected_flows(str(path))
+
+
+def test_watched_policy_changes_update_the_warm_state(checker):
+    snapshot = checker.simulator.policy_parser.source.snapshot
+    with FakeApiServer(snapshot) as api:
+        simulator = TrafficSimulator(source=api.source())
+        checker = AdmissionChecker(simulator, FLOWS)
+        server = AdmissionServer(checker, ("127.0.0.1", 0))
+        stop = threading.Event()
+        server.watch_policies(stop, timeout_seconds=5)
+        try:
+            # Wait for the list and the watch, so the change arrives as an event
+            deadline = time.monotonic() + 5
+            path = "/apis/networking.k8s.io/v1/networkpolicies"
+            while api.requests.count(path) < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            api.delete("NetworkPolicy", "web-to-db", "shop")
+            while checker.verdicts[0] and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            stop.set()
+            server.server_close()
+
+    assert checker.verdicts == {0: 0, 1: 1}
@@ -0,0 +1,173 @@
+import networkx as nx
+import pytest
+
+from knetvis.aggregate import GraphAggregation
+from knetvis.fleet import visualize_cluster
+from knetvis.snapshot import ClusterSnapshot
+
+
+@pytest.fixture
+def graph():
+    graph = nx.DiGraph()
+    for name, workload in [("web-1", "deployment/web"), ("web-2", "deployment/web")]:
+        graph.add_node(
+            f"shop/{name}",
+            kind="pod",
+            namespace="shop",
+            labels={"app": "web"},
+            workload=workload,
+        )
+    graph.add_node("shop/db-0", kind="pod", namespace="shop", labels={"app": "db"})
+    graph.add_node("/ops", kind="namespace", namespace="", labels={"team": "ops"})
+    graph.add_node(
+        "ops/monitor",
+        kind="pod",
+        namespace="ops",
+        labels={},
+        workload="daemonset/monitor",
+    )
+    for source in ("shop/web-1", "shop/web-2", "/ops"):
+        graph.add_edge(source, "shop/db-0", type="allow")
+    graph.add_edge("ops/monitor", "shop/web-1", type="allow")
+    return graph
+
+
+def test_workload_level_merges_replicas(graph):
+    view = GraphAggregation(graph, "workload").graph
+
+    assert sorted(view.nodes) == [
+        "/ops",
+        "ops/daemonset/monitor",
+        "shop/db-0",
+        "shop/deployment/web",
+    ]
+    assert view.nodes["shop/deployment/web"]["count"] == 2
+    assert view.nodes["shop/deployment/web"]["kind"] == "workload"
+    # A pod without an owner stays as it is
+    assert view.nodes["shop/db-0"]["kind"] == "pod"
+    assert view.edges["shop/deployment/web", "shop/db-0"]["weight"] == 2
+
+
+def test_namespace_level_merges_pods_by_namespace(graph):
+    aggregation = GraphAggregation(graph, "namespace")
+    view = aggregation.graph
+
+    assert sorted(view.nodes) == ["/ops", "ns:ops", "ns:shop"]
+    assert view.nodes["ns:ops"]["count"] == 1
+    assert view.edges["/ops", "ns:shop"]["weight"] == 1
+    assert view.edges["ns:ops", "ns:shop"]["weight"] == 1
+    assert view.edges["ns:shop", "ns:shop"]["weight"] == 2
+    assert sorted(aggregation.members["ns:shop"]) == [
+        "shop/db-0",
+        "shop/web-1",
+        "shop/web-2",
+    ]
+
+
+@pytest.mark.parametrize("peer_first", [True, False])
+def test_namespace_groups_do_not_collide_with_namespace_nodes(peer_first):
+    graph = nx.DiGraph()
+    peer = ("/shop", {"kind": "namespace", "namespace": "", "labels": {"a": "b"}})
+    pod = ("shop/web", {"kind": "pod", "namespace": "shop", "labels": {}})
+    graph.add_nodes_from([peer, pod] if peer_first else [pod, peer])
+    graph.add_edge("/shop", "shop/web", type="allow")
+
+    view = GraphAggregation(graph, "namespace").graph
+
+    assert view.nodes["/shop"] == {
+        "kind": "namespace",
+        "namespace": "",
+        "labels": {"a": "b"},
+        "count": 1,
+    }
+    assert view.nodes["ns:shop"]["count"] == 1
+    assert view.nodes["ns:shop"]["labels"] == {}
+    assert list(view.edges) == [("/shop", "ns:shop")]
+
+
+def test_expand_drills_down_one_level(graph):
+    aggregation = GraphAggregation(graph, "namespace")
+
+    shop = aggregation.expand("ns:shop")
+    assert sorted(shop.graph.nodes) == [
+        "/ops",
+        "ns:ops",
+        "shop/db-0",
+        "shop/deployment/web",
+    ]
+
+    web = shop.expand("shop/deployment/web")
+    assert sorted(web.graph.nodes) == [
+        "/ops",
+        "ns:ops",
+        "shop/db-0",
+        "shop/web-1",
+        "shop/web-2",
+    ]
+    assert web.graph.edges["ns:ops", "shop/web-1"]["weight"] == 1
+    assert web.graph.edges["/ops", "shop/db-0"]["weight"] == 1
+
+
+def test_sampled_class_sizes_are_counted(graph):
+    graph.nodes["shop/web-1"]["class_size"] = 10
+    graph.nodes["shop/db-0"]["class_size"] = 3
+
+    view = GraphAggregation(graph, "workload").graph
+
+    assert view.nodes["shop/deployment/web"]["count"] == 11
+    assert view.edges["shop/deployment/web", "shop/db-0"]["weight"] == 33
+
+
+def test_unknown_level_is_rejected(graph):
+    with pytest.raises(ValueError):
+        GraphAggregation(graph, "cluster")
+
+
+def _snapshot(replicas):
+    pods = {
+        f"web-abc-{i}": {"app": "web", "pod-template-hash": "abc"}
+        for i in range(replicas)
+    }
+    pods["db-0"] = {"app": "db"}
+    return ClusterSnapshot(
+        context="prod",
+        namespaces={"shop": {}},
+        pods={"shop": pods},
+        policies={
+            "shop": [
+                {
+                    "metadata": {"name": "web-to-db"},
+                    "spec": {
+                        "podSelector": {"matchLabels": {"app": "db"}},
+                        "ingress": [
+                            {"from": [{"podSelector": {"matchLabels": {"app": "web"}}}]}
+                        ],
+                    },
+                }
+            ]
+        },
+        owners={
+            "shop": {
+                **{
+                    name: [["ReplicaSet", "web-abc"]] for name in pods if name != "db-0"
+                },
+                "db-0": [["StatefulSet", "db"]],
+            }
+        },
+    )
+
+
+@pytest.mark.parametrize("replicas", [2, 50])
+def test_workload_view_size_is_independent_of_replicas(tmp_path, replicas):
+    result = visualize_cluster(
+        _snapshot(replicas),
+        "shop",
+        str(tmp_path),
+        formats=("ndjson",),
+        level="workload",
+    )
+
+    assert result.details["nodes"] == 2
+    assert result.details["edges"] == 1
+    with open(result.details["output_file"]) as f:
+        assert '"shop/deployment/web"' in f.read()
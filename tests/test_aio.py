@@ -0,0 +1,105 @@
+import time
+
+import pytest
+from kubernetes import client
+
+from knetvis.aio import AsyncClusterClient, ClusterClient
+from knetvis.fakeapi import FakeApiServer
+from knetvis.snapshot import ClusterSnapshot
+
+
+def _snapshot(namespace_count):
+    names = [f"ns-{i}" for i in range(namespace_count)]
+    return ClusterSnapshot(
+        context="test",
+        namespaces={ns: {"team": f"t{i % 3}"} for i, ns in enumerate(names)},
+        pods={ns: {f"web-{i}": {"app": "web"}} for i, ns in enumerate(names)},
+        policies={
+            ns: [
+                {
+                    "metadata": {"name": f"deny-{i}"},
+                    "spec": {"podSelector": {}, "policyTypes": ["Ingress"]},
+                }
+            ]
+            for i, ns in enumerate(names)
+        },
+    )
+
+
+@pytest.fixture
+def fake_api_server():
+    """Start a fake API server over ``namespace_count`` namespaces"""
+    servers = []
+
+    def start(namespace_count, latency=0.0):
+        server = FakeApiServer(_snapshot(namespace_count), latency=latency).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def _cluster_client(server, **kwargs):
+    api_client = server.api_client()
+    return ClusterClient(
+        core_api=client.CoreV1Api(api_client),
+        networking_api=client.NetworkingV1Api(api_client),
+        **kwargs,
+    )
+
+
+def test_list_pods_pipelines_requests(fake_api_server):
+    server = fake_api_server(40, latency=0.2)
+    cluster = _cluster_client(server, max_concurrency=20)
+    namespaces = [f"ns-{i}" for i in range(40)]
+
+    start = time.monotonic()
+    pods = cluster.list_pods(namespaces)
+    elapsed = time.monotonic() - start
+
+    assert list(pods) == namespaces
+    assert pods["ns-7"].items[0].metadata.name == "web-7"
+    # 40 sequential requests would take at least 8 seconds
+    assert elapsed < 4.0
+    assert 1 < server.max_in_flight <= 20
+
+
+def test_concurrency_is_bounded(fake_api_server):
+    server = fake_api_server(12, latency=0.02)
+    cluster = _cluster_client(server, max_concurrency=3)
+
+    namespaces = cluster.read_namespaces(f"ns-{i}" for i in range(12))
+
+    assert namespaces["ns-4"].metadata.labels == {"team": "t1"}
+    assert server.max_in_flight <= 3
+
+
+def test_list_policies_returns_dicts(fake_api_server):
+    server = fake_api_server(3)
+    cluster = _cluster_client(server)
+
+    policies = cluster.list_policies(["ns-0", "ns-2", "ns-0"])
+
+    assert list(policies) == ["ns-0", "ns-2"]
+    assert policies["ns-2"][0]["metadata"]["name"] == "deny-2"
+
+
+def test_request_timeout(fake_api_server):
+    server = fake_api_server(1, latency=1.0)
+    cluster = _cluster_client(server, timeout=0.1)
+
+    with pytest.raises(Exception, match="timed out"):
+        cluster.read_pods([("ns-0", "web-0")])
+
+
+def test_missing_resource_raises_api_exception(fake_api_server):
+    server = fake_api_server(1)
+    api_client = server.api_client()
+    aio = AsyncClusterClient(core_api=client.CoreV1Api(api_client))
+    cluster = ClusterClient(core_api=aio.core_api)
+
+    with pytest.raises(client.exceptions.ApiException) as excinfo:
+        cluster.run(aio.read_namespaced_pod("missing", "ns-0"))
+    assert excinfo.value.status == 404
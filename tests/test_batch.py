@@ -0,0 +1,162 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+from kubernetes import client
+
+from knetvis.batch import MANIFEST, load_manifest, render_all
+from knetvis.cache import default_cache
+from knetvis.cli import cli
+from knetvis.fakeapi import FakeApiServer
+from knetvis.snapshot import ClusterSnapshot
+
+
+@pytest.fixture
+def snapshot():
+    return ClusterSnapshot(
+        context="prod",
+        namespaces={"shop": {}, "ops": {"team": "ops"}, "empty": {}},
+        pods={
+            "shop": {"web": {"app": "web"}, "api": {"app": "api"}},
+            "ops": {"probe": {"team": "ops"}},
+        },
+        policies={
+            "shop": [
+                {
+                    "metadata": {"name": "api"},
+                    "spec": {
+                        "podSelector": {"matchLabels": {"app": "api"}},
+                        "ingress": [
+                            {
+                                "from": [
+                                    {"podSelector": {"matchLabels": {"app": "web"}}},
+                                    {
+                                        "namespaceSelector": {
+                                            "matchLabels": {"team": "ops"}
+                                        }
+                                    },
+                                ]
+                            }
+                        ],
+                    },
+                }
+            ]
+        },
+    )
+
+
+def _statuses(results):
+    return {r.namespace: r.status for r in results}
+
+
+def test_unchanged_namespaces_are_skipped(snapshot, tmp_path):
+    out = str(tmp_path)
+
+    first = render_all(snapshot, out, formats=("graphml",))
+    assert _statuses(first) == {n: "rendered" for n in ("empty", "ops", "shop")}
+    assert os.path.exists(tmp_path / "shop-network-policies.graphml")
+    assert not [f for f in os.listdir(out) if f.startswith(".")]
+    manifest = load_manifest(out)
+    assert manifest["context"] == "prod"
+    assert manifest["namespaces"]["shop"]["files"] == ["shop-network-policies.graphml"]
+    assert manifest["namespaces"]["shop"]["seconds"] > 0
+
+    second = render_all(snapshot, out, formats=("graphml",))
+    assert set(_statuses(second).values()) == {"unchanged"}
+    assert [r.hash for r in second] == [r.hash for r in first]
+
+    # shop only depends on ops' namespace labels, not on its pods
+    snapshot.pods["ops"]["probe"] = {"team": "ops", "v": "2"}
+    os.remove(tmp_path / "empty-network-policies.graphml")
+    third = render_all(snapshot, out, formats=("graphml",))
+    assert _statuses(third) == {
+        "empty": "rendered",
+        "ops": "rendered",
+        "shop": "unchanged",
+    }
+    snapshot.namespaces["ops"] = {"team": "platform"}
+    fourth = render_all(snapshot, out, formats=("graphml",))
+    assert _statuses(fourth)["shop"] == "rendered"
+
+    # Another level is another render
+    fifth = render_all(snapshot, out, level="namespace", formats=("graphml",))
+    assert set(_statuses(fifth).values()) == {"rendered"}
+
+
+def test_removed_namespaces_lose_their_files(snapshot, tmp_path):
+    render_all(snapshot, str(tmp_path), formats=("graphml", "dot"))
+    del snapshot.namespaces["ops"]
+    del snapshot.pods["ops"]
+
+    render_all(snapshot, str(tmp_path), formats=("graphml", "dot"))
+
+    assert not os.path.exists(tmp_path / "ops-network-policies.dot")
+    assert sorted(load_manifest(str(tmp_path))["namespaces"]) == ["empty", "shop"]
+
+
+def test_worker_pool_matches_serial(snapshot, tmp_path):
+    # A cached graph is written nodes first; compare graphs built both ways
+    default_cache().clear()
+    serial = render_all(snapshot, str(tmp_path / "serial"), formats=("ndjson",))
+    default_cache().clear()
+    pooled = render_all(snapshot, str(tmp_path / "pooled"), formats=("ndjson",), jobs=2)
+
+    assert [(r.namespace, r.hash, r.edges) for r in pooled] == [
+        (r.namespace, r.hash, r.edges) for r in serial
+    ]
+    for name in ("shop", "ops"):
+        path = f"{name}-network-policies.ndjson"
+        assert (tmp_path / "pooled" / path).read_text() == (
+            tmp_path / "serial" / path
+        ).read_text()
+
+
+def test_cli_visualize_all(snapshot, tmp_path):
+    path = str(tmp_path / "prod.json")
+    snapshot.save(path)
+    out = tmp_path / "out"
+    runner = CliRunner()
+    args = ["visualize", "--all", "--snapshot", path, "--out-dir", str(out)]
+
+    result = runner.invoke(cli, args + ["--format", "graphml"])
+    assert result.exit_code == 0, result.output
+    assert "3 rendered, 0 unchanged, 0 failed" in result.output
+    with open(out / MANIFEST) as f:
+        assert sorted(json.load(f)["namespaces"]) == ["empty", "ops", "shop"]
+
+    result = runner.invoke(cli, args + ["--format", "graphml"])
+    assert "0 rendered, 3 unchanged, 0 failed" in result.output
+
+    result = runner.invoke(cli, ["visualize", "shop", "--all"])
+    assert result.exit_code == 2
+
+
+def test_cli_visualize_all_in_cluster(snapshot, tmp_path):
+    """Without a kubeconfig the in-cluster configuration is used"""
+    with FakeApiServer(snapshot) as server:
+        configuration = client.Configuration()
+        configuration.host = server.url
+
+        def load_incluster_config():
+            client.Configuration.set_default(configuration)
+
+        with patch(
+            "kubernetes.config.load_incluster_config",
+            side_effect=load_incluster_config,
+        ), patch(
+            "kubernetes.config.list_kube_config_contexts",
+            side_effect=Exception("no kubeconfig"),
+        ):
+            try:
+                result = CliRunner().invoke(
+                    cli,
+                    ["visualize", "--all", "--out-dir", str(tmp_path)]
+                    + ["--format", "graphml"],
+                )
+            finally:
+                client.Configuration.set_default(None)
+
+    assert "3 rendered, 0 unchanged, 0 failed" in result.output, result.output
+    assert load_manifest(str(tmp_path))["context"] == "in-cluster"
@@ -0,0 +1,222 @@
+import copy
+import pickle
+
+import pytest
+
+from knetvis.cache import ResultCache, cache_key, content_hash, policies_hash
+from knetvis.models import Target
+from knetvis.policy import PolicyParser
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+from knetvis.visualizer import NetworkVisualizer
+
+API_POLICY = {
+    "metadata": {"name": "api-ingress", "resourceVersion": "1"},
+    "spec": {
+        "podSelector": {"matchLabels": {"app": "api"}},
+        "policyTypes": ["Ingress"],
+        "ingress": [
+            {
+                "from": [
+                    {"podSelector": {"matchLabels": {"app": "web"}}},
+                    {"namespaceSelector": {"matchLabels": {"team": "ops"}}},
+                ]
+            }
+        ],
+    },
+}
+
+WEB = Target("shop", "pod", "web")
+API = Target("shop", "pod", "api")
+PROBE = Target("ops", "pod", "probe")
+
+
+@pytest.fixture
+def snapshot():
+    return ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {"team": "shop"}, "ops": {"team": "ops"}},
+        pods={
+            "shop": {"web": {"app": "web"}, "api": {"app": "api"}},
+            "ops": {"probe": {"app": "probe"}},
+        },
+        policies={"shop": [API_POLICY], "ops": []},
+    )
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash([1, 2]) != content_hash([2, 1])
+
+
+def test_policies_hash_ignores_metadata_noise():
+    changed = copy.deepcopy(API_POLICY)
+    changed["metadata"]["resourceVersion"] = "2"
+    assert policies_hash({"shop": [API_POLICY]}) == policies_hash({"shop": [changed]})
+
+    changed["spec"]["policyTypes"] = ["Ingress", "Egress"]
+    assert policies_hash({"shop": [API_POLICY]}) != policies_hash({"shop": [changed]})
+
+
+def test_memory_tier_is_lru():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_disk_tier_survives_restart_and_evicts_by_size(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_bytes=2500)
+    cache.put(cache_key("x", 1), "1" * 1000)
+    cache.put(cache_key("x", 2), "2" * 1000)
+
+    restarted = ResultCache(directory=str(tmp_path), max_bytes=2500)
+    assert restarted.get(cache_key("x", 1)) == "1" * 1000
+
+    restarted.put(cache_key("x", 3), "3" * 1000)
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    fresh = ResultCache(directory=str(tmp_path))
+    assert fresh.get(cache_key("x", 2)) is None
+    assert fresh.get(cache_key("x", 1)) is not None
+
+
+def test_disk_tier_scans_only_over_the_threshold(tmp_path, monkeypatch):
+    cache = ResultCache(directory=str(tmp_path), max_bytes=1000)
+    scans = []
+    entries = cache._disk_entries
+    monkeypatch.setattr(cache, "_disk_entries", lambda: scans.append(1) or entries())
+
+    for i in range(5):
+        cache.put(cache_key("x", i), "v" * 100)
+    assert len(scans) == 1
+
+    for i in range(5, 10):
+        cache.put(cache_key("x", i), "v" * 100)
+    assert len(scans) == 2
+    assert sum(f.stat().st_size for f in tmp_path.glob("*.json")) <= 900
+
+
+def test_disk_tier_does_not_unpickle(tmp_path):
+    key = cache_key("x", 1)
+    (tmp_path / f"{key}.pickle").write_bytes(pickle.dumps({"planted": True}))
+    (tmp_path / f"{key}.json").write_bytes(pickle.dumps({"planted": True}))
+
+    cache = ResultCache(directory=str(tmp_path))
+    assert cache.get(key) is None
+    with pytest.raises(TypeError):
+        cache.put(cache_key("x", 2), object())
+
+
+def test_connectivity_results_are_cached(snapshot):
+    cache = ResultCache()
+    simulator = TrafficSimulator(PolicyParser(snapshot=snapshot), cache=cache)
+
+    assert simulator.test_connectivity(WEB, API) is True
+    assert simulator.test_connectivity(API, WEB) is True
+    assert cache.misses == 2  # direction is part of the key
+
+    assert simulator.test_connectivity(WEB, API) is True
+    assert cache.hits == 1
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda s: s.pods["shop"]["web"].update(app="other"),
+        lambda s: s.namespaces["ops"].update(team="dev"),
+        lambda s: s.policies["shop"][0]["spec"].pop("ingress"),
+    ],
+)
+def test_changed_inputs_invalidate(snapshot, change):
+    cache = ResultCache()
+    simulator = TrafficSimulator(PolicyParser(snapshot=snapshot), cache=cache)
+    before = simulator.test_connectivity(PROBE, API), simulator.test_connectivity(
+        WEB, API
+    )
+
+    changed = copy.deepcopy(snapshot)
+    change(changed)
+    simulator = TrafficSimulator(PolicyParser(snapshot=changed), cache=cache)
+    after = simulator.test_connectivity(PROBE, API), simulator.test_connectivity(
+        WEB, API
+    )
+
+    # Stale entries would have returned the old answers
+    assert before == (True, True)
+    assert after != before
+
+
+def test_graph_is_cached_until_labels_change(snapshot, monkeypatch):
+    cache = ResultCache()
+    parser = PolicyParser(snapshot=snapshot)
+    visualizer = NetworkVisualizer(
+        core_api=parser.core_api, namespace_index=parser.namespace_index, cache=cache
+    )
+    visualizer.create_graph("shop", [API_POLICY])
+    edges = set(visualizer.graph.edges)
+
+    def rebuild(*args, **kwargs):
+        raise AssertionError("graph rebuilt")
+
+    monkeypatch.setattr(visualizer, "_build_graph", rebuild)
+    visualizer.create_graph("shop", [API_POLICY])
+    assert set(visualizer.graph.edges) == edges
+    assert cache.hits == 1
+
+    snapshot.namespaces["ops"]["team"] = "dev"
+    parser = PolicyParser(snapshot=snapshot)
+    visualizer = NetworkVisualizer(
+        core_api=parser.core_api, namespace_index=parser.namespace_index, cache=cache
+    )
+    visualizer.create_graph("shop", [API_POLICY])
+    assert ("/ops", "shop/api") not in visualizer.graph.edges
+    assert cache.hits == 1
+
+
+def test_graph_is_rebuilt_when_owners_change(snapshot):
+    cache = ResultCache()
+
+    def graph():
+        parser = PolicyParser(snapshot=snapshot)
+        visualizer = NetworkVisualizer(
+            core_api=parser.core_api,
+            namespace_index=parser.namespace_index,
+            cache=cache,
+        )
+        visualizer.create_graph("shop", [API_POLICY])
+        return visualizer.graph
+
+    snapshot.owners = {"shop": {"web": [["StatefulSet", "web"]]}}
+    assert graph().nodes["shop/web"]["workload"] == "statefulset/web"
+
+    # A rollout replaces the owner but keeps the labels
+    snapshot.owners = {"shop": {"web": [["StatefulSet", "web-v2"]]}}
+    assert graph().nodes["shop/web"]["workload"] == "statefulset/web-v2"
+    assert cache.hits == 0
+
+
+def test_graph_survives_restart_on_disk(snapshot, tmp_path, monkeypatch):
+    parser = PolicyParser(snapshot=snapshot)
+
+    def visualizer():
+        return NetworkVisualizer(
+            core_api=parser.core_api,
+            namespace_index=parser.namespace_index,
+            cache=ResultCache(directory=str(tmp_path)),
+        )
+
+    built = visualizer()
+    built.create_graph("shop", [API_POLICY])
+
+    loaded = visualizer()
+    monkeypatch.setattr(loaded, "_build_graph", None)
+    loaded.create_graph("shop", [API_POLICY])
+    assert list(loaded.graph.nodes(data=True)) == list(built.graph.nodes(data=True))
+    assert list(loaded.graph.edges(data=True)) == list(built.graph.edges(data=True))
+    assert loaded.namespace_pods == built.namespace_pods
+    assert loaded.selection.tolist() == built.selection.tolist()
@@ -0,0 +1,291 @@
+"""Generated differential corpus: every fast path against tests/reference.py"""
+
+import random
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pytest
+
+from knetvis.cache import ResultCache
+from knetvis.engine import PolicyEngine
+from knetvis.matrix import evaluate_pairs
+from knetvis.models import Endpoint, Target
+from knetvis.policy import PolicyParser
+from knetvis.reachability import ReachabilityIndex
+from knetvis.sampling import ProgressiveSampler, progressive_matrix
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+from knetvis.visualizer import NetworkVisualizer
+
+from . import reference
+
+SEEDS = range(60)
+KEYS = ["app", "tier", "env"]
+VALUES = ["a", "b", "c"]
+NAMESPACES = ["ns1", "ns2", "ns3", "ns4"]
+
+
+def _labels(rng):
+    return {k: rng.choice(VALUES) for k in KEYS if rng.random() < 0.6}
+
+
+def _selector(rng):
+    """A label selector; empty in about a quarter of cases"""
+    selector = {}
+    if rng.random() < 0.5:
+        selector["matchLabels"] = {rng.choice(KEYS): rng.choice(VALUES)}
+    if rng.random() < 0.4:
+        operator = rng.choice(["In", "NotIn", "Exists", "DoesNotExist"])
+        expr = {"key": rng.choice(KEYS), "operator": operator}
+        if operator in ("In", "NotIn"):
+            expr["values"] = rng.sample(VALUES, 2)
+        selector["matchExpressions"] = [expr]
+    return selector
+
+
+def _peer(rng):
+    kind = rng.choice(["pod", "namespace", "both", "ipBlock"])
+    if kind == "ipBlock":
+        return {"ipBlock": {"cidr": "10.0.0.0/8"}}
+    peer = {}
+    if kind in ("pod", "both"):
+        peer["podSelector"] = _selector(rng)
+    if kind in ("namespace", "both"):
+        peer["namespaceSelector"] = _selector(rng)
+    return peer
+
+
+def _rules(rng, peer_key):
+    rules = []
+    for _ in range(rng.randint(0, 2)):
+        rule = {}
+        shape = rng.random()
+        if shape < 0.1:
+            rule[peer_key] = []
+        elif shape < 0.85:
+            rule[peer_key] = [_peer(rng) for _ in range(rng.randint(1, 2))]
+        if rng.random() < 0.3:
+            rule["ports"] = [{"port": 80, "protocol": "TCP"}]
+        rules.append(rule)
+    return rules
+
+
+def _policy(rng, i):
+    spec = {"podSelector": _selector(rng)}
+    types = rng.random()
+    if types < 0.15:
+        spec["policyTypes"] = []
+    elif types < 0.6:
+        spec["policyTypes"] = rng.sample(["Ingress", "Egress"], rng.randint(1, 2))
+    if rng.random() < 0.7:
+        spec["ingress"] = _rules(rng, "from")
+    if rng.random() < 0.6:
+        spec["egress"] = _rules(rng, "to")
+    return {"metadata": {"name": f"p{i}"}, "spec": spec}
+
+
+def _to_dict_form(policy):
+    """The same policy as kubernetes client models' to_dict() renders it"""
+
+    def selector(s):
+        if s is None:
+            return None
+        return {
+            "match_labels": s.get("matchLabels"),
+            "match_expressions": s.get("matchExpressions"),
+        }
+
+    def peer(p):
+        return {
+            "pod_selector": selector(p.get("podSelector")),
+            "namespace_selector": selector(p.get("namespaceSelector")),
+            "ip_block": p.get("ipBlock"),
+        }
+
+    def rules(items, key, snake):
+        if items is None:
+            return None
+        converted = []
+        for rule in items:
+            peers = rule.get(key)
+            converted.append(
+                {
+                    snake: None if peers is None else [peer(p) for p in peers],
+                    "ports": rule.get("ports"),
+                }
+            )
+        return converted
+
+    spec = policy["spec"]
+    return {
+        "metadata": dict(policy["metadata"]),
+        "spec": {
+            "pod_selector": selector(spec.get("podSelector")),
+            "policy_types": spec.get("policyTypes"),
+            "ingress": rules(spec.get("ingress"), "from", "_from"),
+            "egress": rules(spec.get("egress"), "to", "to"),
+        },
+    }
+
+
+@lru_cache(maxsize=None)
+def _case(seed):
+    rng = random.Random(seed)
+    namespaces = {ns: _labels(rng) for ns in NAMESPACES}
+    endpoints = [
+        Endpoint(rng.choice(NAMESPACES), f"pod{i}", _labels(rng)) for i in range(40)
+    ]
+    policies = {}
+    for ns in NAMESPACES:
+        docs = [_policy(rng, i) for i in range(rng.randint(0, 3))]
+        policies[ns] = [
+            _to_dict_form(doc) if rng.random() < 0.3 else doc for doc in docs
+        ]
+    expected = np.array(
+        [
+            [reference.allowed(policies, namespaces, src, dst) for dst in endpoints]
+            for src in endpoints
+        ]
+    )
+    pods = {ns: {} for ns in NAMESPACES}
+    for e in endpoints:
+        pods[e.namespace][e.name] = e.labels
+    snapshot = ClusterSnapshot(
+        context=f"seed-{seed}", namespaces=namespaces, pods=pods, policies=policies
+    )
+    return snapshot, endpoints, policies, expected
+
+
+def _engine(seed):
+    snapshot, endpoints, policies, expected = _case(seed)
+    parser = PolicyParser(snapshot=snapshot)
+    return PolicyEngine(policies, parser.namespace_index), endpoints, expected
+
+
+def test_corpus_exercises_both_outcomes():
+    outcomes = np.concatenate([_case(seed)[3].ravel() for seed in SEEDS])
+    assert 0.1 < outcomes.mean() < 0.9
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_engine_matches_reference(seed):
+    engine, endpoints, expected = _engine(seed)
+
+    for i, src in enumerate(endpoints):
+        for j, dst in enumerate(endpoints):
+            assert engine.allowed(src, dst) == expected[i, j], (src, dst)
+            assert engine.explain(src, dst).allowed == expected[i, j], (src, dst)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_matrix_matches_reference(seed):
+    engine, endpoints, expected = _engine(seed)
+
+    np.testing.assert_array_equal(evaluate_pairs(engine, endpoints), expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_sampled_matrix_matches_reference(seed):
+    engine, endpoints, expected = _engine(seed)
+    position = {e.name: i for i, e in enumerate(endpoints)}
+    sampler = ProgressiveSampler(endpoints, first_round=4)
+
+    for estimate in progressive_matrix(engine, sampler):
+        rows = [position[c.representative.name] for c in estimate.classes]
+        np.testing.assert_array_equal(
+            estimate.allowed.astype(bool), expected[np.ix_(rows, rows)]
+        )
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_reachability_index_matches_reference(seed):
+    engine, endpoints, expected = _engine(seed)
+    index = ReachabilityIndex(engine, endpoints)
+
+    for i, pod in enumerate(endpoints):
+        sources = {e.name for e in index.who_can_reach(pod)}
+        assert sources == {e.name for e, ok in zip(endpoints, expected[:, i]) if ok}
+        dests = {e.name for e in index.reachable_from(pod)}
+        assert dests == {e.name for e, ok in zip(endpoints, expected[i]) if ok}
+
+
+@pytest.fixture(scope="module")
+def shared_cache():
+    # One cache for every seed, so a key that misses an input would return
+    # another case's result
+    return ResultCache(max_entries=100000)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_cached_connectivity_matches_reference(seed, shared_cache):
+    snapshot, endpoints, _, expected = _case(seed)
+    simulator = TrafficSimulator(PolicyParser(snapshot=snapshot), cache=shared_cache)
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(40), rng.randrange(40)) for _ in range(40)]
+
+    for _ in range(2):
+        for i, j in pairs:
+            src, dst = endpoints[i], endpoints[j]
+            allowed = simulator.test_connectivity(
+                Target(src.namespace, "pod", src.name),
+                Target(dst.namespace, "pod", dst.name),
+            )
+            assert allowed == expected[i, j], (src, dst)
+
+
+@pytest.mark.parametrize("seed", SEEDS[::6])
+def test_parallel_matrix_matches_reference(seed):
+    engine, endpoints, expected = _engine(seed)
+
+    np.testing.assert_array_equal(evaluate_pairs(engine, endpoints, jobs=3), expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS[::6])
+def test_parallel_graph_matches_serial(seed):
+    snapshot = _case(seed)[0]
+    parser = PolicyParser(snapshot=snapshot)
+
+    def build(namespace, jobs):
+        visualizer = NetworkVisualizer(
+            core_api=parser.core_api,
+            namespace_index=parser.namespace_index,
+            cache=ResultCache(),
+            jobs=jobs,
+        )
+        visualizer.create_graph(namespace, parser.get_namespace_policies(namespace))
+        graph = visualizer.graph
+        return list(graph.nodes(data=True)), list(graph.edges(data=True))
+
+    for namespace in NAMESPACES:
+        assert build(namespace, 3) == build(namespace, 1)
+
+
+def test_parallel_results_match_beside_live_threads():
+    """With another thread alive, workers start from a forkserver instead"""
+    seed = 6
+    engine, endpoints, expected = _engine(seed)
+    parser = PolicyParser(snapshot=_case(seed)[0])
+
+    def build(namespace, jobs):
+        visualizer = NetworkVisualizer(
+            core_api=parser.core_api,
+            namespace_index=parser.namespace_index,
+            cache=ResultCache(),
+            jobs=jobs,
+        )
+        visualizer.create_graph(namespace, parser.get_namespace_policies(namespace))
+        return list(visualizer.graph.edges(data=True))
+
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        np.testing.assert_array_equal(
+            evaluate_pairs(engine, endpoints, jobs=3), expected
+        )
+        for namespace in NAMESPACES:
+            assert build(namespace, 3) == build(namespace, 1)
+    finally:
+        stop.set()
+        thread.join()
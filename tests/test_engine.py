@@ -0,0 +1,283 @@
+import pytest
+from click.testing import CliRunner
+
+from knetvis.cli import cli
+from knetvis.engine import PolicyEngine
+from knetvis.models import Endpoint, Target
+from knetvis.policy import PolicyParser
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+
+API_POLICY = {
+    "metadata": {"name": "api-ingress", "namespace": "shop"},
+    "spec": {
+        "podSelector": {"matchLabels": {"app": "api"}},
+        "policyTypes": ["Ingress"],
+        "ingress": [
+            {"from": [{"podSelector": {"matchLabels": {"app": "admin"}}}]},
+            {
+                "from": [
+                    {"namespaceSelector": {"matchLabels": {"team": "ops"}}},
+                    {"podSelector": {"matchLabels": {"app": "web"}}},
+                ]
+            },
+        ],
+    },
+}
+
+DENY_EGRESS = {
+    "metadata": {"name": "deny-egress", "namespace": "shop"},
+    "spec": {
+        "podSelector": {"matchLabels": {"app": "batch"}},
+        "policyTypes": ["Egress"],
+    },
+}
+
+
+@pytest.fixture
+def snapshot():
+    return ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {"team": "shop"}, "ops": {"team": "ops"}},
+        pods={
+            "shop": {
+                "web": {"app": "web"},
+                "api": {"app": "api"},
+                "batch": {"app": "batch"},
+            },
+            "ops": {"probe": {"app": "probe"}},
+        },
+        policies={"shop": [API_POLICY, DENY_EGRESS], "ops": []},
+    )
+
+
+@pytest.fixture
+def simulator(snapshot):
+    return TrafficSimulator(PolicyParser(snapshot=snapshot))
+
+
+def test_explain_reports_deciding_rule_and_peer(simulator):
+    explanation = simulator.explain_connectivity(
+        Target("shop", "pod", "web"), Target("shop", "pod", "api")
+    )
+
+    assert explanation.allowed
+    assert explanation.egress.reason == "no policy selects shop/web"
+    assert explanation.ingress.policy == "shop/api-ingress"
+    assert (explanation.ingress.rule, explanation.ingress.peer) == (1, 1)
+
+
+def test_explain_namespace_peer(simulator):
+    explanation = simulator.explain_connectivity(
+        Target("ops", "pod", "probe"), Target("shop", "pod", "api")
+    )
+
+    assert explanation.allowed
+    assert (explanation.ingress.rule, explanation.ingress.peer) == (1, 0)
+    assert "namespaceSelector 'team=ops'" in explanation.ingress.reason
+
+
+def test_explain_denial_names_selecting_policies(simulator):
+    explanation = simulator.explain_connectivity(
+        Target("shop", "pod", "batch"), Target("shop", "pod", "api")
+    )
+
+    assert not explanation.allowed
+    assert not explanation.egress.allowed
+    assert explanation.egress.selecting == ["shop/deny-egress"]
+    assert (
+        simulator.test_connectivity(
+            Target("shop", "pod", "batch"), Target("shop", "pod", "api")
+        )
+        is False
+    )
+
+
+def test_matrix_explains_single_pair_without_reevaluating(simulator):
+    targets = [Target("shop", "pod", n) for n in ("web", "api", "batch")]
+    matrix = simulator.connectivity_matrix(targets)
+
+    assert matrix.array.astype(int).tolist() == [[1, 1, 1], [1, 0, 1], [0, 0, 0]]
+
+    def fail(*args):
+        raise AssertionError("matrix re-evaluated")
+
+    matrix.engine.allowed = fail
+    explanation = matrix.explain(0, 1)
+    assert explanation.ingress.rule == 1
+
+
+def test_engine_reads_to_dict_form(snapshot):
+    parser = PolicyParser(snapshot=snapshot)
+    policy = {
+        "metadata": {"name": "snake"},
+        "spec": {
+            "pod_selector": {"match_labels": {"app": "api"}},
+            "policy_types": ["Ingress"],
+            "ingress": [
+                {"_from": [{"pod_selector": {"match_labels": {"app": "web"}}}]}
+            ],
+            "egress": None,
+        },
+    }
+    engine = PolicyEngine({"shop": [policy]}, parser.namespace_index)
+    api = Endpoint("shop", "api", {"app": "api"})
+
+    assert engine.allowed(Endpoint("shop", "web", {"app": "web"}), api)
+    assert not engine.allowed(Endpoint("shop", "batch", {"app": "batch"}), api)
+
+
+def test_test_command_explain(snapshot, tmp_path):
+    path = tmp_path / "test.json"
+    snapshot.save(str(path))
+
+    result = CliRunner().invoke(
+        cli,
+        ["test", "shop/pod/web", "shop/pod/api", "--explain", "--snapshot", str(path)],
+    )
+
+    assert result.exit_code == 0
+    assert "Traffic is allowed" in result.output
+    assert "shop/api-ingress" in result.output
+
+
+def _engine(snapshot, spec):
+    parser = PolicyParser(snapshot=snapshot)
+    policy = {"metadata": {"name": "p"}, "spec": spec}
+    return PolicyEngine({"shop": [policy]}, parser.namespace_index)
+
+
+WEB = Endpoint("shop", "web", {"app": "web"})
+API = Endpoint("shop", "api", {"app": "api"})
+PROBE = Endpoint("ops", "probe", {"app": "probe"})
+
+
+def test_policy_types_default_to_ingress(snapshot):
+    # No policyTypes and no ingress section: ingress is still isolated
+    engine = _engine(snapshot, {"podSelector": {"matchLabels": {"app": "api"}}})
+
+    assert not engine.allowed(WEB, API)
+    assert engine.allowed(API, WEB)
+
+
+def test_egress_rules_imply_egress_type(snapshot):
+    engine = _engine(
+        snapshot,
+        {
+            "podSelector": {"matchLabels": {"app": "api"}},
+            "egress": [{"to": [{"podSelector": {"matchLabels": {"app": "web"}}}]}],
+        },
+    )
+
+    assert engine.allowed(API, WEB)
+    assert not engine.allowed(API, PROBE)
+    assert not engine.allowed(WEB, API)
+
+
+def test_unaffected_direction_does_not_allow(snapshot):
+    parser = PolicyParser(snapshot=snapshot)
+    egress_only = {
+        "metadata": {"name": "egress-only"},
+        "spec": {"podSelector": {}, "policyTypes": ["Egress"], "egress": [{}]},
+    }
+    deny_ingress = {"metadata": {"name": "deny"}, "spec": {"podSelector": {}}}
+    engine = PolicyEngine({"shop": [egress_only, deny_ingress]}, parser.namespace_index)
+
+    assert not engine.allowed(WEB, API)
+    assert "shop/egress-only" not in engine.explain(WEB, API).ingress.reason
+
+
+def test_peer_selector_semantics(snapshot):
+    def ingress_from(peer):
+        return _engine(
+            snapshot,
+            {
+                "podSelector": {"matchLabels": {"app": "api"}},
+                "ingress": [{"from": [peer]}],
+            },
+        )
+
+    # A podSelector alone only selects pods in the policy's namespace
+    engine = ingress_from({"podSelector": {}})
+    assert engine.allowed(WEB, API)
+    assert not engine.allowed(PROBE, API)
+
+    # namespaceSelector: {} selects every namespace
+    engine = ingress_from({"namespaceSelector": {}})
+    assert engine.allowed(WEB, API)
+    assert engine.allowed(PROBE, API)
+
+    # Both selectors in one peer must match together
+    engine = ingress_from(
+        {
+            "namespaceSelector": {"matchLabels": {"team": "ops"}},
+            "podSelector": {"matchLabels": {"app": "web"}},
+        }
+    )
+    assert not engine.allowed(WEB, API)
+    assert not engine.allowed(PROBE, API)
+
+    # ipBlock peers never match pods
+    engine = ingress_from({"ipBlock": {"cidr": "0.0.0.0/0"}})
+    assert not engine.allowed(WEB, API)
+
+
+def _unrelated(count):
+    return [
+        {
+            "metadata": {"name": f"other-{i}"},
+            "spec": {
+                "podSelector": {"matchLabels": {"app": f"other-{i}"}},
+                "ingress": [{"from": [{"podSelector": {}}]}],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def test_unrelated_policies_are_not_candidates(snapshot):
+    parser = PolicyParser(snapshot=snapshot)
+    catch_all = {
+        "metadata": {"name": "not-batch"},
+        "spec": {
+            "podSelector": {
+                "matchExpressions": [
+                    {"key": "app", "operator": "NotIn", "values": ["batch"]}
+                ]
+            },
+            "policyTypes": ["Egress"],
+            "egress": [{}],
+        },
+    }
+    engine = PolicyEngine(
+        {"shop": _unrelated(500) + [API_POLICY, catch_all, DENY_EGRESS]},
+        parser.namespace_index,
+    )
+
+    assert [p.name for p in engine.selecting(API)] == ["api-ingress", "not-batch"]
+    verdict, candidates = engine.buckets("shop", "ingress").candidates(API.labels)
+    assert verdict is None
+    assert [p.name for p in candidates] == ["api-ingress"]
+    assert engine.allowed(WEB, API)
+    assert not engine.allowed(Endpoint("shop", "batch", {"app": "batch"}), WEB)
+
+
+def test_verdicts_without_peer_checks(snapshot):
+    parser = PolicyParser(snapshot=snapshot)
+    open_rule = {
+        "metadata": {"name": "open"},
+        "spec": {"podSelector": {}, "ingress": [{"from": []}]},
+    }
+    engine = PolicyEngine(
+        {"shop": [API_POLICY, open_rule, DENY_EGRESS]}, parser.namespace_index
+    )
+    batch = Endpoint("shop", "batch", {"app": "batch"})
+
+    # Default-deny only: denied whatever the peer
+    assert engine.buckets("shop", "egress").candidates(batch.labels) == (False, ())
+    # A rule without peers: allowed whatever the peer
+    assert engine.buckets("shop", "ingress").candidates(API.labels)[0] is True
+    # No policy restricts the direction
+    assert engine.buckets("shop", "egress").candidates(API.labels)[0] is True
+    assert engine.allowed(PROBE, API)
+    assert not engine.allowed(batch, WEB)
@@ -0,0 +1,259 @@
+import base64
+import json
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from knetvis.cache import ResultCache
+from knetvis.export import GraphWriter, export_graph, open_writer
+from knetvis.policy import PolicyParser
+from knetvis.snapshot import ClusterSnapshot
+from knetvis.viewer import layout
+from knetvis.visualizer import NetworkVisualizer
+
+POLICIES = [
+    {
+        "metadata": {"name": "api-ingress"},
+        "spec": {
+            "podSelector": {"matchLabels": {"app": "api"}},
+            "ingress": [
+                {
+                    "from": [
+                        {"podSelector": {"matchLabels": {"app": "web"}}},
+                        {"namespaceSelector": {"matchLabels": {"team": "ops"}}},
+                    ]
+                }
+            ],
+        },
+    }
+]
+
+
+@pytest.fixture
+def visualizer():
+    snapshot = ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {}, "ops": {"team": "ops"}},
+        pods={
+            "shop": {
+                "web-0": {"app": "web"},
+                "web-1": {"app": "web"},
+                "api-0": {"app": "api", "note": 'a<b & "c"'},
+            },
+            "ops": {},
+        },
+        policies={"shop": POLICIES},
+    )
+    parser = PolicyParser(snapshot=snapshot)
+    return NetworkVisualizer(
+        core_api=parser.core_api,
+        namespace_index=parser.namespace_index,
+        cache=ResultCache(),
+    )
+
+
+class RecordingWriter(GraphWriter):
+    def __init__(self, visualizer):
+        super().__init__("")
+        self.visualizer = visualizer
+        self.records = []
+
+    def _node(self, node_id, attrs):
+        self.records.append(("node", node_id))
+
+    def _edge(self, source, target, attrs):
+        # Written before the edge is stored, i.e. while the graph is built
+        assert not self.visualizer.graph.has_edge(source, target)
+        self.records.append(("edge", source, target))
+
+    def close(self):
+        pass
+
+
+def test_writers_must_implement_records():
+    class PartialWriter(GraphWriter):
+        def _node(self, node_id, attrs):
+            pass
+
+    with pytest.raises(TypeError):
+        PartialWriter("")
+
+
+def test_edges_stream_while_graph_is_built(visualizer):
+    writer = RecordingWriter(visualizer)
+
+    visualizer.create_graph("shop", POLICIES, writers=[writer])
+
+    assert writer.edges == visualizer.graph.number_of_edges() == 3
+    assert writer.nodes == visualizer.graph.number_of_nodes()
+    assert ("edge", "/ops", "shop/api-0") in writer.records
+
+
+def test_worker_parts_are_written_as_they_arrive(visualizer, monkeypatch):
+    events = []
+
+    def fork_map(func, state, tasks, jobs):
+        for task in tasks:
+            events.append("part")
+            yield func(state, task)
+
+    class Writer(RecordingWriter):
+        def _edge(self, source, target, attrs):
+            events.append("edge")
+
+    monkeypatch.setattr("knetvis.visualizer.fork_map", fork_map)
+    monkeypatch.setattr("knetvis.visualizer.fork_available", lambda: True)
+    visualizer.jobs = 2
+    egress = {
+        "metadata": {"name": "web-egress"},
+        "spec": {
+            "podSelector": {"matchLabels": {"app": "web"}},
+            "policyTypes": ["Egress"],
+            "egress": [
+                {"to": [{"namespaceSelector": {"matchLabels": {"team": "ops"}}}]}
+            ],
+        },
+    }
+
+    visualizer.create_graph("shop", POLICIES + [egress], writers=[Writer(visualizer)])
+
+    assert events == ["part", "edge", "edge", "edge", "part", "edge", "edge"]
+
+
+def test_per_edge_logging_needs_verbose(visualizer, capsys):
+    visualizer.create_graph("shop", POLICIES)
+    assert "Adding edge" not in capsys.readouterr().out
+
+    visualizer.cache.clear()
+    visualizer.verbose = True
+    visualizer.create_graph("shop", POLICIES)
+    assert "Adding edge" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("fmt", ["graphml", "dot", "ndjson"])
+def test_cached_graph_is_written_whole(visualizer, tmp_path, fmt):
+    visualizer.create_graph("shop", POLICIES)
+    path = str(tmp_path / f"graph.{fmt}")
+
+    with open_writer(fmt, path) as writer:
+        visualizer.create_graph("shop", POLICIES, writers=[writer])
+
+    assert visualizer.cache.hits == 1
+    assert writer.edges == 3
+
+
+def test_export_formats(visualizer, tmp_path):
+    paths = export_graph(
+        visualizer, "shop", POLICIES, str(tmp_path), ["graphml", "dot", "ndjson"]
+    )
+
+    graphml, dot, ndjson = paths
+    assert graphml.endswith("shop-network-policies.graphml")
+    graph = nx.read_graphml(graphml)
+    assert set(graph.edges) == set(visualizer.graph.edges)
+    assert json.loads(graph.nodes["shop/api-0"]["labels"])["note"] == 'a<b & "c"'
+
+    text = open(dot).read()
+    assert text.startswith("digraph knetvis {")
+    assert '"shop/web-0" -> "shop/api-0" [type="allow"];' in text
+
+    records = [json.loads(line) for line in open(ndjson)]
+    edges = [r for r in records if r["record"] == "edge"]
+    assert {(e["source"], e["target"]) for e in edges} == set(visualizer.graph.edges)
+
+
+@pytest.mark.parametrize("level", ["pod", "workload", "namespace"])
+def test_graphml_declares_every_attribute(tmp_path, level):
+    snapshot = ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {}, "ops": {"team": "ops"}},
+        pods={"shop": {"web-0": {"app": "web"}, "api-0": {"app": "api"}}},
+        policies={"shop": POLICIES},
+        owners={"shop": {"web-0": [["StatefulSet", "web"]]}},
+    )
+    parser = PolicyParser(snapshot=snapshot)
+    visualizer = NetworkVisualizer(
+        core_api=parser.core_api,
+        namespace_index=parser.namespace_index,
+        cache=ResultCache(),
+        level=level,
+    )
+
+    (path,) = export_graph(visualizer, "shop", POLICIES, str(tmp_path), ["graphml"])
+
+    graph = nx.read_graphml(path)
+    assert set(graph.edges) == set(visualizer.view.edges)
+    if level == "pod":
+        assert graph.nodes["shop/web-0"]["workload"] == "statefulset/web"
+    else:
+        assert all(graph.nodes[n]["count"] >= 1 for n in graph)
+        assert all(weight >= 1 for _, _, weight in graph.edges(data="weight"))
+
+
+def test_parquet_edge_list(visualizer, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    (path,) = export_graph(visualizer, "shop", POLICIES, str(tmp_path), ["parquet"])
+
+    table = pq.read_table(path)
+    assert table.column_names == ["source", "target", "type"]
+    assert table.num_rows == 3
+
+
+def _payload(path):
+    html = open(path, encoding="utf-8").read()
+    start = html.index('<script id="graph-data" type="application/json">')
+    data = html[html.index(">", start) + 1 : html.index("</script>", start)]
+    return html, json.loads(data)
+
+
+def _column(encoded, dtype):
+    return np.frombuffer(base64.b64decode(encoded), dtype=dtype)
+
+
+def test_html_viewer_is_self_contained(visualizer, tmp_path):
+    (path,) = export_graph(visualizer, "shop", POLICIES, str(tmp_path), ["html"])
+
+    assert path.endswith("shop-network-policies.html")
+    html, payload = _payload(path)
+    assert "http://" not in html and "https://" not in html
+    assert " src=" not in html and "<link" not in html
+
+    nodes = payload["nodes"]
+    namespaces = payload["namespaces"]
+    ids = [
+        f"{namespaces[ns]}/{name}"
+        for ns, name in zip(_column(nodes["namespace"], "<u4"), nodes["names"])
+    ]
+    assert set(ids) == set(visualizer.graph.nodes)
+    api = ids.index("shop/api-0")
+    labels = payload["labelSets"][_column(nodes["labels"], "<u4")[api]]
+    assert labels["note"] == 'a<b & "c"'
+
+    edges = payload["edges"]
+    sources = _column(edges["source"], "<u4")
+    targets = _column(edges["target"], "<u4")
+    assert {(ids[s], ids[t]) for s, t in zip(sources, targets)} == set(
+        visualizer.graph.edges
+    )
+
+
+def test_large_graphs_are_packed_by_namespace():
+    graph = nx.DiGraph()
+    for i in range(3000):
+        ns = f"ns{i % 7}"
+        graph.add_node(f"{ns}/pod-{i}", kind="pod", namespace=ns, labels={})
+
+    positions = layout(graph)
+
+    boxes = {}
+    for node, (x, y) in positions.items():
+        ns = graph.nodes[node]["namespace"]
+        x0, y0, x1, y1 = boxes.get(ns, (x, y, x, y))
+        boxes[ns] = (min(x0, x), min(y0, y), max(x1, x), max(y1, y))
+    assert len(positions) == 3000
+    for a, (ax0, ay0, ax1, ay1) in boxes.items():
+        for b, (bx0, by0, bx1, by1) in boxes.items():
+            if a < b:
+                assert ax1 < bx0 or bx1 < ax0 or ay1 < by0 or by1 < ay0
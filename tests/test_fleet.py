@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from knetvis import fleet
+from knetvis.cli import cli
+from knetvis.snapshot import ClusterSnapshot, SnapshotApi
+
+DB_POLICY = {
+    "apiVersion": "networking.k8s.io/v1",
+    "kind": "NetworkPolicy",
+    "metadata": {"name": "db-from-frontend", "namespace": "default"},
+    "spec": {
+        "podSelector": {"matchLabels": {"app": "db"}},
+        "policyTypes": ["Ingress"],
+        "ingress": [{"from": [{"podSelector": {"matchLabels": {"app": "frontend"}}}]}],
+    },
+}
+
+
+def _snapshot(context, policies):
+    return ClusterSnapshot(
+        context=context,
+        namespaces={"default": {"env": "prod"}, "other": {"env": "dev"}},
+        pods={
+            "default": {"web": {"app": "web"}, "db": {"app": "db"}},
+            "other": {"tool": {"app": "tool"}},
+        },
+        policies={"default": policies, "other": []},
+    )
+
+
+@pytest.fixture
+def snapshot_files(tmp_path):
+    open_path = tmp_path / "open.json"
+    locked_path = tmp_path / "locked.json"
+    _snapshot("open", []).save(str(open_path))
+    _snapshot("locked", [DB_POLICY]).save(str(locked_path))
+    return str(open_path), str(locked_path)
+
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = _snapshot("prod", [DB_POLICY])
+    path = tmp_path / "prod.json"
+    snapshot.save(str(path))
+
+    loaded = ClusterSnapshot.load(str(path))
+
+    assert loaded == snapshot
+    assert json.loads(path.read_text())["context"] == "prod"
+
+
+def test_snapshot_api_filters_by_label_selector():
+    api = SnapshotApi(_snapshot("prod", []))
+
+    pods = api.list_namespaced_pod("default", label_selector="app=db")
+    namespaces = api.list_namespace(label_selector="env!=prod")
+
+    assert [p.metadata.name for p in pods.items] == ["db"]
+    assert [ns.metadata.name for ns in namespaces.items] == ["other"]
+    with pytest.raises(Exception) as excinfo:
+        api.read_namespaced_pod("missing", "default")
+    assert excinfo.value.status == 404
+
+
+def test_evaluate_in_processes_reports_each_cluster():
+    snapshots = [_snapshot("open", []), _snapshot("locked", [DB_POLICY])]
+
+    results = fleet.evaluate(
+        fleet.check_connectivity,
+        snapshots,
+        jobs=2,
+        source="default/pod/web",
+        destination="default/pod/db",
+    )
+
+    assert [r.cluster for r in results] == ["open", "locked"]
+    assert [r.details["allowed"] for r in results] == [True, False]
+
+
+def _parent(snapshot):
+    return fleet.ClusterResult(snapshot.context, True, "", {"parent": os.getppid()})
+
+
+def test_evaluate_does_not_fork_beside_live_threads():
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        results = fleet.evaluate(
+            _parent, [_snapshot("a", []), _snapshot("b", [])], jobs=2
+        )
+    finally:
+        stop.set()
+        thread.join()
+
+    assert [r.cluster for r in results] == ["a", "b"]
+    assert all(r.details["parent"] != os.getpid() for r in results)
+
+
+def test_check_connectivity_counts_pod_pairs():
+    snapshot = _snapshot("locked", [DB_POLICY])
+    snapshot.pods["default"]["frontend"] = {"app": "frontend", "tier": "edge"}
+    snapshot.pods["default"]["web"]["tier"] = "edge"
+    snapshot.services = {"default": {"edge": {"tier": "edge"}}}
+
+    result = fleet.check_connectivity(snapshot, "default/svc/edge", "default/pod/db")
+
+    assert result.details == {"allowed": False, "allowed_pairs": 1, "total_pairs": 2}
+    assert result.summary == "Traffic is allowed for 1 of 2 pod pairs"
+
+
+def test_evaluate_reports_failures_per_cluster():
+    results = fleet.evaluate(
+        fleet.check_connectivity,
+        [_snapshot("open", [])],
+        source="default/pod/web",
+        destination="bad-target",
+    )
+
+    assert not results[0].ok
+    assert "Invalid target format" in results[0].summary
+
+
+def test_test_command_with_snapshots(snapshot_files):
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["test", "default/pod/web", "default/pod/db"]
+        + ["--snapshot", snapshot_files[0], "--snapshot", snapshot_files[1]],
+    )
+
+    assert result.exit_code == 0
+    assert "Traffic is allowed" in result.output
+    assert "Traffic is blocked" in result.output
+
+
+def test_validate_command_with_snapshot(snapshot_files):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["validate", "--snapshot", snapshot_files[1]])
+
+    assert result.exit_code == 0
+    assert "1 policies valid" in result.output
+
+
+def test_visualize_command_with_snapshot(snapshot_files, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["visualize", "default", "--snapshot", snapshot_files[1]]
+    )
+
+    assert result.exit_code == 0
+    assert (tmp_path / "output" / "locked" / "default-network-policies.png").exists()
@@ -0,0 +1,203 @@
+import queue
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from knetvis.cli import cli
+from knetvis.fakeapi import FakeApiServer
+from knetvis.guard import FlowGuard, FlowSelector, load_flow_spec, watch_guard
+from knetvis.snapshot import ClusterSnapshot
+
+SPEC = """
+flows:
+  - name: web-to-api
+    from: {namespace: "shop-*", labels: {app: "web*"}}
+    to: {namespace: "shop-*", labels: {app: api}}
+  - name: ops-to-api
+    from: ops/team
+    to: shop-eu/app=api
+  - name: no-db-from-web
+    from: shop-eu/app=web
+    to: shop-eu/app=db
+    expect: deny
+"""
+
+
+def _ingress(name, app, peers):
+    return {
+        "apiVersion": "networking.k8s.io/v1",
+        "kind": "NetworkPolicy",
+        "metadata": {"name": name},
+        "spec": {
+            "podSelector": {"matchLabels": {"app": app}},
+            "ingress": [{"from": peers}],
+        },
+    }
+
+
+@pytest.fixture
+def snapshot():
+    return ClusterSnapshot(
+        context="prod",
+        namespaces={"shop-eu": {}, "shop-us": {}, "ops": {"team": "ops"}},
+        pods={
+            "shop-eu": {
+                "web-1": {"app": "web"},
+                "web-2": {"app": "web"},
+                "web-canary": {"app": "web-canary"},
+                "api": {"app": "api"},
+                "db": {"app": "db"},
+            },
+            "shop-us": {"web": {"app": "web"}, "api": {"app": "api"}},
+            "ops": {"probe": {"team": "ops"}},
+        },
+        policies={
+            "shop-eu": [
+                _ingress(
+                    "api",
+                    "api",
+                    [
+                        {"podSelector": {"matchLabels": {"app": "web"}}},
+                        {"namespaceSelector": {"matchLabels": {"team": "ops"}}},
+                    ],
+                ),
+                _ingress(
+                    "db", "db", [{"podSelector": {"matchLabels": {"app": "api"}}}]
+                ),
+            ]
+        },
+    )
+
+
+@pytest.fixture
+def spec(tmp_path):
+    path = tmp_path / "flows.yaml"
+    path.write_text(SPEC)
+    return load_flow_spec(str(path))
+
+
+def test_spec_compiles_wildcards(spec, tmp_path):
+    assert [e.name for e in spec] == ["web-to-api", "ops-to-api", "no-db-from-web"]
+    assert spec[0].source.matches("shop-us", {"app": "web-canary", "x": "y"})
+    assert not spec[0].source.matches("ops", {"app": "web"})
+    assert spec[1].source.matches("ops", {"team": "anything"})
+    assert spec[2].expect == "deny"
+    assert str(FlowSelector("shop-eu/app=db")) == "shop-eu/app=db"
+
+    bad = tmp_path / "bad.yaml"
+    bad.write_text("flows: [{from: a, to: b, expect: maybe}]")
+    with pytest.raises(Exception, match="Failed to load flow spec"):
+        load_flow_spec(str(bad))
+
+
+def test_check_all_reports_violating_class_pairs(spec, snapshot):
+    guard = FlowGuard(spec, snapshot)
+
+    violations = {(str(v.source), str(v.dest)): v.pairs for v in guard.check_all()}
+
+    # shop-us has no policies; in shop-eu the policy only admits app=web
+    assert violations == {
+        ("shop-eu/web-canary", "shop-eu/api"): 1,
+        ("shop-us/web", "shop-eu/api"): 1,
+    }
+
+
+def test_pod_change_rechecks_only_matching_entries(spec, snapshot):
+    guard = FlowGuard(spec, snapshot)
+    guard.check_all()
+
+    change = guard.set_pod("shop-eu", "web-canary", {"app": "web"})
+    assert change.checked == 2
+    assert [str(v.source) for v in change.resolved] == ["shop-eu/web-canary"]
+    assert change.violations == []
+
+    # A pod no entry selects re-checks nothing
+    assert guard.set_pod("shop-eu", "batch", {"app": "batch"}).checked == 0
+    # Unchanged labels are a no-op
+    assert guard.set_pod("shop-eu", "web-1", {"app": "web"}).checked == 0
+
+
+def test_policy_change_rechecks_entries_of_its_namespace(spec, snapshot):
+    guard = FlowGuard(spec, snapshot)
+    guard.check_all()
+    db = _ingress("db", "db", [{"podSelector": {"matchLabels": {"app": "web"}}}])
+
+    change = guard.set_policy("shop-eu", "db", db)
+
+    assert change.checked == 3
+    assert [v.entry.name for v in change.violations] == ["no-db-from-web"]
+    assert change.violations[0].pairs == 2
+    assert guard.set_policy("shop-us", "other", None).checked == 0
+
+    change = guard.set_policy("shop-eu", "db", None)
+    # Without any policy db is open to every pod
+    assert [v.entry.name for v in guard.current()].count("no-db-from-web") == 1
+    assert change.resolved == []
+
+
+def test_namespace_labels_rechecks_everything(spec, snapshot):
+    guard = FlowGuard(spec, snapshot)
+    guard.check_all()
+
+    change = guard.set_namespace("ops", {"team": "platform"})
+
+    assert change.checked == 3
+    assert [str(v.source) for v in change.violations] == ["ops/probe"]
+
+
+def test_watch_applies_changes_as_they_arrive(spec, snapshot):
+    with FakeApiServer(snapshot) as server:
+        source = server.source()
+        guard = FlowGuard(spec, snapshot)
+        guard.check_all()
+        changes = queue.Queue()
+        stop = threading.Event()
+        watcher = threading.Thread(
+            target=watch_guard,
+            args=(guard, source.core_api, source.networking_api, changes.put, stop),
+            kwargs={"timeout_seconds": 5},
+        )
+        # Deleted before the watch starts: the initial list reconciles it
+        server.delete("Pod", "web", "shop-us")
+        watcher.start()
+        try:
+            change = changes.get(timeout=5)
+            assert [str(v.source) for v in change.resolved] == ["shop-us/web"]
+
+            server.apply(
+                {
+                    "kind": "Pod",
+                    "metadata": {
+                        "name": "web-canary",
+                        "namespace": "shop-eu",
+                        "labels": {"app": "web"},
+                    },
+                    "spec": {"containers": [{"name": "app"}]},
+                }
+            )
+            change = changes.get(timeout=5)
+            assert len(change.resolved) == 1
+
+            server.delete("NetworkPolicy", "db", "shop-eu")
+            change = changes.get(timeout=5)
+            assert [v.entry.name for v in change.violations] == ["no-db-from-web"]
+        finally:
+            stop.set()
+            watcher.join()
+
+
+def test_cli_guard_exit_status(snapshot, tmp_path):
+    path = str(tmp_path / "prod.json")
+    snapshot.save(path)
+    flows = tmp_path / "flows.yaml"
+    flows.write_text(SPEC)
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ["guard", str(flows), "--snapshot", path])
+    assert result.exit_code == 1
+    assert "3 flow(s) checked, 2 violation(s)" in result.output
+
+    flows.write_text("flows: [{from: shop-eu/app=web, to: shop-eu/app=api}]")
+    result = runner.invoke(cli, ["guard", str(flows), "--snapshot", path])
+    assert result.exit_code == 0
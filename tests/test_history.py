@@ -0,0 +1,124 @@
+import copy
+
+import pytest
+from click.testing import CliRunner
+
+from knetvis.cli import cli
+from knetvis.history import HistoryStore, apply_delta, delta, parse_timestamp
+from knetvis.snapshot import ClusterSnapshot
+
+DENY_DB = {
+    "metadata": {"name": "deny-db", "namespace": "shop"},
+    "spec": {"podSelector": {"matchLabels": {"app": "db"}}, "policyTypes": ["Ingress"]},
+}
+
+
+def _snapshot():
+    return ClusterSnapshot(
+        context="prod",
+        namespaces={"shop": {"team": "shop"}, "ops": {}},
+        pods={"shop": {"web": {"app": "web"}, "db": {"app": "db"}}, "ops": {}},
+        policies={"shop": []},
+    )
+
+
+def test_delta_round_trips_changes():
+    old = _snapshot()
+    new = copy.deepcopy(old)
+    new.pods["shop"]["web"] = {"app": "web", "version": "2"}
+    del new.pods["shop"]["db"]
+    new.pods["tmp"] = {}
+    del new.namespaces["ops"]
+    del new.pods["ops"]
+    new.policies["shop"] = [DENY_DB]
+
+    changes = delta(old, new)
+    apply_delta(old, changes)
+
+    assert old == new
+    assert delta(new, new) == {}
+
+
+def test_history_reconstructs_each_point_in_time(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.jsonl"), checkpoint_every=3)
+    states = []
+    snapshot = _snapshot()
+    for i in range(7):
+        snapshot.pods["shop"][f"pod-{i}"] = {"app": "web"}
+        if i == 4:
+            snapshot.policies["shop"] = [DENY_DB]
+        assert store.record(snapshot, timestamp=100.0 + i)
+        states.append(copy.deepcopy(snapshot))
+
+    assert [checkpoint for _, checkpoint, _ in store.entries] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+    for i, state in enumerate(states):
+        assert store.at(100.0 + i + 0.5) == state
+    with pytest.raises(ValueError):
+        store.at(99.0)
+
+
+def test_unchanged_state_is_not_recorded(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.jsonl"))
+
+    assert store.record(_snapshot(), timestamp=1.0)
+    assert not store.record(_snapshot(), timestamp=2.0)
+    assert len(store) == 1
+    with pytest.raises(ValueError):
+        store.record(_snapshot(), timestamp=0.5)
+
+
+def test_index_is_rebuilt_and_torn_writes_dropped(tmp_path):
+    path = tmp_path / "history.jsonl"
+    store = HistoryStore(str(path))
+    store.record(_snapshot(), timestamp=1.0)
+    changed = _snapshot()
+    changed.policies["shop"] = [DENY_DB]
+    store.record(changed, timestamp=2.0)
+    (tmp_path / "history.jsonl.idx").unlink()
+    with open(path, "a") as f:
+        f.write('{"ts": 3.0, "kind": "delta", "chan')
+
+    reopened = HistoryStore(str(path))
+
+    assert [ts for ts, _, _ in reopened.entries] == [1.0, 2.0]
+    assert reopened.at(2.0) == changed
+    assert reopened.record(_snapshot(), timestamp=3.0)
+    assert HistoryStore(str(path)).at(3.0) == _snapshot()
+
+
+def test_parse_timestamp():
+    assert parse_timestamp("1700000000") == 1700000000.0
+    assert parse_timestamp("2023-11-14T22:13:20Z") == 1700000000.0
+    with pytest.raises(ValueError):
+        parse_timestamp("yesterday")
+
+
+def test_cli_tests_connectivity_at_a_past_time(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    store = HistoryStore(path)
+    store.record(_snapshot(), timestamp=1700000000.0)
+    denied = _snapshot()
+    denied.policies["shop"] = [DENY_DB]
+    store.record(denied, timestamp=1700003600.0)
+    runner = CliRunner()
+
+    def run(at):
+        args = ["test", "shop/pod/web", "shop/pod/db", "--history", path, "--at", at]
+        return runner.invoke(cli, args).output
+
+    assert "Traffic is allowed" in run("2023-11-14T22:30:00Z")
+    assert "Traffic is blocked" in run("2023-11-14T23:30:00Z")
+    assert (
+        "--at needs --history"
+        in runner.invoke(
+            cli, ["test", "shop/pod/web", "shop/pod/db", "--at", "1"]
+        ).output
+    )
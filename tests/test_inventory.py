@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import pytest
+from kubernetes import client
+
+from knetvis.aio import ClusterClient
+from knetvis.fakeapi import FakeApiServer
+from knetvis.inventory import PodRecord, iter_pod_pages, iter_pods
+from knetvis.policy import PolicyParser
+from knetvis.snapshot import ClusterSnapshot
+
+
+def _pod(i):
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {
+            "name": f"web-{i}",
+            "namespace": "shop",
+            "labels": {"app": "web"},
+            "managedFields": [{"manager": "kubectl"}],
+        },
+        "spec": {
+            "containers": [
+                {
+                    "name": "web",
+                    "image": "nginx",
+                    "ports": [{"name": "http", "containerPort": 8080}],
+                    "env": [{"name": "A", "value": "x" * 100}],
+                }
+            ]
+        },
+        "status": {"phase": "Running"},
+    }
+
+
+@pytest.fixture
+def server():
+    with FakeApiServer() as server:
+        for i in range(7):
+            server.apply(_pod(i))
+        yield server
+
+
+def test_pages_follow_continue_tokens(server):
+    core_api = client.CoreV1Api(server.api_client())
+
+    with patch.object(client.ApiClient, "deserialize") as deserialize:
+        pages = list(iter_pod_pages(core_api, "shop", page_size=3))
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert len(server.requests) == 3
+    assert pages[2][0] == PodRecord(
+        "shop", "web-6", {"app": "web"}, (("http", 8080, "TCP"),)
+    )
+    # Pages are parsed from raw JSON, not into client models
+    deserialize.assert_not_called()
+
+
+def test_cluster_client_lists_records_concurrently(server):
+    cluster = ClusterClient(core_api=client.CoreV1Api(server.api_client()))
+
+    records = cluster.list_pod_records(["shop", "ops"], page_size=2)
+
+    assert [pod.name for pod in records["shop"]] == [f"web-{i}" for i in range(7)]
+    assert records["ops"] == []
+
+
+def test_model_objects_are_read_as_one_page():
+    snapshot = ClusterSnapshot(
+        context="test", namespaces={"shop": {}}, pods={"shop": {"db": {"app": "db"}}}
+    )
+    core_api = PolicyParser(snapshot=snapshot).core_api
+
+    pods = list(iter_pods(core_api, "shop", page_size=1))
+
+    assert pods == [PodRecord("shop", "db", {"app": "db"})]
+
+
+@pytest.mark.parametrize("read", [1, 2])
+@pytest.mark.parametrize("replace", [True, False])
+def test_expired_continue_tokens(replace, read):
+    snapshot = ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {}},
+        pods={"shop": {f"web-{i}": {"app": "web"} for i in range(7)}},
+    )
+    with FakeApiServer(snapshot) as server:
+        core_api = client.CoreV1Api(server.api_client())
+        pages = iter_pod_pages(core_api, "shop", page_size=3)
+        names = [pod.name for _ in range(read) for pod in next(pages)]
+        server.expire_continue_tokens(replace=replace)
+        names += [pod.name for page in pages for pod in page]
+
+        # With a fresh token the list goes on; without, it starts over
+        # and as many pods as were already seen are skipped
+        assert names == [f"web-{i}" for i in range(7)]
+        assert len(server.requests) == (4 if replace else 4 + read)
+
+        calls = []
+        list_pods = core_api.list_namespaced_pod
+
+        def expiring(*args, **kwargs):
+            calls.append(kwargs.get("_continue"))
+            if len(calls) == 2:
+                server.expire_continue_tokens(replace=False)
+            return list_pods(*args, **kwargs)
+
+        core_api.list_namespaced_pod = expiring
+        records = ClusterClient(core_api=core_api).list_pod_records(
+            ["shop"], page_size=3
+        )
+        assert [pod.name for pod in records["shop"]] == names
+        assert calls[0] is None and calls[1] and calls[2] is None
@@ -0,0 +1,201 @@
+import random
+import tracemalloc
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+from knetvis.engine import PolicyEngine
+from knetvis.matrix import LabelMatrix, evaluate_pairs
+from knetvis.models import Endpoint
+from knetvis.selector import LabelSelector, NamespaceIndex
+from knetvis.visualizer import NetworkVisualizer
+
+KEYS = ["app", "tier", "env"]
+VALUES = ["a", "b", "c"]
+NAMESPACES = ["ns1", "ns2", "ns3"]
+
+
+def _random_labels(rng):
+    return {k: rng.choice(VALUES) for k in KEYS if rng.random() < 0.7}
+
+
+def _random_selector(rng):
+    selector = {}
+    if rng.random() < 0.5:
+        selector["matchLabels"] = {rng.choice(KEYS): rng.choice(VALUES)}
+    if rng.random() < 0.6:
+        operator = rng.choice(["In", "NotIn", "Exists", "DoesNotExist"])
+        expr = {"key": rng.choice(KEYS), "operator": operator}
+        if operator in ("In", "NotIn"):
+            expr["values"] = rng.sample(VALUES, 2)
+        selector["matchExpressions"] = [expr]
+    return selector
+
+
+def _random_policy(rng, i):
+    def rules():
+        return [
+            {
+                "from": [
+                    {
+                        "podSelector": _random_selector(rng)
+                        or {"matchLabels": {"app": "a"}}
+                    }
+                ],
+                "to": [
+                    {"namespaceSelector": {"matchLabels": {"zone": rng.choice(VALUES)}}}
+                ],
+            }
+            for _ in range(rng.randint(0, 2))
+        ]
+
+    spec = {"podSelector": _random_selector(rng)}
+    if rng.random() < 0.7:
+        spec["policyTypes"] = rng.sample(["Ingress", "Egress"], rng.randint(1, 2))
+    if rng.random() < 0.7:
+        spec["ingress"] = rules()
+    if rng.random() < 0.5:
+        spec["egress"] = rules()
+    return {"metadata": {"name": f"p{i}"}, "spec": spec}
+
+
+@pytest.fixture
+def namespace_index():
+    core_api = Mock()
+    core_api.list_namespace.return_value = SimpleNamespace(
+        items=[
+            SimpleNamespace(metadata=SimpleNamespace(name=ns, labels={"zone": z}))
+            for ns, z in zip(NAMESPACES, VALUES)
+        ]
+    )
+    return NamespaceIndex(core_api)
+
+
+def test_label_matrix_agrees_with_selector_matching():
+    rng = random.Random(7)
+    label_sets = [_random_labels(rng) for _ in range(200)]
+    matrix = LabelMatrix(label_sets)
+
+    for _ in range(300):
+        selector = LabelSelector(_random_selector(rng))
+        expected = [selector.matches(labels) for labels in label_sets]
+        assert matrix.select(selector).tolist() == expected
+
+
+def test_selection_matrix_scopes_by_namespace():
+    matrix = LabelMatrix([{"app": "a"}, {"app": "a"}, {"app": "b"}], ["x", "y", "x"])
+    selector = LabelSelector({"matchLabels": {"app": "a"}})
+
+    selection = matrix.selection_matrix([selector, selector], ["x", None])
+
+    assert selection.tolist() == [[True, False, False], [True, True, False]]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorized_pairs_match_engine(seed, namespace_index):
+    rng = random.Random(seed)
+    endpoints = [
+        Endpoint(rng.choice(NAMESPACES), f"pod{i}", _random_labels(rng))
+        for i in range(40)
+    ]
+    policies = {
+        ns: [_random_policy(rng, i) for i in range(rng.randint(0, 4))]
+        for ns in NAMESPACES
+    }
+    engine = PolicyEngine(policies, namespace_index)
+
+    allowed = evaluate_pairs(engine, endpoints)
+
+    for i, src in enumerate(endpoints):
+        for j, dst in enumerate(endpoints):
+            assert allowed[i, j] == engine.allowed(src, dst), (i, j)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_pairs_are_assembled_from_row_blocks(jobs, namespace_index):
+    rng = random.Random(7)
+    endpoints = [
+        Endpoint(rng.choice(NAMESPACES), f"pod{i}", _random_labels(rng))
+        for i in range(30)
+    ]
+    policies = {ns: [_random_policy(rng, i) for i in range(3)] for ns in NAMESPACES}
+    engine = PolicyEngine(policies, namespace_index)
+
+    with patch("knetvis.matrix.BLOCK_ROWS", 7):
+        allowed = evaluate_pairs(engine, endpoints, jobs=jobs)
+
+    expected = [[engine.allowed(s, d) for d in endpoints] for s in endpoints]
+    assert allowed.tolist() == expected
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_only_the_result_is_held_whole(jobs, namespace_index):
+    n = 1500
+    endpoints = [Endpoint("ns1", f"pod{i}", {"app": VALUES[i % 3]}) for i in range(n)]
+    peers = [{"podSelector": {"matchLabels": {"app": "a"}}}]
+    policy = {
+        "metadata": {"name": "both"},
+        "spec": {
+            "podSelector": {},
+            "policyTypes": ["Ingress", "Egress"],
+            "ingress": [{"from": peers}],
+            "egress": [{"to": peers}],
+        },
+    }
+    engine = PolicyEngine({"ns1": [policy]}, namespace_index)
+
+    tracemalloc.start()
+    try:
+        with patch("knetvis.matrix.BLOCK_ROWS", 64):
+            allowed = evaluate_pairs(engine, endpoints, jobs=jobs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # The result is one byte per pair; both directions were never held whole
+    assert peak < 2 * n * n
+    assert allowed.sum() == (n // 3) ** 2
+
+
+def test_oversized_matrices_are_refused(namespace_index):
+    engine = PolicyEngine({}, namespace_index)
+    endpoints = [Endpoint("ns1", f"pod{i}", {}) for i in range(5)]
+
+    with patch("knetvis.matrix.MAX_PAIRS", 24), pytest.raises(ValueError):
+        evaluate_pairs(engine, endpoints)
+    assert evaluate_pairs(engine, endpoints[:4]).all()
+
+
+@pytest.mark.usefixtures("mock_kube_config")
+@patch("kubernetes.client.CoreV1Api")
+def test_visualizer_selects_from_label_matrix(mock_core_api):
+    pods = [
+        SimpleNamespace(metadata=SimpleNamespace(name=name, labels=labels))
+        for name, labels in [
+            ("web", {"app": "web", "tier": "front"}),
+            ("api", {"app": "api", "tier": "back"}),
+            ("db", {"app": "db", "tier": "back"}),
+        ]
+    ]
+    mock_core_api.return_value.list_namespaced_pod.return_value.items = pods
+    policy = {
+        "spec": {
+            "podSelector": {
+                "matchExpressions": [
+                    {"key": "tier", "operator": "In", "values": ["back"]}
+                ]
+            },
+            "ingress": [{"from": [{"podSelector": {"matchLabels": {"app": "web"}}}]}],
+        }
+    }
+
+    visualizer = NetworkVisualizer()
+    visualizer.create_graph("default", [policy])
+
+    assert visualizer.selection.tolist() == [[False, True, True]]
+    assert set(visualizer.graph.edges()) == {
+        ("default/web", "default/api"),
+        ("default/web", "default/db"),
+    }
+    assert mock_core_api.return_value.list_namespaced_pod.call_count == 1
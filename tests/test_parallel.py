@@ -0,0 +1,134 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from knetvis import parallel
+from knetvis.fakeapi import FakeApiServer
+from knetvis.parallel import fork_available, fork_map, split
+from knetvis.snapshot import ClusterSnapshot
+
+# Runs the CLI, printing the start method of every worker pool
+RECORD_POOLS = """
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from knetvis import parallel
+from knetvis.cli import cli
+
+
+class RecordingPool(ProcessPoolExecutor):
+    def __init__(self, *args, mp_context=None, **kwargs):
+        print("pool:", mp_context.get_start_method(), flush=True)
+        super().__init__(*args, mp_context=mp_context, **kwargs)
+
+
+parallel.ProcessPoolExecutor = RecordingPool
+cli(sys.argv[1:])
+"""
+
+
+def _lookup(state, key):
+    return state[key], os.getpid()
+
+
+def _lookup_parent(state, key):
+    return state[key], os.getppid()
+
+
+def test_split_covers_items_in_order():
+    assert split(list(range(7)), 3) == [[0, 1], [2, 3], [4, 5, 6]]
+    assert split(list(range(2)), 4) == [[0], [1]]
+    assert split([], 4) == []
+
+
+@pytest.mark.skipif(not fork_available(), reason="platform cannot fork")
+def test_fork_map_workers_inherit_state():
+    state = {key: key * 2 for key in range(4)}
+
+    results = list(fork_map(_lookup, state, [0, 1, 2, 3], jobs=2))
+
+    assert [value for value, _ in results] == [0, 2, 4, 6]
+    assert all(pid != os.getpid() for _, pid in results)
+    assert parallel._STATE is None
+
+
+def test_fork_map_runs_serially_with_one_job():
+    results = list(fork_map(_lookup, {1: "a"}, [1, 1], jobs=1))
+
+    assert results == [("a", os.getpid()), ("a", os.getpid())]
+
+
+@pytest.mark.skipif(not fork_available(), reason="platform cannot fork")
+def test_fork_map_avoids_forking_beside_live_threads():
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        results = list(fork_map(_lookup_parent, {1: "a", 2: "b"}, [1, 2], jobs=2))
+    finally:
+        stop.set()
+        thread.join()
+
+    # Workers are not forked from this process; the pool initializer
+    # gave them the state
+    assert [value for value, _ in results] == ["a", "b"]
+    assert all(parent != os.getpid() for _, parent in results)
+    assert parallel._STATE is None
+
+
+def _policy(name, app):
+    # The combined selector makes the visualizer list pods concurrently
+    return {
+        "metadata": {"name": name},
+        "spec": {
+            "podSelector": {"matchLabels": {"app": app}},
+            "ingress": [{"from": [{"namespaceSelector": {}, "podSelector": {}}]}],
+        },
+    }
+
+
+@pytest.mark.skipif(not fork_available(), reason="platform cannot fork")
+@pytest.mark.parametrize("target", ["shop", "--all"])
+def test_cli_workers_are_forked(tmp_path, target):
+    """API threads are stopped before the CLI starts its worker pool"""
+    snapshot = ClusterSnapshot(
+        context="fake",
+        namespaces={"shop": {}, "ops": {}},
+        pods={"shop": {"web": {"app": "web"}, "db": {"app": "db"}}, "ops": {}},
+        policies={
+            "shop": [_policy("web", "web"), _policy("db", "db")],
+            "ops": [_policy("web", "web")],
+        },
+    )
+    with FakeApiServer(snapshot) as server:
+        kubeconfig = tmp_path / "config"
+        kubeconfig.write_text(
+            json.dumps(
+                {
+                    "apiVersion": "v1",
+                    "kind": "Config",
+                    "clusters": [{"name": "fake", "cluster": {"server": server.url}}],
+                    "users": [{"name": "fake", "user": {}}],
+                    "contexts": [
+                        {"name": "fake", "context": {"cluster": "fake", "user": "fake"}}
+                    ],
+                    "current-context": "fake",
+                }
+            )
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", RECORD_POOLS, "visualize", target]
+            + ["--jobs", "2", "--format", "graphml", "--out-dir", str(tmp_path)],
+            env=dict(os.environ, KUBECONFIG=str(kubeconfig)),
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+
+    assert result.returncode == 0, result.stderr
+    pools = [line for line in result.stdout.splitlines() if line.startswith("pool:")]
+    assert pools == ["pool: fork"]
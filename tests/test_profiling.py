@@ -0,0 +1,80 @@
+import json
+import os
+import pstats
+import tracemalloc
+
+from click.testing import CliRunner
+
+from knetvis.cli import cli
+from knetvis.profiling import (
+    MEMORY,
+    META,
+    PSTATS,
+    STACKS,
+    Profiler,
+    find_captures,
+    summarize,
+)
+from knetvis.snapshot import ClusterSnapshot
+
+
+def _busy_work():
+    held = [list(range(1000)) for _ in range(200)]
+    total = 0
+    for _ in range(30):
+        total += sum(sum(row) for row in held)
+    return held, total
+
+
+def test_profiler_writes_a_capture(tmp_path):
+    profiler = Profiler(str(tmp_path), "work", interval=0.001)
+    profiler.start()
+    held, _ = _busy_work()
+    path = profiler.stop()
+
+    assert not tracemalloc.is_tracing()
+    assert find_captures(str(tmp_path)) == [path]
+    assert find_captures(path) == [path]
+    for name in (META, MEMORY, PSTATS, STACKS):
+        assert os.path.exists(os.path.join(path, name))
+
+    functions = {f[2] for f in pstats.Stats(os.path.join(path, PSTATS)).stats}
+    assert "_busy_work" in functions
+    with open(os.path.join(path, STACKS)) as f:
+        lines = f.read().splitlines()
+    assert lines
+    stack, _, count = lines[0].rpartition(" ")
+    assert int(count) > 0 and "test_profiler_writes_a_capture" in stack
+    with open(os.path.join(path, MEMORY)) as f:
+        memory = json.load(f)
+    assert memory["peak"] >= memory["current"] > 0
+    assert any(site["file"].endswith("test_profiling.py") for site in memory["top"])
+
+    summary = summarize(path, top=3)
+    assert summary["meta"]["command"] == "work"
+    assert len(summary["functions"]) == 3
+    assert sum(f["share"] for f in summary["frames"]) <= 1.0
+
+
+def test_cli_profile_out_and_report(tmp_path):
+    path = str(tmp_path / "prod.json")
+    ClusterSnapshot(
+        context="prod", namespaces={"shop": {}}, pods={"shop": {"web": {"app": "web"}}}
+    ).save(path)
+    out = str(tmp_path / "profiles")
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ["--profile-out", out, "report", "--snapshot", path])
+    assert result.exit_code == 0, result.output
+    assert "Profile written to" in result.output
+    (capture,) = find_captures(out)
+    assert "-report-" in os.path.basename(capture)
+
+    result = runner.invoke(cli, ["profile-report", out, "--top", "5"])
+    assert result.exit_code == 0, result.output
+    assert "Functions by own time" in result.output
+    assert "Allocation sites" in result.output
+
+    # Without the option nothing is captured
+    runner.invoke(cli, ["report", "--snapshot", path])
+    assert len(find_captures(out)) == 1
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+from click.testing import CliRunner
+
+from knetvis.cli import cli
+from knetvis.engine import PolicyEngine
+from knetvis.models import Endpoint, Target
+from knetvis.policy import PolicyParser
+from knetvis.reachability import ReachabilityIndex
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+
+from .test_matrix import (  # noqa: F401
+    NAMESPACES,
+    _random_labels,
+    _random_policy,
+    namespace_index,
+)
+
+DB_POLICY = {
+    "metadata": {"name": "db-ingress"},
+    "spec": {
+        "podSelector": {"matchLabels": {"app": "db"}},
+        "policyTypes": ["Ingress"],
+        "ingress": [{"from": [{"podSelector": {"matchLabels": {"app": "api"}}}]}],
+    },
+}
+
+
+@pytest.fixture
+def snapshot():
+    pods = {f"web-{i}": {"app": "web", "shard": str(i)} for i in range(20)}
+    pods.update({"api-0": {"app": "api"}, "api-1": {"app": "api"}, "db": {"app": "db"}})
+    return ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {}, "ops": {}},
+        pods={"shop": pods, "ops": {"probe": {"app": "probe"}}},
+        policies={"shop": [DB_POLICY], "ops": []},
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_queries_match_brute_force(seed, namespace_index):  # noqa: F811
+    rng = random.Random(seed)
+    endpoints = [
+        Endpoint(rng.choice(NAMESPACES), f"pod{i}", _random_labels(rng))
+        for i in range(60)
+    ]
+    policies = {
+        ns: [_random_policy(rng, i) for i in range(rng.randint(0, 4))]
+        for ns in NAMESPACES
+    }
+    engine = PolicyEngine(policies, namespace_index)
+    index = ReachabilityIndex(engine, endpoints)
+
+    def names(found):
+        return {str(e) for e in found}
+
+    for pod in endpoints[:15]:
+        assert names(index.who_can_reach(pod)) == {
+            str(e) for e in endpoints if engine.allowed(e, pod)
+        }
+        assert names(index.reachable_from(pod)) == {
+            str(e) for e in endpoints if engine.allowed(pod, e)
+        }
+
+
+def test_only_candidate_classes_are_evaluated(snapshot):
+    simulator = TrafficSimulator(PolicyParser(snapshot=snapshot))
+    index = simulator.reachability_index(["shop", "ops"])
+    db = simulator.resolve_endpoint(Target("shop", "pod", "db"))
+
+    sources = index.who_can_reach(db)
+
+    assert [str(e) for e in sources] == ["shop/api-0", "shop/api-1"]
+    assert len(index.classes) == 23
+    assert index.evaluated == 1
+
+
+def test_simulator_includes_target_namespace_policies(snapshot):
+    simulator = TrafficSimulator(PolicyParser(snapshot=snapshot))
+
+    sources = simulator.who_can_reach(Target("shop", "pod", "db"), ["ops"])
+
+    assert sources == []
+
+
+def test_reach_commands(snapshot, monkeypatch):
+    monkeypatch.setattr(
+        "knetvis.cli.PolicyParser", lambda: PolicyParser(snapshot=snapshot)
+    )
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ["who-can-reach", "shop/pod/db"])
+    assert result.exit_code == 0
+    assert "2 pod(s) can reach shop/pod/db" in result.output
+    assert "api-1" in result.output
+
+    result = runner.invoke(cli, ["reachable-from", "ops/pod/probe", "-n", "ops"])
+    assert result.exit_code == 0
+    assert "ops/pod/probe can reach 1 pod(s)" in result.output
@@ -0,0 +1,183 @@
+import csv
+import io
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from knetvis.cli import cli
+from knetvis.report import CoverageReport
+from knetvis.snapshot import ClusterSnapshot
+
+
+def _policy(namespace, name, app, ingress, types=("Ingress",)):
+    return {
+        "metadata": {"name": name, "namespace": namespace},
+        "spec": {
+            "podSelector": {"matchLabels": {"app": app}},
+            "policyTypes": list(types),
+            "ingress": ingress,
+        },
+    }
+
+
+@pytest.fixture
+def snapshot():
+    return ClusterSnapshot(
+        context="prod",
+        namespaces={"shop": {"team": "shop"}, "ops": {"team": "ops"}, "empty": {}},
+        pods={
+            "shop": {
+                "web-1": {"app": "web"},
+                "web-2": {"app": "web"},
+                "db": {"app": "db"},
+                "cache": {"app": "cache"},
+            },
+            "ops": {"monitor": {"app": "monitor"}},
+            "empty": {},
+        },
+        policies={
+            "shop": [
+                # Open to every namespace on the named http port
+                _policy(
+                    "shop",
+                    "web-public",
+                    "web",
+                    [
+                        {
+                            "from": [{"namespaceSelector": {}}],
+                            "ports": [{"port": "http", "protocol": "TCP"}],
+                        }
+                    ],
+                ),
+                # Only from the shop namespace
+                _policy(
+                    "shop",
+                    "db-internal",
+                    "db",
+                    [{"from": [{"podSelector": {}}], "ports": [{"port": 5432}]}],
+                    types=("Ingress", "Egress"),
+                ),
+            ]
+        },
+        ports={
+            "shop": {
+                "web-1": [["http", 8080, "TCP"]],
+                "web-2": [["http", 8080, "TCP"], ["metrics", 9090, "TCP"]],
+                "cache": [["", 6379, "TCP"]],
+            }
+        },
+    )
+
+
+def test_report_counts_coverage_and_exposure(snapshot):
+    data = CoverageReport(snapshot).to_dict()
+
+    assert data["summary"] == {
+        "namespaces": 3,
+        "pods": 5,
+        "policies": 2,
+        "unselected": 2,
+        "reachable_from_all_namespaces": 4,
+    }
+    assert data["unselected"] == ["ops/monitor", "shop/cache"]
+    assert "shop/db" not in data["reachable_from_all_namespaces"]
+    assert data["namespaces"]["shop"]["open_ports"] == [
+        "5432/TCP",
+        "6379/TCP",
+        "8080/TCP",
+    ]
+    assert data["namespaces"]["ops"]["open_ports"] == ["*"]
+    assert data["namespaces"]["empty"]["pods"] == 0
+
+
+def test_rows_describe_each_pod(snapshot):
+    rows = {row.pod: row for row in CoverageReport(snapshot).rows()}
+
+    assert rows["db"].ingress_isolated and rows["db"].egress_isolated
+    assert not rows["db"].reachable_from_all_namespaces
+    # Open to shop only, but open all the same
+    assert rows["db"].open_ports == ["5432/TCP"]
+    assert rows["web-2"].selected_by == 1
+    assert rows["web-2"].open_ports == ["8080/TCP"]
+
+
+def test_peers_without_matching_pods_do_not_count(snapshot):
+    snapshot.policies["shop"][0]["spec"]["ingress"][0]["from"] = [
+        {"namespaceSelector": {}, "podSelector": {"matchLabels": {"app": "monitor"}}}
+    ]
+
+    rows = {row.pod: row for row in CoverageReport(snapshot).rows()}
+
+    # Only ops has a monitor pod, so shop cannot reach web
+    assert not rows["web-1"].reachable_from_all_namespaces
+
+
+def test_ports_of_each_rule_are_reported(snapshot):
+    snapshot.policies["shop"].append(
+        _policy(
+            "shop",
+            "cache-mixed",
+            "cache",
+            [
+                {"from": [{"namespaceSelector": {}}], "ports": [{"port": 80}]},
+                {
+                    "from": [{"namespaceSelector": {"matchLabels": {"team": "ops"}}}],
+                    "ports": [{"port": 5432}],
+                },
+            ],
+        )
+    )
+    # Admits no namespace with pods
+    snapshot.policies["shop"].append(
+        _policy(
+            "shop",
+            "web-nobody",
+            "web",
+            [
+                {
+                    "from": [{"podSelector": {"matchLabels": {"app": "x"}}}],
+                    "ports": [{"port": 22}],
+                }
+            ],
+        )
+    )
+
+    report = CoverageReport(snapshot)
+    rows = {row.pod: row for row in report.rows()}
+
+    assert rows["cache"].reachable_from_all_namespaces
+    assert rows["cache"].open_ports == ["5432/TCP", "80/TCP"]
+    assert rows["web-1"].open_ports == ["8080/TCP"]
+
+    snapshot.policies["shop"][-2]["spec"]["ingress"].pop(0)
+    report = CoverageReport(snapshot)
+    rows = {row.pod: row for row in report.rows()}
+
+    assert not rows["cache"].reachable_from_all_namespaces
+    assert rows["cache"].open_ports == ["5432/TCP"]
+    assert "5432/TCP" in report.namespaces["shop"].open_ports
+    assert "80/TCP" not in report.namespaces["shop"].open_ports
+
+
+def test_csv_streams_one_row_per_pod(snapshot):
+    out = io.StringIO()
+    CoverageReport(snapshot).write_csv(out)
+
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+
+    assert len(rows) == 5
+    assert rows[0]["namespace"] == "ops"
+    assert rows[0]["reachable_from_all_namespaces"] == "True"
+
+
+def test_cli_report_formats(snapshot, tmp_path):
+    path = str(tmp_path / "prod.json")
+    snapshot.save(path)
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ["report", "--snapshot", path, "--format", "json"])
+    assert json.loads(result.output)["summary"]["unselected"] == 2
+
+    table = runner.invoke(cli, ["report", "--snapshot", path]).output
+    assert "2 not selected by any policy" in table
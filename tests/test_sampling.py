@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from knetvis.cli import cli
+from knetvis.engine import PolicyEngine
+from knetvis.matrix import evaluate_pairs
+from knetvis.models import Endpoint
+from knetvis.policy import PolicyParser
+from knetvis.sampling import ProgressiveSampler, classify, stratified_order
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+from knetvis.visualizer import NetworkVisualizer
+
+API_POLICY = {
+    "metadata": {"name": "api-ingress"},
+    "spec": {
+        "podSelector": {"matchLabels": {"app": "api"}},
+        "policyTypes": ["Ingress"],
+        "ingress": [{"from": [{"podSelector": {"matchLabels": {"app": "web"}}}]}],
+    },
+}
+
+
+def _endpoints():
+    replicas = {("shop", "web"): 6, ("shop", "api"): 3, ("shop", "db"): 1}
+    replicas.update({("ops", "probe"): 2, ("ops", "cron"): 1})
+    return [
+        Endpoint(ns, f"{app}-{i}", {"app": app})
+        for (ns, app), count in replicas.items()
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def snapshot():
+    endpoints = _endpoints()
+    pods = {}
+    for e in endpoints:
+        pods.setdefault(e.namespace, {})[e.name] = e.labels
+    return ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {}, "ops": {}},
+        pods=pods,
+        policies={"shop": [API_POLICY], "ops": []},
+    )
+
+
+def test_classes_group_identical_labels():
+    classes = classify(_endpoints())
+
+    assert sorted((c.namespace, c.labels["app"], c.size) for c in classes) == [
+        ("ops", "cron", 1),
+        ("ops", "probe", 2),
+        ("shop", "api", 3),
+        ("shop", "db", 1),
+        ("shop", "web", 6),
+    ]
+
+
+def test_stratified_order_alternates_namespaces_largest_first():
+    ordered = stratified_order(classify(_endpoints()))
+
+    assert [c.labels["app"] for c in ordered] == ["probe", "web", "cron", "api", "db"]
+
+
+def test_rounds_grow_until_sample_size():
+    sampler = ProgressiveSampler(_endpoints(), sample=4, first_round=1)
+
+    rounds = [len(classes) for classes in sampler.rounds()]
+
+    assert rounds == [1, 2, 4]
+    assert sampler.coverage(sampler.classes[:4]) == pytest.approx(12 / 13)
+
+
+def test_budget_stops_after_first_round():
+    sampler = ProgressiveSampler(_endpoints(), budget_seconds=0, first_round=1)
+
+    assert [len(classes) for classes in sampler.rounds()] == [1]
+
+
+def test_full_sample_matches_exact_matrix(snapshot):
+    simulator = TrafficSimulator(PolicyParser(snapshot=snapshot))
+    estimates = list(simulator.sampled_matrix(["shop", "ops"]))
+    final = estimates[-1]
+
+    endpoints = simulator.list_endpoints(["shop", "ops"])
+    engine = PolicyEngine({"shop": [API_POLICY], "ops": []}, simulator.namespace_index)
+    exact = evaluate_pairs(engine, endpoints)
+
+    assert final.coverage == 1.0
+    assert final.allowed_fraction == pytest.approx(exact.mean())
+    shop = np.array([e.namespace == "shop" for e in endpoints])
+    assert final.namespace_summary()[("shop", "shop")] == pytest.approx(
+        exact[np.ix_(shop, shop)].mean()
+    )
+
+
+def test_sampled_graph_draws_representatives(snapshot):
+    parser = PolicyParser(snapshot=snapshot)
+    visualizer = NetworkVisualizer(
+        core_api=parser.core_api, namespace_index=parser.namespace_index
+    )
+
+    visualizer.create_graph("shop", [API_POLICY], sample=2)
+
+    assert visualizer.coverage == pytest.approx(9 / 10)
+    assert {n.labels["app"] for n in visualizer.namespace_pods} == {"web", "api"}
+    assert visualizer.graph.nodes["shop/web-0"]["class_size"] == 6
+    assert ("shop/web-0", "shop/api-0") in visualizer.graph.edges
+
+
+def test_matrix_command_streams_rounds(snapshot, monkeypatch):
+    monkeypatch.setattr(
+        "knetvis.cli.PolicyParser", lambda: PolicyParser(snapshot=snapshot)
+    )
+
+    result = CliRunner().invoke(cli, ["matrix", "shop", "ops", "--sample", "3"])
+
+    assert result.exit_code == 0
+    assert "Round 1: 3/5 label classes" in result.output
+    assert "Allowed pod pairs" in result.output
@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from knetvis.engine import PolicyEngine
+from knetvis.models import Endpoint
+from knetvis.selector import LabelSelector, NamespaceIndex
+
+
+def _ns(name, labels):
+    return SimpleNamespace(metadata=SimpleNamespace(name=name, labels=labels))
+
+
+@pytest.fixture
+def core_api():
+    api = Mock()
+    api.list_namespace.return_value = SimpleNamespace(
+        items=[
+            _ns("prod", {"env": "prod", "team": "pay"}),
+            _ns("staging", {"env": "staging", "team": "pay"}),
+            _ns("tools", {"team": "infra"}),
+        ],
+        metadata=SimpleNamespace(resource_version="10"),
+    )
+    return api
+
+
+@pytest.mark.parametrize(
+    "selector, expected",
+    [
+        ({}, True),
+        ({"matchLabels": {"app": "web"}}, True),
+        ({"match_labels": {"app": "db"}}, False),
+        (
+            {"matchExpressions": [{"key": "tier", "operator": "In", "values": ["a"]}]},
+            True,
+        ),
+        (
+            {
+                "matchExpressions": [
+                    {"key": "tier", "operator": "NotIn", "values": ["a"]}
+                ]
+            },
+            False,
+        ),
+        (
+            {
+                "matchExpressions": [
+                    {"key": "zone", "operator": "NotIn", "values": ["a"]}
+                ]
+            },
+            True,
+        ),
+        ({"matchExpressions": [{"key": "tier", "operator": "Exists"}]}, True),
+        ({"match_expressions": [{"key": "zone", "operator": "Exists"}]}, False),
+        ({"matchExpressions": [{"key": "zone", "operator": "DoesNotExist"}]}, True),
+        ({"matchExpressions": [{"key": "app", "operator": "DoesNotExist"}]}, False),
+    ],
+)
+def test_label_selector_matches(selector, expected):
+    labels = {"app": "web", "tier": "a"}
+    assert LabelSelector(selector).matches(labels) is expected
+
+
+def test_label_selector_rejects_unknown_operator():
+    with pytest.raises(ValueError):
+        LabelSelector({"matchExpressions": [{"key": "a", "operator": "Near"}]})
+
+
+def test_equivalent_selectors_share_a_key():
+    camel = LabelSelector({"matchLabels": {"a": "1", "b": "2"}})
+    snake = LabelSelector({"match_labels": {"b": "2", "a": "1"}})
+    assert camel == snake
+    assert camel.to_string() == "a=1,b=2"
+
+
+def test_namespace_index_resolves_with_one_api_call(core_api):
+    index = NamespaceIndex(core_api)
+    pay = {"matchLabels": {"team": "pay"}}
+    not_prod = {
+        "matchExpressions": [{"key": "env", "operator": "NotIn", "values": ["prod"]}]
+    }
+
+    for _ in range(100):
+        assert index.resolve(pay) == {"prod", "staging"}
+        assert index.resolve(not_prod) == {"staging", "tools"}
+        assert index.matches("tools", {})
+
+    assert core_api.list_namespace.call_count == 1
+
+
+def test_namespace_index_applies_watch_events(core_api):
+    index = NamespaceIndex(core_api)
+    pay = {"matchLabels": {"team": "pay"}}
+    assert index.resolve(pay) == {"prod", "staging"}
+
+    index.apply_event("ADDED", _ns("billing", {"team": "pay"}))
+    index.apply_event("MODIFIED", _ns("staging", {"team": "infra"}))
+    index.apply_event("DELETED", _ns("prod", {"team": "pay"}))
+
+    assert index.resolve(pay) == {"billing"}
+    assert index.labels("staging") == {"team": "infra"}
+    assert core_api.list_namespace.call_count == 1
+
+
+def test_namespace_peers_cost_no_namespace_reads(core_api):
+    index = NamespaceIndex(core_api)
+    policy = {
+        "metadata": {"name": "from-staging"},
+        "spec": {
+            "podSelector": {},
+            "ingress": [
+                {
+                    "from": [
+                        {
+                            "namespaceSelector": {
+                                "matchExpressions": [
+                                    {
+                                        "key": "env",
+                                        "operator": "In",
+                                        "values": ["staging"],
+                                    }
+                                ]
+                            }
+                        }
+                    ]
+                }
+            ],
+        },
+    }
+    engine = PolicyEngine({"prod": [policy]}, index)
+    dest = Endpoint("prod", "db", {})
+
+    for ns in ["prod", "staging", "tools"] * 50:
+        allowed = engine.allowed(Endpoint(ns, "p", {}), dest)
+        assert allowed is (ns == "staging")
+
+    core_api.read_namespace.assert_not_called()
+    assert core_api.list_namespace.call_count == 1
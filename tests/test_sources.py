@@ -0,0 +1,169 @@
+import threading
+
+import pytest
+import yaml
+
+from knetvis.cache import ResultCache
+from knetvis.fakeapi import FakeApiServer
+from knetvis.inventory import iter_pods
+from knetvis.models import Target
+from knetvis.policy import PolicyParser
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+from knetvis.sources import (
+    CachedSource,
+    FileSource,
+    SnapshotSource,
+    from_manifests,
+    to_manifests,
+)
+from knetvis.visualizer import NetworkVisualizer
+
+
+@pytest.fixture
+def snapshot():
+    return ClusterSnapshot(
+        context="prod",
+        namespaces={"shop": {"team": "shop"}, "ops": {"team": "ops"}},
+        pods={
+            "shop": {f"web-{i}": {"app": "web"} for i in range(5)},
+            "ops": {"monitor": {"app": "monitor"}},
+        },
+        policies={
+            "shop": [
+                {
+                    "apiVersion": "networking.k8s.io/v1",
+                    "kind": "NetworkPolicy",
+                    "metadata": {"name": "from-ops", "namespace": "shop"},
+                    "spec": {
+                        "podSelector": {"matchLabels": {"app": "web"}},
+                        "ingress": [
+                            {
+                                "from": [
+                                    {
+                                        "namespaceSelector": {
+                                            "matchLabels": {"team": "ops"}
+                                        }
+                                    }
+                                ]
+                            }
+                        ],
+                    },
+                }
+            ]
+        },
+        owners={"shop": {"web-0": [["ReplicaSet", "web-abc"]]}},
+        ports={"shop": {"web-0": [["http", 8080, "TCP"]]}},
+        services={"shop": {"web": {"app": "web"}}},
+    )
+
+
+@pytest.fixture
+def server(snapshot):
+    with FakeApiServer(snapshot) as server:
+        yield server
+
+
+def test_pods_are_paged_through_the_client(server):
+    source = server.source()
+
+    records = list(iter_pods(source.core_api, "shop", page_size=2))
+
+    assert sorted(r.name for r in records) == [f"web-{i}" for i in range(5)]
+    web = next(r for r in records if r.name == "web-0")
+    assert web.owners == (("ReplicaSet", "web-abc"),)
+    assert web.ports == (("http", 8080, "TCP"),)
+    assert server.requests.count("/api/v1/namespaces/shop/pods") == 3
+
+
+def test_all_classes_evaluate_through_one_source(server):
+    source = server.source()
+    simulator = TrafficSimulator(source=source, cache=ResultCache())
+    visualizer = NetworkVisualizer(source=source)
+
+    assert simulator.namespace_index is source.namespace_index
+    assert visualizer.cluster is source.cluster
+    assert simulator.test_connectivity(
+        Target("ops", "pod", "monitor"), Target("shop", "pod", "web-1")
+    )
+    assert not simulator.test_connectivity(
+        Target("shop", "pod", "web-1"), Target("shop", "pod", "web-2")
+    )
+    assert simulator.count_connectivity(
+        Target("ops", "pod", "monitor"), Target("shop", "service", "web")
+    ) == (5, 5)
+
+    policies = PolicyParser(source=source).get_namespace_policies("shop")
+    visualizer.create_graph("shop", policies)
+    assert visualizer.graph.has_edge("/ops", "shop/web-3")
+
+
+def test_namespace_watch_follows_the_server(server):
+    index = server.source().namespace_index
+    assert index.resolve({"matchLabels": {"team": "ops"}}) == {"ops"}
+
+    watcher = threading.Thread(target=index.watch, kwargs={"timeout_seconds": 1})
+    watcher.start()
+    server.apply(
+        {
+            "kind": "Namespace",
+            "metadata": {"name": "shop", "labels": {"team": "ops"}},
+        }
+    )
+    server.delete("Namespace", "ops")
+    watcher.join()
+
+    assert index.resolve({"matchLabels": {"team": "ops"}}) == {"shop"}
+
+
+def test_cached_source_answers_repeats_from_memory(server):
+    server.latency = 0.02
+    source = CachedSource(server.source(), ttl=60)
+    parser = PolicyParser(source=source)
+
+    parser.get_policies(["shop", "ops"])
+    list(iter_pods(source.core_api, "shop", page_size=2))
+    requests = len(server.requests)
+    parser.get_policies(["shop", "ops"])
+    records = list(iter_pods(source.core_api, "shop", page_size=2))
+
+    assert len(server.requests) == requests
+    assert len(records) == 5
+    assert source.hits == 5
+
+    source.invalidate()
+    parser.get_policies(["shop"])
+    assert len(server.requests) == requests + 1
+
+
+def test_manifests_round_trip(snapshot):
+    docs = to_manifests(snapshot)
+
+    assert from_manifests(docs, "prod") == snapshot
+
+
+def test_file_source_reads_manifests_and_snapshots(snapshot, tmp_path):
+    manifests = tmp_path / "cluster.yaml"
+    docs = to_manifests(snapshot)
+    with open(manifests, "w") as f:
+        # A List, a kind knetvis does not read and plain documents
+        yaml.safe_dump_all(
+            [
+                {"apiVersion": "v1", "kind": "List", "items": docs[:3]},
+                {"apiVersion": "apps/v1", "kind": "Deployment", "metadata": {}},
+            ]
+            + docs[3:],
+            f,
+        )
+    saved = tmp_path / "prod.json"
+    snapshot.save(str(saved))
+
+    assert FileSource(str(manifests), context="prod").snapshot == snapshot
+    assert FileSource(str(saved)).snapshot == snapshot
+
+
+def test_snapshot_source_keeps_the_context(snapshot):
+    parser = PolicyParser(source=SnapshotSource(snapshot))
+
+    assert parser.context == "prod"
+    assert len(parser.get_policies(["shop"])["shop"]) == 1
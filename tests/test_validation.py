@@ -0,0 +1,178 @@
+import textwrap
+
+import pytest
+from click.testing import CliRunner
+
+from knetvis.cli import cli
+from knetvis.validation import DEFAULT_RULES, PORT, Validator
+
+
+def _policy(spec):
+    return {
+        "apiVersion": "networking.k8s.io/v1",
+        "kind": "NetworkPolicy",
+        "metadata": {"name": "p"},
+        "spec": spec,
+    }
+
+
+def _messages(doc):
+    return [str(issue) for issue in DEFAULT_RULES.compile().validate(doc)]
+
+
+def test_valid_policy_has_no_issues():
+    doc = _policy(
+        {
+            "podSelector": {"matchLabels": {"app": "api"}},
+            "policyTypes": ["Ingress", "Egress"],
+            "ingress": [
+                {
+                    "from": [
+                        {"ipBlock": {"cidr": "10.0.0.0/8", "except": ["10.1.0.0/16"]}}
+                    ],
+                    "ports": [{"port": 8000, "endPort": 9000, "protocol": "TCP"}],
+                }
+            ],
+            "egress": [{"to": [{"namespaceSelector": {}}], "ports": [{"port": "dns"}]}],
+        }
+    )
+
+    assert _messages(doc) == []
+
+
+def test_existing_messages_are_kept():
+    doc = _policy(
+        {
+            "podSelector": {},
+            "ingress": [{"ports": [{"protocol": "ICMP"}], "from": [{}]}],
+        }
+    )
+
+    assert _messages(doc) == [
+        "Ingress rule 1: Port specification missing port number",
+        "Ingress rule 1: Invalid protocol ICMP",
+        "Ingress rule 1: Peer missing selector",
+    ]
+    assert _messages({"kind": "Pod", "metadata": {}}) == [
+        "Pod missing required metadata.name field"
+    ]
+
+
+@pytest.mark.parametrize(
+    "block, message",
+    [
+        ({"cidr": "10.0.0.0"}, "Invalid ipBlock cidr '10.0.0.0'"),
+        ({"cidr": "10.0.0.0/33"}, "Invalid ipBlock cidr '10.0.0.0/33'"),
+        ({"except": []}, "ipBlock missing cidr"),
+        (
+            {"cidr": "10.0.0.0/16", "except": ["10.2.0.0/24"]},
+            "ipBlock except 10.2.0.0/24 is not within 10.0.0.0/16",
+        ),
+        (
+            {"cidr": "10.0.0.0/8", "except": ["fd00::/8"]},
+            "ipBlock except fd00::/8 is not within 10.0.0.0/8",
+        ),
+    ],
+)
+def test_ip_block_cidrs(block, message):
+    doc = _policy({"podSelector": {}, "egress": [{"to": [{"ipBlock": block}]}]})
+
+    assert _messages(doc) == [f"Egress rule 1: {message}"]
+
+
+@pytest.mark.parametrize(
+    "port, message",
+    [
+        ({"port": 90, "endPort": 80}, "endPort 80 is less than port 90"),
+        ({"port": "http", "endPort": 80}, "endPort requires a numeric port"),
+        ({"port": 70000}, "Port 70000 out of range 1-65535"),
+        ({"port": "Not_A_Name"}, "Invalid named port 'Not_A_Name'"),
+    ],
+)
+def test_ports(port, message):
+    doc = _policy({"podSelector": {}, "ingress": [{"ports": [port]}]})
+
+    assert _messages(doc) == [f"Ingress rule 1: {message}"]
+
+
+def test_policy_types_and_selectors():
+    doc = _policy(
+        {
+            "podSelector": {
+                "matchExpressions": [{"key": "app", "operator": "In", "values": []}]
+            },
+            "policyTypes": ["Ingress", "ingress", "Ingress"],
+        }
+    )
+
+    assert _messages(doc) == [
+        "Invalid policyType 'ingress', expected Ingress or Egress",
+        "Duplicate policyType 'Ingress'",
+        "podSelector operator In requires values",
+    ]
+
+
+def test_custom_rule_and_timings():
+    registry = DEFAULT_RULES.copy()
+
+    @registry.rule(PORT, "no-privileged-ports")
+    def no_privileged_ports(port, location):
+        if isinstance(port.get("port"), int) and port["port"] < 1024:
+            yield f"Privileged port {port['port']}"
+
+    validator = registry.compile(timed=True)
+    doc = _policy({"podSelector": {}, "ingress": [{"ports": [{"port": 80}]}]})
+
+    issues = validator.validate_all([doc, doc])
+
+    assert [(i.document, i.rule, str(i)) for i in issues] == [
+        (0, "no-privileged-ports", "Ingress rule 1: Privileged port 80"),
+        (1, "no-privileged-ports", "Ingress rule 1: Privileged port 80"),
+    ]
+    assert validator.timings["no-privileged-ports"][1] == 2
+    assert "no-privileged-ports" not in DEFAULT_RULES
+    with pytest.raises(ValueError):
+        registry.rule(PORT, "no-privileged-ports")(no_privileged_ports)
+
+
+def test_parallel_matches_serial(monkeypatch):
+    monkeypatch.setattr("knetvis.validation.CHUNK_SIZE", 10)
+    docs = [
+        _policy({"podSelector": {}, "ingress": [{"ports": [{"port": i % 3 * 70000}]}]})
+        for i in range(45)
+    ]
+    serial = Validator(list(DEFAULT_RULES)).validate_all(docs)
+
+    parallel = Validator(list(DEFAULT_RULES), jobs=2, timed=True)
+    issues = parallel.validate_all(docs)
+
+    assert issues == serial
+    assert parallel.timings["port-number"][1] == 45
+
+
+def test_validate_command_loads_rules(tmp_path, mock_kube_config):
+    policy = tmp_path / "policy.yaml"
+    policy.write_text(textwrap.dedent("""
+            apiVersion: networking.k8s.io/v1
+            kind: NetworkPolicy
+            metadata: {name: web}
+            spec:
+              podSelector: {}
+              ingress: [{ports: [{port: 22}]}]
+            """))
+    rules = tmp_path / "rules.py"
+    rules.write_text(textwrap.dedent("""
+            def register(registry):
+                @registry.rule("port", "no-ssh")
+                def no_ssh(port, location):
+                    if port.get("port") == 22:
+                        yield "SSH is not allowed"
+            """))
+
+    result = CliRunner().invoke(
+        cli, ["validate", str(policy), "--rules", str(rules), "--timings"]
+    )
+
+    assert result.exit_code == 0
+    assert "Ingress rule 1: SSH is not allowed" in result.output
+    assert "Rule timings" in result.output
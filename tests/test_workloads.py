@@ -0,0 +1,169 @@
+import pytest
+from kubernetes import client
+
+from knetvis.fakeapi import FakeApiServer
+from knetvis.inventory import PodRecord, records_from_json
+from knetvis.models import Target
+from knetvis.policy import PolicyParser
+from knetvis.simulator import TrafficSimulator
+from knetvis.snapshot import ClusterSnapshot
+from knetvis.workloads import (
+    ServiceRecord,
+    WorkloadIndex,
+    canonical_kind,
+    fetch_services,
+    workload_owners,
+)
+
+WEB_TO_DB = {
+    "metadata": {"name": "web-to-db", "namespace": "shop"},
+    "spec": {
+        "podSelector": {"matchLabels": {"app": "db"}},
+        "policyTypes": ["Ingress"],
+        "ingress": [{"from": [{"podSelector": {"matchLabels": {"app": "web"}}}]}],
+    },
+}
+
+
+@pytest.fixture
+def snapshot():
+    return ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {}},
+        pods={
+            "shop": {
+                "web-7d4b9-abcde": {"app": "web", "pod-template-hash": "7d4b9"},
+                "web-7d4b9-fghij": {"app": "web", "pod-template-hash": "7d4b9"},
+                "canary-0": {"app": "canary"},
+                "db-0": {"app": "db"},
+                "db-1": {"app": "db"},
+            }
+        },
+        policies={"shop": [WEB_TO_DB]},
+        owners={
+            "shop": {
+                "web-7d4b9-abcde": [["ReplicaSet", "web-7d4b9"]],
+                "web-7d4b9-fghij": [["ReplicaSet", "web-7d4b9"]],
+                "canary-0": [["StatefulSet", "canary"]],
+                "db-0": [["StatefulSet", "db"]],
+                "db-1": [["StatefulSet", "db"]],
+            }
+        },
+        services={"shop": {"db": {"app": "db"}, "external": None}},
+    )
+
+
+@pytest.fixture
+def simulator(snapshot):
+    return TrafficSimulator(PolicyParser(snapshot=snapshot))
+
+
+def test_canonical_kind_accepts_kubectl_aliases():
+    assert canonical_kind("deploy") == "deployment"
+    assert canonical_kind("SVC") == "service"
+    with pytest.raises(ValueError):
+        canonical_kind("ingress")
+
+
+def test_deployment_is_derived_from_the_replicaset_name():
+    pod = PodRecord(
+        "shop",
+        "web-7d4b9-abcde",
+        {"pod-template-hash": "7d4b9"},
+        owners=(("ReplicaSet", "web-7d4b9"),),
+    )
+
+    assert list(workload_owners(pod)) == [
+        ("replicaset", "web-7d4b9"),
+        ("deployment", "web"),
+    ]
+
+
+def test_owner_references_are_read_from_raw_json():
+    page = {
+        "items": [
+            {
+                "metadata": {
+                    "name": "db-0",
+                    "ownerReferences": [{"kind": "StatefulSet", "name": "db"}],
+                }
+            }
+        ]
+    }
+
+    records, _ = records_from_json("shop", page)
+
+    assert records[0].owners == (("StatefulSet", "db"),)
+
+
+def test_index_resolves_services_by_selector():
+    pods = {
+        "shop": [
+            PodRecord("shop", "db-0", {"app": "db", "tier": "data"}),
+            PodRecord("shop", "web", {"app": "web"}),
+        ]
+    }
+    services = {
+        "shop": [
+            ServiceRecord("shop", "db", {"app": "db"}),
+            ServiceRecord("shop", "external", None),
+        ]
+    }
+    index = WorkloadIndex(pods, services)
+
+    assert [p.name for p in index.resolve(Target("shop", "svc", "db"))] == ["db-0"]
+    assert index.resolve(Target("shop", "service", "external")) == []
+    assert index.exists(Target("shop", "service", "external"))
+    assert not index.exists(Target("shop", "deployment", "db"))
+
+
+def test_services_are_read_from_raw_json():
+    snapshot = ClusterSnapshot(
+        context="test",
+        namespaces={"shop": {}},
+        services={"shop": {"db": {"app": "db"}, "external": None}},
+    )
+    with FakeApiServer(snapshot) as server:
+        services = fetch_services(client.CoreV1Api(server.api_client()), "shop")
+
+    assert services == [
+        ServiceRecord("shop", "db", {"app": "db"}),
+        ServiceRecord("shop", "external", None),
+    ]
+
+
+def test_deployment_to_service_connectivity(simulator):
+    web = Target("shop", "deploy", "web")
+    db = Target("shop", "svc", "db")
+
+    assert simulator.check_resource_exists(web)
+    assert simulator.check_resource_exists(db)
+    assert not simulator.check_resource_exists(Target("shop", "deployment", "api"))
+    assert simulator.count_connectivity(web, db) == (4, 4)
+    assert simulator.test_connectivity(web, db)
+
+
+def test_partially_allowed_workloads_are_counted(snapshot):
+    # The ReplicaSet also owns the canary pod, which may not reach db
+    snapshot.owners["shop"]["canary-0"] = [["ReplicaSet", "web-7d4b9"]]
+    simulator = TrafficSimulator(PolicyParser(snapshot=snapshot))
+    web = Target("shop", "replicaset", "web-7d4b9")
+    db = Target("shop", "statefulset", "db")
+
+    assert simulator.count_connectivity(web, db) == (4, 6)
+    assert not simulator.test_connectivity(web, db)
+    explanation = simulator.explain_connectivity(web, db)
+    assert not explanation.allowed
+
+
+def test_who_can_reach_a_service_merges_its_pods(simulator):
+    sources = simulator.who_can_reach(Target("shop", "svc", "db"), ["shop"])
+
+    assert sorted(e.name for e in sources) == ["web-7d4b9-abcde", "web-7d4b9-fghij"]
+
+
+def test_snapshot_round_trips_owners_and_services(snapshot):
+    restored = ClusterSnapshot.from_dict(snapshot.to_dict())
+
+    assert restored.owners == snapshot.owners
+    assert restored.services == snapshot.services